@@ -28,6 +28,11 @@ USAGE:
     5. Save/load settings:
        python CRYSTALOptToD12.py --save-options --options-file settings.json
 
+    6. From Python, without prompts (as the MACE workflow does):
+       from CRYSTALOptToD12 import generate_d12
+       result = generate_d12("file.out", "file.d12", config={"calculation_type": "SP"})
+       result["d12_file"]  # path of the new input
+
 AUTHOR:
     New entirely reworked script by Marcus Djokic
     Based on prior versions written by Wangwei Lan, Kevin Lucht, Danny Maldonado, Marcus Djokic
@@ -38,6 +43,7 @@ import sys
 import re
 import argparse
 import json
+import copy
 from pathlib import Path
 
 # Import from new modular structure
@@ -555,7 +561,37 @@ def write_d12_file(output_file, geometry_data, settings, external_basis_data=Non
         # Note: The single END at the very end is written by write_scf_section
 
 
-def process_files(output_file, input_file=None, shared_settings=None, config_file=None, non_interactive=False, calc_type=None, opt_type=None, origin_setting="auto"):
+def output_d12_filename(output_file, options, output_dir=None):
+    """Name of the D12 file process_files writes for the given options
+
+    Args:
+        output_file: Path to .out file
+        options: Settings used (as returned by process_files)
+        output_dir: Directory for the new file (default: next to output_file)
+
+    Returns:
+        str: Path of the new D12 file
+    """
+    base_name = os.path.splitext(output_file)[0]
+    if output_dir:
+        base_name = os.path.join(output_dir, os.path.basename(base_name))
+    calc_type = options["calculation_type"]
+    functional = options.get("functional", "RHF")
+
+    # Don't add -D3 to 3C methods or HF methods or if dispersion is already included in the name
+    if (
+        options.get("dispersion")
+        and "-3C" not in functional
+        and "3C" not in functional
+        and functional not in ["RHF", "UHF", "HF3C", "HFSOL3C"]
+    ):
+        functional += "-D3"
+
+    return f"{base_name}_{calc_type.lower()}_{functional}_optimized.d12"
+
+
+def process_files(output_file, input_file=None, shared_settings=None, config_file=None, non_interactive=False, calc_type=None, opt_type=None, origin_setting="auto",
+                  config=None, output_dir=None):
     """Process CRYSTAL output and input files
 
     Args:
@@ -567,6 +603,8 @@ def process_files(output_file, input_file=None, shared_settings=None, config_fil
         calc_type: Calculation type for non-interactive mode (optional)
         opt_type: Optimization type for non-interactive mode (optional)
         origin_setting: Origin setting for non-interactive mode (optional)
+        config: Config settings as a dictionary, used instead of config_file (optional)
+        output_dir: Directory for the new D12 file (default: next to output_file)
 
     Returns:
         tuple: (success, settings_used)
@@ -642,13 +680,17 @@ def process_files(output_file, input_file=None, shared_settings=None, config_fil
         settings["scf_settings"] = {"method": "DIIS", "maxcycle": 800, "fmixing": 30}
 
     # Get user options or use shared settings
-    if config_file:
+    if config_file or config is not None:
         # Config file takes precedence - process it first
-        # Load settings from config file
-        print(f"\nLoading settings from config file: {config_file}")
         try:
-            with open(config_file, 'r') as f:
-                config_data = json.load(f)
+            if config is not None:
+                # Copied: the settings below modify nested dictionaries in place
+                config_data = copy.deepcopy(config)
+            else:
+                # Load settings from config file
+                print(f"\nLoading settings from config file: {config_file}")
+                with open(config_file, 'r') as f:
+                    config_data = json.load(f)
             
             # Show config summary
             print("\n" + "="*60)
@@ -893,20 +935,7 @@ def process_files(output_file, input_file=None, shared_settings=None, config_fil
             options["write_only_unique"] = False
     
     # Create output filename
-    base_name = os.path.splitext(output_file)[0]
-    calc_type = options["calculation_type"]
-    functional = options.get("functional", "RHF")
-
-    # Don't add -D3 to 3C methods or HF methods or if dispersion is already included in the name
-    if (
-        options.get("dispersion")
-        and "-3C" not in functional
-        and "3C" not in functional
-        and functional not in ["RHF", "UHF", "HF3C", "HFSOL3C"]
-    ):
-        functional += "-D3"
-
-    new_filename = f"{base_name}_{calc_type.lower()}_{functional}_optimized.d12"
+    new_filename = output_d12_filename(output_file, options, output_dir)
 
     # Write new D12 file
     print(f"\nWriting new D12 file: {new_filename}")
@@ -1032,6 +1061,41 @@ def process_files(output_file, input_file=None, shared_settings=None, config_fil
     return True, options
 
 
+def generate_d12(output_file, input_file=None, config=None, output_dir=None):
+    """Generate a follow-up D12 file without prompts
+
+    Programmatic entry point for the workflow engine: the settings come from
+    a config dictionary (the contents of a --config-file), and the geometry
+    from the output file.
+
+    Args:
+        output_file: Path to .out file
+        input_file: Path to the original .d12 file (optional)
+        config: Config settings, e.g. {"calculation_type": "SP", "functional": "PBE0"}
+                (default: SP with the settings of the original calculation)
+        output_dir: Directory for the new D12 file (default: next to output_file)
+
+    Returns:
+        dict: {"d12_file", "calc_type", "options"}, or None on failure
+    """
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+    success, options = process_files(
+        str(output_file),
+        str(input_file) if input_file else None,
+        non_interactive=True,
+        config=config,
+        output_dir=str(output_dir) if output_dir else None,
+    )
+    if not success:
+        return None
+    return {
+        "d12_file": output_d12_filename(str(output_file), options, str(output_dir) if output_dir else None),
+        "calc_type": options["calculation_type"],
+        "options": options,
+    }
+
+
 def find_file_pairs(directory):
     """Find matching .out and .d12 file pairs in a directory
 
@@ -1148,7 +1212,8 @@ def main():
             non_interactive=args.non_interactive,
             calc_type=args.calc_type,
             opt_type=args.opt_type,
-            origin_setting=args.origin_setting
+            origin_setting=args.origin_setting,
+            output_dir=args.output_dir
         )
 
         if success and args.save_options:
@@ -1297,7 +1362,8 @@ def main():
                 non_interactive=args.non_interactive,
                 calc_type=args.calc_type,
                 opt_type=args.opt_type,
-                origin_setting=args.origin_setting
+                origin_setting=args.origin_setting,
+                output_dir=args.output_dir
             )
             if success:
                 success_count += 1
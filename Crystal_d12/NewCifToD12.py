@@ -36,6 +36,20 @@ USAGE:
     4. Specify output directory:
        python NewCifToD12.py --cif_dir /path/to/cif/files --output_dir /path/to/output
 
+    5. Convert a large set of CIFs with 8 worker processes:
+       python NewCifToD12.py --batch --options_file my_settings.json --cif_dir /path/to/cif/files --jobs 8
+
+       Parsed structures and spglib results are cached by file contents in
+       <cif_dir>/.cif2d12_cache (--cache_dir to move it, --no_cache to skip it),
+       so converting the same CIFs again with other options skips the symmetry
+       analysis. Files that fail are listed at the end instead of stopping the run.
+
+    Batch runs (--batch, --jobs > 1 or --strict) never prompt: a missing space
+    group is inferred with spglib from the atom positions, other questions take
+    their default answer or fail the file. Failed files and decisions taken
+    without asking are recorded as JSON lines in <output_dir>/cif2d12_errors.jsonl
+    (--error_manifest to move it).
+
 CONFIGURATION:
     ** IMPORTANT: Before running, modify the path constants at the top of this script **
 
@@ -49,12 +63,16 @@ AUTHOR:
 """
 
 import os
+import io
 import sys
 import glob
+import time
 import argparse
+import contextlib
 import numpy as np
 from ase.io import read
 import json
+from concurrent.futures import ProcessPoolExecutor
 
 # Import from new modular structure
 from d12_constants import (
@@ -120,6 +138,7 @@ from d12_interactive import (
     save_options_to_file,
     load_options_from_file,
 )
+from d12_cif_cache import CifAnalysisCache, DEFAULT_CACHE_DIRNAME
 
 # Import MACE configuration for paths
 import sys
@@ -145,6 +164,9 @@ except ImportError:
 # Import write_scf_section from d12_writer
 from d12_writer import write_scf_section
 
+# JSON-lines record of failed CIF files, written next to the D12 files
+DEFAULT_ERROR_MANIFEST = "cif2d12_errors.jsonl"
+
 # Try to import spglib for symmetry operations
 try:
     import spglib
@@ -156,10 +178,21 @@ except ImportError:
     print("Install spglib for full symmetry functionality: pip install spglib")
 
 
+class CifConversionError(Exception):
+    """A CIF file that cannot be converted without asking the user"""
+
+    def __init__(self, message, stage="parse"):
+        super().__init__(message)
+        self.stage = stage  # parse, spacegroup, basis, ...
+
+
 def parse_cif(cif_file):
     """
     Parse a CIF file to extract crystallographic data
 
+    Never prompts: the space group is None when the CIF does not state one
+    (load_cif() resolves it).
+
     Args:
         cif_file (str): Path to the CIF file
 
@@ -206,13 +239,6 @@ def parse_cif(cif_file):
                 if hm_match:
                     cif_symmetry_name = hm_match.group(1)
 
-        # If still not found, prompt user
-        if spacegroup is None:
-            print(f"Warning: Space group not found in {cif_file}")
-            if cif_symmetry_name:
-                print(f"Found Hermann-Mauguin symbol: {cif_symmetry_name}")
-            spacegroup = int(input("Please enter the space group number: "))
-
         # Convert symbols to atomic numbers
         atomic_numbers = []
         for sym in symbols:
@@ -237,8 +263,23 @@ def parse_cif(cif_file):
         }
 
     except Exception as e:
-        # If ASE fails, use manual parsing
         print(f"ASE parsing failed: {e}")
+
+        # ASE does not read CIFs without a space group: read the atom sites
+        # with ASE's CIF parser and the CIF's symmetry operations instead
+        try:
+            data = read_full_cell(cif_file)
+            data.update({
+                "spacegroup": None,
+                "cif_symmetry_name": None,
+                "name": os.path.basename(cif_file).replace(".cif", ""),
+            })
+            print("Read the atom sites with the CIF symmetry operations (no space group)")
+            return data
+        except Exception as e:
+            print(f"Reading the atom sites failed: {e}")
+
+        # If ASE fails, use manual parsing
         print("Falling back to manual parsing...")
 
         with open(cif_file, "r") as f:
@@ -355,16 +396,12 @@ def parse_cif(cif_file):
         filtered_positions = []
 
         for i, name in enumerate(atom_name):
-            try:
-                atom = getattr(Element, name)
-                atomic_num = int(atom)
-            except (AttributeError, ValueError):
-                atomic_num = SYMBOL_TO_NUMBER.get(name)
-                if atomic_num is None:
-                    print(
-                        f"Warning: Unknown element symbol '{name}' at position {i} - skipping"
-                    )
-                    continue
+            atomic_num = SYMBOL_TO_NUMBER.get(name)
+            if atomic_num is None:
+                print(
+                    f"Warning: Unknown element symbol '{name}' at position {i} - skipping"
+                )
+                continue
 
             atomic_numbers.append(atomic_num)
             filtered_atom_names.append(name)
@@ -377,6 +414,152 @@ def parse_cif(cif_file):
         return data
 
 
+def read_full_cell(cif_file):
+    """
+    Read the atom sites of a CIF and expand them to the full cell with the
+    symmetry operations listed in the CIF
+
+    Used for CIFs without a space group number, which ASE does not read.
+
+    Args:
+        cif_file (str): Path to the CIF file
+
+    Returns:
+        dict: a, b, c, alpha, beta, gamma, symbols, atomic_numbers and positions
+    """
+    from ase.io.cif import parse_cif as parse_cif_blocks
+    from ase.spacegroup.spacegroup import parse_sitesym
+
+    block = next(iter(parse_cif_blocks(cif_file)), None)
+    if block is None:
+        raise ValueError("no data block in the CIF")
+    atoms = block.get_unsymmetrized_structure()
+    operations = (
+        block.get("_symmetry_equiv_pos_as_xyz")
+        or block.get("_space_group_symop_operation_xyz")
+        or ["x,y,z"]
+    )
+    rotations, translations = parse_sitesym(operations)
+
+    positions, symbols = [], []
+    for site, symbol in zip(atoms.get_scaled_positions(wrap=False), atoms.get_chemical_symbols()):
+        for rotation, translation in zip(rotations, translations):
+            position = (np.dot(rotation, site) + translation) % 1.0
+            # Skip images of a site already placed (distance across the cell boundary)
+            if any(
+                other_symbol == symbol
+                and np.all(np.abs((position - other + 0.5) % 1.0 - 0.5) < 1e-4)
+                for other, other_symbol in zip(positions, symbols)
+            ):
+                continue
+            positions.append(position)
+            symbols.append(symbol)
+
+    atomic_numbers = []
+    for sym in symbols:
+        atomic_num = SYMBOL_TO_NUMBER.get(sym)
+        if atomic_num is None:
+            raise ValueError(f"Unknown element symbol '{sym}' in CIF file")
+        atomic_numbers.append(atomic_num)
+
+    a, b, c, alpha, beta, gamma = block.get_cellpar()
+    return {
+        "a": a,
+        "b": b,
+        "c": c,
+        "alpha": alpha,
+        "beta": beta,
+        "gamma": gamma,
+        "atomic_numbers": atomic_numbers,
+        "symbols": symbols,
+        "positions": np.array(positions),
+    }
+
+
+def add_conversion_warning(cif_data, stage, message):
+    """Record a decision taken without asking the user (listed in the error manifest)"""
+    cif_data.setdefault("conversion_warnings", []).append(
+        {"stage": stage, "message": message}
+    )
+
+
+def resolve_spacegroup(cif_file, cif_data, tolerance=1e-5, strict=False, cache=None):
+    """
+    Fill in the space group of a CIF that does not state one
+
+    The atom sites are expanded to the full cell with the symmetry operations
+    of the CIF and spglib infers the space group. In strict (batch) mode the
+    inferred group is used and recorded as a warning; a CIF where inference
+    is impossible raises CifConversionError. Interactively, the inferred
+    group is offered as the default answer.
+
+    Args:
+        cif_file (str): Path to the CIF file
+        cif_data (dict): Parsed CIF data (modified in place)
+        tolerance (float): Symmetry tolerance for spglib
+        strict (bool): Never prompt
+        cache (CifAnalysisCache, optional): Analysis cache
+
+    Returns:
+        dict: cif_data with its space group
+    """
+    if cif_data.get("spacegroup") is not None:
+        return cif_data
+
+    print(f"Warning: Space group not found in {cif_file}")
+    if cif_data.get("cif_symmetry_name"):
+        print(f"Found Hermann-Mauguin symbol: {cif_data['cif_symmetry_name']}")
+
+    symmetry = None
+    reason = "spglib is not installed"
+    if SPGLIB_AVAILABLE:
+        try:
+            cif_data.update(read_full_cell(cif_file))
+            symmetry = analyze_symmetry(cif_data, tolerance, cache)
+            reason = "spglib could not analyze the structure"
+        except Exception as e:
+            reason = f"the atom sites could not be read ({str(e) or type(e).__name__})"
+
+    if symmetry is None:
+        if strict:
+            raise CifConversionError(
+                f"Space group not found in the CIF and {reason}", stage="spacegroup"
+            )
+        cif_data["spacegroup"] = int(input("Please enter the space group number: "))
+        return cif_data
+
+    inferred = symmetry["number"]
+    print(f"spglib infers space group {inferred} ({symmetry['international']}) at tolerance {tolerance}")
+    if strict:
+        cif_data["spacegroup"] = inferred
+        add_conversion_warning(
+            cif_data,
+            "spacegroup",
+            f"Space group not found in the CIF; using {inferred} ({symmetry['international']}) "
+            f"inferred by spglib at tolerance {tolerance}",
+        )
+    else:
+        answer = input(f"Please enter the space group number [{inferred}]: ").strip()
+        cif_data["spacegroup"] = int(answer) if answer else inferred
+    return cif_data
+
+
+def check_structure(cif_data):
+    """
+    Raise CifConversionError if the parsed CIF lacks cell parameters or atoms
+
+    Args:
+        cif_data (dict): Parsed CIF data
+    """
+    # ASE reads cell parameters that are absent from the CIF as 0
+    missing = [key for key in ("a", "b", "c", "alpha", "beta", "gamma") if not cif_data.get(key)]
+    if missing:
+        raise CifConversionError(f"Missing cell parameters in the CIF: {', '.join(missing)}")
+    atomic_numbers = cif_data.get("atomic_numbers")
+    if atomic_numbers is None or len(atomic_numbers) == 0:
+        raise CifConversionError("No atom sites found in the CIF")
+
+
 def select_method():
     """
     Select calculation method (HF or DFT)
@@ -509,8 +692,97 @@ def detect_trigonal_setting(cif_data):
     return "hexagonal_axes"
 
 
+def cif_lattice(cif_data):
+    """
+    Build the lattice matrix (rows a, b, c) from the CIF cell parameters
+
+    Args:
+        cif_data (dict): Parsed CIF data
+
+    Returns:
+        numpy.ndarray: 3x3 lattice matrix in Angstrom
+    """
+    a, b, c = cif_data["a"], cif_data["b"], cif_data["c"]
+    alpha, beta, gamma = cif_data["alpha"], cif_data["beta"], cif_data["gamma"]
+
+    # Convert to radians
+    alpha_rad = np.radians(alpha)
+    beta_rad = np.radians(beta)
+    gamma_rad = np.radians(gamma)
+
+    # Build proper lattice matrix
+    lattice = np.zeros((3, 3))
+    lattice[0, 0] = a
+    lattice[1, 0] = b * np.cos(gamma_rad)
+    lattice[1, 1] = b * np.sin(gamma_rad)
+    lattice[2, 0] = c * np.cos(beta_rad)
+    lattice[2, 1] = (
+        c
+        * (np.cos(alpha_rad) - np.cos(beta_rad) * np.cos(gamma_rad))
+        / np.sin(gamma_rad)
+    )
+    lattice[2, 2] = (
+        c
+        * np.sqrt(
+            1
+            - np.cos(alpha_rad) ** 2
+            - np.cos(beta_rad) ** 2
+            - np.cos(gamma_rad) ** 2
+            + 2 * np.cos(alpha_rad) * np.cos(beta_rad) * np.cos(gamma_rad)
+        )
+        / np.sin(gamma_rad)
+    )
+    return lattice
+
+
+def analyze_symmetry(cif_data, tolerance=1e-5, cache=None):
+    """
+    Run the spglib symmetry analysis of a parsed CIF structure
+
+    With a cache and a CIF loaded through load_cif(), the result for the
+    same file contents and tolerance is read from the cache instead.
+
+    Args:
+        cif_data (dict): Parsed CIF data (all atoms, before any reduction)
+        tolerance (float): Symmetry tolerance for spglib
+        cache (CifAnalysisCache, optional): Analysis cache
+
+    Returns:
+        dict: number, international, equivalent_atoms, rotations and translations,
+              or None if spglib could not analyze the structure
+    """
+    key = cif_data.get("content_hash")
+    if cache is not None and key:
+        symmetry = cache.load_symmetry(key, tolerance)
+        if symmetry is not None:
+            return symmetry if symmetry["number"] is not None else None
+
+    cell = (
+        cif_lattice(cif_data),
+        np.array(cif_data["positions"]),
+        np.array(cif_data["atomic_numbers"]),
+    )
+    dataset = spglib.get_symmetry_dataset(cell, symprec=tolerance)
+    if dataset is None:
+        symmetry = {"number": None}
+    else:
+        # spglib >= 2.5 returns a dataclass, older versions a dict
+        fields = dataset if isinstance(dataset, dict) else vars(dataset)
+        symmetry = {
+            "number": int(fields["number"]),
+            "international": str(fields["international"]),
+            "equivalent_atoms": [int(i) for i in fields["equivalent_atoms"]],
+            "rotations": np.asarray(fields["rotations"]).tolist(),
+            "translations": np.asarray(fields["translations"]).tolist(),
+        }
+
+    if cache is not None and key:
+        cache.store_symmetry(key, tolerance, symmetry)
+    return symmetry if symmetry["number"] is not None else None
+
+
 def verify_and_reduce_to_asymmetric_unit(
-    cif_data, tolerance=1e-5, validate_symmetry=False
+    cif_data, tolerance=1e-5, validate_symmetry=False, cache=None, strict=False
 ):
     """
     Verify spglib symmetry analysis matches CIF data and reduce to asymmetric unit
@@ -519,6 +791,9 @@ def verify_and_reduce_to_asymmetric_unit(
         cif_data (dict): Parsed CIF data
         tolerance (float): Symmetry tolerance for spglib
         validate_symmetry (bool): Whether to validate that symmetry operations can reconstruct the original structure
+        cache (CifAnalysisCache, optional): Cache of spglib results
+        strict (bool): Never prompt; take the default answers (keep the CIF
+                       space group without reduction on a mismatch)
 
     Returns:
         dict: Modified CIF data with only asymmetric unit atoms, or original if verification fails
@@ -529,52 +804,18 @@ def verify_and_reduce_to_asymmetric_unit(
         return cif_data
 
     try:
-        # Create proper lattice matrix from CIF parameters
-        a, b, c = cif_data["a"], cif_data["b"], cif_data["c"]
-        alpha, beta, gamma = cif_data["alpha"], cif_data["beta"], cif_data["gamma"]
-
-        # Convert to radians
-        alpha_rad = np.radians(alpha)
-        beta_rad = np.radians(beta)
-        gamma_rad = np.radians(gamma)
-
-        # Build proper lattice matrix
-        lattice = np.zeros((3, 3))
-        lattice[0, 0] = a
-        lattice[1, 0] = b * np.cos(gamma_rad)
-        lattice[1, 1] = b * np.sin(gamma_rad)
-        lattice[2, 0] = c * np.cos(beta_rad)
-        lattice[2, 1] = (
-            c
-            * (np.cos(alpha_rad) - np.cos(beta_rad) * np.cos(gamma_rad))
-            / np.sin(gamma_rad)
-        )
-        lattice[2, 2] = (
-            c
-            * np.sqrt(
-                1
-                - np.cos(alpha_rad) ** 2
-                - np.cos(beta_rad) ** 2
-                - np.cos(gamma_rad) ** 2
-                + 2 * np.cos(alpha_rad) * np.cos(beta_rad) * np.cos(gamma_rad)
-            )
-            / np.sin(gamma_rad)
-        )
-
         positions = np.array(cif_data["positions"])
         numbers = np.array(cif_data["atomic_numbers"])
 
-        cell = (lattice, positions, numbers)
-
         # Get spacegroup data with the specified tolerance
-        spacegroup_info = spglib.get_spacegroup(cell, symprec=tolerance)
-        dataset = spglib.get_symmetry_dataset(cell, symprec=tolerance)
+        dataset = analyze_symmetry(cif_data, tolerance, cache)
 
         if dataset is None:
             print("Warning: spglib could not analyze the structure symmetry.")
             print("Using all atoms from the CIF file.")
             return cif_data
 
+        spacegroup_info = f"{dataset['international']} ({dataset['number']})"
         detected_spacegroup_num = dataset["number"]
         original_spacegroup_num = cif_data["spacegroup"]
 
@@ -595,6 +836,19 @@ def verify_and_reduce_to_asymmetric_unit(
             print(f"       - Incorrect CIF space group assignment")
             print(f"       - Non-standard atomic positions in CIF")
 
+            if strict:
+                print(
+                    f"\nBatch mode: using original CIF space group {original_spacegroup_num} (no reduction)"
+                )
+                add_conversion_warning(
+                    cif_data,
+                    "symmetry",
+                    f"CIF space group {original_spacegroup_num} but spglib detects "
+                    f"{detected_spacegroup_num} at tolerance {tolerance}; kept the CIF "
+                    f"space group and all atoms",
+                )
+                return cif_data
+
             # Offer options to the user
             print(f"\nOptions:")
             print(f"  1: Try different tolerance values")
@@ -612,8 +866,8 @@ def verify_and_reduce_to_asymmetric_unit(
                 for test_tolerance in [1e-3, 1e-4, 1e-6, 1e-7]:
                     if test_tolerance != tolerance:
                         print(f"\nTrying tolerance {test_tolerance}...")
-                        test_dataset = spglib.get_symmetry_dataset(
-                            cell, symprec=test_tolerance
+                        test_dataset = analyze_symmetry(
+                            cif_data, test_tolerance, cache
                         )
                         if (
                             test_dataset
@@ -625,7 +879,7 @@ def verify_and_reduce_to_asymmetric_unit(
                             )
                             if use_tolerance:
                                 return verify_and_reduce_to_asymmetric_unit(
-                                    cif_data, test_tolerance
+                                    cif_data, test_tolerance, cache=cache
                                 )
 
                 print("\nNo tolerance found that matches CIF space group.")
@@ -679,7 +933,9 @@ def verify_and_reduce_to_asymmetric_unit(
             )
             print("     or there's an issue with symmetry detection.")
 
-            use_reduction = yes_no_prompt("Use the 'reduced' structure anyway?", "yes")
+            use_reduction = strict or yes_no_prompt(
+                "Use the 'reduced' structure anyway?", "yes"
+            )
             if not use_reduction:
                 print("Using all atoms from the CIF file.")
                 return cif_data
@@ -769,7 +1025,7 @@ def reduce_to_asymmetric_unit(cif_data, validate_symmetry=False):
     return verify_and_reduce_to_asymmetric_unit(cif_data, 1e-5, validate_symmetry)
 
 
-def create_d12_file(cif_data, output_file, options):
+def create_d12_file(cif_data, output_file, options, strict=False):
     """
     Create a D12 input file for CRYSTAL23 from CIF data
 
@@ -777,6 +1033,8 @@ def create_d12_file(cif_data, output_file, options):
         cif_data (dict): Parsed CIF data
         output_file (str): Output file path
         options (dict): Calculation options
+        strict (bool): Raise CifConversionError instead of asking whether to
+                       continue with a basis set that lacks some elements
 
     Returns:
         None
@@ -805,6 +1063,12 @@ def create_d12_file(cif_data, output_file, options):
         print(
             f"Missing elements: {', '.join([f'{ATOMIC_NUMBER_TO_SYMBOL.get(z, z)} (Z={z})' for z in missing_elements])}"
         )
+        if strict:
+            raise CifConversionError(
+                f"Basis set '{options['basis_set']}' does not support "
+                + ", ".join(ATOMIC_NUMBER_TO_SYMBOL.get(z, str(z)) for z in missing_elements),
+                stage="basis",
+            )
         if not yes_no_prompt("Continue anyway?", "no"):
             print("Aborting D12 file creation.")
             return
@@ -1136,125 +1400,328 @@ def create_d12_file(cif_data, output_file, options):
         # Note: The single END at the very end is written by write_scf_section
 
 
-def process_cifs(cif_directory, options, output_directory=None):
+def d12_output_name(cif_file, options):
     """
-    Process all CIF files in a directory
+    Build the D12 file name for a CIF file from the calculation options
 
     Args:
-        cif_directory (str): Directory containing CIF files
+        cif_file (str): Path to the CIF file
         options (dict): Calculation options
-        output_directory (str, optional): Output directory for D12 files
 
     Returns:
-        None
+        str: File name such as <cif>_CRYSTAL_OPT_symm_PBE-D3_POB-TZVP-REV2.d12
     """
-    if output_directory is None:
-        output_directory = cif_directory
+    base_name = os.path.basename(cif_file).replace(".cif", "")
 
-    if not os.path.exists(output_directory):
-        os.makedirs(output_directory)
+    # Generate output filename
+    dimensionality = options["dimensionality"]
+    calc_type = options["calculation_type"]
 
-    # Find all CIF files
-    cif_files = glob.glob(os.path.join(cif_directory, "*.cif"))
+    # Method identifier
+    if options["method"] == "HF":
+        method_name = options.get("hf_method", "RHF")
+    else:
+        method_name = options.get("dft_functional", "")
 
-    if not cif_files:
-        print(f"No CIF files found in {cif_directory}")
-        return
+        # Handle method_modifications for filename
+        if "method_modifications" in options:
+            modifications = options["method_modifications"]
+            if "functional" in modifications:
+                method_name = modifications["functional"]
 
-    print(f"Found {len(cif_files)} CIF files to process")
+        # Also check if functional is directly specified
+        if not method_name and "functional" in options:
+            method_name = options["functional"]
 
-    # Process each CIF file
-    for cif_file in cif_files:
-        base_name = os.path.basename(cif_file).replace(".cif", "")
+        # Don't add -D3 to 3C methods or if dispersion is already included in the name
+        if (
+            options.get("use_dispersion")
+            and "-3C" not in method_name
+            and "3C" not in method_name
+        ):
+            method_name += "-D3"
 
-        # Generate output filename
-        dimensionality = options["dimensionality"]
-        calc_type = options["calculation_type"]
+    symmetry_tag = "P1" if options["symmetry_handling"] == "P1" else "symm"
 
-        # Method identifier
-        if options["method"] == "HF":
-            method_name = options.get("hf_method", "RHF")
-        else:
-            method_name = options.get("dft_functional", "")
+    if options["basis_set_type"] == "EXTERNAL":
+        basis_name = os.path.basename(options["basis_set"].rstrip("/"))
+    else:
+        basis_name = options["basis_set"]
 
-            # Handle method_modifications for filename
-            if "method_modifications" in options:
-                modifications = options["method_modifications"]
-                if "functional" in modifications:
-                    method_name = modifications["functional"]
+    return f"{base_name}_{dimensionality}_{calc_type}_{symmetry_tag}_{method_name}_{basis_name}.d12"
 
-            # Also check if functional is directly specified
-            if not method_name and "functional" in options:
-                method_name = options["functional"]
 
-            # Don't add -D3 to 3C methods or if dispersion is already included in the name
-            if (
-                options.get("use_dispersion")
-                and "-3C" not in method_name
-                and "3C" not in method_name
-            ):
-                method_name += "-D3"
+def load_cif(cif_file, cache=None, strict=False, tolerance=1e-5):
+    """
+    Parse a CIF file, reusing the cached parse of identical file contents
+
+    A missing space group is resolved with resolve_spacegroup() and missing
+    cell parameters or atoms raise CifConversionError.
 
-        symmetry_tag = "P1" if options["symmetry_handling"] == "P1" else "symm"
+    Args:
+        cif_file (str): Path to the CIF file
+        cache (CifAnalysisCache, optional): Analysis cache
+        strict (bool): Never prompt
+        tolerance (float): Symmetry tolerance for inferring a missing space group
+
+    Returns:
+        dict: Parsed CIF data as from parse_cif(); with a cache it also holds
+              the "content_hash" that keys the cached symmetry analysis
+    """
+    if cache is None:
+        cif_data = parse_cif(cif_file)
+    else:
+        key = cache.content_hash(cif_file)
+        cif_data = cache.load_structure(key)
+        if cif_data is None:
+            cif_data = parse_cif(cif_file)
+            cache.store_structure(key, cif_data)
+        cif_data["name"] = os.path.basename(cif_file).replace(".cif", "")
+        cif_data["content_hash"] = key
 
-        if options["basis_set_type"] == "EXTERNAL":
-            basis_name = os.path.basename(options["basis_set"].rstrip("/"))
+    resolve_spacegroup(cif_file, cif_data, tolerance, strict, cache)
+    check_structure(cif_data)
+    return cif_data
+
+
+def convert_cif(cif_file, options, output_file, cache=None, strict=False):
+    """
+    Convert one CIF file to a D12 file
+
+    Args:
+        cif_file (str): Path to the CIF file
+        options (dict): Calculation options
+        output_file (str): Output D12 file path
+        cache (CifAnalysisCache, optional): Cache of parsed structures and spglib results
+        strict (bool): Never prompt: infer or fail (CifConversionError) instead
+
+    Returns:
+        list: Decisions taken without asking ({"stage", "message"} dicts)
+    """
+    tolerance = options.get("symmetry_tolerance", 1e-5)
+
+    # Parse CIF file
+    cif_data = load_cif(cif_file, cache, strict, tolerance)
+    warnings = cif_data.setdefault("conversion_warnings", [])
+
+    # Apply symmetry handling
+    if options["symmetry_handling"] == "P1":
+        # If P1 symmetry requested, override the spacegroup
+        cif_data["spacegroup"] = 1
+        print("Using P1 symmetry (no symmetry operations, all atoms explicit)")
+    elif options["symmetry_handling"] == "SPGLIB":
+        # If spglib symmetry requested and reduction is enabled
+        if SPGLIB_AVAILABLE and options.get("reduce_to_asymmetric", True):
+            print("\nPerforming spglib symmetry analysis with verification...")
+            validate_symmetry = options.get("validate_symmetry", False)
+            cif_data = verify_and_reduce_to_asymmetric_unit(
+                cif_data, tolerance, validate_symmetry, cache=cache, strict=strict
+            )
+    elif options["symmetry_handling"] == "CIF":
+        # For CIF symmetry, optionally reduce to unique atoms based on user preference
+        if options.get("write_only_unique", True):
+            if SPGLIB_AVAILABLE:
+                print(
+                    "\nUsing CIF symmetry - verifying with spglib and reducing to asymmetric unit..."
+                )
+                validate_symmetry = options.get("validate_symmetry", False)
+                cif_data = verify_and_reduce_to_asymmetric_unit(
+                    cif_data, tolerance, validate_symmetry, cache=cache, strict=strict
+                )
+            else:
+                print(
+                    "Warning: Cannot identify unique atoms without spglib. Writing all atoms."
+                )
+                print(
+                    "Install spglib to enable asymmetric unit reduction: pip install spglib"
+                )
         else:
-            basis_name = options["basis_set"]
+            print("Using CIF symmetry but writing all atoms explicitly")
 
-        output_name = f"{base_name}_{dimensionality}_{calc_type}_{symmetry_tag}_{method_name}_{basis_name}.d12"
-        output_file = os.path.join(output_directory, output_name)
+    # Create D12 file
+    create_d12_file(cif_data, output_file, options, strict=strict)
+    return warnings
 
-        try:
-            print(f"Processing {cif_file}...")
 
-            # Parse CIF file
-            cif_data = parse_cif(cif_file)
+def _run_conversion(cif_file, output_file, options, cache, strict):
+    """Convert one CIF file, returning the outcome instead of raising"""
+    result = {"cif_file": cif_file, "output_file": output_file, "error": None,
+              "stage": None, "warnings": []}
+    try:
+        result["warnings"] = convert_cif(cif_file, options, output_file, cache, strict)
+    except CifConversionError as e:
+        result["error"], result["stage"] = str(e), e.stage
+    except Exception as e:
+        result["error"], result["stage"] = str(e) or type(e).__name__, "convert"
+    return result
 
-            # Apply symmetry handling
-            if options["symmetry_handling"] == "P1":
-                # If P1 symmetry requested, override the spacegroup
-                cif_data["spacegroup"] = 1
-                print("Using P1 symmetry (no symmetry operations, all atoms explicit)")
-            elif options["symmetry_handling"] == "SPGLIB":
-                # If spglib symmetry requested and reduction is enabled
-                if SPGLIB_AVAILABLE and options.get("reduce_to_asymmetric", True):
-                    print("\nPerforming spglib symmetry analysis with verification...")
-                    tolerance = options.get("symmetry_tolerance", 1e-5)
-                    validate_symmetry = options.get("validate_symmetry", False)
-                    cif_data = verify_and_reduce_to_asymmetric_unit(
-                        cif_data, tolerance, validate_symmetry
-                    )
-            elif options["symmetry_handling"] == "CIF":
-                # For CIF symmetry, optionally reduce to unique atoms based on user preference
-                if options.get("write_only_unique", True):
-                    if SPGLIB_AVAILABLE:
-                        print(
-                            "\nUsing CIF symmetry - verifying with spglib and reducing to asymmetric unit..."
-                        )
-                        tolerance = options.get("symmetry_tolerance", 1e-5)
-                        validate_symmetry = options.get("validate_symmetry", False)
-                        cif_data = verify_and_reduce_to_asymmetric_unit(
-                            cif_data, tolerance, validate_symmetry
-                        )
-                    else:
-                        print(
-                            "Warning: Cannot identify unique atoms without spglib. Writing all atoms."
-                        )
-                        print(
-                            "Install spglib to enable asymmetric unit reduction: pip install spglib"
-                        )
-                else:
-                    print("Using CIF symmetry but writing all atoms explicitly")
 
-            # Create D12 file
-            create_d12_file(cif_data, output_file, options)
+def _convert_worker(task):
+    """
+    Convert one CIF file in a worker process
 
-            print(f"Created {output_file}")
+    Workers never prompt (they have no terminal), so they always convert in
+    strict mode. The per-file log is suppressed; the parent reports progress,
+    errors and warnings.
+    """
+    cif_file, output_file, options, cache_dir = task
+    cache = CifAnalysisCache(cache_dir) if cache_dir else None
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = _run_conversion(cif_file, output_file, options, cache, strict=True)
+    result["cache_hits"], result["cache_misses"] = (cache.hits, cache.misses) if cache else (0, 0)
+    return result
+
+
+class ErrorManifest:
+    """JSON-lines record of the CIF files that failed or needed a decision"""
+
+    def __init__(self, manifest_file):
+        """
+        Args:
+            manifest_file (str): Manifest path; a manifest of an earlier run is removed
+        """
+        self.manifest_file = manifest_file
+        self.entries = 0
+        self._file = None
+        if os.path.exists(manifest_file):
+            os.remove(manifest_file)
+
+    def record(self, cif_file, status, stage, message, output_file=None):
+        """Append one entry (status 'error' or 'warning') and flush it"""
+        if self._file is None:
+            self._file = open(self.manifest_file, "w")
+        entry = {"cif_file": os.path.abspath(cif_file), "status": status, "stage": stage,
+                 "message": message, "output_file": output_file}
+        self._file.write(json.dumps(entry) + "\n")
+        self._file.flush()
+        self.entries += 1
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def process_cifs(cif_directory, options, output_directory=None, jobs=1, cache_dir=None,
+                 strict=False, manifest_file=None):
+    """
+    Process all CIF files in a directory
 
-        except Exception as e:
-            print(f"Error processing {cif_file}: {e}")
-            continue
+    Args:
+        cif_directory (str): Directory containing CIF files
+        options (dict): Calculation options
+        output_directory (str, optional): Output directory for D12 files
+        jobs (int): Worker processes (1 converts in this process, with the full log)
+        cache_dir (str, optional): Directory of the CIF analysis cache (no cache if None)
+        strict (bool): Never prompt; missing space groups are inferred with spglib,
+                       other questions take their default or fail the file
+                       (always on with several workers)
+        manifest_file (str, optional): JSON-lines manifest of failed files and of
+                                       decisions taken without asking
+
+    Returns:
+        dict: 'converted' (D12 files), 'errors' and 'warnings' ((CIF file, message)
+              pairs), 'cache_hits', 'cache_misses' and 'elapsed' seconds
+    """
+    summary = {"converted": [], "errors": [], "warnings": [], "cache_hits": 0,
+               "cache_misses": 0, "elapsed": 0.0}
+
+    if output_directory is None:
+        output_directory = cif_directory
+
+    if not os.path.exists(output_directory):
+        os.makedirs(output_directory)
+
+    # Find all CIF files
+    cif_files = sorted(glob.glob(os.path.join(cif_directory, "*.cif")))
+
+    if not cif_files:
+        print(f"No CIF files found in {cif_directory}")
+        return summary
+
+    jobs = max(1, min(jobs or 1, len(cif_files)))
+    print(f"Found {len(cif_files)} CIF files to process")
+    if jobs > 1:
+        print(f"Converting with {jobs} worker processes")
+    elif strict:
+        print("Strict batch mode: no prompts, problems are recorded instead")
+
+    tasks = [
+        (cif_file, os.path.join(output_directory, d12_output_name(cif_file, options)), options, cache_dir)
+        for cif_file in cif_files
+    ]
+    manifest = ErrorManifest(manifest_file) if manifest_file else None
+    start = time.monotonic()
+
+    def collect(result):
+        cif_file = result["cif_file"]
+        for warning in result["warnings"]:
+            summary["warnings"].append((cif_file, warning["message"]))
+            if manifest:
+                manifest.record(cif_file, "warning", warning["stage"], warning["message"],
+                                None if result["error"] else result["output_file"])
+        if result["error"]:
+            summary["errors"].append((cif_file, result["error"]))
+            if manifest:
+                manifest.record(cif_file, "error", result["stage"], result["error"])
+        else:
+            summary["converted"].append(result["output_file"])
+
+    try:
+        if jobs == 1:
+            # Process each CIF file
+            cache = CifAnalysisCache(cache_dir) if cache_dir else None
+            for cif_file, output_file, _, _ in tasks:
+                print(f"Processing {cif_file}...")
+                result = _run_conversion(cif_file, output_file, options, cache, strict)
+                if result["error"]:
+                    print(f"Error processing {cif_file}: {result['error']}")
+                else:
+                    print(f"Created {output_file}")
+                collect(result)
+            if cache:
+                summary["cache_hits"], summary["cache_misses"] = cache.hits, cache.misses
+        else:
+            chunksize = max(1, min(16, len(tasks) // (jobs * 4)))
+            last_report = start
+            with ProcessPoolExecutor(max_workers=jobs) as executor:
+                results = executor.map(_convert_worker, tasks, chunksize=chunksize)
+                for done, result in enumerate(results, 1):
+                    summary["cache_hits"] += result["cache_hits"]
+                    summary["cache_misses"] += result["cache_misses"]
+                    if result["error"]:
+                        print(f"Error processing {result['cif_file']}: {result['error']}")
+                    collect(result)
+                    now = time.monotonic()
+                    if now - last_report >= 5 or done == len(tasks):
+                        last_report = now
+                        rate = done / (now - start) if now > start else 0.0
+                        print(f"  {done}/{len(tasks)} CIF files ({rate:.1f} files/s)")
+    finally:
+        if manifest:
+            manifest.close()
+
+    summary["elapsed"] = time.monotonic() - start
+    print(
+        f"\nConverted {len(summary['converted'])} of {len(cif_files)} CIF files "
+        f"in {summary['elapsed']:.1f}s"
+    )
+    if cache_dir:
+        print(
+            f"CIF analysis cache: {summary['cache_hits']} hits, "
+            f"{summary['cache_misses']} misses ({cache_dir})"
+        )
+    if summary["warnings"]:
+        print(f"\n{len(summary['warnings'])} decision(s) taken without asking:")
+        for cif_file, message in summary["warnings"]:
+            print(f"  {os.path.basename(cif_file)}: {message}")
+    if summary["errors"]:
+        print(f"\n{len(summary['errors'])} CIF file(s) failed:")
+        for cif_file, error in summary["errors"]:
+            print(f"  {os.path.basename(cif_file)}: {error}")
+    if manifest and manifest.entries:
+        print(f"\nError manifest: {manifest_file}")
+    return summary
 
 
 def print_summary(options):
@@ -1335,6 +1802,33 @@ def main():
         default="cif2d12_options.json",
         help="File to save/load options for batch mode",
     )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=1,
+        help="Worker processes for the conversion (default: 1, with the full per-file log)",
+    )
+    parser.add_argument(
+        "--cache_dir",
+        type=str,
+        help=f"CIF analysis cache directory (default: <cif_dir>/{DEFAULT_CACHE_DIRNAME})",
+    )
+    parser.add_argument(
+        "--no_cache",
+        action="store_true",
+        help="Parse and analyze every CIF again instead of using the cache",
+    )
+    parser.add_argument(
+        "--strict",
+        action="store_true",
+        help="Never prompt while converting (implied by --batch and --jobs > 1)",
+    )
+    parser.add_argument(
+        "--error_manifest",
+        type=str,
+        help=f"JSON-lines manifest of failed CIFs and decisions taken without asking "
+        f"(default: <output_dir>/{DEFAULT_ERROR_MANIFEST})",
+    )
 
     args = parser.parse_args()
 
@@ -1372,7 +1866,22 @@ def main():
                 print(f"Error saving options to {args.options_file}: {e}")
 
     # Process CIF files
-    process_cifs(args.cif_dir, options, args.output_dir)
+    cache_dir = None
+    if not args.no_cache:
+        cache_dir = args.cache_dir or os.path.join(args.cif_dir, DEFAULT_CACHE_DIRNAME)
+    strict = args.strict or args.batch or args.jobs > 1
+    manifest_file = args.error_manifest or os.path.join(
+        args.output_dir or args.cif_dir, DEFAULT_ERROR_MANIFEST
+    )
+    process_cifs(
+        args.cif_dir,
+        options,
+        args.output_dir,
+        jobs=args.jobs,
+        cache_dir=cache_dir,
+        strict=strict,
+        manifest_file=manifest_file,
+    )
 
 
 if __name__ == "__main__":
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+CIF Analysis Cache for CRYSTAL23 Input Generation
+-------------------------------------------------
+This module caches the structure-only work of NewCifToD12.py, so that
+converting the same CIF files again with different method, basis set or
+calculation options skips it:
+
+- the parsed cell, space group, atoms and fractional positions
+- the spglib symmetry analysis per tolerance (space group number and
+  symbol, equivalent atoms, which give the asymmetric unit, and the
+  symmetry operations)
+
+Entries are keyed by the SHA-256 of the CIF file contents, so renamed or
+copied files hit the cache and edited files miss it. Each CIF has one small
+JSON file in the cache directory, written atomically, so several worker
+processes can share the directory.
+
+Author: Marcus Djokic
+Institution: Michigan State University, Mendoza Group
+
+Usage:
+    from d12_cif_cache import CifAnalysisCache
+    cache = CifAnalysisCache("/path/to/cifs/.cif2d12_cache")
+    key = cache.content_hash("structure.cif")
+    cif_data = cache.load_structure(key)
+"""
+
+import os
+import json
+import hashlib
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+
+CACHE_VERSION = 1
+DEFAULT_CACHE_DIRNAME = ".cif2d12_cache"
+
+# Parsed fields that depend only on the file contents ("name" comes from the file name)
+STRUCTURE_FIELDS = (
+    "a", "b", "c", "alpha", "beta", "gamma", "spacegroup", "cif_symmetry_name",
+    "atomic_numbers", "symbols", "positions",
+)
+
+
+def _to_json(value: Any) -> Any:
+    """Convert NumPy arrays and scalars to plain JSON values."""
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, (list, tuple)):
+        return [_to_json(item) for item in value]
+    return value
+
+
+class CifAnalysisCache:
+    """Content-hash keyed cache of parsed CIF structures and spglib results."""
+
+    def __init__(self, cache_dir: str):
+        """
+        Args:
+            cache_dir: Directory for the cache files (created on first write)
+        """
+        self.cache_dir = Path(cache_dir)
+        self.hits = 0
+        self.misses = 0
+        self._write_failed = False
+
+    @staticmethod
+    def content_hash(cif_file: str) -> str:
+        """SHA-256 of the file contents."""
+        digest = hashlib.sha256()
+        with open(cif_file, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+        return digest.hexdigest()
+
+    def _entry_path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.json"
+
+    def _read_entry(self, key: str) -> Dict[str, Any]:
+        try:
+            with open(self._entry_path(key), "r") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        if not isinstance(entry, dict) or entry.get("version") != CACHE_VERSION:
+            return {}
+        return entry
+
+    def _write_entry(self, key: str, entry: Dict[str, Any]):
+        if self._write_failed:
+            return
+        entry["version"] = CACHE_VERSION
+        path = self._entry_path(key)
+        tmp_file = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            with open(tmp_file, "w") as f:
+                json.dump(entry, f)
+            os.replace(tmp_file, path)
+        except OSError as e:
+            # A read-only CIF directory only costs the cache, not the conversion
+            self._write_failed = True
+            print(f"Warning: CIF analysis cache not written ({self.cache_dir}): {e}")
+
+    def load_structure(self, key: str) -> Optional[Dict[str, Any]]:
+        """Parsed structure of a CIF (positions as a NumPy array), or None."""
+        structure = self._read_entry(key).get("structure")
+        if structure is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        structure["positions"] = np.array(structure["positions"], dtype=float)
+        return structure
+
+    def store_structure(self, key: str, cif_data: Dict[str, Any]):
+        """Store the content-dependent fields of a parsed CIF."""
+        entry = self._read_entry(key)
+        entry["structure"] = {field: _to_json(cif_data.get(field)) for field in STRUCTURE_FIELDS}
+        self._write_entry(key, entry)
+
+    def load_symmetry(self, key: str, tolerance: float) -> Optional[Dict[str, Any]]:
+        """spglib results for a tolerance, or None."""
+        symmetry = self._read_entry(key).get("symmetry", {}).get(repr(float(tolerance)))
+        if symmetry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return symmetry
+
+    def store_symmetry(self, key: str, tolerance: float, symmetry: Dict[str, Any]):
+        """Store spglib results for a tolerance ({"number": None} records that spglib failed)."""
+        entry = self._read_entry(key)
+        entry.setdefault("symmetry", {})[repr(float(tolerance))] = _to_json(symmetry)
+        self._write_entry(key, entry)
@@ -25,6 +25,13 @@ from d12_constants import (
     RHOMBOHEDRAL_SPACEGROUPS
 )
 
+# Shared streaming tokenizer for CRYSTAL outputs (falls back to a plain read
+# when MACE is not importable)
+try:
+    from mace.utils.crystal_output_stream import CrystalOutputStream
+except ImportError:
+    CrystalOutputStream = None
+
 
 class CrystalOutputParser:
     """Enhanced parser for CRYSTAL17/23 output files"""
@@ -55,24 +62,47 @@ class CrystalOutputParser:
 
     def parse(self) -> Dict[str, Any]:
         """Parse the output file and extract all relevant data"""
-        with open(self.output_file, "r") as f:
-            content = f.read()
-            lines = content.split("\n")
+        header, closing = self._read_sections()
+        header_lines = header.split("\n")
 
-        # Store the full content for optimization section extraction
-        self.data["optimization_content"] = content
+        # Store the input settings and final geometry for optimization section extraction
+        self.data["optimization_content"] = header + "".join(closing)
 
         # Extract dimensionality first
-        self._extract_dimensionality(lines)
+        self._extract_dimensionality(header_lines)
 
         # Extract optimized geometry
-        self._extract_geometry(content)
+        self._extract_geometry(header, "".join(closing))
 
         # Extract calculation settings
-        self._extract_settings(lines)
+        self._extract_settings(header_lines)
 
         return self.data
 
+    def _read_sections(self):
+        """Return the header text and the texts of the sections closing an optimization.
+
+        Settings come from the header and the geometry from the end of the
+        run, so optimization steps and the SCF sections ending them are
+        dropped while streaming. Everything before the first step is the
+        header, which is the whole file for runs without an optimization.
+        """
+        if CrystalOutputStream is None:
+            with open(self.output_file, "r") as f:
+                return f.read(), []
+
+        header, closing = [], []
+        in_optimization = False
+        for section in CrystalOutputStream(self.output_file).iter_sections():
+            if section.kind == "opt_point":
+                in_optimization = True
+            elif in_optimization:
+                if section.kind != "scf_end":
+                    closing.append(section.text)
+            else:
+                header.append(section.text)
+        return "".join(header), closing
+
     def _extract_dimensionality(self, lines: List[str]) -> None:
         """Extract system dimensionality"""
         # First pass - look for explicit calculation type declarations
@@ -124,9 +154,14 @@ class CrystalOutputParser:
         if self.data["dimensionality"] is None:
             self.data["dimensionality"] = "CRYSTAL"
 
-    def _extract_geometry(self, content: str) -> None:
-        """Extract optimized geometry from output"""
-        lines = content.split("\n")
+    def _extract_geometry(self, content: str, final_content: str = "") -> None:
+        """Extract optimized geometry from output
+
+        final_content holds the sections after an optimization and is searched
+        for the final geometry first; without it, content is searched.
+        """
+        header_lines = content.split("\n")
+        lines = final_content.split("\n") if final_content else header_lines
 
         # Find FINAL OPTIMIZED GEOMETRY section
         final_geom_idx = None
@@ -151,6 +186,7 @@ class CrystalOutputParser:
 
         if final_geom_idx is None:
             # For single point calculations, look for initial geometry
+            lines = header_lines
             for i, line in enumerate(lines):
                 if "GEOMETRY FOR WAVE FUNCTION" in line:
                     final_geom_idx = i
@@ -160,7 +196,7 @@ class CrystalOutputParser:
             raise ValueError("Could not find geometry in output file")
 
         # Extract space group
-        self._extract_spacegroup(lines)
+        self._extract_spacegroup(header_lines if lines is header_lines else header_lines + lines)
 
         # Extract cell parameters
         self._extract_cell_parameters(lines, final_geom_idx)
@@ -18,6 +18,11 @@ The script automatically:
 - Copies required binary files (fort.9/fort.98)
 - Generates properly formatted D3 input files
 - Handles all calculation types interactively
+
+From Python, without prompts (as the MACE workflow does):
+    from CRYSTALOptToD3 import generate_d3_from_config
+    result = generate_d3_from_config("file.out", {"calculation_type": "DOSS", ...})
+    result["d3_file"]  # path of the new input
 """
 
 import os
@@ -63,9 +68,15 @@ from d12_constants import (SPACEGROUP_SYMBOLS, SPACEGROUP_ALTERNATIVES,
 class D3Generator:
     """Handle D3 file generation from CRYSTAL output files."""
     
-    def __init__(self, input_file: str, calc_type: str, output_dir: Optional[str] = None):
+    def __init__(self, input_file: str, calc_type: str, output_dir: Optional[str] = None,
+                 interactive: bool = True):
         self.input_file = Path(input_file).resolve()
         self.calc_type = calc_type.upper()
+        self.interactive = interactive
+        
+        # Paths of the generated files, set by generate_d3()
+        self.d3_file = None
+        self.wavefunction_file = None
         self.base_name = self.input_file.stem
         
         # Remove common suffixes to get clean base name
@@ -217,6 +228,8 @@ class D3Generator:
         if not source_wf:
             print("\nWarning: No wavefunction file (fort.9/fort.98) found!")
             print("The D3 calculation will fail without the wavefunction file.")
+            if not self.interactive:
+                return False
             cont = yes_no_prompt("Continue anyway?", "no")
             return cont
         
@@ -231,6 +244,7 @@ class D3Generator:
         if source_wf != target_wf:
             print(f"\nCopying wavefunction: {source_wf.name} -> {target_wf.name}")
             shutil.copy2(source_wf, target_wf)
+        self.wavefunction_file = target_wf
         
         return True
     
@@ -1130,6 +1144,7 @@ class D3Generator:
         
         with open(d3_path, 'w') as f:
             f.write(d3_content)
+        self.d3_file = d3_path
         
         print(f"\n✓ D3 file written: {d3_path}")
         
@@ -1158,6 +1173,46 @@ class D3Generator:
         return config
 
 
+def generate_d3_from_config(input_file: str, config: Dict[str, Any], calc_type: Optional[str] = None,
+                            output_dir: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """Generate a D3 file from a configuration dictionary, without prompts.
+    
+    Programmatic entry point for the workflow engine, equivalent to
+    ``--input file.out --config-file config.json``.
+    
+    Args:
+        input_file: CRYSTAL output file (.out)
+        config: D3 configuration (the "configuration" part of a D3 config file)
+        calc_type: Calculation type, if the config has no calculation_type
+        output_dir: Directory for the D3 and wavefunction files (default: next to input_file)
+    
+    Returns:
+        {"d3_file", "wavefunction_file", "calc_type", "config"}, or None on failure
+        (including a missing wavefunction file)
+    """
+    config = dict(config)
+    if calc_type:
+        config.setdefault("calculation_type", calc_type.upper())
+    is_valid, errors = validate_d3_config(config)
+    if not is_valid:
+        print("\nConfiguration validation errors:")
+        for error in errors:
+            print(f"  - {error}")
+        return None
+    calc_type = config["calculation_type"]
+    
+    generator = D3Generator(input_file, calc_type, output_dir, interactive=False)
+    used_config = generator.generate_d3(config)
+    if not used_config or generator.d3_file is None:
+        return None
+    return {
+        "d3_file": str(generator.d3_file),
+        "wavefunction_file": str(generator.wavefunction_file) if generator.wavefunction_file else None,
+        "calc_type": generator.calc_type,
+        "config": used_config,
+    }
+
+
 def main():
     """Main entry point for the script."""
     parser = argparse.ArgumentParser(
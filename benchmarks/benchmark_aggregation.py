@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+Benchmark for SQL-side property aggregation
+-------------------------------------------
+Builds a synthetic materials database (space groups, formulas, band gaps,
+energies, atom counts, conductivity types, calculations) and runs
+PropertyAggregator.aggregate_by_group for every grouping criterion, inside
+SQLite and in Python. Both must produce the same groups, counts and
+statistics; the script exits with status 1 otherwise.
+
+Usage:
+  python benchmark_aggregation.py [--materials 50000]
+"""
+
+import sys
+import math
+import time
+import random
+import tempfile
+import argparse
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+# Import MACE components
+try:
+    from mace.database.materials import MaterialDatabase
+    from mace.database.analysis.aggregation import PropertyAggregator
+except ImportError as e:
+    print(f"Error importing MACE database modules: {e}")
+    sys.exit(1)
+
+
+CASES = [
+    ('space_group', 'mean', None),
+    ('crystal_system', 'median', None),
+    ('crystal_system', 'stdev', None),
+    ('formula_prefix', 'max', None),
+    ('conductivity_type', 'count', None),
+    ('band_gap_range', 'mean', None),
+    ('energy_range', 'min', None),
+    ('atoms_range', 'range', None),
+    ('calculation_type', 'p90', None),
+    ('convergence_status', 'sum', None),
+    ('crystal_system', 'median', ['space_group > 200']),
+    ('formula_prefix', 'mean', ['band_gap > 1.5', "formula LIKE 'Zn%' OR formula LIKE 'Ti%'"]),
+]
+
+PROPERTIES = ['band_gap', 'total_energy', 'atoms_in_unit_cell']
+
+FORMULAS = ['ZnO', 'TiO2', 'SiC', 'Si', 'C', 'GaN', 'MgO', 'ZnS', 'CaTiO3', 'Al2O3', 'BN',
+            'zno', '123', '']
+CALC_TYPES = ['OPT', 'SP', 'BAND', 'DOSS', 'FREQ']
+
+
+def build_database(db_path: Path, n_materials: int, seed: int = 11) -> MaterialDatabase:
+    """Create a synthetic database with n_materials materials."""
+    rng = random.Random(seed)
+    db = MaterialDatabase(str(db_path))
+    start = datetime(2025, 1, 1)
+    materials, properties, calculations = [], [], []
+
+    for i in range(n_materials):
+        material_id = f"mat_{i:06d}"
+        created = (start + timedelta(seconds=i)).isoformat()
+        materials.append((material_id, rng.choice(FORMULAS),
+                          rng.choice([None, 0, 1, 14, 62, 139, 160, 186, 194, 225, 227, 229]),
+                          created, created))
+
+        def add(name, value=None, text=None, category='electronic', calc='c0'):
+            properties.append((material_id, f"{material_id}_{calc}", category, name, value, text, created))
+
+        if rng.random() < 0.85:
+            add('band_gap', rng.choice([0.0, 0.05, 1.2, 2.0, 2.5, 3.7, 5.1, 7.2]) + rng.random() * 0.01)
+            if rng.random() < 0.1:
+                # Later extraction from another calculation
+                add('band_gap', rng.uniform(0, 8), calc='c1')
+        if rng.random() < 0.05:
+            add('band_gap', None, 'n/a', calc='c2')
+        if rng.random() < 0.8:
+            add('total_energy', rng.uniform(-5000, 10), category='thermodynamic')
+        if rng.random() < 0.7:
+            add('atoms_in_unit_cell', None, str(rng.choice([2, 8, 10, 11, 50, 51, 200, 240])),
+                category='structural')
+        if rng.random() < 0.6:
+            add('conductivity_type', None, rng.choice(['metal', 'semiconductor', 'insulator', '']),
+                category='electronic')
+
+        for k in range(rng.randint(0, 3)):
+            calc_created = (start + timedelta(seconds=i, minutes=k)).isoformat()
+            calculations.append((f"{material_id}_calc{k}", material_id, rng.choice(CALC_TYPES),
+                                 rng.choice(['completed', 'failed', 'running']), calc_created))
+
+    with db._get_connection() as conn:
+        conn.executemany("""
+            INSERT INTO materials (material_id, formula, space_group, created_at, updated_at)
+            VALUES (?, ?, ?, ?, ?)
+        """, materials)
+        conn.executemany("""
+            INSERT INTO properties (material_id, calc_id, property_category, property_name,
+                                    property_value, property_value_text, extracted_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        """, properties)
+        conn.executemany("""
+            INSERT INTO calculations (calc_id, material_id, calc_type, status, created_at)
+            VALUES (?, ?, ?, ?, ?)
+        """, calculations)
+    return db
+
+
+def close(a, b) -> bool:
+    if isinstance(a, (int, float)) and isinstance(b, (int, float)):
+        return math.isclose(a, b, rel_tol=1e-9, abs_tol=1e-9)
+    return a == b
+
+
+def compare(sql: dict, python: dict) -> list:
+    """Differences between the SQL and Python results."""
+    problems = []
+    if sql['total_materials'] != python['total_materials']:
+        problems.append(f"total_materials {sql['total_materials']} != {python['total_materials']}")
+    if list(sql['groups']) != list(python['groups']):
+        problems.append(f"groups {list(sql['groups'])[:5]} != {list(python['groups'])[:5]}")
+    for name in set(sql['groups']) & set(python['groups']):
+        a, b = sql['groups'][name], python['groups'][name]
+        for key in ('material_count', 'material_ids', 'material_ids_truncated'):
+            if a.get(key) != b.get(key):
+                problems.append(f"{name} {key}: {a.get(key)} != {b.get(key)}")
+        if set(a['properties']) != set(b['properties']):
+            problems.append(f"{name} properties: {sorted(a['properties'])} != {sorted(b['properties'])}")
+            continue
+        for prop, stats in a['properties'].items():
+            for key, value in stats.items():
+                if not close(value, b['properties'][prop].get(key)):
+                    problems.append(f"{name} {prop} {key}: {value} != {b['properties'][prop].get(key)}")
+    return problems
+
+
+def main():
+    """Main function."""
+    parser = argparse.ArgumentParser(description="Benchmark SQL vs Python property aggregation")
+    parser.add_argument("--materials", type=int, default=50000, help="Number of synthetic materials")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="mace_agg_bench_") as tmp:
+        print(f"Building synthetic database with {args.materials} materials")
+        db = build_database(Path(tmp) / "materials.db", args.materials)
+        aggregator = PropertyAggregator(db)
+
+        # Build the property cache used by the Python path outside the timings
+        aggregator.aggregate_by_group('space_group', PROPERTIES[:1], pushdown=False)
+
+        mismatches = 0
+        sql_total = python_total = 0.0
+        print(f"\n{'group by':<20} {'aggregation':<12} {'filters':<40} {'groups':>6} {'sql':>9} {'python':>9}")
+        for group_by, aggregation, filters in CASES:
+            start = time.perf_counter()
+            sql = aggregator.aggregate_by_group(group_by, PROPERTIES, aggregation, filters)
+            sql_time = time.perf_counter() - start
+            start = time.perf_counter()
+            python = aggregator.aggregate_by_group(group_by, PROPERTIES, aggregation, filters, pushdown=False)
+            python_time = time.perf_counter() - start
+            sql_total += sql_time
+            python_total += python_time
+
+            label = ' AND '.join(filters) if filters else ''
+            print(f"{group_by:<20} {aggregation:<12} {label[:40]:<40} {sql['total_groups']:>6} "
+                  f"{sql_time:>8.3f}s {python_time:>8.3f}s")
+            problems = compare(sql, python)
+            if problems:
+                mismatches += 1
+                for problem in problems[:5]:
+                    print(f"  MISMATCH: {problem}")
+
+        print(f"\nTotal: sql {sql_total:.3f}s, python {python_total:.3f}s "
+              f"({python_total / max(sql_total, 1e-9):.1f}x)")
+        print(f"Mismatches: {mismatches} of {len(CASES)} cases")
+        sys.exit(1 if mismatches else 0)
+
+
+if __name__ == "__main__":
+    main()
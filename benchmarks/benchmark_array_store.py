@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the BAND/DOS array store
+--------------------------------------
+Writes synthetic DOSS.DAT and BAND.DAT files, parses them with
+DatFileProcessor and saves the extracted properties twice: as JSON text
+(the format before the array store) and through
+CrystalPropertyExtractor.save_many_properties_to_database, which puts the
+arrays in the array store. Reports write time, read-back time and storage
+size of both, checks that the arrays read back are identical, and that
+AdvancedElectronicAnalyzer gives the same results from the store as from
+the DAT files; exits with status 1 otherwise.
+
+Usage:
+  python benchmark_array_store.py [--calculations 40] [--points 20000] [--projections 8]
+"""
+
+import sys
+import json
+import math
+import time
+import random
+import tempfile
+import argparse
+from datetime import datetime
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+# Import MACE components
+try:
+    from mace.database.materials import MaterialDatabase
+    from mace.database.array_store import ArrayStore, load_property_array
+    from mace.utils.property_extractor import CrystalPropertyExtractor
+    from mace.utils.dat_file_processor import DatFileProcessor
+    from mace.utils.advanced_electronic_analyzer import AdvancedElectronicAnalyzer
+except ImportError as e:
+    print(f"Error importing MACE modules: {e}")
+    sys.exit(1)
+
+import numpy as np
+
+
+ARRAYS = ('energy_points', 'total_dos', 'projected_dos', 'k_points', 'eigenvalues')
+
+
+def write_dat_files(directory: Path, n_points: int, n_projections: int, rng: random.Random):
+    """A DOSS.DAT (energy, total, projections) and a BAND.DAT (k path, bands) in Hartree."""
+    directory.mkdir(parents=True, exist_ok=True)
+    with open(directory / "DOSS.DAT", 'w') as f:
+        f.write("# NEPTS {} NPROJ {}\n".format(n_points, n_projections))
+        for i in range(n_points):
+            energy = -1.0 + 2.0 * i / (n_points - 1)
+            gap = 0.0 if abs(energy) < 0.05 else 1.0
+            values = [gap * rng.uniform(0, 5) for _ in range(n_projections + 1)]
+            f.write(f"{energy: .8E} " + " ".join(f"{v: .8E}" for v in values) + "\n")
+    n_k, n_bands = max(50, n_points // 100), 24
+    with open(directory / "BAND.DAT", 'w') as f:
+        f.write(f"# NKPT {n_k} NBND {n_bands}\n")
+        for i in range(n_k):
+            k = i / (n_k - 1)
+            bands = [(b - n_bands / 2) * 0.05 + 0.02 * math.cos(math.pi * k * (b + 1)) +
+                     (0.03 if b >= n_bands / 2 else -0.03) for b in range(n_bands)]
+            f.write(f"{k: .8E} {k * 0.5: .8E} 0.00000000E+00 " + " ".join(f"{e: .8E}" for e in bands) + "\n")
+
+
+def extraction(directory: Path, processor: DatFileProcessor, material_id: str, calc_id: str) -> dict:
+    """Properties as the extractor collects them from the DAT files."""
+    properties = {}
+    properties.update(processor.process_doss_dat_file(directory / "DOSS.DAT"))
+    band = processor.process_band_dat_file(directory / "BAND.DAT")
+    properties['k_points'] = band['k_points']
+    properties['eigenvalues'] = band['eigenvalues']
+    properties['_metadata'] = {'material_id': material_id, 'calc_id': calc_id,
+                               'extracted_at': datetime.now().isoformat()}
+    return properties
+
+
+def build_database(db_path: Path, n_calcs: int) -> MaterialDatabase:
+    """Create a database with one material and one calculation per DAT file pair."""
+    db_path.parent.mkdir(parents=True, exist_ok=True)
+    db = MaterialDatabase(str(db_path))
+    now = datetime.now().isoformat()
+    with db._get_connection() as conn:
+        for i in range(n_calcs):
+            conn.execute("INSERT INTO materials (material_id, formula, created_at, updated_at) VALUES (?, 'C', ?, ?)",
+                         (f"mat_{i}", now, now))
+            conn.execute("INSERT INTO calculations (calc_id, material_id, calc_type, status, created_at) "
+                         "VALUES (?, ?, 'DOSS', 'completed', ?)", (f"calc_{i}", f"mat_{i}", now))
+    return db
+
+
+def directory_size(path: Path) -> int:
+    """Total size of the files below path."""
+    return sum(f.stat().st_size for f in path.rglob('*') if f.is_file())
+
+
+def same_results(a: dict, b: dict) -> list:
+    """Differences between two analyze_* results (file names excluded)."""
+    problems = []
+    for key in sorted(set(a) | set(b)):
+        if key == 'files_analyzed':
+            continue
+        x, y = a.get(key), b.get(key)
+        if isinstance(x, (int, float)) and isinstance(y, (int, float)):
+            if not (x == y or math.isclose(x, y, rel_tol=1e-12, abs_tol=1e-15)):
+                problems.append(f"{key}: {x} != {y}")
+        elif x != y:
+            problems.append(f"{key}: {x} != {y}")
+    return problems
+
+
+def main():
+    """Main function."""
+    parser = argparse.ArgumentParser(description="Benchmark JSON text vs array store for BAND/DOS data")
+    parser.add_argument("--calculations", type=int, default=40, help="Number of DOSS/BAND calculations")
+    parser.add_argument("--points", type=int, default=20000, help="DOS energy points per calculation")
+    parser.add_argument("--projections", type=int, default=8, help="Projected DOS columns")
+    args = parser.parse_args()
+
+    rng = random.Random(3)
+    processor = DatFileProcessor()
+    with tempfile.TemporaryDirectory(prefix="mace_array_bench_") as tmp:
+        tmp = Path(tmp)
+        print(f"Writing {args.calculations} DOSS/BAND file pairs ({args.points} points, "
+              f"{args.projections} projections)")
+        dirs = []
+        for i in range(args.calculations):
+            directory = tmp / "calcs" / f"calc_{i}"
+            write_dat_files(directory, args.points, args.projections, rng)
+            dirs.append(directory)
+        extractions = [extraction(d, processor, f"mat_{i}", f"calc_{i}") for i, d in enumerate(dirs)]
+
+        # JSON text (no array store)
+        json_db = build_database(tmp / "json" / "materials.db", args.calculations)
+        json_extractor = CrystalPropertyExtractor(db_path=None)
+        start = time.perf_counter()
+        rows = []
+        for props in extractions:
+            rows.extend(json_extractor._build_property_rows(props))
+        json_db.upsert_properties(rows)
+        json_write = time.perf_counter() - start
+
+        # Array store
+        store_db = build_database(tmp / "store" / "materials.db", args.calculations)
+        store_extractor = CrystalPropertyExtractor(db_path=None)
+        store_extractor.db = store_db
+        start = time.perf_counter()
+        store_extractor.save_many_properties_to_database(extractions)
+        store_write = time.perf_counter() - start
+        store = ArrayStore(store_db)
+
+        # Read back every array
+        start = time.perf_counter()
+        json_arrays = {}
+        for i in range(args.calculations):
+            for name in ARRAYS:
+                json_arrays[(i, name)] = load_property_array(json_db, f"calc_{i}", name)[0]
+        json_read = time.perf_counter() - start
+
+        start = time.perf_counter()
+        store_arrays = {}
+        for i in range(args.calculations):
+            for name in ARRAYS:
+                store_arrays[(i, name)] = store.load(f"calc_{i}", name)
+        store_read = time.perf_counter() - start
+
+        problems = []
+        for key, array in json_arrays.items():
+            if store_arrays[key] is None or not np.array_equal(array, store_arrays[key]):
+                problems.append(f"array {key} differs")
+
+        # Advanced analysis from files and from the store
+        analyzer = AdvancedElectronicAnalyzer()
+        start = time.perf_counter()
+        from_files = [analyzer.analyze_material(d / "BAND.DAT", d / "DOSS.DAT") for d in dirs]
+        files_time = time.perf_counter() - start
+        start = time.perf_counter()
+        from_store = [analyzer.analyze_calculation(store, f"calc_{i}", f"calc_{i}") for i in range(len(dirs))]
+        store_time = time.perf_counter() - start
+        for i, (a, b) in enumerate(zip(from_files, from_store)):
+            problems.extend(f"analysis calc_{i} {p}" for p in same_results(a, b))
+
+        json_size = (tmp / "json" / "materials.db").stat().st_size
+        store_size = (tmp / "store" / "materials.db").stat().st_size + directory_size(store.store_dir)
+        print(f"\n{'':<22} {'JSON text':>12} {'array store':>12}")
+        print(f"{'write':<22} {json_write:>11.3f}s {store_write:>11.3f}s")
+        print(f"{'read all arrays':<22} {json_read:>11.3f}s {store_read:>11.3f}s")
+        print(f"{'storage':<22} {json_size / 1e6:>10.1f}MB {store_size / 1e6:>10.1f}MB")
+        print(f"{'electronic analysis':<22} {files_time:>11.3f}s {store_time:>11.3f}s  (DAT files vs store)")
+        print(f"\nDifferences: {len(problems)}")
+        for problem in problems[:10]:
+            print(f"  {problem}")
+        sys.exit(1 if problems else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the per-material calculation index
+------------------------------------------------
+Counts the SELECT statements and the time of two request paths with and
+without MaterialCalcIndex:
+
+- a recovery sweep (ErrorRecoveryEngine.get_recoverable_calculations) over
+  --failures failed calculations. Some of them are plain failures, some are
+  chains of failed recovery attempts at or below the retry limit, and some
+  have an error type without a handler. Before the index, each failure cost
+  two queries (get_calculation + the material's calculations).
+- WorkflowEngine.process_completed_calculations over --completions SP
+  completions. Input generation is replaced by a record insert, so only
+  the engine's lookups are counted. The existence, dependency, sequence
+  position and wavefunction checks each queried the material's calculations.
+
+The script asserts that the recovery sweep runs in at most 2 queries (failed
+calculations + one index load), whatever the number of failures. It also
+checks:
+
+- the recoverable calculations match the expected ones from how the data
+  was built, and retries are counted over the whole recovery chain
+- the workflow engine creates the same calculations with and without the
+  index, and a material's second event sees what its first event created
+
+It exits with status 1 on any difference.
+
+Usage:
+  python benchmark_calc_index.py [--failures 1000] [--completions 200]
+"""
+
+import io
+import sys
+import json
+import time
+import tempfile
+import argparse
+import contextlib
+from contextlib import redirect_stdout
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+# Import MACE components
+try:
+    from mace.database.materials import MaterialDatabase
+    from mace.database.calc_index import MaterialCalcIndex
+    from mace.recovery.recovery import ErrorRecoveryEngine
+    from mace.workflow.engine import WorkflowEngine
+    from mace.workflow.fanout import StepFanout
+except ImportError as e:
+    print(f"Error importing MACE modules: {e}")
+    sys.exit(1)
+
+WORKFLOW_ID = "workflow_bench"
+
+
+class CountingDatabase(MaterialDatabase):
+    """MaterialDatabase that counts the SELECT statements it runs."""
+
+    def __init__(self, *args, **kwargs):
+        self.selects = 0
+        super().__init__(*args, **kwargs)
+
+    def _open_connection(self, read_only: bool = False):
+        conn = super()._open_connection(read_only)
+        conn.set_trace_callback(self._trace)
+        return conn
+
+    def _trace(self, statement: str):
+        if statement.lstrip().upper().startswith('SELECT'):
+            self.selects += 1
+
+
+def legacy_recoverable(db, config: dict) -> list:
+    """get_recoverable_calculations before the index (one material query per failure)."""
+    recoverable = []
+    for calc in db.get_calculations_by_status('failed'):
+        error_type = calc.get('error_type', 'unknown')
+        if error_type not in config["error_recovery"]:
+            continue
+        material_calcs = db.get_calculations_by_status(material_id=db.get_calculation(calc['calc_id'])['material_id'])
+        retry_count = sum(1 for other in material_calcs
+                          if other.get('parent_calc_id') == calc['calc_id'] and other.get('is_recovery_attempt'))
+        if retry_count < config["error_recovery"][error_type].get("max_retries", 3):
+            recoverable.append(calc)
+    return recoverable
+
+
+def insert_calcs(db, rows: list):
+    """Insert (calc_id, material_id, calc_type, status, error_type, settings) rows."""
+    with db._get_connection() as conn:
+        conn.executemany("""
+            INSERT INTO calculations (calc_id, material_id, calc_type, status, error_type,
+                                      settings_json, created_at)
+            VALUES (?, ?, ?, ?, ?, ?, strftime('%Y-%m-%dT%H:%M:%f', 'now'))
+        """, [(calc_id, material_id, calc_type, status, error_type, json.dumps(settings))
+              for calc_id, material_id, calc_type, status, error_type, settings in rows])
+
+
+def build_failures(db_path: Path, n_failures: int) -> set:
+    """Failed calculations in four patterns; returns the calc_ids that are recoverable."""
+    db = MaterialDatabase(str(db_path))
+    rows, expected = [], set()
+    n_failed, i = 0, 0
+    while n_failed < n_failures:
+        material_id = f"mat_{i // 4:05d}"
+        if i % 4 == 0:
+            db.create_material(material_id, "C")
+            rows.append((f"{material_id}_opt", material_id, "OPT", "completed", None, {}))
+        pattern = i % 4
+        original = f"{material_id}_sp{i % 4}"
+        if pattern == 3:
+            # No handler for this error type
+            rows.append((original, material_id, "SP", "failed", "unknown_error", {}))
+            n_failed += 1
+        else:
+            # 0, 1 or 3 failed recovery attempts (shrink_error allows 3)
+            attempts = {0: 0, 1: 1, 2: 3}[pattern]
+            chain = [original] + [f"{original}_r{n}" for n in range(1, attempts + 1)]
+            for n, calc_id in enumerate(chain):
+                settings = {'is_recovery_attempt': True, 'parent_calc_id': chain[n - 1]} if n else {}
+                rows.append((calc_id, material_id, "SP", "failed", "shrink_error", settings))
+            n_failed += len(chain)
+            if attempts < 3:
+                expected.add(chain[-1])  # Only the newest attempt of a chain is recovered
+        i += 1
+    insert_calcs(db, rows)
+    db.close()
+    return expected
+
+
+def recovery_sweep(db_path: Path, expected: set, problems: list) -> dict:
+    """Query counts and times of the recovery sweep with and without the index."""
+    with redirect_stdout(io.StringIO()):
+        recovery = ErrorRecoveryEngine(str(db_path), str(db_path.parent / "no_config.yaml"))
+    db = CountingDatabase(str(db_path))
+    recovery.db = db
+    n_failed = len(db.get_calculations_by_status('failed'))
+
+    db.selects = 0
+    start = time.perf_counter()
+    legacy = legacy_recoverable(db, recovery.config)
+    legacy_time, legacy_queries = time.perf_counter() - start, db.selects
+
+    db.selects = 0
+    start = time.perf_counter()
+    recoverable = recovery.get_recoverable_calculations()
+    index_time, index_queries = time.perf_counter() - start, db.selects
+
+    if index_queries > 2:
+        problems.append(f"recovery sweep: {index_queries} queries for {n_failed} failures, expected <= 2")
+    found = {calc['calc_id'] for calc in recoverable}
+    if found != expected:
+        problems.append(f"recovery sweep: {len(found ^ expected)} calculations differ from the expected ones")
+
+    # Standalone retry counts: whole chain, same answer with or without an index
+    chain_end = next(calc_id for calc_id in sorted(expected) if calc_id.endswith("_r1"))
+    index = MaterialCalcIndex(db, [chain_end.split("_sp")[0]])
+    if recovery.get_retry_count(chain_end) != 1 or recovery.get_retry_count(chain_end, index) != 1:
+        problems.append(f"retry count of {chain_end} is not 1")
+    if recovery.get_retry_count(chain_end.rsplit("_r", 1)[0], index) != 1:
+        problems.append("retry count of a recovered original is not 1")
+    db.close()
+    return {'n': n_failed, 'legacy': (legacy_queries, legacy_time, len(legacy)),
+            'index': (index_queries, index_time, len(recoverable))}
+
+
+class RecordingEngine(WorkflowEngine):
+    """Workflow engine whose property calculations are only recorded."""
+
+    def generate_property_calculation(self, source_calc_id, target_calc_type):
+        material_id = source_calc_id.rsplit('_', 1)[0]  # Built as <material>_sp
+        return self.db.create_calculation(material_id, target_calc_type, prerequisite_calc_id=source_calc_id,
+                                          settings={'workflow_id': WORKFLOW_ID})
+
+
+def build_completions(work_dir: Path, n_completions: int):
+    """Completed OPT -> SP chains with pending SP events; the first material also has its OPT event."""
+    (work_dir / "workflow_configs").mkdir(parents=True)
+    (work_dir / "workflow_configs" / "workflow_plan_bench.json").write_text(
+        json.dumps({"workflow_sequence": ["OPT", "SP", "BAND", "DOSS"]}))
+    db = MaterialDatabase(str(work_dir / "materials.db"))
+    settings = {'workflow_id': WORKFLOW_ID}
+    rows = []
+    for i in range(n_completions):
+        material_id = f"mat_{i:05d}"
+        db.create_material(material_id, "C")
+        rows.append((f"{material_id}_opt", material_id, "OPT", "completed", None, settings))
+        rows.append((f"{material_id}_sp", material_id, "SP", "completed", None, settings))
+    insert_calcs(db, rows)
+    with db._get_connection() as conn:
+        conn.execute("UPDATE workflow_events SET consumed_at = CURRENT_TIMESTAMP "
+                     "WHERE calc_id LIKE '%_opt' AND calc_id != 'mat_00000_opt'")
+    db.close()
+
+
+def workflow_run(work_dir: Path, use_index: bool, problems: list) -> tuple:
+    """(SELECT statements, seconds, created calculations) of process_completed_calculations."""
+    with redirect_stdout(io.StringIO()):
+        engine = RecordingEngine(str(work_dir / "materials.db"), str(work_dir))
+    engine.db = CountingDatabase(str(work_dir / "materials.db"))
+    engine.step_fanout = StepFanout(max_workers=1)
+    if not use_index:
+        engine.calc_index_scope = lambda material_ids: contextlib.nullcontext()
+
+    engine.db.selects = 0
+    start = time.perf_counter()
+    with redirect_stdout(io.StringIO()):
+        engine.process_completed_calculations()
+    elapsed, selects = time.perf_counter() - start, engine.db.selects
+
+    created = sorted((calc['material_id'], calc['calc_type'])
+                     for calc in engine.db.get_calculations_by_status()
+                     if calc['calc_type'] not in ("OPT", "SP"))
+    # mat_00000's OPT event runs first; its SP event must still create BAND and DOSS once
+    if created.count(("mat_00000", "BAND")) != 1:
+        problems.append(f"index={use_index}: mat_00000 has {created.count(('mat_00000', 'BAND'))} BAND")
+    engine.close()
+    return selects, elapsed, created
+
+
+def main():
+    """Main function."""
+    parser = argparse.ArgumentParser(description="Count database queries with and without MaterialCalcIndex")
+    parser.add_argument("--failures", type=int, default=1000, help="Failed calculations in the recovery sweep")
+    parser.add_argument("--completions", type=int, default=200, help="SP completions for the workflow engine")
+    args = parser.parse_args()
+
+    problems = []
+    with tempfile.TemporaryDirectory(prefix="mace_index_bench_") as tmp:
+        tmp = Path(tmp)
+        (tmp / "recovery").mkdir()
+        expected = build_failures(tmp / "recovery" / "materials.db", args.failures)
+        sweep = recovery_sweep(tmp / "recovery" / "materials.db", expected, problems)
+
+        build_completions(tmp / "plain", args.completions)
+        build_completions(tmp / "indexed", args.completions)
+        plain = workflow_run(tmp / "plain", False, problems)
+        indexed = workflow_run(tmp / "indexed", True, problems)
+        if plain[2] != indexed[2]:
+            problems.append(f"workflow engine created {len(plain[2])} calculations without the index, "
+                            f"{len(indexed[2])} with it")
+        if len(indexed[2]) != 2 * args.completions:
+            problems.append(f"{len(indexed[2])} calculations created, expected {2 * args.completions}")
+
+        print(f"{'':<40} {'queries':>9} {'time':>9}   {'queries':>9} {'time':>9}")
+        print(f"{'':<40} {'-- without index --':>19}   {'-- with index --':>19}")
+        print(f"{'recovery sweep, %d failures' % sweep['n']:<40} "
+              f"{sweep['legacy'][0]:>9} {sweep['legacy'][1]:>8.3f}s   "
+              f"{sweep['index'][0]:>9} {sweep['index'][1]:>8.3f}s")
+        print(f"{'workflow events, %d SP completions' % args.completions:<40} "
+              f"{plain[0]:>9} {plain[1]:>8.3f}s   {indexed[0]:>9} {indexed[1]:>8.3f}s")
+        print(f"\nRecoverable: {sweep['index'][2]} (before the index: {sweep['legacy'][2]}, "
+              f"retry counts were always 0)")
+        print(f"\nDifferences: {len(problems)}")
+        for problem in problems[:10]:
+            print(f"  {problem}")
+        sys.exit(1 if problems else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the parallel, cached CIF to D12 conversion
+--------------------------------------------------------
+Copies the example CIF files in cif/ into --files distinct CIFs (each
+copy gets its own comment line, so its content hash differs), adds a
+broken CIF and a CIF without space group tags, and converts the set in
+strict batch mode with NewCifToD12.process_cifs:
+
+- serially without the cache (the converter before --jobs)
+- with --jobs workers and a cold analysis cache
+- with other method and basis options, serially without the cache and
+  with a warm cache (serially and with --jobs workers), which skips
+  parsing and the spglib analysis
+
+Standard input is empty, as on a batch node. The script checks that:
+
+- every run writes byte-identical D12 files
+- the broken CIF is reported as an error without stopping the run
+- the space group of the CIF without one is inferred, and the error
+  manifest lists both files
+- the warm runs do not parse or analyze a good CIF again
+
+It exits with status 1 on any difference.
+
+Usage:
+  python benchmark_cif_to_d12.py [--files 400] [--jobs 4]
+"""
+
+import io
+import os
+import re
+import sys
+import glob
+import json
+import time
+import tempfile
+import argparse
+from contextlib import redirect_stdout
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT / "Crystal_d12"))
+
+import NewCifToD12
+from NewCifToD12 import process_cifs
+
+OPTIONS_A = {
+    "dimensionality": "CRYSTAL", "calculation_type": "SP", "method": "DFT",
+    "dft_functional": "PBE", "use_dispersion": False, "basis_set_type": "INTERNAL",
+    "basis_set": "POB-TZVP-REV2", "symmetry_handling": "CIF", "write_only_unique": True,
+    "symmetry_tolerance": 1e-5, "is_spin_polarized": False,
+    "tolerances": {"TOLINTEG": "7 7 7 7 14", "TOLDEE": 7}, "scf_method": "DIIS",
+    "scf_maxcycle": 800, "fmixing": 30, "dft_grid": "XLGRID",
+}
+OPTIONS_B = dict(OPTIONS_A, method="HF", hf_method="UHF", basis_set="STO-3G",
+                 is_spin_polarized=True, use_dispersion=True, dft_functional="B3LYP",
+                 symmetry_handling="SPGLIB", validate_symmetry=True)
+
+
+def build_cifs(cif_dir: Path, n_files: int) -> int:
+    """Write n_files distinct CIFs, one without space group and one broken CIF; returns the convertible ones."""
+    templates = [Path(path).read_text() for path in sorted(glob.glob(str(REPO_ROOT / "cif" / "*.cif")))]
+    cif_dir.mkdir(parents=True)
+    for i in range(n_files):
+        text = templates[i % len(templates)]
+        (cif_dir / f"structure_{i:05d}.cif").write_text(f"# copy {i}\n{text}")
+    (cif_dir / "broken.cif").write_text("data_broken\n_cell_length_a 3.0\n")
+    no_spacegroup = re.sub(r"_symmetry_(space_group_name_H-M|Int_Tables_number|cell_setting).*\n", "", templates[0])
+    (cif_dir / "no_spacegroup.cif").write_text(no_spacegroup)
+    return n_files + 1
+
+
+def convert(cif_dir: Path, out_dir: Path, options: dict, jobs: int, cache_dir) -> tuple:
+    """(seconds, summary, {file name: D12 text}, manifest entries) of one strict conversion with empty stdin."""
+    stdin = sys.stdin
+    sys.stdin = io.StringIO("")
+    try:
+        start = time.perf_counter()
+        with redirect_stdout(io.StringIO()):
+            summary = process_cifs(str(cif_dir), options, str(out_dir), jobs=jobs,
+                                   cache_dir=str(cache_dir) if cache_dir else None, strict=True,
+                                   manifest_file=str(out_dir / "errors.jsonl"))
+        elapsed = time.perf_counter() - start
+    finally:
+        sys.stdin = stdin
+    outputs = {path.name: path.read_text() for path in out_dir.glob("*.d12")}
+    with open(out_dir / "errors.jsonl") as f:
+        manifest = [json.loads(line) for line in f]
+    return elapsed, summary, outputs, manifest
+
+
+def main():
+    """Main function."""
+    parser = argparse.ArgumentParser(description="Benchmark serial vs parallel, cached CIF to D12 conversion")
+    parser.add_argument("--files", type=int, default=400, help="CIF files to convert")
+    parser.add_argument("--jobs", type=int, default=4, help="Worker processes")
+    args = parser.parse_args()
+
+    if not NewCifToD12.SPGLIB_AVAILABLE:
+        print("spglib is required for this benchmark")
+        sys.exit(1)
+
+    problems = []
+    with tempfile.TemporaryDirectory(prefix="mace_cif_bench_") as tmp:
+        tmp = Path(tmp)
+        n_good = build_cifs(tmp / "cifs", args.files)
+        cache = tmp / "cache"
+
+        runs = [
+            ("A", "serial, no cache", OPTIONS_A, 1, None),
+            ("A", f"{args.jobs} workers, cold cache", OPTIONS_A, args.jobs, cache),
+            ("B", "serial, no cache", OPTIONS_B, 1, None),
+            ("B", "serial, warm cache", OPTIONS_B, 1, cache),
+            ("B", f"{args.jobs} workers, warm cache", OPTIONS_B, args.jobs, cache),
+        ]
+        reference = {}
+        rows = []
+        for n, (options_name, label, options, jobs, cache_dir) in enumerate(runs):
+            elapsed, summary, outputs, manifest = convert(tmp / "cifs", tmp / f"out_{n}", options, jobs, cache_dir)
+            rows.append((options_name, label, elapsed, summary))
+            name = f"options {options_name}, {label}"
+
+            errors = [os.path.basename(cif_file) for cif_file, _ in summary["errors"]]
+            if errors != ["broken.cif"]:
+                problems.append(f"{name}: errors {errors[:5]}, expected only broken.cif")
+            recorded = sorted((Path(entry["cif_file"]).name, entry["status"], entry["stage"]) for entry in manifest)
+            if recorded != [("broken.cif", "error", "spacegroup"), ("no_spacegroup.cif", "warning", "spacegroup")]:
+                problems.append(f"{name}: error manifest {recorded}")
+            if len(outputs) != n_good:
+                problems.append(f"{name}: {len(outputs)} D12 files, expected {n_good}")
+            # no_spacegroup.cif is structure_00000.cif without its space group tags
+            inferred = {key.split("_CRYSTAL_")[0]: text.split("\n", 1)[1] for key, text in outputs.items()
+                        if key.startswith(("no_spacegroup_", "structure_00000_"))}
+            if len(set(inferred.values())) != 1 or len(inferred) != 2:
+                problems.append(f"{name}: D12 of the CIF without space group differs from its template")
+            if options_name not in reference:
+                reference[options_name] = outputs
+            elif outputs != reference[options_name]:
+                differing = sum(1 for key in reference[options_name] if outputs.get(key) != reference[options_name][key])
+                problems.append(f"{name}: {differing} D12 files differ from the serial run")
+            # Warm runs only miss on the broken CIF (its analysis fails and is not stored)
+            if "warm" in label and summary["cache_hits"] < 2 * n_good:
+                problems.append(f"{name}: {summary['cache_hits']} cache hits, expected >= {2 * n_good}")
+
+        print(f"{args.files} CIF files + 1 without space group + 1 broken, {os.cpu_count()} CPU(s)")
+        print(f"  options A: DFT PBE / POB-TZVP-REV2, CIF symmetry")
+        print(f"  options B: UHF / STO-3G, spglib symmetry with validation\n")
+        print(f"{'':<36} {'time':>8} {'files/s':>9} {'cache hits':>11}")
+        for options_name, label, elapsed, summary in rows:
+            print(f"{f'options {options_name}, {label}':<36} {elapsed:>7.2f}s "
+                  f"{len(summary['converted']) / elapsed:>9.1f} {summary['cache_hits']:>11}")
+        print(f"\nDifferences: {len(problems)}")
+        for problem in problems[:10]:
+            print(f"  {problem}")
+        sys.exit(1 if problems else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Benchmark for persistent per-thread SQLite connections
+------------------------------------------------------
+Builds a database with --calculations calculations (5 per material) and
+times a queue-manager callback with and without persistent connections
+(MaterialDatabase(persistent_connections=False) is the old behaviour: a new
+connection, four PRAGMAs and a close per call).
+
+A callback handles --jobs finished jobs. For each it looks up the
+calculation by SLURM job ID, reads its material and the material's
+calculations, and marks the calculation completed.
+
+The script also runs --pools short-lived thread pools of 4 threads against
+the persistent database and checks that connections of finished threads
+are closed (open file descriptors do not grow with the number of pools).
+It exits with status 1 on any difference.
+
+Usage:
+  python benchmark_connections.py [--calculations 50000] [--callbacks 20] [--jobs 50]
+"""
+
+import os
+import gc
+import sys
+import time
+import random
+import tempfile
+import argparse
+import statistics
+from datetime import datetime
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+# Import MACE components
+try:
+    from mace.database.materials import MaterialDatabase
+except ImportError as e:
+    print(f"Error importing MACE modules: {e}")
+    sys.exit(1)
+
+CALCS_PER_MATERIAL = 5
+
+
+def build_database(db_path: Path, n_calcs: int):
+    """Create a database with n_calcs completed-or-running calculations."""
+    db = MaterialDatabase(str(db_path), str(db_path.with_name("structures.db")))
+    now = datetime.now().isoformat()
+    materials = [(f"mat_{i:06d}", "Si2", 227, now, now) for i in range(n_calcs // CALCS_PER_MATERIAL)]
+    calcs = [(f"calc_{i:07d}", f"mat_{i // CALCS_PER_MATERIAL:06d}", "SP", "running", str(1000000 + i), now)
+             for i in range(n_calcs)]
+    with db._get_connection() as conn:
+        conn.executemany("INSERT INTO materials (material_id, formula, space_group, created_at, updated_at) "
+                         "VALUES (?, ?, ?, ?, ?)", materials)
+        conn.executemany("INSERT INTO calculations (calc_id, material_id, calc_type, status, slurm_job_id, created_at) "
+                         "VALUES (?, ?, ?, ?, ?, ?)", calcs)
+    db.close()
+
+
+def callback(db: MaterialDatabase, job_ids: list):
+    """What a queue-manager callback does for a batch of finished jobs."""
+    for job_id in job_ids:
+        calc = db.get_calculation_by_slurm_id(job_id)
+        db.get_material(calc["material_id"])
+        db.get_material_calculations(calc["material_id"])
+        db.update_calculation_status(calc["calc_id"], "completed")
+
+
+def time_callbacks(db_path: Path, persistent: bool, batches: list) -> list:
+    """Seconds per callback, each with a fresh MaterialDatabase as a callback process would have."""
+    times = []
+    for job_ids in batches:
+        start = time.perf_counter()
+        db = MaterialDatabase(str(db_path), str(db_path.with_name("structures.db")),
+                              persistent_connections=persistent)
+        callback(db, job_ids)
+        db.close()
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def open_fds() -> int:
+    return len(os.listdir("/proc/self/fd")) if os.path.isdir("/proc/self/fd") else -1
+
+
+def main():
+    """Main function."""
+    parser = argparse.ArgumentParser(description="Benchmark persistent vs per-call SQLite connections")
+    parser.add_argument("--calculations", type=int, default=50000, help="Calculations in the database")
+    parser.add_argument("--callbacks", type=int, default=20, help="Callbacks to time per mode")
+    parser.add_argument("--jobs", type=int, default=50, help="Finished jobs handled per callback")
+    parser.add_argument("--pools", type=int, default=50, help="Short-lived thread pools for the leak check")
+    args = parser.parse_args()
+
+    problems = []
+    rng = random.Random(1)
+    with tempfile.TemporaryDirectory(prefix="mace_conn_bench_") as tmp:
+        db_path = Path(tmp) / "materials.db"
+        build_database(db_path, args.calculations)
+        job_ids = [str(1000000 + i) for i in range(args.calculations)]
+        rng.shuffle(job_ids)
+        n = args.jobs
+        batches_old = [job_ids[i * n:(i + 1) * n] for i in range(args.callbacks)]
+        batches_new = [job_ids[(args.callbacks + i) * n:(args.callbacks + i + 1) * n] for i in range(args.callbacks)]
+
+        old = time_callbacks(db_path, False, batches_old)
+        new = time_callbacks(db_path, True, batches_new)
+
+        db = MaterialDatabase(str(db_path), str(db_path.with_name("structures.db")))
+        completed = len(db.get_calculations_by_status("completed"))
+        if completed != 2 * args.callbacks * n:
+            problems.append(f"{completed} completed calculations, expected {2 * args.callbacks * n}")
+
+        # Connections of finished threads must be closed. SQLite keeps a few
+        # descriptors of closed connections while another connection of the
+        # process holds the file, so compare the count after one pool and
+        # after all of them.
+        sample = job_ids[:64]
+        fds = []
+        for _ in range(args.pools):
+            with ThreadPoolExecutor(max_workers=4) as pool:
+                list(pool.map(lambda job_id: db.get_calculation_by_slurm_id(job_id), sample))
+            gc.collect()
+            fds.append(open_fds())
+        if fds[-1] > fds[0]:
+            problems.append(f"{fds[-1] - fds[0]} file descriptors left open by {args.pools - 1} more thread pools")
+        live = len(db._thread_holders)
+        if live > 1:
+            problems.append(f"connections of {live - 1} finished threads are still open")
+        db.close()
+
+        print(f"{args.calculations} calculations, {args.callbacks} callbacks of {n} finished jobs each\n")
+        print(f"{'':<28} {'median':>10} {'mean':>10} {'ops/s':>10}")
+        ops = 4 * n
+        for label, times in (("per-call connections", old), ("persistent connections", new)):
+            print(f"{label:<28} {statistics.median(times) * 1000:>8.1f}ms {statistics.mean(times) * 1000:>8.1f}ms "
+                  f"{ops / statistics.mean(times):>10.0f}")
+        print(f"\nSpeedup (median): {statistics.median(old) / statistics.median(new):.1f}x")
+        print(f"Open file descriptors after 1/{args.pools} thread pools: {fds[0]}/{fds[-1]}")
+        print(f"\nDifferences: {len(problems)}")
+        for problem in problems[:10]:
+            print(f"  {problem}")
+        sys.exit(1 if problems else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Benchmark for PropertyCorrelation engines
+-----------------------------------------
+Builds a synthetic materials database (correlated and independent numeric
+properties, missing values, ties, constant columns and large-offset energies)
+and runs PropertyCorrelation.calculate_correlations with the NumPy matrix
+engine and with the pure-Python pair loop. Reports both timings and checks
+that every pair agrees (sample counts, materials and ranges exactly,
+statistics within a relative tolerance); exits with status 1 otherwise.
+
+Usage:
+  python benchmark_correlation.py [--materials 1000] [--properties 40] [--missing 0.2]
+"""
+
+import sys
+import math
+import time
+import random
+import tempfile
+import argparse
+from datetime import datetime
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+# Import MACE components
+try:
+    from mace.database.materials import MaterialDatabase
+    from mace.database.analysis.correlation import PropertyCorrelation, HAS_NUMPY
+except ImportError as e:
+    print(f"Error importing MACE database modules: {e}")
+    sys.exit(1)
+
+
+STATISTICS = ('correlation', 'spearman', 'r_squared', 'slope', 'intercept')
+
+
+def build_database(db_path: Path, n_materials: int, n_properties: int,
+                   missing: float, seed: int = 7) -> MaterialDatabase:
+    """Create a synthetic database of n_materials x n_properties numeric values."""
+    rng = random.Random(seed)
+    db = MaterialDatabase(str(db_path))
+    now = datetime.now().isoformat()
+    materials, properties = [], []
+
+    for m in range(n_materials):
+        material_id = f"mat_{m:06d}"
+        materials.append((material_id, 'C', 227, now, now))
+        base = rng.gauss(0, 1)
+        for p in range(n_properties):
+            if rng.random() < missing:
+                continue
+            kind = p % 5
+            if kind == 0:
+                value = 2.0 * base + rng.gauss(0, 0.3)        # correlated with base
+            elif kind == 1:
+                value = -7500.0 + 1e-3 * base + rng.gauss(0, 1e-4)  # total-energy like
+            elif kind == 2:
+                value = float(rng.randint(0, 4))               # many ties
+            elif kind == 3:
+                value = 1.5 if p % 10 == 3 else rng.gauss(0, 1)  # some constant columns
+            else:
+                value = rng.expovariate(1.0)
+            properties.append((material_id, f"{material_id}_c0", 'electronic',
+                               f"prop_{p:03d}", value, None, now))
+
+    with db._get_connection() as conn:
+        conn.executemany("""
+            INSERT INTO materials (material_id, formula, space_group, created_at, updated_at)
+            VALUES (?, ?, ?, ?, ?)
+        """, materials)
+        conn.executemany("""
+            INSERT INTO properties (material_id, calc_id, property_category, property_name,
+                                    property_value, property_value_text, extracted_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        """, properties)
+    return db
+
+
+def compare(fast: dict, slow: dict, tolerance: float = 1e-6) -> list:
+    """Differences between the results of the two engines."""
+    problems = []
+    slow_pairs = {(c['property_1'], c['property_2']): c for c in slow['correlations']}
+    fast_pairs = {(c['property_1'], c['property_2']): c for c in fast['correlations']}
+    if set(slow_pairs) != set(fast_pairs):
+        problems.append(f"pair sets differ: {len(fast_pairs)} vs {len(slow_pairs)}")
+    for pair in set(slow_pairs) & set(fast_pairs):
+        a, b = fast_pairs[pair], slow_pairs[pair]
+        for key in ('sample_count', 'materials', 'x_range', 'y_range'):
+            if a[key] != b[key]:
+                problems.append(f"{pair} {key}: {a[key]} != {b[key]}")
+        for key in STATISTICS:
+            if not math.isclose(a[key], b[key], rel_tol=tolerance, abs_tol=tolerance):
+                problems.append(f"{pair} {key}: {a[key]!r} != {b[key]!r}")
+    if fast['summary']['total_materials'] != slow['summary']['total_materials']:
+        problems.append("total_materials differs")
+    return problems
+
+
+def main():
+    """Main function."""
+    parser = argparse.ArgumentParser(description="Benchmark NumPy vs pure-Python property correlations")
+    parser.add_argument("--materials", type=int, default=1000, help="Number of synthetic materials")
+    parser.add_argument("--properties", type=int, default=40, help="Number of numeric properties")
+    parser.add_argument("--missing", type=float, default=0.2, help="Fraction of missing values")
+    parser.add_argument("--skip-python", action="store_true",
+                        help="Only time the NumPy engine (for sizes the Python loop cannot finish)")
+    args = parser.parse_args()
+
+    if not HAS_NUMPY:
+        print("NumPy is not installed; only the pure-Python engine is available")
+        sys.exit(1)
+
+    with tempfile.TemporaryDirectory(prefix="mace_corr_bench_") as tmp:
+        print(f"Building {args.materials} materials x {args.properties} properties "
+              f"({args.missing:.0%} missing)")
+        db = build_database(Path(tmp) / "materials.db", args.materials, args.properties, args.missing)
+        analyzer = PropertyCorrelation(db)
+
+        start = time.perf_counter()
+        fast = analyzer.calculate_correlations(min_samples=3, vectorized=True)
+        fast_time = time.perf_counter() - start
+        print(f"  numpy engine:  {fast_time:8.3f}s  ({len(fast['correlations'])} pairs)")
+
+        if args.skip_python:
+            return
+
+        start = time.perf_counter()
+        slow = analyzer.calculate_correlations(min_samples=3, vectorized=False)
+        slow_time = time.perf_counter() - start
+        print(f"  python engine: {slow_time:8.3f}s  ({slow_time / fast_time:.1f}x slower)")
+
+        problems = compare(fast, slow)
+        print(f"  differences: {len(problems)}")
+        for problem in problems[:10]:
+            print(f"    {problem}")
+        sys.exit(1 if problems else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the resident queue manager daemon
+-----------------------------------------------
+Simulates a burst of job ends against a database of calculations. Callbacks
+are served two ways:
+
+- one queue manager per job end (what each job's end-of-script call does):
+  interpreter start and import, manager initialisation, the callback
+  throttle delay and the locked callback
+- a QueueDaemon in a thread: every job end only writes a notification and
+  the daemon runs the callback once per batch
+
+The callback itself is replaced by its database reads (the calculation
+lists check_queue_status and the workflow progression read), so only the
+callback machinery is timed. The script also checks that every
+notification is consumed, that a second daemon refuses to start next to a
+live one and that the daemon keeps serving after a corrupt notification,
+and exits with status 1 on any difference. The read cache, liveness and
+spool handling are covered by tests/test_queue_daemon.py.
+
+Usage:
+  python benchmark_daemon.py [--jobs 200] [--calculations 20000]
+"""
+
+import os
+import sys
+import time
+import tempfile
+import argparse
+import threading
+import subprocess
+from datetime import datetime
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT))
+
+# Import MACE components
+try:
+    from mace.database.materials import MaterialDatabase
+    from mace.queue.manager import EnhancedCrystalQueueManager
+    from mace.queue.daemon import QueueDaemon, notify, drain_spool, is_daemon_running, SPOOL_DIR
+except ImportError as e:
+    print(f"Error importing MACE modules: {e}")
+    sys.exit(1)
+
+
+class ReadOnlyCallbackManager(EnhancedCrystalQueueManager):
+    """Queue manager whose callbacks only do their database reads."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.callbacks = []
+
+    def _run_callback_check_locked(self, mode='completion'):
+        for status in ('submitted', 'running', 'completed'):
+            self.db.get_calculations_by_status(status)
+        self.callbacks.append(mode)
+
+
+def build_database(db_path: Path, n_calcs: int):
+    """n_calcs calculations spread over the queue states."""
+    db_path.parent.mkdir(parents=True, exist_ok=True)
+    db = MaterialDatabase(str(db_path))
+    now = datetime.now().isoformat()
+    statuses = ('completed', 'completed', 'running', 'submitted')
+    with db._get_connection() as conn:
+        conn.executemany("INSERT INTO materials (material_id, formula, created_at, updated_at) VALUES (?, 'C', ?, ?)",
+                         [(f"mat_{i}", now, now) for i in range(n_calcs // 4)])
+        conn.executemany("""
+            INSERT INTO calculations (calc_id, material_id, calc_type, status, slurm_job_id, created_at)
+            VALUES (?, ?, 'OPT', ?, ?, ?)
+        """, [(f"calc_{i}", f"mat_{i // 4}", statuses[i % 4], str(100000 + i), now) for i in range(n_calcs)])
+    db.close()
+
+
+def make_manager(work: Path, db_path: Path) -> ReadOnlyCallbackManager:
+    return ReadOnlyCallbackManager(str(work), db_path=str(db_path), enable_error_recovery=False)
+
+
+def import_time() -> float:
+    """Wall time of a fresh interpreter importing the queue manager."""
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "-c", "import pyarrow\nimport mace.queue.manager"],
+                   check=False, capture_output=True,
+                   env=dict(os.environ, PYTHONPATH=str(REPO_ROOT)))
+    return time.perf_counter() - start
+
+
+def main():
+    """Main function."""
+    parser = argparse.ArgumentParser(description="Benchmark per-job queue manager vs resident daemon")
+    parser.add_argument("--jobs", type=int, default=200, help="Job ends in the burst")
+    parser.add_argument("--calculations", type=int, default=20000, help="Calculations in the database")
+    args = parser.parse_args()
+
+    problems = []
+    with tempfile.TemporaryDirectory(prefix="mace_daemon_bench_") as tmp:
+        tmp = Path(tmp)
+        db_path = tmp / "db" / "materials.db"
+        work = tmp / "work"
+        work.mkdir()
+        directory = tmp / "daemon"
+        build_database(db_path, args.calculations)
+        print(f"{args.jobs} job ends, {args.calculations} calculations")
+
+        # One manager per job end (throttle delays are not slept, only added up)
+        startup = import_time()
+        throttle = 0.0
+        start = time.perf_counter()
+        legacy_callbacks = 0
+        for _ in range(args.jobs):
+            manager = make_manager(work, db_path)
+            if manager.throttler:
+                throttle += (manager.throttler.min_delay + manager.throttler.max_delay) / 2
+                manager.throttler = None
+            manager.run_callback_check('completion')
+            legacy_callbacks += len(manager.callbacks)
+            manager.db.close()
+        legacy_time = time.perf_counter() - start
+
+        # Resident daemon: notifications from concurrent job ends
+        started = threading.Event()
+        holder = {}
+
+        # The manager is created here (its lock manager installs signal handlers),
+        # the daemon and its read cache in the serving thread
+        manager = make_manager(work, db_path)
+
+        def serve():
+            daemon = QueueDaemon(manager, directory, tick=0.5, coalesce_delay=0.2, idle_check_interval=0)
+            holder['daemon'] = daemon
+            started.set()
+            holder['started'] = daemon.run()
+
+        thread = threading.Thread(target=serve)
+        thread.start()
+        started.wait()
+        while not is_daemon_running(directory):
+            time.sleep(0.01)
+        daemon = holder['daemon']
+
+        # A second daemon refuses to start
+        if QueueDaemon(make_manager(work, db_path), directory).run(max_batches=0):
+            problems.append("a second daemon started next to a live one")
+
+        start = time.perf_counter()
+        senders = [threading.Thread(target=notify, args=(directory, 'completion'), kwargs={'job_id': str(i)})
+                   for i in range(args.jobs)]
+        for sender in senders:
+            sender.start()
+        for sender in senders:
+            sender.join()
+        notify_time = (time.perf_counter() - start) / args.jobs
+        while daemon.notifications < args.jobs and time.perf_counter() - start < 30:
+            time.sleep(0.05)
+        daemon_time = time.perf_counter() - start
+
+        # Corrupt and unknown notifications are dropped, the daemon keeps going
+        (directory / SPOOL_DIR / "0_corrupt.json").write_text("{not json")
+        notify(directory, 'no_such_mode')
+        notify(directory, 'status_check')
+        deadline = time.time() + 10
+        while 'status_check' not in manager.callbacks and time.time() < deadline:
+            time.sleep(0.05)
+        if 'status_check' not in manager.callbacks:
+            problems.append("daemon stopped serving after a corrupt notification")
+
+        daemon.stop()
+        thread.join(10)
+        if not holder.get('started') or thread.is_alive():
+            problems.append("daemon did not start or stop cleanly")
+        if is_daemon_running(directory) or drain_spool(directory):
+            problems.append("daemon left a pid file or notifications behind")
+        if daemon.notifications != args.jobs + 2:
+            problems.append(f"daemon consumed {daemon.notifications} notifications, expected {args.jobs + 2}")
+        completion_batches = manager.callbacks.count('completion')
+        cache = manager.db
+        manager.db.close()
+
+        if legacy_callbacks != args.jobs:
+            problems.append(f"per-job managers ran {legacy_callbacks} callbacks")
+
+        print(f"\n{'':<36} {'per job':>12} {'daemon':>12}")
+        print(f"{'callbacks run':<36} {legacy_callbacks:>12} {completion_batches:>12}")
+        print(f"{'interpreter + import per job end':<36} {startup:>11.3f}s {'':>12}")
+        print(f"{'throttle delay (total)':<36} {throttle:>11.1f}s {'':>12}")
+        print(f"{'init + callbacks (total)':<36} {legacy_time:>11.3f}s {daemon_time:>11.3f}s"
+              f"  (daemon: until the burst is served)")
+        print(f"{'job-end cost':<36} {startup + legacy_time / args.jobs:>11.3f}s {notify_time:>11.5f}s"
+              f"  (notification only)")
+        print(f"{'daemon cache hits / misses':<36} {'':>12} {f'{cache.hits} / {cache.misses}':>12}")
+        print(f"\nDifferences: {len(problems)}")
+        for problem in problems[:10]:
+            print(f"  {problem}")
+        sys.exit(1 if problems else 0)
+
+
+if __name__ == "__main__":
+    main()
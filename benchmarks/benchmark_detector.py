@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Benchmark for CrystalErrorDetector scan modes
+---------------------------------------------
+Generates a corpus of synthetic CRYSTAL outputs (completed OPT and SP runs,
+SCF and time limit failures, runs still in progress, geometry warnings in the
+header) and compares the 'full' and 'tail' scan modes of
+CrystalErrorDetector.analyze_output_file on it: wall time, bytes on disk and
+agreement of status and error type for every file.
+
+Usage:
+  python benchmark_detector.py [--files 200] [--size-mb 5] [--keep DIR]
+"""
+
+import os
+import sys
+import time
+import shutil
+import tempfile
+import argparse
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+# Import MACE components
+try:
+    from mace.recovery.detector import CrystalErrorDetector
+except ImportError as e:
+    print(f"Error importing CrystalErrorDetector: {e}")
+    sys.exit(1)
+
+
+HEADER = """ *******************************************************************************
+ *                                                                             *
+ *                               CRYSTAL23                                     *
+ *                                                                             *
+ *******************************************************************************
+ CRYSTAL CALCULATION
+ SPACE GROUP (CENTROSYMMETRIC) : F D 3 M
+ NUMBER OF ATOMS IN THE ASYMMETRIC UNIT    2
+ PRIMITIVE CELL - CENTRING CODE 5/0 VOLUME=    11.364896 - DENSITY  3.512 g/cm^3
+"""
+
+SCF_BLOCK = """ CYC {cycle:3d} ETOT(AU) -7.571996436178E+01 DETOT -3.95E-0{digit} tst  1.22E-05 PX  1.00E+00
+ CHARGE NORMALIZATION FACTOR  1.00000000
+ TOTAL ATOMIC CHARGES:
+  6.0000000  6.0000000
+ SCF CYCLE {cycle:3d} TIMING     12.345 MEMORY USED 512 MB
+"""
+
+ENDINGS = {
+    'opt_complete': """ OPT END - CONVERGED * E(AU):  -7.5719964361780E+01  POINTS    6 *
+ FINAL OPTIMIZED GEOMETRY - DIMENSIONALITY OF THE SYSTEM      3
+ TOTAL CPU TIME =     1234.567
+ EEEEEEEEEE TERMINATION  DATE 16 10 2026 TIME 12:00:00.0
+""",
+    'sp_complete': """ == SCF ENDED - CONVERGENCE ON ENERGY      E(AU) -7.5719964361780E+01 CYCLES  12
+    TOTAL CPU TIME =      456.789
+ EEEEEEEEEE TERMINATION  DATE 16 10 2026 TIME 12:00:00.0
+""",
+    'scf_failure': """ ==  SCF ENDED - TOO MANY CYCLES      E(AU) -7.5719964361780E+01 CYCLES 800
+    TOTAL CPU TIME =     9876.543
+""",
+    'time_limit': """slurmstepd: error: *** JOB 123456 ON node01 CANCELLED AT 2026-10-16T12:00:00 DUE TO TIME LIMIT ***
+""",
+    'ongoing': "",
+}
+
+
+def generate_corpus(directory: Path, n_files: int, size_mb: float):
+    """Write n_files synthetic outputs of about size_mb each, cycling through the endings."""
+    kinds = list(ENDINGS)
+    target = int(size_mb * 1024 * 1024)
+    body_unit = ''.join(SCF_BLOCK.format(cycle=i % 1000, digit=i % 10) for i in range(50))
+    body = body_unit * max(1, target // len(body_unit))
+
+    for i in range(n_files):
+        kind = kinds[i % len(kinds)]
+        header = HEADER
+        if i % 7 == 0:
+            # Geometry warning near the top of the file, found by both modes
+            header += " **** NEIGHB ****  ATOMS TOO CLOSE\n"
+        with open(directory / f"bench_{i:05d}_{kind}.out", 'w') as f:
+            f.write(header)
+            f.write(body)
+            f.write(ENDINGS[kind])
+
+
+def run_mode(detector: CrystalErrorDetector, files, mode: str):
+    start = time.perf_counter()
+    results = {f.name: detector.analyze_output_file(f, scan_mode=mode) for f in files}
+    return results, time.perf_counter() - start
+
+
+def main():
+    """Main function."""
+    parser = argparse.ArgumentParser(description="Benchmark full vs tail output scanning")
+    parser.add_argument("--files", type=int, default=200, help="Number of synthetic output files")
+    parser.add_argument("--size-mb", type=float, default=5.0, help="Approximate size of each file in MB")
+    parser.add_argument("--keep", help="Write the corpus to this directory and keep it")
+    args = parser.parse_args()
+
+    corpus_dir = Path(args.keep) if args.keep else Path(tempfile.mkdtemp(prefix="mace_detector_bench_"))
+    corpus_dir.mkdir(parents=True, exist_ok=True)
+
+    try:
+        print(f"Generating {args.files} synthetic outputs of ~{args.size_mb} MB in {corpus_dir}")
+        generate_corpus(corpus_dir, args.files, args.size_mb)
+        files = sorted(corpus_dir.glob("*.out"))
+        total_mb = sum(f.stat().st_size for f in files) / (1024 * 1024)
+
+        detector = CrystalErrorDetector(str(corpus_dir), enable_tracking=False)
+
+        full_results, full_time = run_mode(detector, files, 'full')
+        tail_results, tail_time = run_mode(detector, files, 'tail')
+
+        mismatches = [
+            name for name in full_results
+            if (full_results[name]['status'], full_results[name]['error_type']) !=
+               (tail_results[name]['status'], tail_results[name]['error_type'])
+        ]
+        fallbacks = sum(1 for r in tail_results.values() if r['scan_mode'] == 'full')
+
+        print(f"\nCorpus: {len(files)} files, {total_mb:.1f} MB")
+        print(f"  full scan: {full_time:8.3f}s ({total_mb / full_time:8.1f} MB/s)")
+        print(f"  tail scan: {tail_time:8.3f}s ({full_time / tail_time:8.1f}x faster)")
+        print(f"  tail scans that fell back to a full read: {fallbacks}")
+        print(f"  status/error_type mismatches: {len(mismatches)}")
+        for name in mismatches[:10]:
+            print(f"    {name}: full={full_results[name]['status']}/{full_results[name]['error_type']} "
+                  f"tail={tail_results[name]['status']}/{tail_results[name]['error_type']}")
+    finally:
+        if not args.keep:
+            shutil.rmtree(corpus_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+Benchmark for streaming exports
+-------------------------------
+Builds a synthetic materials database and exports it twice per case: with
+the streaming pipeline (export_materials) and from fully materialised record
+lists, the way exports were built before streaming. Reports rows per second
+and peak Python memory (tracemalloc) for both, and checks that the CSV files
+are identical and the JSON / JSON lines records are equal; exits with status
+1 otherwise. Parquet output is timed and read back when pyarrow is installed.
+
+Usage:
+  python benchmark_export.py [--materials 50000] [--chunk-size 5000]
+"""
+
+import sys
+import json
+import time
+import random
+import tempfile
+import argparse
+import tracemalloc
+from datetime import datetime, timedelta
+from pathlib import Path
+
+# pyarrow first: MACE puts its own directory (with a queue package) on sys.path
+try:
+    import pyarrow.parquet  # noqa: F401
+    HAS_PYARROW = True
+except ImportError:
+    HAS_PYARROW = False
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+# Import MACE components
+try:
+    from mace.database.materials import MaterialDatabase
+    from mace.database.export.formats import ExportFormatter, export_materials
+except ImportError as e:
+    print(f"Error importing MACE database modules: {e}")
+    sys.exit(1)
+
+
+# (label, format, filters, properties_only, include_properties)
+CASES = [
+    ('all materials', 'csv', None, False, None),
+    ('all materials', 'json', None, False, None),
+    ('all materials', 'jsonl', None, False, None),
+    ('properties', 'csv', None, True, None),
+    ('with properties', 'csv', None, False, ['band_gap', 'total_energy', 'conductivity_type']),
+    ('filtered', 'json', ['band_gap > 1.5'], False, ['band_gap']),
+    ('advanced filter', 'csv', ["band_gap > 2 AND formula LIKE 'Zn%'"], False, None),
+    ('all materials', 'parquet', None, False, None),
+    ('with properties', 'parquet', None, False, ['band_gap', 'total_energy', 'conductivity_type']),
+]
+
+FORMULAS = ['ZnO', 'TiO2', 'SiC', 'Si', 'C', 'GaN', 'MgO', 'ZnS', 'CaTiO3', 'Al2O3', 'BN']
+
+
+def build_database(db_path: Path, n_materials: int, seed: int = 5) -> MaterialDatabase:
+    """Create a synthetic database with n_materials materials."""
+    rng = random.Random(seed)
+    db = MaterialDatabase(str(db_path))
+    start = datetime(2025, 1, 1)
+    materials, properties = [], []
+
+    for i in range(n_materials):
+        material_id = f"mat_{i:06d}"
+        created = (start + timedelta(seconds=i)).isoformat()
+        metadata = json.dumps({'source': 'synthetic', 'index': i}) if i % 3 == 0 else None
+        materials.append((material_id, rng.choice(FORMULAS), rng.choice([None, 62, 186, 225, 227]),
+                          'cif', f"/data/{material_id}.cif", metadata, created, created))
+
+        def add(name, value=None, text=None, category='electronic'):
+            properties.append((material_id, f"{material_id}_c0", category, name, value, text, created))
+
+        if rng.random() < 0.9:
+            add('band_gap', rng.uniform(0, 6))
+        if rng.random() < 0.8:
+            add('total_energy', rng.uniform(-5000, 10), category='thermodynamic')
+        if rng.random() < 0.6:
+            add('conductivity_type', None, rng.choice(['metal', 'semiconductor', 'insulator']))
+        for k in range(rng.randint(0, 6)):
+            add(f"lattice_param_{k}", rng.uniform(2, 12), category='structural')
+
+    with db._get_connection() as conn:
+        conn.executemany("""
+            INSERT INTO materials (material_id, formula, space_group, source_type, source_file,
+                                   metadata_json, created_at, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        """, materials)
+        conn.executemany("""
+            INSERT INTO properties (material_id, calc_id, property_category, property_name,
+                                    property_value, property_value_text, extracted_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        """, properties)
+    return db
+
+
+def materialised_export(db, output_file, format, filters, properties_only, include_properties):
+    """Export from in-memory record lists (the pre-streaming pipeline)."""
+    if properties_only:
+        data = db.get_all_properties()
+    elif not filters:
+        data = db.get_all_materials()
+    elif len(filters) == 1 and ' AND ' in filters[0]:
+        data = db.filter_materials_advanced(filters[0])
+    else:
+        data = db.filter_materials_by_properties(filters)
+
+    if include_properties and not properties_only:
+        for material in data:
+            for prop in db.get_material_properties(material['material_id']):
+                if prop['property_name'] in include_properties:
+                    material[prop['property_name']] = prop['property_value']
+
+    formatter = ExportFormatter()
+    formatter.export(data, output_file, format=format, properties_filter=include_properties)
+    return formatter.last_stats
+
+
+def read_records(path: Path, format: str):
+    """Records of an export, for comparison."""
+    if format == 'csv':
+        return path.read_bytes()
+    if format == 'json':
+        content = json.loads(path.read_text())
+        content['metadata'].pop('export_date')
+        return content
+    if format == 'jsonl':
+        return [json.loads(line) for line in path.read_text().splitlines()]
+    import pyarrow.parquet as pq
+    return pq.read_table(path).to_pylist()
+
+
+def measure(func):
+    """Run func, returning (result, seconds, peak traced memory in MB)."""
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = func()
+    seconds = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1] / 1e6
+    tracemalloc.stop()
+    return result, seconds, peak
+
+
+def main():
+    """Main function."""
+    parser = argparse.ArgumentParser(description="Benchmark streaming vs materialised exports")
+    parser.add_argument("--materials", type=int, default=50000, help="Number of synthetic materials")
+    parser.add_argument("--chunk-size", type=int, default=5000, help="Streaming chunk size")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="mace_export_bench_") as tmp:
+        tmp = Path(tmp)
+        print(f"Building synthetic database with {args.materials} materials")
+        db = build_database(tmp / "materials.db", args.materials)
+
+        mismatches = 0
+        print(f"\n{'case':<18} {'format':<8} {'rows':>7} {'stream rows/s':>14} {'peak MB':>8} "
+              f"{'list rows/s':>12} {'peak MB':>8}")
+        for n, (label, format, filters, properties_only, include) in enumerate(CASES):
+            if format == 'parquet' and not HAS_PYARROW:
+                print(f"{label:<18} {format:<8} skipped (pyarrow not installed)")
+                continue
+            stream_file = tmp / f"stream_{n}.{format}"
+            list_file = tmp / f"list_{n}.{format}"
+
+            _, stream_time, stream_peak = measure(lambda: export_materials(
+                db, format=format, output_file=str(stream_file), filters=filters,
+                properties_only=properties_only, include_properties=include,
+                chunk_size=args.chunk_size))
+            stats, list_time, list_peak = measure(lambda: materialised_export(
+                db, str(list_file), format, filters, properties_only, include))
+
+            rows = stats.rows
+            print(f"{label:<18} {format:<8} {rows:>7} {rows / stream_time:>14,.0f} {stream_peak:>8.1f} "
+                  f"{rows / list_time:>12,.0f} {list_peak:>8.1f}")
+
+            streamed, listed = read_records(stream_file, format), read_records(list_file, format)
+            if format == 'json':
+                # Metadata differs by design (export type); compare data and count
+                streamed = (streamed['data'], streamed['metadata']['record_count'])
+                listed = (listed['data'], listed['metadata']['record_count'])
+            if streamed != listed:
+                mismatches += 1
+                print("  MISMATCH between streaming and materialised output")
+
+        print(f"\nMismatches: {mismatches}")
+        sys.exit(1 if mismatches else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the vectorised fort.25 reader
+-------------------------------------------
+Writes a synthetic fort.25 file with several MAPN blocks (E12.5 fields,
+including negative values that run into each other) and reads it with
+the line-by-line reader formerly used by format_and_plot_f25_new.py
+and with f25_reader.read_f25, uncached and from the .npy cache. Reports the
+read times and checks that every block decodes to exactly the same values;
+exits with status 1 otherwise. Any .f25 files given on the command line
+(e.g. the phonon band file in code/NewPlotting_Scripts/AutoPhononBands) are checked as well.
+
+Usage:
+  python benchmark_f25.py [--nx 600] [--ny 600] [--maps 3] [file.f25 ...]
+"""
+
+import os
+import re
+import sys
+import math
+import time
+import random
+import tempfile
+import argparse
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "code" / "NewPlotting_Scripts" / "AutoChargeDens"))
+
+from f25_reader import read_f25
+
+
+def write_f25(path, nx, ny, n_maps, rng):
+    """Write n_maps MAPN blocks of nx*ny values."""
+    with open(path, 'w') as f:
+        for m in range(n_maps):
+            f.write(f"-%-0MAPN{nx:5d}{ny:5d}{0.05 * (m + 1):12.5E}{0.05:12.5E}{0.0:12.5E}\n")
+            f.write(f"{0.0:12.5E}{0.0:12.5E}{0.0:12.5E}{1.0:12.5E}{1.0:12.5E}{0.0:12.5E}\n")
+            f.write(f"{0.0:12.5E}{1.0:12.5E}{0.0:12.5E}{m + 1:4d}{1:4d}{0:4d}\n")
+            n = nx * ny
+            values = [rng.choice((-1, 1)) * rng.uniform(1e-12, 1e3) for _ in range(n)]
+            for start in range(0, n, 6):
+                f.write(''.join(f"{v:12.5E}" for v in values[start:start + 6]) + '\n')
+
+
+def parse_concatenated_floats(s):
+    pattern = r'[+-]?\d+\.?\d*[Ee][+-]?\d+'
+    return re.findall(pattern, s)
+
+
+def line_reader(fort25):
+    """Line-by-line reader from format_and_plot_f25_new.py, extended to every block."""
+    blocks = []
+    with open(fort25) as f:
+        lines = f.readlines()
+    i = 0
+    while i < len(lines):
+        if not lines[i].startswith('-%-'):
+            i += 1
+            continue
+        header = lines[i]
+        # Fixed columns: nx and ny may run into the tag (e.g. -%-1BAND  361000)
+        nx, ny = int(header[8:13]), int(header[13:18])
+        nlines = math.ceil(nx * ny / 6)
+        data = []
+        for line in lines[i + 3:i + 3 + nlines]:
+            for part in line.split():
+                try:
+                    float(part)
+                    data.append(part)
+                except ValueError:
+                    data.extend(parse_concatenated_floats(part) or [part])
+        blocks.append([float(x) for x in data])
+        i += 3 + nlines
+    return blocks
+
+
+def compare(path, label):
+    """Time both readers on path; returns the number of differing blocks."""
+    start = time.perf_counter()
+    reference = line_reader(path)
+    line_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    maps = read_f25(path, cache=False)
+    vector_time = time.perf_counter() - start
+
+    with tempfile.TemporaryDirectory(prefix="f25_cache_") as cache_dir:
+        read_f25(path, cache_dir=cache_dir)
+        start = time.perf_counter()
+        cached = read_f25(path, cache_dir=cache_dir)
+        cache_time = time.perf_counter() - start
+        cached_values = [np.array(fmap.values) for fmap in cached]
+
+    problems = 0
+    if len(maps) != len(reference) or len(cached_values) != len(reference):
+        print(f"  {label}: {len(reference)} blocks line by line, {len(maps)} vectorised, "
+              f"{len(cached_values)} cached")
+        problems += 1
+    for n, (ref, fmap, values) in enumerate(zip(reference, maps, cached_values)):
+        if not (np.array_equal(ref, fmap.values) and np.array_equal(ref, values)):
+            print(f"  {label}: block {n} ({fmap.tag}) differs")
+            problems += 1
+
+    n_values = sum(len(block) for block in reference)
+    size = os.path.getsize(path) / 1e6
+    print(f"{label:<28} {len(maps):>5} {n_values:>10,} {size:>7.1f}MB "
+          f"{line_time:>9.3f}s {vector_time:>9.3f}s {cache_time:>9.4f}s {line_time / vector_time:>7.1f}x")
+    return problems
+
+
+def main():
+    """Main function."""
+    parser = argparse.ArgumentParser(description="Benchmark line-by-line vs vectorised fort.25 reading")
+    parser.add_argument("--nx", type=int, default=600, help="Map points along x")
+    parser.add_argument("--ny", type=int, default=600, help="Map points along y")
+    parser.add_argument("--maps", type=int, default=3, help="Blocks in the synthetic file")
+    parser.add_argument("files", nargs='*', help="Additional .f25 files to check")
+    args = parser.parse_args()
+
+    print(f"{'file':<28} {'maps':>5} {'values':>10} {'size':>9} {'line':>10} {'vector':>10} "
+          f"{'cached':>10} {'speedup':>8}")
+    problems = 0
+    with tempfile.TemporaryDirectory(prefix="f25_bench_") as tmp:
+        path = os.path.join(tmp, "synthetic.f25")
+        write_f25(path, args.nx, args.ny, args.maps, random.Random(11))
+        problems += compare(path, f"synthetic {args.nx}x{args.ny}")
+        # Last line only partly filled
+        odd = os.path.join(tmp, "odd.f25")
+        write_f25(odd, 37, 41, 2, random.Random(12))
+        problems += compare(odd, "synthetic 37x41")
+    for path in args.files:
+        problems += compare(path, os.path.basename(path)[:28])
+
+    print(f"\nDifferences: {problems}")
+    sys.exit(1 if problems else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+"""
+Benchmark and cross-check for SQL filter pushdown
+-------------------------------------------------
+Builds a synthetic materials database (numeric and text properties, numeric
+strings, duplicated properties from several calculations, NULLs, missing
+properties) and runs a corpus of filter expressions through both the SQL
+pushdown path and the Python evaluator of MaterialDatabase. Every expression
+must select the same materials; the script exits with status 1 otherwise.
+
+Usage:
+  python benchmark_filters.py [--materials 2000] [--keep DB_PATH]
+"""
+
+import sys
+import time
+import random
+import tempfile
+import argparse
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+# Import MACE components
+try:
+    from mace.database.materials import MaterialDatabase
+    from mace.database.query.advanced_filters import parse_advanced_filter
+    from mace.database.query.sql_filters import compile_advanced_filter
+except ImportError as e:
+    print(f"Error importing MACE database modules: {e}")
+    sys.exit(1)
+
+
+ADVANCED_CORPUS = [
+    "band_gap > 3",
+    "band_gap >= 3.0 AND band_gap < 5",
+    "band_gap = 2.5",
+    "band_gap != 2.5",
+    "band_gap <> 2.5",
+    "band_gap == 2",
+    "total_energy < -1000 OR band_gap > 4",
+    "(band_gap > 3 AND space_group = 227) OR total_energy < -1000",
+    "space_group IN (225, 227, 229)",
+    "space_group NOT IN (225, 227)",
+    "space_group > 200",
+    "space_group = '227'",
+    "formula LIKE 'Zn%'",
+    "formula LIKE '%o'",
+    "formula NOT LIKE 'C%'",
+    "formula LIKE 'Z_O'",
+    "formula LIKE 'Ti.%'",
+    "formula = 'ZnO'",
+    "formula != 'ZnO'",
+    "formula > 'M'",
+    "formula IN ('ZnO', 'TiO2', 'SiC')",
+    "formula > 100",
+    "formula = 123",
+    "transport_seebeck IS NOT NULL",
+    "transport_seebeck IS NULL",
+    "magnetic_state = 'ferromagnetic'",
+    "magnetic_state != 'ferromagnetic'",
+    "magnetic_state IN ('ferromagnetic', 'antiferromagnetic')",
+    "magnetic_state NOT IN ('ferromagnetic')",
+    "magnetic_state LIKE 'ferro%'",
+    "magnetic_state < 'm'",
+    "magnetic_state > 1",
+    "fermi_energy > 0",
+    "fermi_energy LIKE '1%'",
+    "fermi_energy = 'n/a'",
+    "band_gap LIKE '2.%'",
+    "band_gap IN (2.5, 3, 'n/a')",
+    "band_gap IS 2.5",
+    "band_gap IS NOT 2.5",
+    "dimensionality = 'SLAB' AND band_gap > 1",
+    "status = 'active' AND (formula LIKE 'Si%' OR formula LIKE 'Ti%')",
+    "notes IS NULL",
+    "source_type = 'cif' OR source_type = 'd12'",
+    "metal_flag = True",
+    "metal_flag = 0",
+    "missing_property > 0",
+    "missing_property IS NULL",
+]
+
+PROPERTY_FILTER_CORPUS = [
+    (["band_gap > 3.0"], 'AND'),
+    (["band_gap > 3.0", "total_energy < -1000"], 'AND'),
+    (["band_gap > 3.0", "total_energy < -1000"], 'OR'),
+    (["fermi_energy >= 0"], 'AND'),
+    (["magnetic_state = ferromagnetic"], 'AND'),
+    (["magnetic_state != ferromagnetic"], 'AND'),
+    (["transport_seebeck = None"], 'AND'),
+    (["band_gap != 2.5", "space_group > 0"], 'OR'),
+]
+
+FORMULAS = ['ZnO', 'TiO2', 'SiC', 'Si', 'C', 'GaN', 'MgO', 'ZnS', 'Ti.O', 'zno',
+            '123', '12.5', '1-2', 'CaTiO3', 'Al2O3', 'BN', 'Zn\nO', 'Zño']
+
+
+def build_database(db_path: Path, n_materials: int, seed: int = 42) -> MaterialDatabase:
+    """Create a synthetic database with n_materials materials."""
+    rng = random.Random(seed)
+    db = MaterialDatabase(str(db_path))
+    start = datetime(2025, 1, 1)
+    materials, properties = [], []
+
+    for i in range(n_materials):
+        material_id = f"mat_{i:06d}"
+        created = (start + timedelta(minutes=i)).isoformat()
+        materials.append((
+            material_id, rng.choice(FORMULAS), rng.choice([None, 1, 194, 225, 227, 229]),
+            rng.choice(['CRYSTAL', 'SLAB']), created, created,
+            rng.choice(['cif', 'd12', 'manual', None]), None, rng.choice(['active', 'archived']),
+            None, rng.choice([None, 'checked'])
+        ))
+
+        def add(name, value=None, text=None, category='electronic', calc=0):
+            properties.append((material_id, f"{material_id}_c{calc}", category, name,
+                               value, text, None, created))
+
+        if rng.random() < 0.9:
+            add('band_gap', rng.choice([0.0, 1.2, 2, 2.5, 3.0, 3.7, 5.1]))
+            if rng.random() < 0.2:
+                # Second extraction of the same property from another calculation
+                add('band_gap', rng.choice([2.5, 4.2]), category=rng.choice(['electronic', 'band']), calc=1)
+        if rng.random() < 0.1:
+            add('band_gap', None, 'n/a', calc=2)
+        if rng.random() < 0.8:
+            add('total_energy', rng.uniform(-3000, -10), category='thermodynamic')
+        if rng.random() < 0.5:
+            add('transport_seebeck', rng.choice([None, 120.5, -35.0]), category='transport')
+        if rng.random() < 0.6:
+            add('magnetic_state', None, rng.choice(['ferromagnetic', 'antiferromagnetic', 'Ferro', '']),
+                category='magnetic')
+        if rng.random() < 0.6:
+            # Numeric values stored as text
+            add('fermi_energy', None, rng.choice(['1.5', '-0.25', '10', '1e-05', 'n/a', ' 3 ']))
+        if rng.random() < 0.5:
+            add('metal_flag', rng.choice([0.0, 1.0]))
+
+    with db._get_connection() as conn:
+        conn.executemany("""
+            INSERT INTO materials (material_id, formula, space_group, dimensionality, created_at,
+                                   updated_at, source_type, source_file, status, metadata_json, notes)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, materials)
+        conn.executemany("""
+            INSERT INTO properties (material_id, calc_id, property_category, property_name,
+                                    property_value, property_value_text, property_unit, extracted_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        """, properties)
+    return db
+
+
+def timed(func, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def main():
+    """Main function."""
+    parser = argparse.ArgumentParser(description="Cross-check SQL filter pushdown against the Python evaluator")
+    parser.add_argument("--materials", type=int, default=2000, help="Number of synthetic materials")
+    parser.add_argument("--keep", help="Write the database to this path and keep it")
+    args = parser.parse_args()
+
+    tmp_dir = None
+    if args.keep:
+        db_path = Path(args.keep)
+    else:
+        tmp_dir = tempfile.TemporaryDirectory(prefix="mace_filter_bench_")
+        db_path = Path(tmp_dir.name) / "materials.db"
+
+    print(f"Building synthetic database with {args.materials} materials in {db_path}")
+    db = build_database(db_path, args.materials)
+
+    mismatches = 0
+    sql_total = python_total = 0.0
+    print(f"\n{'expression':<70} {'matches':>8} {'sql':>9} {'python':>9}")
+
+    cases = [('advanced', expr, None) for expr in ADVANCED_CORPUS]
+    cases += [('property', filters, logic) for filters, logic in PROPERTY_FILTER_CORPUS]
+    for kind, query, logic in cases:
+        if kind == 'advanced':
+            pushed = compile_advanced_filter(parse_advanced_filter(query)) is not None
+            sql_rows, sql_time = timed(db.filter_materials_advanced, query)
+            py_rows, py_time = timed(db.filter_materials_advanced, query, pushdown=False)
+            label = query
+        else:
+            pushed = True
+            sql_rows, sql_time = timed(db.filter_materials_by_properties, query, logic)
+            py_rows, py_time = timed(db.filter_materials_by_properties, query, logic, pushdown=False)
+            label = f" {logic} ".join(query)
+
+        sql_total += sql_time
+        python_total += py_time
+        sql_ids = sorted(m['material_id'] for m in sql_rows)
+        py_ids = sorted(m['material_id'] for m in py_rows)
+        flag = '' if pushed else ' (python)'
+        print(f"{label + flag:<70} {len(py_ids):>8} {sql_time:>8.3f}s {py_time:>8.3f}s")
+        if sql_ids != py_ids:
+            mismatches += 1
+            only_sql = sorted(set(sql_ids) - set(py_ids))[:5]
+            only_py = sorted(set(py_ids) - set(sql_ids))[:5]
+            print(f"  MISMATCH: only sql={only_sql} only python={only_py}")
+
+    print(f"\nTotal: sql {sql_total:.3f}s, python {python_total:.3f}s "
+          f"({python_total / max(sql_total, 1e-9):.1f}x)")
+    print(f"Mismatches: {mismatches} of {len(cases)} expressions")
+
+    if tmp_dir:
+        tmp_dir.cleanup()
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the batched property history
+------------------------------------------
+Re-extracts the properties of synthetic materials several times, changing
+every value each round. Histories are recorded two ways: change by change
+with the pre-batching record_property_change (its own connection, a SELECT
+for the old value, a MAX(version) scan and an INSERT per change), and by
+MaterialDatabase.upsert_properties, which writes the history of the whole
+batch in the property transaction.
+
+Both databases must end up with the same history (values, old values and
+per-property versions). Every material version that is rebuilt from
+snapshots must match a full replay of the history. The script reports
+write times and the time to rebuild the latest version with and without
+snapshots, and exits with status 1 on any difference.
+
+Usage:
+  python benchmark_history.py [--materials 40] [--properties 150] [--rounds 8]
+"""
+
+import sys
+import time
+import random
+import sqlite3
+import tempfile
+import argparse
+from datetime import datetime
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+# Import MACE components
+try:
+    from mace.database.materials import MaterialDatabase
+    from mace.database.utils.history import PropertyHistory, material_state
+except ImportError as e:
+    print(f"Error importing MACE database modules: {e}")
+    sys.exit(1)
+
+
+def legacy_record_property_change(db_path, material_id, property_name, new_value,
+                                  new_unit=None, calc_id=None, changed_by=None, change_reason=None):
+    """record_property_change before batching: one connection and three statements per change."""
+    conn = sqlite3.connect(db_path)
+    conn.row_factory = sqlite3.Row
+    try:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT property_value, property_unit FROM properties
+            WHERE material_id = ? AND property_name = ?
+            ORDER BY property_id DESC LIMIT 1
+        """, (material_id, property_name))
+        current = cursor.fetchone()
+        old_value = current['property_value'] if current else None
+        cursor.execute("""
+            SELECT MAX(version) as max_version FROM property_history
+            WHERE material_id = ? AND property_name = ?
+        """, (material_id, property_name))
+        version = (cursor.fetchone()['max_version'] or 0) + 1
+        cursor.execute("""
+            INSERT INTO property_history
+            (material_id, property_name, property_value, property_unit,
+             calc_id, changed_by, change_reason, old_value, version)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, (material_id, property_name, str(new_value), new_unit,
+              calc_id, changed_by, change_reason, old_value, version))
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def build_database(db_path: Path, n_materials: int) -> MaterialDatabase:
+    """Create a database with n_materials materials and one calculation each."""
+    db_path.parent.mkdir(parents=True, exist_ok=True)
+    db = MaterialDatabase(str(db_path))
+    now = datetime.now().isoformat()
+    with db._get_connection() as conn:
+        for i in range(n_materials):
+            conn.execute("INSERT INTO materials (material_id, formula, created_at, updated_at) VALUES (?, 'C', ?, ?)",
+                         (f"mat_{i}", now, now))
+            conn.execute("INSERT INTO calculations (calc_id, material_id, calc_type, status, created_at) "
+                         "VALUES (?, ?, 'SP', 'completed', ?)", (f"calc_{i}", f"mat_{i}", now))
+    return db
+
+
+def extraction_rows(n_materials: int, n_properties: int, rng: random.Random):
+    """One round of property rows for every material, all values new."""
+    now = datetime.now().isoformat()
+    return [(f"mat_{i}", f"calc_{i}", 'electronic', f"prop_{p}", value, str(value), 'eV',
+             now, 'crystal_property_extractor.py')
+            for i in range(n_materials)
+            for p in range(n_properties)
+            for value in [round(rng.uniform(-10, 10), 6)]]
+
+
+def history_rows(db_path: Path):
+    """Comparable history: (material, property, version) -> (value, old value)."""
+    conn = sqlite3.connect(str(db_path))
+    try:
+        return {(row[0], row[1], row[2]): (row[3], row[4]) for row in conn.execute("""
+            SELECT material_id, property_name, version, property_value, old_value FROM property_history
+        """)}
+    finally:
+        conn.close()
+
+
+def replay(conn, material_id: str, version: int) -> dict:
+    """Material state at version from the full history (no snapshots)."""
+    properties = {}
+    for row in conn.execute("""
+        SELECT property_name, property_value, property_unit, property_category, calc_id, version
+        FROM property_history WHERE material_id = ? AND material_version <= ?
+        ORDER BY material_version, history_id
+    """, (material_id, version)):
+        properties[row[0]] = {'value': row[1], 'unit': row[2], 'category': row[3],
+                              'calc_id': row[4], 'version': row[5]}
+    return properties
+
+
+def main():
+    """Main function."""
+    parser = argparse.ArgumentParser(description="Benchmark per-change vs batched property history")
+    parser.add_argument("--materials", type=int, default=40, help="Number of materials")
+    parser.add_argument("--properties", type=int, default=150, help="Properties per extraction")
+    parser.add_argument("--rounds", type=int, default=8, help="Re-extractions per material")
+    args = parser.parse_args()
+
+    rounds = [extraction_rows(args.materials, args.properties, random.Random(seed))
+              for seed in range(args.rounds)]
+    n_changes = sum(len(rows) for rows in rounds)
+    problems = []
+
+    with tempfile.TemporaryDirectory(prefix="mace_history_bench_") as tmp:
+        tmp = Path(tmp)
+        print(f"{args.materials} materials x {args.properties} properties x {args.rounds} rounds "
+              f"= {n_changes} changes")
+
+        # Per change, then the bulk property write
+        legacy_path = tmp / "legacy" / "materials.db"
+        legacy_db = build_database(legacy_path, args.materials)
+        PropertyHistory(str(legacy_path))
+        start = time.perf_counter()
+        for rows in rounds:
+            for row in rows:
+                legacy_record_property_change(str(legacy_path), row[0], row[3], row[5], row[6],
+                                              row[1], row[8])
+            legacy_db.upsert_properties(rows, record_history=False)
+        legacy_write = time.perf_counter() - start
+
+        # History written with the bulk property write
+        batched_path = tmp / "batched" / "materials.db"
+        batched_db = build_database(batched_path, args.materials)
+        start = time.perf_counter()
+        for rows in rounds:
+            batched_db.upsert_properties(rows)
+        batched_write = time.perf_counter() - start
+
+        # Unchanged re-extraction: nothing to record
+        start = time.perf_counter()
+        batched_db.upsert_properties(rounds[-1])
+        unchanged_write = time.perf_counter() - start
+
+        legacy_history, batched_history = history_rows(legacy_path), history_rows(batched_path)
+        if len(batched_history) != n_changes:
+            problems.append(f"{len(batched_history)} history rows, expected {n_changes}")
+        for key, (value, old_value) in legacy_history.items():
+            other = batched_history.get(key)
+            if other is None or other[0] != value or (other[1] is not None and old_value is not None
+                                                      and float(other[1]) != float(old_value)):
+                problems.append(f"history {key}: {(value, old_value)} != {other}")
+
+        # Rebuild every version from snapshots and by full replay
+        history = PropertyHistory(str(batched_path))
+        conn = sqlite3.connect(str(batched_path))
+        snapshots = conn.execute("SELECT COUNT(*) FROM history_snapshots").fetchone()[0]
+        for i in range(args.materials):
+            for version in range(1, args.rounds + 1):
+                rebuilt = history.get_material_state(f"mat_{i}", version)
+                if rebuilt['properties'] != replay(conn, f"mat_{i}", version):
+                    problems.append(f"mat_{i} version {version} differs from replay")
+
+        # Latest properties equal the properties table
+        for i in range(0, args.materials, max(1, args.materials // 10)):
+            latest = history.get_material_state(f"mat_{i}")['properties']
+            current = {p['property_name']: p['property_value_text']
+                       for p in batched_db.get_material_properties(f"mat_{i}")}
+            if {name: entry['value'] for name, entry in latest.items()} != current:
+                problems.append(f"mat_{i} latest state differs from properties table")
+
+        start = time.perf_counter()
+        for i in range(args.materials):
+            material_state(conn, f"mat_{i}")
+        snapshot_time = time.perf_counter() - start
+        start = time.perf_counter()
+        for i in range(args.materials):
+            replay(conn, f"mat_{i}", args.rounds)
+        replay_time = time.perf_counter() - start
+        conn.close()
+
+        print(f"\n{'':<34} {'per change':>12} {'batched':>12}")
+        print(f"{'write history + properties':<34} {legacy_write:>11.3f}s {batched_write:>11.3f}s")
+        print(f"{'unchanged re-extraction':<34} {'':>12} {unchanged_write:>11.3f}s")
+        print(f"{'snapshots written':<34} {'':>12} {snapshots:>12}")
+        print(f"{'rebuild latest (all materials)':<34} {replay_time:>11.3f}s {snapshot_time:>11.3f}s"
+              f"  (full replay vs snapshot)")
+        print(f"\nDifferences: {len(problems)}")
+        for problem in problems[:10]:
+            print(f"  {problem}")
+        sys.exit(1 if problems else 0)
+
+
+if __name__ == "__main__":
+    main()
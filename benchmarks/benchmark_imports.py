@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Import-time budget for the MACE entry points
+--------------------------------------------
+Job-end callbacks start a fresh interpreter for every job, so their cost is
+mostly interpreter start and imports. This script starts each entry point in
+a new interpreter under `python -X importtime`, parses the report and prints
+the wall time, the total import time and the slowest top-level imports.
+
+It exits with status 1 if the job-end callback exceeds its wall-time budget
+or if an entry point that must stay light imports one of the heavy packages
+(numpy, pandas, ase, matplotlib, scipy), which belong in the subcommands
+that use them.
+
+Usage:
+  python benchmark_imports.py [--repeat 5] [--budget-ms 150] [--top 5]
+"""
+
+import os
+import re
+import sys
+import time
+import argparse
+import subprocess
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+HEAVY_PACKAGES = ('numpy', 'pandas', 'ase', 'matplotlib', 'scipy')
+
+# Name -> (python arguments, must stay light)
+ENTRY_POINTS = {
+    'job-end callback': (['-c', 'import mace.queue.manager, mace.queue.daemon, '
+                                'mace.recovery.recovery, mace.workflow.engine'], True),
+    'daemon notification': (['-c', 'import mace.queue.daemon'], True),
+    'mace --version': ([str(REPO_ROOT / 'mace_cli'), '--version'], True),
+    'mace monitor': (['-c', 'import mace.queue.monitor'], True),
+    'mace workflow': (['-c', 'import mace.run_mace'], False),
+}
+
+_IMPORTTIME_LINE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( +)(\S+)')
+
+
+def parse_importtime(stderr: str):
+    """
+    Parse `python -X importtime` output.
+
+    Returns:
+        (all imported module names, [(cumulative microseconds, name)] of the
+        top-level imports)
+    """
+    modules = set()
+    top_level = []
+    for line in stderr.splitlines():
+        match = _IMPORTTIME_LINE.match(line)
+        if not match:
+            continue
+        cumulative, indent, name = int(match.group(2)), len(match.group(3)), match.group(4)
+        modules.add(name)
+        if indent == 1:
+            top_level.append((cumulative, name))
+    return modules, top_level
+
+
+def measure(args, repeat: int):
+    """Best wall time over repeat runs, and the import report of the fastest run."""
+    env = dict(os.environ, PYTHONPATH=str(REPO_ROOT), MACE_NO_BANNER='1')
+    # Time imports from bytecode, as installed: recompiling sources is not import cost
+    env.pop('PYTHONDONTWRITEBYTECODE', None)
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = subprocess.run([sys.executable, '-X', 'importtime'] + args, cwd=str(REPO_ROOT),
+                                env=env, capture_output=True, text=True)
+        wall = time.perf_counter() - start
+        if result.returncode != 0:
+            raise RuntimeError(result.stderr.strip().splitlines()[-1])
+        if best is None or wall < best[0]:
+            best = (wall, result.stderr)
+    return best
+
+
+def main():
+    """Main function."""
+    parser = argparse.ArgumentParser(description="Check the import time of the MACE entry points")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per entry point (best is reported)")
+    parser.add_argument("--budget-ms", type=float, default=150, help="Wall-time budget of the job-end callback")
+    parser.add_argument("--top", type=int, default=5, help="Slowest top-level imports to show")
+    args = parser.parse_args()
+
+    problems = []
+    print(f"{'entry point':<22} {'wall':>9} {'imports':>9}  slowest imports")
+    for name, (entry_args, light) in ENTRY_POINTS.items():
+        try:
+            wall, stderr = measure(entry_args, args.repeat)
+        except RuntimeError as e:
+            problems.append(f"{name}: failed ({e})")
+            continue
+        modules, top_level = parse_importtime(stderr)
+        total = sum(cumulative for cumulative, _ in top_level) / 1000
+        slowest = ', '.join(f"{module} {cumulative / 1000:.0f}"
+                            for cumulative, module in sorted(top_level, reverse=True)[:args.top])
+        print(f"{name:<22} {wall * 1000:>7.0f}ms {total:>7.0f}ms  {slowest}")
+
+        if name == 'job-end callback' and wall * 1000 > args.budget_ms:
+            problems.append(f"{name}: {wall * 1000:.0f} ms exceeds the {args.budget_ms:.0f} ms budget")
+        heavy = sorted(package for package in HEAVY_PACKAGES if package in modules)
+        if light and heavy:
+            problems.append(f"{name}: imports {', '.join(heavy)}")
+
+    print(f"\nProblems: {len(problems)}")
+    for problem in problems:
+        print(f"  {problem}")
+    sys.exit(1 if problems else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the input generation service
+------------------------------------------
+Generates the follow-up inputs of a set of CRYSTAL outputs (an SP D12 file
+and DOSS and BAND D3 files each, with the workflow engine's default D3
+settings) two ways:
+
+- one CRYSTALOptToD12.py / CRYSTALOptToD3.py interpreter per input, with a
+  config file (what the workflow did before)
+- through InputGenerationService, with the config as a dictionary
+
+and reports inputs per second. The script also checks:
+
+- both ways write the same files with the same contents
+- a missing wavefunction fails the D3 input instead of waiting for a prompt
+- a numbered type (BAND2) gets its base type's input
+
+It exits with status 1 on any difference.
+
+Usage:
+  python benchmark_input_service.py [--outputs cif/crystalouputs] [--workers 2] [--rounds 3]
+"""
+
+import sys
+import json
+import time
+import shutil
+import tempfile
+import argparse
+import subprocess
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+# Import MACE components
+try:
+    from mace.workflow.input_service import InputGenerationService, REPO_ROOT
+except ImportError as e:
+    print(f"Error importing MACE modules: {e}")
+    sys.exit(1)
+
+D12_SCRIPT = REPO_ROOT / "Crystal_d12" / "CRYSTALOptToD12.py"
+D3_SCRIPT = REPO_ROOT / "Crystal_d3" / "CRYSTALOptToD3.py"
+
+D12_CONFIG = {"calculation_type": "SP", "functional": "PBE0"}
+
+# WorkflowEngine._get_default_d3_config
+D3_CONFIGS = {
+    "DOSS": {
+        "calculation_type": "DOSS",
+        "n_points": 10000,
+        "bands": "all",
+        "projection_type": 0,
+        "energy_range": [-20, 20]
+    },
+    "BAND": {
+        "calculation_type": "BAND",
+        "path": "auto",
+        "bands": "auto",
+        "shrink": "auto",
+        "labels": "auto",
+        "auto_path": True,
+        "n_points": 10000,
+        "path_method": "coordinates"
+    },
+}
+
+
+def copy_outputs(source: Path, target: Path) -> list:
+    """Copy the .out/.d12 pairs with a dummy wavefunction; returns the .out files."""
+    target.mkdir(parents=True)
+    outputs = []
+    for out_file in sorted(source.glob("*.out")):
+        d12_file = out_file.with_suffix(".d12")
+        if not d12_file.exists():
+            continue
+        shutil.copy2(out_file, target)
+        shutil.copy2(d12_file, target)
+        (target / f"{out_file.stem}.f9").write_bytes(b"\0" * 1024)
+        outputs.append(target / out_file.name)
+    return outputs
+
+
+def run_scripts(outputs: list) -> int:
+    """One interpreter per input; returns the number of inputs written."""
+    written = 0
+    for out_file in outputs:
+        config_file = out_file.parent / "d12_config.json"
+        config_file.write_text(json.dumps(D12_CONFIG))
+        result = subprocess.run([sys.executable, str(D12_SCRIPT), "--out-file", str(out_file),
+                                 "--d12-file", str(out_file.with_suffix(".d12")),
+                                 "--output-dir", str(out_file.parent),
+                                 "--config-file", str(config_file), "--non-interactive"],
+                                capture_output=True, text=True, stdin=subprocess.DEVNULL)
+        written += result.returncode == 0
+        config_file.unlink()
+
+        for calc_type, d3_config in D3_CONFIGS.items():
+            config_file = out_file.parent / f"{calc_type.lower()}_config.json"
+            config_file.write_text(json.dumps({"version": "1.0", "type": "d3_configuration",
+                                               "calculation_type": calc_type, "configuration": d3_config}))
+            result = subprocess.run([sys.executable, str(D3_SCRIPT), "--input", str(out_file),
+                                     "--calc-type", calc_type, "--output-dir", str(out_file.parent),
+                                     "--config-file", str(config_file)],
+                                    capture_output=True, text=True, stdin=subprocess.DEVNULL)
+            written += result.returncode == 0
+            config_file.unlink()
+    return written
+
+
+def run_service(service: InputGenerationService, outputs: list, problems: list) -> int:
+    """All inputs through the service; returns the number of inputs written."""
+    written = 0
+    for out_file in outputs:
+        result = service.generate_d12(out_file, out_file.with_suffix(".d12"), D12_CONFIG, out_file.parent)
+        if result['success']:
+            written += 1
+        else:
+            problems.append(f"{out_file.name} SP: {result['error']}")
+        for calc_type, d3_config in D3_CONFIGS.items():
+            result = service.generate_d3(out_file, d3_config, output_dir=out_file.parent)
+            if result['success']:
+                written += 1
+            else:
+                problems.append(f"{out_file.name} {calc_type}: {result['error']}")
+    return written
+
+
+def compare_dirs(expected: Path, actual: Path, problems: list):
+    """Same generated files with the same contents."""
+    def generated(directory):
+        return {p.name: p for p in directory.iterdir() if p.suffix in (".d12", ".d3", ".f9")}
+    expected_files, actual_files = generated(expected), generated(actual)
+    for name in sorted(set(expected_files) ^ set(actual_files)):
+        problems.append(f"only {'with scripts' if name in expected_files else 'with service'}: {name}")
+    for name in sorted(set(expected_files) & set(actual_files)):
+        # D12 titles contain the output path
+        expected_bytes = expected_files[name].read_bytes().replace(bytes(expected), b"DIR")
+        actual_bytes = actual_files[name].read_bytes().replace(bytes(actual), b"DIR")
+        if expected_bytes != actual_bytes:
+            problems.append(f"contents differ: {name}")
+
+
+def main():
+    """Main function."""
+    parser = argparse.ArgumentParser(description="Benchmark script interpreters vs the input generation service")
+    parser.add_argument("--outputs", default=str(REPO_ROOT / "cif" / "crystalouputs"),
+                        help="Directory of CRYSTAL .out files with their .d12 inputs")
+    parser.add_argument("--workers", type=int, default=2, help="Service worker processes")
+    parser.add_argument("--rounds", type=int, default=3, help="Service rounds over all outputs (warm timing)")
+    args = parser.parse_args()
+
+    problems = []
+    with tempfile.TemporaryDirectory(prefix="mace_input_bench_") as tmp:
+        tmp = Path(tmp)
+        script_outputs = copy_outputs(Path(args.outputs), tmp / "scripts")
+        service_outputs = copy_outputs(Path(args.outputs), tmp / "service")
+        n_inputs = len(script_outputs) * (1 + len(D3_CONFIGS))
+        print(f"{len(script_outputs)} outputs, {n_inputs} inputs per round")
+
+        start = time.perf_counter()
+        script_written = run_scripts(script_outputs)
+        script_time = time.perf_counter() - start
+
+        service = InputGenerationService(max_workers=args.workers)
+        start = time.perf_counter()
+        service_written = run_service(service, service_outputs, problems)
+        cold_time = time.perf_counter() - start
+        start = time.perf_counter()
+        for _ in range(args.rounds):
+            run_service(service, service_outputs, problems)
+        warm_time = (time.perf_counter() - start) / max(args.rounds, 1)
+
+        if script_written != n_inputs or service_written != n_inputs:
+            problems.append(f"inputs written: {script_written} with scripts, {service_written} with service")
+        compare_dirs(tmp / "scripts", tmp / "service", problems)
+
+        # A missing wavefunction fails instead of prompting
+        out_file = service_outputs[0]
+        out_file.with_suffix(".f9").unlink()
+        start = time.perf_counter()
+        result = service.generate_d3(out_file, D3_CONFIGS["DOSS"], output_dir=tmp / "missing")
+        if result['success'] or time.perf_counter() - start > 60:
+            problems.append("missing wavefunction did not fail")
+
+        # Numbered types use the base type's settings
+        result = service.generate_d3(service_outputs[-1], D3_CONFIGS["BAND"], "BAND2", tmp / "band2")
+        if not result['success'] or result['calc_type'] != "BAND":
+            problems.append(f"BAND2 input: {result['error']}")
+        service.close()
+
+        print(f"\n{'':<28} {'scripts':>12} {'service':>12}")
+        print(f"{'first round':<28} {script_time:>11.2f}s {cold_time:>11.2f}s  (service: incl. worker start)")
+        print(f"{'warm round':<28} {'':>12} {warm_time:>11.2f}s")
+        print(f"{'inputs per second':<28} {n_inputs / script_time:>12.1f} {n_inputs / warm_time:>12.1f}")
+        print(f"\nDifferences: {len(problems)}")
+        for problem in problems[:10]:
+            print(f"  {problem}")
+        sys.exit(1 if problems else 0)
+
+
+if __name__ == "__main__":
+    main()
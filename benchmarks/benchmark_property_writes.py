@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+Benchmark for batched property writes
+-------------------------------------
+Writes --extractions extractions of --properties properties each (numbers,
+text and JSON lists) twice with CrystalPropertyExtractor:
+
+- the per-property path before the batched upsert: a new connection, a
+  SELECT and an UPDATE or INSERT, and a commit for every property
+- save_properties_to_database, one upsert transaction per extraction
+- save_many_properties_to_database, one transaction for all extractions
+
+Every path writes the extractions once and then again with new values, so
+both inserts and updates are timed. The script checks that all paths leave
+identical property tables, and that opening a database with duplicate
+property rows and no unique index reports and removes the duplicates.
+It exits with status 1 on any difference.
+
+Usage:
+  python benchmark_property_writes.py [--extractions 50] [--properties 200]
+"""
+
+import io
+import re
+import sys
+import time
+import sqlite3
+import tempfile
+import argparse
+from contextlib import redirect_stdout
+from datetime import datetime
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+# Import MACE components
+try:
+    from mace.database.materials import MaterialDatabase
+    from mace.utils.property_extractor import CrystalPropertyExtractor
+except ImportError as e:
+    print(f"Error importing MACE modules: {e}")
+    sys.exit(1)
+
+
+def make_extractions(n_extractions: int, n_properties: int, scale: float) -> list:
+    """Extraction results shaped like CrystalPropertyExtractor.extract_all_properties output."""
+    extractions = []
+    for i in range(n_extractions):
+        properties = {"_metadata": {"material_id": f"mat_{i:05d}", "calc_id": f"calc_{i:05d}",
+                                    "extracted_at": datetime.now().isoformat()}}
+        for j in range(n_properties):
+            if j % 10 == 0:
+                properties[f"label_{j}"] = f"value {j * scale}"
+            elif j % 10 == 1:
+                properties[f"series_{j}"] = [j * scale, j * scale + 1]
+            else:
+                properties[f"energy_{j}"] = (i + j) * scale
+        extractions.append(properties)
+    return extractions
+
+
+def legacy_save(extractor: CrystalPropertyExtractor, properties: dict) -> int:
+    """save_properties_to_database before the batched upsert (one connection per property)."""
+    metadata = properties['_metadata']
+    saved = 0
+    for row in extractor._build_property_rows(properties):
+        material_id, calc_id, category, prop_name, value_numeric, value_text, unit, extracted_at, script = row
+        with extractor.db._get_connection() as conn:
+            existing = conn.execute(
+                "SELECT property_id FROM properties WHERE material_id = ? AND property_name = ? AND calc_id = ?",
+                (material_id, prop_name, calc_id)).fetchone()
+            if existing:
+                conn.execute("""
+                    UPDATE properties
+                    SET property_value = ?, property_value_text = ?, property_unit = ?,
+                        extracted_at = ?, extractor_script = ?
+                    WHERE property_id = ?
+                """, (value_numeric, value_text, unit, metadata['extracted_at'], script, existing[0]))
+            else:
+                conn.execute("""
+                    INSERT INTO properties
+                    (material_id, calc_id, property_category, property_name,
+                     property_value, property_value_text, property_unit,
+                     extracted_at, extractor_script)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """, row)
+        saved += 1
+    return saved
+
+
+def property_table(db_path: Path) -> list:
+    conn = sqlite3.connect(str(db_path))
+    rows = conn.execute("""
+        SELECT material_id, calc_id, property_category, property_name, property_value,
+               property_value_text, property_unit, extractor_script
+        FROM properties ORDER BY material_id, calc_id, property_name
+    """).fetchall()
+    conn.close()
+    return rows
+
+
+def run(tmp: Path, name: str, write, persistent: bool, passes: list) -> tuple:
+    """(seconds, properties written, property table) of writing every pass with one write mode."""
+    db_path = tmp / f"{name}.db"
+    with redirect_stdout(io.StringIO()):
+        extractor = CrystalPropertyExtractor(str(db_path))
+    extractor.db = MaterialDatabase(str(db_path), str(tmp / f"{name}_structures.db"),
+                                    persistent_connections=persistent)
+    start = time.perf_counter()
+    written = sum(write(extractor, extractions) for extractions in passes)
+    elapsed = time.perf_counter() - start
+    extractor.db.close()
+    return elapsed, written, property_table(db_path)
+
+
+def check_migration(tmp: Path) -> list:
+    """Duplicates in a database without the unique index are reported and removed."""
+    problems = []
+    db_path = tmp / "legacy.db"
+    with redirect_stdout(io.StringIO()):
+        db = MaterialDatabase(str(db_path), str(tmp / "legacy_structures.db"))
+    with db._get_connection() as conn:
+        conn.execute("DROP INDEX idx_properties_unique")
+        conn.executemany("INSERT INTO properties (material_id, calc_id, property_category, property_name, "
+                         "property_value, extracted_at) VALUES (?, ?, ?, ?, ?, ?)",
+                         [("mat_1", "calc_1", "test", f"p{i % 5}", i, "2024-01-01") for i in range(20)])
+    db.close()
+    output = io.StringIO()
+    with redirect_stdout(output):
+        MaterialDatabase(str(db_path), str(tmp / "legacy_structures.db")).close()
+    match = re.search(r"Removed (\d+) duplicate property rows", output.getvalue())
+    if not match or int(match.group(1)) != 15:
+        problems.append(f"migration reported {match.group(1) if match else 'no'} removed rows, expected 15")
+    values = sorted(row[4] for row in property_table(db_path))
+    if values != [15.0, 16.0, 17.0, 18.0, 19.0]:
+        problems.append(f"migration kept {values}, expected the most recent row of each property")
+    return problems
+
+
+def main():
+    """Main function."""
+    parser = argparse.ArgumentParser(description="Benchmark per-property vs batched property writes")
+    parser.add_argument("--extractions", type=int, default=50, help="Extractions to write")
+    parser.add_argument("--properties", type=int, default=200, help="Properties per extraction")
+    args = parser.parse_args()
+
+    passes = [make_extractions(args.extractions, args.properties, scale) for scale in (1.0, 2.0)]
+    modes = [
+        ("per-property (before)", lambda ex, batch: sum(legacy_save(ex, p) for p in batch), False),
+        ("one transaction per extraction", lambda ex, batch: sum(ex.save_properties_to_database(p) for p in batch), True),
+        ("one transaction for all", lambda ex, batch: ex.save_many_properties_to_database(batch), True),
+    ]
+
+    problems = []
+    with tempfile.TemporaryDirectory(prefix="mace_props_bench_") as tmp:
+        tmp = Path(tmp)
+        results = []
+        for n, (label, write, persistent) in enumerate(modes):
+            results.append((label,) + run(tmp, f"run_{n}", write, persistent, passes))
+
+        expected = 2 * args.extractions * args.properties
+        reference = results[0][3]
+        for label, elapsed, written, table in results:
+            if written != expected:
+                problems.append(f"{label}: {written} properties written, expected {expected}")
+            if table != reference:
+                differing = sum(1 for a, b in zip(table, reference) if a != b) + abs(len(table) - len(reference))
+                problems.append(f"{label}: {differing} property rows differ from the per-property path")
+        problems.extend(check_migration(tmp))
+
+        print(f"{args.extractions} extractions x {args.properties} properties, written twice (insert + update)\n")
+        print(f"{'':<32} {'time':>8} {'properties/s':>14}")
+        for label, elapsed, written, _ in results:
+            print(f"{label:<32} {elapsed:>7.2f}s {written / elapsed:>14.0f}")
+        print(f"\nSpeedup (one transaction per extraction): {results[0][1] / results[1][1]:.1f}x")
+        print(f"\nDifferences: {len(problems)}")
+        for problem in problems[:10]:
+            print(f"  {problem}")
+        sys.exit(1 if problems else 0)
+
+
+if __name__ == "__main__":
+    main()
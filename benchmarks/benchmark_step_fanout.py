@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the concurrent fan-out of workflow steps
+------------------------------------------------------
+Builds a database of materials whose SP calculations have just completed in
+an OPT -> SP -> BAND -> DOSS workflow and lets
+WorkflowEngine.process_completed_calculations generate and submit the BAND
+and DOSS steps two ways:
+
+- one step after another (MACE_STEP_WORKERS=1, what the engine did before)
+- with the concurrent fan-out (--workers threads)
+
+Input generation and sbatch are replaced by sleeps of the given latencies
+(both mostly wait on other processes), so only the scheduling is timed. The
+script also checks:
+
+- both ways create the same calculations
+- a material's events run one at a time, in order
+- an exception in a step releases the material's event and its later
+  events and is raised after the other materials were processed
+- a failed optional BAND does not stop DOSS
+- a failed required step cancels the steps that need it and the later steps
+  of its chain, and stage times are recorded per step
+
+It exits with status 1 on any difference.
+
+Usage:
+  python benchmark_step_fanout.py [--materials 40] [--workers 4] [--generate-ms 50] [--submit-ms 20]
+"""
+
+import io
+import sys
+import json
+import time
+import tempfile
+import argparse
+import itertools
+import threading
+from contextlib import redirect_stdout
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+# Import MACE components
+try:
+    from mace.database.materials import MaterialDatabase
+    from mace.workflow.engine import WorkflowEngine
+    from mace.workflow.fanout import StepFanout, StepTask, stage, CANCELLED, DONE, FAILED
+except ImportError as e:
+    print(f"Error importing MACE modules: {e}")
+    sys.exit(1)
+
+WORKFLOW_ID = "workflow_bench"
+SEQUENCE = ["OPT", "SP", "BAND", "DOSS"]
+
+
+class SimulatedEngine(WorkflowEngine):
+    """Workflow engine whose input generation and submission only take time."""
+
+    def __init__(self, *args, generate_s=0.05, submit_s=0.02, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.generate_s = generate_s
+        self.submit_s = submit_s
+        self.fail_band = set()  # Materials whose BAND generation fails
+        self.raise_for = set()  # Materials whose workflow step raises
+        self.violations = []
+        self.calls = {}  # material_id -> completed calc_ids in call order
+        self._active = set()
+        self._job_ids = itertools.count(1000)
+        self._active_lock = threading.Lock()
+
+    def execute_workflow_step(self, material_id, completed_calc_id):
+        with self._active_lock:
+            if material_id in self._active:
+                self.violations.append(f"{material_id}: events ran concurrently")
+            self._active.add(material_id)
+            self.calls.setdefault(material_id, []).append(completed_calc_id)
+        try:
+            if material_id in self.raise_for:
+                raise RuntimeError(f"step of {material_id} failed")
+            return super().execute_workflow_step(material_id, completed_calc_id)
+        finally:
+            with self._active_lock:
+                self._active.discard(material_id)
+
+    def generate_property_calculation(self, source_calc_id, target_calc_type):
+        material_id = self.db.get_calculation(source_calc_id)['material_id']
+        with stage('generate'):
+            time.sleep(self.generate_s)
+        if target_calc_type == "BAND" and material_id in self.fail_band:
+            return None
+        calc_id = self.db.create_calculation(material_id, target_calc_type,
+                                             prerequisite_calc_id=source_calc_id,
+                                             settings={'workflow_id': WORKFLOW_ID})
+        with stage('submit'):
+            time.sleep(self.submit_s)
+        self.db.update_calculation_status(calc_id, 'submitted', slurm_job_id=str(next(self._job_ids)))
+        return calc_id
+
+
+def build_work_dir(work_dir: Path, n_materials: int) -> dict:
+    """Database with completed OPT (consumed) and SP (pending) calculations; returns material -> [calc ids]."""
+    (work_dir / "workflow_configs").mkdir(parents=True)
+    (work_dir / "workflow_configs" / "workflow_plan_bench.json").write_text(
+        json.dumps({"workflow_sequence": SEQUENCE}))
+    db = MaterialDatabase(str(work_dir / "materials.db"))
+    calcs = {}
+    consumed = []
+    for i in range(n_materials):
+        material_id = f"mat_{i:04d}"
+        db.create_material(material_id, "C")
+        calcs[material_id] = []
+        for calc_type in ("OPT", "SP"):
+            calc_id = db.create_calculation(material_id, calc_type, settings={'workflow_id': WORKFLOW_ID})
+            db.update_calculation_status(calc_id, 'completed',
+                                         output_file=str(work_dir / f"{material_id}_{calc_type.lower()}.out"))
+            calcs[material_id].append(calc_id)
+            if calc_type == "OPT" and i >= 2:
+                consumed.append(calc_id)
+    # mat_0000 and mat_0001 still have their OPT event: two events in order
+    with db._get_connection() as conn:
+        conn.executemany("UPDATE workflow_events SET consumed_at = CURRENT_TIMESTAMP WHERE calc_id = ?",
+                         [(calc_id,) for calc_id in consumed])
+    db.close()
+    return calcs
+
+
+def created_calculations(db_path: Path) -> list:
+    """(material, type, status) of the generated calculations."""
+    db = MaterialDatabase(str(db_path))
+    rows = sorted((calc['material_id'], calc['calc_type'], calc['status'])
+                  for calc in db.get_calculations_by_status()
+                  if calc['calc_type'] not in ("OPT", "SP"))
+    db.close()
+    return rows
+
+
+def run_engine(work_dir: Path, workers: int, args, calcs: dict, problems: list) -> float:
+    """Process the pending events (twice: the first run raises); returns the wall time."""
+    with redirect_stdout(io.StringIO()):
+        engine = SimulatedEngine(str(work_dir / "materials.db"), str(work_dir),
+                                 generate_s=args.generate_ms / 1000, submit_s=args.submit_ms / 1000)
+    engine.step_fanout.shutdown()
+    engine.step_fanout = StepFanout(max_workers=workers)
+    engine.fail_band = {"mat_0002"}
+    engine.raise_for = {"mat_0001"}
+
+    start = time.perf_counter()
+    try:
+        with redirect_stdout(io.StringIO()):
+            engine.process_completed_calculations()
+        problems.append(f"workers={workers}: step exception was not raised")
+    except RuntimeError:
+        pass
+    wall = time.perf_counter() - start
+
+    # mat_0001's OPT event raised: it and the material's SP event are left for the next run
+    pending = engine.db.count_pending_workflow_events()
+    if pending != 2:
+        problems.append(f"workers={workers}: {pending} events left after the exception, expected 2")
+    if engine.calls.get("mat_0001") != calcs["mat_0001"][:1]:
+        problems.append(f"workers={workers}: mat_0001 ran {engine.calls.get('mat_0001')}")
+
+    engine.raise_for = set()
+    start = time.perf_counter()
+    with redirect_stdout(io.StringIO()):
+        engine.process_completed_calculations()
+    wall += time.perf_counter() - start
+    if engine.db.count_pending_workflow_events():
+        problems.append(f"workers={workers}: events left after the second run")
+    for material_id in ("mat_0000", "mat_0001"):
+        if engine.calls[material_id][-2:] != calcs[material_id]:
+            problems.append(f"workers={workers}: {material_id} events out of order")
+    problems.extend(f"workers={workers}: {violation}" for violation in engine.violations)
+    engine.close()
+    return wall
+
+
+def check_scheduler(problems: list):
+    """DAG semantics of StepFanout."""
+    order = []
+
+    def step(name, result="ok", seconds=0.01):
+        def function():
+            with stage('work'):
+                time.sleep(seconds)
+            order.append(name)
+            if isinstance(result, Exception):
+                raise result
+            return result
+        return function
+
+    tasks = [
+        StepTask("opt2", step("opt2", None), chain="opt"),           # Required step fails
+        StepTask("opt3", step("opt3"), chain="opt"),                 # Later in its chain
+        StepTask("freq", step("freq"), requires=["opt2"]),           # Needs the failed step
+        StepTask("freq_band", step("freq_band"), requires=["freq"]),  # Transitively
+        StepTask("band", step("band", RuntimeError("boom")), chain="band", critical=False),
+        StepTask("band2", step("band2"), chain="band"),              # Optional failure: runs
+        StepTask("doss", step("doss", seconds=0.05)),
+    ]
+    fanout = StepFanout(max_workers=4)
+    fanout.run(tasks)
+    fanout.shutdown()
+    status = {task.key: task.status for task in tasks}
+    expected = {"opt2": FAILED, "opt3": CANCELLED, "freq": CANCELLED, "freq_band": CANCELLED,
+                "band": FAILED, "band2": DONE, "doss": DONE}
+    if status != expected:
+        problems.append(f"scheduler states: {status}")
+    if order.index("band") > order.index("band2"):
+        problems.append("chain order not kept")
+    if not isinstance(tasks[4].error, RuntimeError) or tasks[2].cancelled_by != "opt2":
+        problems.append("errors and cancellations not recorded")
+    if not all(task.timings.get('work', 0) >= 0.009 for task in tasks if task.status == DONE):
+        problems.append("stage times not recorded")
+
+    # A fan-out nested in a pooled step runs inline and adds its stage times to the step
+    def nested():
+        inner = [StepTask(i, step(f"inner{i}", seconds=0.01)) for i in range(3)]
+        StepFanout(max_workers=4).run(inner)
+        return threading.current_thread().name
+
+    outer = [StepTask(i, nested) for i in range(2)]
+    fanout = StepFanout(max_workers=2)
+    fanout.run(outer)
+    fanout.shutdown()
+    if not all(task.status == DONE and task.timings.get('work', 0) >= 0.029 for task in outer):
+        problems.append("nested fan-out stage times not recorded")
+
+
+def main():
+    """Main function."""
+    parser = argparse.ArgumentParser(description="Benchmark sequential vs concurrent workflow steps")
+    parser.add_argument("--materials", type=int, default=40, help="Materials with a completed SP")
+    parser.add_argument("--workers", type=int, default=4, help="Concurrent steps")
+    parser.add_argument("--generate-ms", type=float, default=50, help="Simulated input generation time")
+    parser.add_argument("--submit-ms", type=float, default=20, help="Simulated sbatch time")
+    args = parser.parse_args()
+
+    problems = []
+    with tempfile.TemporaryDirectory(prefix="mace_fanout_bench_") as tmp:
+        tmp = Path(tmp)
+        sequential_calcs = build_work_dir(tmp / "sequential", args.materials)
+        concurrent_calcs = build_work_dir(tmp / "concurrent", args.materials)
+
+        sequential_time = run_engine(tmp / "sequential", 1, args, sequential_calcs, problems)
+        concurrent_time = run_engine(tmp / "concurrent", args.workers, args, concurrent_calcs, problems)
+
+        sequential = created_calculations(tmp / "sequential" / "materials.db")
+        concurrent = created_calculations(tmp / "concurrent" / "materials.db")
+        if sequential != concurrent:
+            problems.append(f"created calculations differ: {len(sequential)} sequential, {len(concurrent)} concurrent")
+        expected = 2 * args.materials - 1  # mat_0002's BAND fails
+        if len(concurrent) != expected:
+            problems.append(f"{len(concurrent)} calculations created, expected {expected}")
+        if ("mat_0002", "DOSS", "submitted") not in concurrent:
+            problems.append("DOSS not generated after the optional BAND failed")
+
+        check_scheduler(problems)
+
+        steps = len(concurrent)
+        print(f"{args.materials} materials, {steps} BAND/DOSS steps "
+              f"({args.generate_ms:.0f} ms generation + {args.submit_ms:.0f} ms sbatch each)")
+        print(f"\n{'':<28} {'sequential':>12} {f'{args.workers} workers':>12}")
+        print(f"{'wall time':<28} {sequential_time:>11.2f}s {concurrent_time:>11.2f}s")
+        print(f"{'steps per second':<28} {steps / sequential_time:>12.1f} {steps / concurrent_time:>12.1f}")
+        print(f"\nDifferences: {len(problems)}")
+        for problem in problems[:10]:
+            print(f"  {problem}")
+        sys.exit(1 if problems else 0)
+
+
+if __name__ == "__main__":
+    main()
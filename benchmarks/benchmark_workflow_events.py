@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the workflow completion outbox
+--------------------------------------------
+Builds a database with many completed calculations that the workflow engine
+has already processed, then completes a few new ones. It finds the
+calculations to process two ways:
+
+- by the pre-outbox scan: every completed calculation, with settings_json
+  parsed to check its workflow_processed flag
+- from the workflow_events outbox, through
+  WorkflowEngine.process_completed_calculations
+
+The workflow step itself is replaced by a recorder, so only the pipeline is
+timed. The script also checks:
+
+- a repeated completion does not create a second event
+- consumed events set workflow_processed
+- a database created before the outbox is backfilled with exactly its
+  unprocessed completions
+- the directory cleanup that used to run on every workflow step call costs
+  nothing while throttled
+
+It exits with status 1 on any difference.
+
+Usage:
+  python benchmark_workflow_events.py [--calculations 100000] [--new 50] [--workflow-dirs 300]
+"""
+
+import sys
+import json
+import time
+import sqlite3
+import tempfile
+import argparse
+from datetime import datetime
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+# Import MACE components
+try:
+    from mace.database.materials import MaterialDatabase
+    from mace.workflow.engine import WorkflowEngine
+except ImportError as e:
+    print(f"Error importing MACE modules: {e}")
+    sys.exit(1)
+
+
+class RecordingEngine(WorkflowEngine):
+    """Workflow engine whose workflow step only records the calculation."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.processed = []
+
+    def execute_workflow_step(self, material_id, completed_calc_id):
+        self.processed.append(completed_calc_id)
+        return []
+
+
+def legacy_unprocessed(db) -> list:
+    """Calculations the pre-outbox process_completed_calculations would handle."""
+    unprocessed = []
+    for calc in db.get_calculations_by_status('completed'):
+        settings_json = calc.get('settings_json')
+        try:
+            settings = json.loads(settings_json) if settings_json else {}
+        except (json.JSONDecodeError, TypeError):
+            settings = {}
+        if not settings.get('workflow_processed'):
+            unprocessed.append(calc['calc_id'])
+    return unprocessed
+
+
+def build_database(db_path: Path, n_calcs: int, n_new: int) -> MaterialDatabase:
+    """n_calcs processed completed calculations and n_new submitted ones."""
+    db_path.parent.mkdir(parents=True, exist_ok=True)
+    db = MaterialDatabase(str(db_path))
+    now = datetime.now().isoformat()
+    processed = json.dumps({'workflow_id': 'wf_bench', 'workflow_processed': True})
+    with db._get_connection() as conn:
+        conn.executemany("INSERT INTO materials (material_id, formula, created_at, updated_at) VALUES (?, 'C', ?, ?)",
+                         [(f"mat_{i}", now, now) for i in range(n_calcs // 4 + n_new)])
+        conn.executemany("""
+            INSERT INTO calculations (calc_id, material_id, calc_type, status, settings_json, created_at, completed_at)
+            VALUES (?, ?, 'OPT', 'completed', ?, ?, ?)
+        """, [(f"calc_{i}", f"mat_{i // 4}", processed, now, now) for i in range(n_calcs)])
+        conn.executemany("""
+            INSERT INTO calculations (calc_id, material_id, calc_type, status, settings_json, created_at)
+            VALUES (?, ?, 'OPT', 'submitted', ?, ?)
+        """, [(f"new_{i}", f"mat_{n_calcs // 4 + i}", json.dumps({'workflow_id': 'wf_bench'}), now)
+              for i in range(n_new)])
+        # History: the engine consumed the events of the old completions
+        conn.execute("UPDATE workflow_events SET consumed_at = ?", (now,))
+    return db
+
+
+def build_workflow_outputs(base: Path, n_dirs: int):
+    """Workflow output directories with finished calculations (nothing to clean up)."""
+    for i in range(n_dirs):
+        calc_dir = base / "workflow_outputs" / f"workflow_{i}" / "step_001_OPT" / f"mat_{i}"
+        calc_dir.mkdir(parents=True)
+        for name in ("mat.d12", "mat.f9", "mat.sh"):
+            (calc_dir / name).write_text("x")
+        (calc_dir / "mat.out").write_text("x")
+
+
+def main():
+    """Main function."""
+    parser = argparse.ArgumentParser(description="Benchmark table scan vs outbox for completed calculations")
+    parser.add_argument("--calculations", type=int, default=100000, help="Processed completed calculations")
+    parser.add_argument("--new", type=int, default=50, help="Newly completed calculations")
+    parser.add_argument("--workflow-dirs", type=int, default=300, help="Workflow output directories")
+    args = parser.parse_args()
+
+    problems = []
+    with tempfile.TemporaryDirectory(prefix="mace_events_bench_") as tmp:
+        tmp = Path(tmp)
+        print(f"Building database with {args.calculations} processed calculations")
+        db = build_database(tmp / "db" / "materials.db", args.calculations, args.new)
+        build_workflow_outputs(tmp / "work", args.workflow_dirs)
+
+        # Complete the new calculations (twice: the second update must not add events)
+        db.update_calculation_statuses([{'calc_id': f"new_{i}", 'status': 'completed'} for i in range(args.new)])
+        db.update_calculation_statuses([{'calc_id': f"new_{i}", 'status': 'completed'} for i in range(args.new)])
+        expected = sorted(f"new_{i}" for i in range(args.new))
+        if db.count_pending_workflow_events() != args.new:
+            problems.append(f"{db.count_pending_workflow_events()} pending events, expected {args.new}")
+
+        start = time.perf_counter()
+        legacy = legacy_unprocessed(db)
+        scan_time = time.perf_counter() - start
+        if sorted(legacy) != expected:
+            problems.append(f"table scan found {len(legacy)} calculations")
+
+        engine = RecordingEngine(str(tmp / "db" / "materials.db"), str(tmp / "work"))
+        start = time.perf_counter()
+        engine.process_completed_calculations()
+        outbox_time = time.perf_counter() - start
+        if sorted(engine.processed) != expected:
+            problems.append(f"outbox delivered {len(engine.processed)} calculations")
+
+        # Nothing left: a second run reads no events, the scan finds no calculations
+        start = time.perf_counter()
+        engine.process_completed_calculations()
+        idle_outbox = time.perf_counter() - start
+        start = time.perf_counter()
+        left = legacy_unprocessed(db)
+        idle_scan = time.perf_counter() - start
+        if left or db.count_pending_workflow_events():
+            problems.append(f"{len(left)} calculations / {db.count_pending_workflow_events()} events left")
+        if len(engine.processed) != args.new:
+            problems.append("events were delivered twice")
+
+        # Directory cleanup: a full walk before, a throttled check now
+        start = time.perf_counter()
+        engine._cleanup_failed_workflow_dirs()
+        walk_time = time.perf_counter() - start
+        start = time.perf_counter()
+        for _ in range(100):
+            engine._schedule_workflow_dir_cleanup()
+        throttled_time = (time.perf_counter() - start) / 100
+
+        # A database from before the outbox is backfilled with its unprocessed completions
+        db.close()
+        legacy_db_path = tmp / "db" / "materials.db"
+        conn = sqlite3.connect(str(legacy_db_path))
+        conn.execute("UPDATE calculations SET settings_json = '{}' WHERE calc_id IN ('calc_1', 'calc_2')")
+        conn.execute("UPDATE calculations SET settings_json = 'not json' WHERE calc_id = 'calc_3'")
+        conn.executescript("""
+            DROP TRIGGER trg_calculations_completed_event;
+            DROP TRIGGER trg_calculations_insert_completed_event;
+            DROP TABLE workflow_events;
+        """)
+        conn.commit()
+        conn.close()
+        migrated = MaterialDatabase(str(legacy_db_path))
+        backfilled = sorted(e['calc_id'] for e in migrated.claim_workflow_events('check', limit=1000))
+        if backfilled != ['calc_1', 'calc_2', 'calc_3']:
+            problems.append(f"backfill gave {backfilled[:10]}")
+        migrated.close()
+
+        print(f"\n{'':<36} {'table scan':>12} {'outbox':>12}")
+        print(f"{f'find {args.new} new completions':<36} {scan_time:>11.3f}s {outbox_time:>11.3f}s")
+        print(f"{'nothing to process':<36} {idle_scan:>11.3f}s {idle_outbox:>11.3f}s")
+        print(f"{'directory cleanup per step':<36} {walk_time:>11.4f}s {throttled_time:>11.6f}s"
+              f"  (walk vs throttled)")
+        print(f"\nDifferences: {len(problems)}")
+        for problem in problems[:10]:
+            print(f"  {problem}")
+        sys.exit(1 if problems else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -8,7 +8,9 @@ Author: Marcus Djokic
 Institution: Michigan State University, Mendoza Group
 """
 
+import argparse
 import os
+import re
 import pandas as pd
 
 # === Define known error and completion message patterns === #
@@ -31,6 +33,78 @@ ERROR_PATTERNS = {
     ],
 }
 
+# Shared CRYSTAL output readers (the --tail mode needs MACE to be importable)
+try:
+    from mace.utils.crystal_output_stream import compile_alternation, read_head_lines, read_tail_lines
+except ImportError:
+    compile_alternation = read_head_lines = read_tail_lines = None
+
+# All keywords matched at once (case-insensitive, like the per-keyword check)
+if compile_alternation is not None:
+    ERROR_RE = compile_alternation((keyword for keywords in ERROR_PATTERNS.values() for keyword in keywords),
+                                   re.IGNORECASE)
+else:
+    ERROR_RE = re.compile('|'.join(re.escape(keyword)
+                                   for keywords in ERROR_PATTERNS.values()
+                                   for keyword in keywords), re.IGNORECASE)
+
+parser = argparse.ArgumentParser(description="Categorize CRYSTAL .out files in the current directory")
+# --tail: read only the first and last 64 KB of each file, where CRYSTAL
+# writes its error and termination messages, and read the whole file only
+# when neither an error nor a completion message is found there
+parser.add_argument('--tail', action='store_true',
+                    help="read only the head and tail of each output file when they are conclusive")
+args = parser.parse_args()
+
+TAIL_ONLY = args.tail
+if TAIL_ONLY and read_tail_lines is None:
+    print("Warning: --tail needs the mace package to be importable; reading every file whole")
+    TAIL_ONLY = False
+
+def read_head_and_tail(file_name):
+    """Return (text, full_text) of the first and last 64 KB of the file; full_text if that is the whole file."""
+    # The tail is read backwards in blocks, stopping early at an error message
+    tail_lines, covers_file = read_tail_lines(file_name, stop_re=ERROR_RE)
+    if covers_file:
+        return ''.join(tail_lines), True
+    return ''.join(read_head_lines(file_name) + tail_lines), False
+
+
+def error_category(content):
+    """Return the category of the first line with a known error message, or None."""
+    match = ERROR_RE.search(content)
+    if match is None:
+        return None
+    content = content[content.rfind('\n', 0, match.start()) + 1:]
+    for line in content.lower().splitlines():
+        for category, keywords in ERROR_PATTERNS.items():
+            if any(keyword.lower() in line for keyword in keywords):
+                return category
+    return None
+
+
+def classify_text(content, full_text):
+    """Return the category for the text, or None if a tail-only read is inconclusive."""
+    # === Error pattern matching FIRST === #
+    category = error_category(content)
+    if category is not None:
+        return category
+
+    # === Completion checks only if no error found === #
+    if "OPT END" in content:
+        return 'complete'
+    elif "    TOTAL CPU TIME =" in content:
+        return 'completesp'
+
+    if not full_text:
+        return None
+
+    # === Fallback: Check for generic 'error' === #
+    if "error" in content.lower():
+        return 'unknown'
+    return 'ongoing'
+
+
 # === Initialize buckets === #
 categories = list(ERROR_PATTERNS.keys()) + ["complete", "completesp", "unknown", "ongoing"]
 result_buckets = {cat: pd.DataFrame(columns=["data_files"]) for cat in categories}
@@ -41,35 +115,17 @@ def categorize_output_file(file_name):
     temp_df = pd.DataFrame([[submit_name]], columns=["data_files"])
 
     try:
-        with open(file_name, 'r', errors='ignore') as f:
-            lines = f.readlines()
+        category = None
+        if TAIL_ONLY:
+            category = classify_text(*read_head_and_tail(file_name))
+        if category is None:
+            with open(file_name, 'r', errors='ignore') as f:
+                category = classify_text(f.read(), full_text=True)
     except Exception as e:
         print(f"Could not read file {file_name}: {e}")
         return
 
-    # === Error pattern matching FIRST === #
-    for line in lines:
-        for category, keywords in ERROR_PATTERNS.items():
-            if any(keyword.lower() in line.lower() for keyword in keywords):
-                result_buckets[category] = pd.concat([result_buckets[category], temp_df], ignore_index=True)
-                return
-
-    # === Completion checks only if no error found === #
-    has_opt_end = any("OPT END" in line for line in lines)
-    has_cpu_time = any("    TOTAL CPU TIME =" in line for line in lines)
-
-    if has_opt_end:
-        result_buckets['complete'] = pd.concat([result_buckets['complete'], temp_df], ignore_index=True)
-        return
-    elif has_cpu_time:
-        result_buckets['completesp'] = pd.concat([result_buckets['completesp'], temp_df], ignore_index=True)
-        return
-
-    # === Fallback: Check for generic 'error' === #
-    if any("error" in line.lower() for line in lines):
-        result_buckets['unknown'] = pd.concat([result_buckets['unknown'], temp_df], ignore_index=True)
-    else:
-        result_buckets['ongoing'] = pd.concat([result_buckets['ongoing'], temp_df], ignore_index=True)
+    result_buckets[category] = pd.concat([result_buckets[category], temp_df], ignore_index=True)
 
 
 # === Main loop: Process all .out files in directory === #
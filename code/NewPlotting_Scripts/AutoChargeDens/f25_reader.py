@@ -0,0 +1,254 @@
+# -*- coding: utf-8 -*-
+"""
+Vectorised fort.25 reader
+=========================
+Reads the data blocks CRYSTAL properties writes to fort.25 (MAPN charge
+density / potential maps from ECHG and POTM, BAND blocks, ...). Each block is
+
+    -%-0MAPN   nx   ny  dx  dy  ...     header: A3,I1,A4,2I5,3E12.5
+    <two lines of corner coordinates / metadata>
+    <nx*ny values, 6 per line, Fortran E12.5 fields>
+
+and a file may hold several blocks one after the other.
+
+The file is memory-mapped and each numeric block is decoded in one step: its
+lines are viewed as fixed 12-character fields (NumPy 'S12') and converted
+to float64 by NumPy, which also separates values whose signs run into each
+other (-4.41239E-10-6.33884E-10). Blocks that are not fixed-width fall back
+to a regular-expression tokenizer.
+
+Decoded values are cached in <file>.npy (all blocks, concatenated) with the
+block headers in <file>.npy.json, and reused while the fort.25 file keeps
+its size and modification time. Cached maps are memory-mapped views.
+
+Usage:
+    from f25_reader import read_f25
+    for fmap in read_f25('SnSe2.f25'):
+        print(fmap.tag, fmap.nx, fmap.ny, fmap.grid.shape)
+"""
+
+import os
+import re
+import json
+import mmap
+import math
+import numpy as np
+
+FIELD_WIDTH = 12
+FIELDS_PER_LINE = 6
+CACHE_VERSION = 1
+
+_FLOAT_RE = re.compile(rb'[+-]?(?:\d+\.?\d*|\.\d+)(?:[Ee][+-]?\d+)?')
+
+
+class F25Map:
+    """One data block of a fort.25 file."""
+
+    def __init__(self, tag, nx, ny, dx, dy, header, values):
+        self.tag = tag          # e.g. '-%-0MAPN', '-%-1BAND'
+        self.nx = nx
+        self.ny = ny
+        self.dx = dx            # increments as written (Angstrom for maps)
+        self.dy = dy
+        self.header = header    # header and the two lines after it
+        self.values = values    # 1-D array of nx*ny values, in file order
+
+    @property
+    def grid(self):
+        """Values as an (ny, nx) array (a view, no copy)."""
+        return self.values.reshape(-1, self.nx)
+
+    def __repr__(self):
+        return f"F25Map({self.tag!r}, nx={self.nx}, ny={self.ny})"
+
+
+def parse_header(line):
+    """(tag, nx, ny, dx, dy) from a block header line."""
+    tag = line[:8].strip()
+    try:
+        # Fixed columns: A3,I1,A4 then 2I5
+        nx, ny = int(line[8:13]), int(line[13:18])
+        floats = [float(x) for x in _FLOAT_RE.findall(line[18:].encode())]
+    except ValueError:
+        parts = line.split()
+        nx, ny = int(parts[1]), int(parts[2])
+        floats = [float(x) for x in parts[3:5]]
+    dx = floats[0] if len(floats) > 0 else 0.0
+    dy = floats[1] if len(floats) > 1 else 0.0
+    return tag, nx, ny, dx, dy
+
+
+def _decode_fixed(buf, start, n_values):
+    """
+    Decode n_values fixed-width fields starting at byte offset start.
+
+    Returns:
+        (values, end offset) or None if the block is not fixed-width
+    """
+    n_lines = math.ceil(n_values / FIELDS_PER_LINE)
+    n_full = n_values // FIELDS_PER_LINE
+    data_width = FIELD_WIDTH * FIELDS_PER_LINE
+
+    first_end = buf.find(b'\n', start)
+    if first_end < 0:
+        first_end = len(buf)
+    line_len = first_end - start + 1  # including the line ending
+    eol = 2 if first_end > start and buf[first_end - 1:first_end] == b'\r' else 1
+    if n_full and line_len - eol != data_width:
+        return None
+    if start + n_full * line_len > len(buf):
+        return None
+
+    parts = []
+    if n_full:
+        raw = np.frombuffer(buf, dtype=np.uint8, count=n_full * line_len, offset=start)
+        lines = raw.reshape(n_full, line_len)
+        if not (lines[:, -1] == ord('\n')).all():
+            return None
+        parts.append(lines[:, :data_width].copy().view(f'S{FIELD_WIDTH}').ravel())
+
+    end = start + n_full * line_len
+    remainder = n_values - n_full * FIELDS_PER_LINE
+    if remainder:
+        line_end = buf.find(b'\n', end)
+        if line_end < 0:
+            line_end = len(buf)
+        last = bytes(buf[end:line_end]).rstrip(b'\r')
+        if len(last) < remainder * FIELD_WIDTH:
+            return None
+        parts.append(np.frombuffer(last[:remainder * FIELD_WIDTH], dtype=f'S{FIELD_WIDTH}'))
+        end = line_end + 1
+    if n_lines == 0:
+        return np.empty(0), start
+
+    fields = np.concatenate(parts)
+    try:
+        return fields.astype(np.float64), end
+    except ValueError:
+        return None
+
+
+def _decode_tokens(buf, start, n_values):
+    """Decode n_values numbers of free-format lines starting at byte offset start."""
+    n_lines = math.ceil(n_values / FIELDS_PER_LINE)
+    end = start
+    for _ in range(n_lines):
+        line_end = buf.find(b'\n', end)
+        if line_end < 0:
+            end = len(buf)
+            break
+        end = line_end + 1
+    tokens = _FLOAT_RE.findall(bytes(buf[start:end]))
+    values = np.array(tokens, dtype=np.float64) if tokens else np.empty(0)
+    return values, end
+
+
+def parse_f25(buf):
+    """Decode every block of a fort.25 file held in a bytes-like buffer."""
+    maps = []
+    pos = 0
+    while True:
+        start = buf.find(b'-%-', pos)
+        if start < 0:
+            break
+        if start > 0 and buf[start - 1:start] != b'\n':
+            pos = start + 3
+            continue
+
+        # Header and the two coordinate lines
+        offsets = [start]
+        for _ in range(3):
+            line_end = buf.find(b'\n', offsets[-1])
+            if line_end < 0:
+                return maps
+            offsets.append(line_end + 1)
+        header_lines = bytes(buf[start:offsets[3]]).decode('ascii', errors='replace').splitlines()
+        tag, nx, ny, dx, dy = parse_header(header_lines[0])
+        n_values = nx * ny
+
+        decoded = _decode_fixed(buf, offsets[3], n_values)
+        if decoded is None:
+            decoded = _decode_tokens(buf, offsets[3], n_values)
+        values, end = decoded
+        if len(values) != n_values:
+            print(f"Warning: {tag} block has {len(values)} values, expected {nx}x{ny}={n_values}")
+        maps.append(F25Map(tag, nx, ny, dx, dy, header_lines, values))
+        pos = max(end, offsets[3])
+    return maps
+
+
+def _cache_paths(path, cache_dir=None):
+    directory = cache_dir or os.path.dirname(os.path.abspath(path))
+    base = os.path.join(directory, os.path.basename(path))
+    return base + '.npy', base + '.npy.json'
+
+
+def _source_signature(path):
+    stat = os.stat(path)
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+
+def _load_cache(path, cache_dir=None):
+    values_path, index_path = _cache_paths(path, cache_dir)
+    try:
+        with open(index_path) as f:
+            index = json.load(f)
+        if index.get('version') != CACHE_VERSION or index.get('source') != _source_signature(path):
+            return None
+        values = np.load(values_path, mmap_mode='r')
+    except (OSError, ValueError):
+        return None
+    maps = []
+    for block in index['maps']:
+        block_values = values[block['offset']:block['offset'] + block['count']]
+        maps.append(F25Map(block['tag'], block['nx'], block['ny'], block['dx'], block['dy'],
+                           block['header'], block_values))
+    return maps
+
+
+def _save_cache(path, maps, cache_dir=None):
+    values_path, index_path = _cache_paths(path, cache_dir)
+    blocks, offset = [], 0
+    for fmap in maps:
+        blocks.append({'tag': fmap.tag, 'nx': fmap.nx, 'ny': fmap.ny, 'dx': fmap.dx, 'dy': fmap.dy,
+                       'header': fmap.header, 'offset': offset, 'count': len(fmap.values)})
+        offset += len(fmap.values)
+    values = np.concatenate([fmap.values for fmap in maps]) if maps else np.empty(0)
+    try:
+        tmp_path = values_path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            np.save(f, values)
+        os.replace(tmp_path, values_path)
+        with open(index_path + '.tmp', 'w') as f:
+            json.dump({'version': CACHE_VERSION, 'source': _source_signature(path), 'maps': blocks}, f)
+        os.replace(index_path + '.tmp', index_path)
+    except OSError as e:
+        print(f"Warning: Could not write fort.25 cache for {path}: {e}")
+
+
+def read_f25(path, cache=True, cache_dir=None):
+    """
+    Read every data block of a fort.25 file.
+
+    Args:
+        path: fort.25 / .f25 file
+        cache: Reuse and write the decoded .npy cache next to the file
+        cache_dir: Directory for the cache files (default: the file's directory)
+
+    Returns:
+        List of F25Map, in file order
+    """
+    if cache:
+        maps = _load_cache(path, cache_dir)
+        if maps is not None:
+            return maps
+
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return []
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+            maps = parse_f25(buf)
+
+    if cache:
+        _save_cache(path, maps, cache_dir)
+    return maps
@@ -2,7 +2,6 @@
 
 import matplotlib.pyplot as plt
 import numpy as np
-import math
 import os
 import glob
 import itertools
@@ -10,6 +9,8 @@ from mpl_toolkits.axes_grid1 import make_axes_locatable
 import time
 import re
 
+from f25_reader import read_f25
+
 def parse_concatenated_floats(s):
     """
     Parse a string that may contain concatenated scientific notation numbers.
@@ -23,47 +24,16 @@ def parse_concatenated_floats(s):
     return matches
 
 def getdataf25(fort25):
-    data = []
-    with open(fort25) as f:
-        for i,line in enumerate(f):
-            if i == 0:
-                # Parse the first line to get nx, ny, and pixel increments
-                parts = line.split()
-                nx = int(parts[1])
-                ny = int(parts[2])
-                dx_angstrom = float(parts[3])  # increment in x (Angstrom)
-                dy_angstrom = float(parts[4])  # increment in y (Angstrom)
-                # Convert from Angstrom to nanometers (1 Å = 0.1 nm)
-                dx_nm = dx_angstrom * 0.1
-                dy_nm = dy_angstrom * 0.1
-                nlines = math.ceil(nx*ny/6)
-            if i > 2 and i <= nlines+2:
-                # First try normal splitting
-                parts = line.split()
-                parsed_parts = []
-                for part in parts:
-                    try:
-                        # Try to convert directly
-                        float(part)
-                        parsed_parts.append(part)
-                    except ValueError:
-                        # If it fails, it might be concatenated numbers
-                        separated = parse_concatenated_floats(part)
-                        if separated:
-                            parsed_parts.extend(separated)
-                        else:
-                            # If parsing fails, keep the original
-                            parsed_parts.append(part)
-                data.extend(parsed_parts)
-    
-    # Convert all parsed values to float
-    data_vect = []
-    for x in data:
-        try:
-            data_vect.append(float(x))
-        except ValueError:
-            print(f"Warning: Could not convert '{x}' to float, skipping...")
-            continue
+    # Vectorised fixed-width decode of the first map, cached as .npy (see f25_reader)
+    maps = read_f25(fort25)
+    if not maps:
+        raise ValueError(f"{fort25}: no data block (-%-...MAPN header) found, is it an empty fort.25?")
+    fmap = maps[0]
+    nx, ny = fmap.nx, fmap.ny
+    # Convert from Angstrom to nanometers (1 Å = 0.1 nm)
+    dx_nm = fmap.dx * 0.1
+    dy_nm = fmap.dy * 0.1
+    data_vect = fmap.values
     mean = np.mean(data_vect)
     std = np.std(data_vect)
     min = mean-std
@@ -75,11 +45,9 @@ def getdataf25(fort25):
     return(data_vect, nx, ny, max, min, dx_nm, dy_nm)
 
 def formatf25(material, data_vect, nx):
-    data_matrix = [data_vect[i:i+nx] for i in range(0,len(data_vect),nx)]
-    data_matrix = np.matrix(data_matrix)
+    data_matrix = np.asarray(data_vect).reshape(-1, nx)
     with open(material+'_matrix.txt','w+') as f:
-        for line in data_matrix:
-            np.savetxt(f, line, fmt='%.10f')
+        np.savetxt(f, data_matrix, fmt='%.10f')
     return(data_matrix)
 
 def plot_f25(data, nx, ny, dx_nm, dy_nm, vmin=None, vmax=None, dpi=200, save=False, save_name=None):
@@ -132,17 +100,22 @@ def plot_f25(data, nx, ny, dx_nm, dy_nm, vmin=None, vmax=None, dpi=200, save=Fal
     plt.close(fig)
     
 # Main execution
-DIR = (os.getcwd()+'/')
-pathlist = glob.glob(DIR+'*.f25')
-nDIR = len(DIR)
-ntype = len('.f25')
+if __name__ == "__main__":
+    DIR = (os.getcwd()+'/')
+    pathlist = glob.glob(DIR+'*.f25')
+    nDIR = len(DIR)
+    ntype = len('.f25')
 
-for path in pathlist:
-    material = str(path[nDIR:-ntype])
-    print(f"Processing: {material}")
-    data_vect, nx, ny, max, min, dx_nm, dy_nm = getdataf25(str(path))
-    print(f"  Grid: {nx}×{ny} pixels")
-    print(f"  Pixel size: {dx_nm:.4f}×{dy_nm:.4f} nm")
-    print(f"  Total size: {nx*dx_nm:.2f}×{ny*dy_nm:.2f} nm²")
-    data_matrix = formatf25(material, data_vect, nx)
-    plot_f25(data_matrix, nx, ny, dx_nm, dy_nm, vmin=min, vmax=max, dpi=200, save=False, save_name=material)
+    for path in pathlist:
+        material = str(path[nDIR:-ntype])
+        print(f"Processing: {material}")
+        try:
+            data_vect, nx, ny, max, min, dx_nm, dy_nm = getdataf25(str(path))
+        except ValueError as e:
+            print(f"  Skipped: {e}")
+            continue
+        print(f"  Grid: {nx}×{ny} pixels")
+        print(f"  Pixel size: {dx_nm:.4f}×{dy_nm:.4f} nm")
+        print(f"  Total size: {nx*dx_nm:.2f}×{ny*dy_nm:.2f} nm²")
+        data_matrix = formatf25(material, data_vect, nx)
+        plot_f25(data_matrix, nx, ny, dx_nm, dy_nm, vmin=min, vmax=max, dpi=200, save=False, save_name=material)
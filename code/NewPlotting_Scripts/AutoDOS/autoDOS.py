@@ -22,6 +22,7 @@ import matplotlib.pyplot as plt
 import sqlite3
 import json
 import re
+from pathlib import Path
 from typing import Dict, List, Tuple, Optional
 
 def parse_projection_labels(file_content_preview: str) -> List[str]:
@@ -108,6 +109,64 @@ def parse_dos_energy_range(file_content_preview: str) -> Optional[Tuple[float, f
     
     return None
 
+def load_stored_array(cursor, db_path: str, calc_id: str, name: str) -> Tuple[Optional[np.ndarray], Optional[List[str]]]:
+    """
+    Memory-map an array from the MACE array store (calculation_arrays index
+    and .npy files next to the database).
+    
+    Returns:
+        (array, row labels), or (None, None) if the array is not stored
+    """
+    try:
+        cursor.execute("""
+            SELECT file_path, labels_json
+            FROM calculation_arrays
+            WHERE calc_id = ? AND array_name = ?
+        """, (calc_id, name))
+    except sqlite3.OperationalError:
+        return None, None  # Database created before the array store
+    
+    result = cursor.fetchone()
+    if not result:
+        return None, None
+    
+    file_path = Path(result[0])
+    if not file_path.is_absolute():
+        file_path = Path(db_path).resolve().parent / file_path
+    if not file_path.exists():
+        print(f"Warning: Stored array file missing: {file_path}")
+        return None, None
+    
+    labels = json.loads(result[1]) if result[1] else None
+    return np.load(file_path, mmap_mode='r', allow_pickle=False), labels
+
+
+def load_json_property(cursor, calc_id: str, name: str):
+    """
+    Load a property stored as JSON text (databases written before the array store).
+    
+    Returns:
+        The decoded value, or None if the property does not exist
+    
+    Raises:
+        ValueError: if the row only references an array store file that is missing
+    """
+    cursor.execute("""
+        SELECT property_value_text
+        FROM properties
+        WHERE calc_id = ? AND property_name = ?
+    """, (calc_id, name))
+    
+    result = cursor.fetchone()
+    if not result or not result[0]:
+        return None
+    
+    values = json.loads(result[0])
+    if isinstance(values, dict) and 'array_store' in values:
+        raise ValueError(f"Array file missing for {name} of calculation {calc_id} "
+                         f"(the database only holds a reference to it)")
+    return values
+
 def get_dos_data(db_path: str, material_id: str) -> Tuple[np.ndarray, np.ndarray, Dict[str, np.ndarray], List[str], float, Optional[Tuple[float, float]]]:
     """
     Retrieve DOS data from the SQLite database.
@@ -160,18 +219,14 @@ def get_dos_data(db_path: str, material_id: str) -> Tuple[np.ndarray, np.ndarray
         # Parse energy range if specified in DOSS input
         energy_range = parse_dos_energy_range(input_settings.get('file_content_preview', ''))
         
-        # Get energy points
-        cursor.execute("""
-            SELECT property_value_text
-            FROM properties
-            WHERE calc_id = ? AND property_name = 'energy_points'
-        """, (calc_id,))
-        
-        result = cursor.fetchone()
-        if not result:
-            raise ValueError(f"No energy_points found for calculation {calc_id}")
-        
-        energy_points = np.array(json.loads(result[0]))
+        # Get energy points (array store first, JSON text in older databases)
+        energy_points, _ = load_stored_array(cursor, db_path, calc_id, 'energy_points')
+        if energy_points is None:
+            values = load_json_property(cursor, calc_id, 'energy_points')
+            if values is None:
+                raise ValueError(f"No energy_points found for calculation {calc_id}")
+            
+            energy_points = np.array(values)
         
         # If energy range was specified in DOSS input, the energy points might be in Hartree
         # Check if the energy points match the Hartree range
@@ -186,27 +241,23 @@ def get_dos_data(db_path: str, material_id: str) -> Tuple[np.ndarray, np.ndarray
                 energy_points = energy_points * 27.2114
         
         # Get total DOS
-        cursor.execute("""
-            SELECT property_value_text
-            FROM properties
-            WHERE calc_id = ? AND property_name = 'total_dos'
-        """, (calc_id,))
-        
-        result = cursor.fetchone()
-        if not result:
-            # Try alternative property names
-            cursor.execute("""
-                SELECT DISTINCT property_name 
-                FROM properties 
-                WHERE calc_id = ? AND property_name LIKE '%total%dos%'
-            """, (calc_id,))
+        total_dos, _ = load_stored_array(cursor, db_path, calc_id, 'total_dos')
+        if total_dos is None:
+            values = load_json_property(cursor, calc_id, 'total_dos')
+            if values is None:
+                # Try alternative property names
+                cursor.execute("""
+                    SELECT DISTINCT property_name 
+                    FROM properties 
+                    WHERE calc_id = ? AND property_name LIKE '%total%dos%'
+                """, (calc_id,))
+                
+                alternatives = cursor.fetchall()
+                if alternatives:
+                    print(f"No 'total_dos' found. Available alternatives: {[alt[0] for alt in alternatives]}")
+                raise ValueError(f"No total_dos found for calculation {calc_id}")
             
-            alternatives = cursor.fetchall()
-            if alternatives:
-                print(f"No 'total_dos' found. Available alternatives: {[alt[0] for alt in alternatives]}")
-            raise ValueError(f"No total_dos found for calculation {calc_id}")
-        
-        total_dos = np.array(json.loads(result[0]))
+            total_dos = np.array(values)
         print(f"Total DOS shape: {total_dos.shape}, min: {np.min(total_dos):.4f}, max: {np.max(total_dos):.4f}")
         
         # Additional diagnostics for total DOS
@@ -215,21 +266,18 @@ def get_dos_data(db_path: str, material_id: str) -> Tuple[np.ndarray, np.ndarray
         n_zero = np.sum(total_dos == 0)
         print(f"Total DOS breakdown: {n_positive} positive, {n_negative} negative, {n_zero} zero values")
         
-        total_dos = np.array(json.loads(result[0]))
-        
         # Get projected DOS
-        cursor.execute("""
-            SELECT property_value_text
-            FROM properties
-            WHERE calc_id = ? AND property_name = 'projected_dos'
-        """, (calc_id,))
+        projected_array, projected_labels = load_stored_array(cursor, db_path, calc_id, 'projected_dos')
+        if projected_array is not None:
+            # One row per projected_dos_N column
+            projected_dos_data = dict(zip(projected_labels or [], projected_array))
+        else:
+            projected_dos_data = load_json_property(cursor, calc_id, 'projected_dos')
         
-        result = cursor.fetchone()
-        if not result:
+        if projected_dos_data is None:
             print(f"Warning: No projected_dos found for calculation {calc_id}")
             projections = {}
         else:
-            projected_dos_data = json.loads(result[0])
             
             # Map the generic projected_dos_N keys to actual labels
             projections = {}
@@ -251,11 +299,11 @@ def get_dos_data(db_path: str, material_id: str) -> Tuple[np.ndarray, np.ndarray
                 for i, (num, dos_values) in enumerate(dos_items):
                     if i + 1 < len(labels):  # +1 because we skip 'Energy (eV)'
                         label = labels[i + 1]
-                        projections[label] = np.array(dos_values)
+                        projections[label] = np.asarray(dos_values)
                         print(f"Mapped projected_dos_{num} -> {label}")
                         
                         # Show stats for each projection
-                        dos_array = np.array(dos_values)
+                        dos_array = projections[label]
                         n_pos = np.sum(dos_array > 0)
                         n_neg = np.sum(dos_array < 0)
                         print(f"  Stats: {n_pos} positive, {n_neg} negative values, max: {np.max(np.abs(dos_array)):.4f}")
@@ -264,7 +312,7 @@ def get_dos_data(db_path: str, material_id: str) -> Tuple[np.ndarray, np.ndarray
                 # If it's a list, map directly to labels
                 for i, dos_values in enumerate(projected_dos_data):
                     if i + 1 < len(labels):  # Skip energy label
-                        projections[labels[i + 1]] = np.array(dos_values)
+                        projections[labels[i + 1]] = np.asarray(dos_values)
         
         # Get Fermi energy
         cursor.execute("""
@@ -2,51 +2,90 @@
 MACE Database Module
 ====================
 Material tracking database with workflow isolation support.
+
+The public names below are loaded on first access, so importing
+mace.database.materials (as every job-end callback does) does not pull in
+numpy and the analysis, export and interactive subpackages.
 """
 
-# Core database classes
-from .materials import MaterialDatabase
-from .materials_contextual import ContextualMaterialDatabase, get_contextual_database
+import importlib
+
+# Public name -> submodule that defines it
+_LAZY_IMPORTS = {
+    # Core database classes
+    'MaterialDatabase': '.materials',
+    'ContextualMaterialDatabase': '.materials_contextual',
+    'get_contextual_database': '.materials_contextual',
+    'ArrayStore': '.array_store',
+    'load_property_array': '.array_store',
+    'MaterialCalcIndex': '.calc_index',
+    # Query functionality
+    'PropertyFilter': '.query',
+    'parse_filter_string': '.query',
+    'AdvancedFilterParser': '.query',
+    'parse_advanced_filter': '.query',
+    'evaluate_advanced_filter': '.query',
+    'compile_advanced_filter': '.query',
+    'compile_property_filter': '.query',
+    'query_materials': '.query',
+    'execute_custom_query': '.query',
+    # Analysis tools
+    'MaterialComparison': '.analysis',
+    'compare_materials': '.analysis',
+    'MissingDataAnalyzer': '.analysis',
+    'analyze_missing_data': '.analysis',
+    'PropertyCorrelation': '.analysis',
+    'calculate_property_correlations': '.analysis',
+    'PropertyDistribution': '.analysis',
+    'analyze_property_distributions': '.analysis',
+    'WorkflowProgress': '.analysis',
+    'track_workflow_progress': '.analysis',
+    'PropertyAggregator': '.analysis',
+    'aggregate_by_groups': '.analysis',
+    # Export functionality
+    'ExportFormatter': '.export',
+    'export_materials': '.export',
+    'VisualizationExporter': '.export',
+    # Utilities
+    'UnitConverter': '.utils',
+    'convert_units': '.utils',
+    'get_property_units': '.utils',
+    'get_default_unit': '.utils',
+    'parse_value_with_unit': '.utils',
+    'format_value_with_unit': '.utils',
+    'PropertyValidator': '.utils',
+    'DatabaseValidator': '.utils',
+    'validate_materials': '.utils',
+    'PropertyHistory': '.utils',
+    # Interactive explorer
+    'DatabaseExplorer': '.interactive',
+    'run_interactive_explorer': '.interactive',
+}
 
-# Query functionality
-from .query import (
-    PropertyFilter, parse_filter_string,
-    AdvancedFilterParser, parse_advanced_filter, evaluate_advanced_filter,
-    query_materials, execute_custom_query
-)
 
-# Analysis tools
-from .analysis import (
-    MaterialComparison, compare_materials,
-    MissingDataAnalyzer, analyze_missing_data,
-    PropertyCorrelation, calculate_property_correlations,
-    PropertyDistribution, analyze_property_distributions,
-    WorkflowProgress, track_workflow_progress,
-    PropertyAggregator, aggregate_by_groups
-)
+def __getattr__(name):
+    if name in _LAZY_IMPORTS:
+        value = getattr(importlib.import_module(_LAZY_IMPORTS[name], __name__), name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
-# Export functionality
-from .export import ExportFormatter, export_materials, VisualizationExporter
 
-# Utilities
-from .utils import (
-    UnitConverter, convert_units, get_property_units, get_default_unit,
-    parse_value_with_unit, format_value_with_unit,
-    PropertyValidator, DatabaseValidator, validate_materials,
-    PropertyHistory
-)
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY_IMPORTS))
 
-# Interactive explorer
-from .interactive import DatabaseExplorer, run_interactive_explorer
 
 __all__ = [
     # Core database
     'MaterialDatabase',
-    'ContextualMaterialDatabase', 
+    'ContextualMaterialDatabase',
     'get_contextual_database',
+    'ArrayStore', 'load_property_array',
+    'MaterialCalcIndex',
     # Query
     'PropertyFilter', 'parse_filter_string',
     'AdvancedFilterParser', 'parse_advanced_filter', 'evaluate_advanced_filter',
+    'compile_advanced_filter', 'compile_property_filter',
     'query_materials', 'execute_custom_query',
     # Analysis
     'MaterialComparison', 'compare_materials',
@@ -64,4 +103,4 @@ __all__ = [
     'PropertyHistory',
     # Interactive
     'DatabaseExplorer', 'run_interactive_explorer'
-]
\ No newline at end of file
+]
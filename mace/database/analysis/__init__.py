@@ -10,10 +10,12 @@ from .correlation import PropertyCorrelation, calculate_property_correlations
 from .distribution import PropertyDistribution, analyze_property_distributions
 from .workflow_progress import WorkflowProgress, track_workflow_progress
 from .aggregation import PropertyAggregator, aggregate_by_groups
+from .property_matrix import PropertyMatrix, PropertyMatrixCache, get_property_matrix
 
 __all__ = ['MaterialComparison', 'compare_materials', 
            'MissingDataAnalyzer', 'analyze_missing_data',
            'PropertyCorrelation', 'calculate_property_correlations',
            'PropertyDistribution', 'analyze_property_distributions',
            'WorkflowProgress', 'track_workflow_progress',
-           'PropertyAggregator', 'aggregate_by_groups']
\ No newline at end of file
+           'PropertyAggregator', 'aggregate_by_groups',
+           'PropertyMatrix', 'PropertyMatrixCache', 'get_property_matrix']
\ No newline at end of file
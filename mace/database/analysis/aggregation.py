@@ -2,13 +2,108 @@
 Property Aggregation by Groups
 ===============================
 Aggregate and analyze properties by material groups.
+
+Grouping and aggregation run inside SQLite: the grouping key (crystal system
+from the space group, first element of the formula, latest calculation type,
+band gap range, ...) is a SQL expression, each property value is a
+correlated subquery, and count/mean/min/max/stdev come from one GROUP BY.
+Median, percentile and sample standard deviation are registered as SQLite
+aggregates (register_aggregate_functions). Only one row per group is
+returned to Python.
+
+With pushdown=False the same results are computed in Python from the
+columnar property cache.
+
+Usage:
+    aggregator = PropertyAggregator(db)
+    results = aggregator.aggregate_by_group('crystal_system', ['band_gap'], 'median',
+                                            filters=['space_group > 200'])
 """
 
 from typing import List, Dict, Any, Optional, Callable, Tuple
 import json
+import math
+import sqlite3
 import statistics
 from collections import defaultdict
 
+from mace.database.analysis.property_matrix import PropertyMatrix, get_property_matrix, numeric_property_value
+
+
+def percentile(values: List[float], p: float) -> Optional[float]:
+    """Percentile (0-100) of a list of numbers, linearly interpolated between ranks."""
+    ordered = sorted(values)
+    if not ordered:
+        return None
+    k = (len(ordered) - 1) * p / 100.0
+    lower = int(math.floor(k))
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (k - lower)
+
+
+class _CollectAggregate:
+    """SQLite aggregate base class that collects the non-NULL values of a group."""
+
+    def __init__(self):
+        self.values = []
+
+    def step(self, value):
+        if value is not None:
+            self.values.append(value)
+
+
+class _MedianAggregate(_CollectAggregate):
+    def finalize(self):
+        return statistics.median(self.values) if self.values else None
+
+
+class _StdevAggregate(_CollectAggregate):
+    def finalize(self):
+        return statistics.stdev(self.values) if len(self.values) > 1 else None
+
+
+class _PercentileAggregate(_CollectAggregate):
+    p = 50.0
+
+    def step(self, value, p):
+        super().step(value)
+        self.p = p
+
+    def finalize(self):
+        return percentile(self.values, self.p)
+
+
+def register_aggregate_functions(conn: sqlite3.Connection):
+    """Register mace_median, mace_stdev, mace_percentile and mace_numeric on a connection."""
+    conn.create_aggregate('mace_median', 1, _MedianAggregate)
+    conn.create_aggregate('mace_stdev', 1, _StdevAggregate)
+    conn.create_aggregate('mace_percentile', 2, _PercentileAggregate)
+    try:
+        conn.create_function('mace_numeric', 2, numeric_property_value, deterministic=True)
+    except (TypeError, sqlite3.NotSupportedError):
+        # Python < 3.8 or SQLite < 3.8.3
+        conn.create_function('mace_numeric', 2, numeric_property_value)
+
+
+# Numeric value of a properties row, as in the columnar property cache
+_ROW_NUMERIC = ("(CASE WHEN typeof(property_value) IN ('real', 'integer') THEN property_value "
+                "ELSE mace_numeric(property_value, property_value_text) END)")
+
+# Last numeric row of a property of material m (same value as the property cache)
+_PROPERTY_NUMERIC = (f"(SELECT {_ROW_NUMERIC} FROM properties "
+                     f"WHERE material_id = m.material_id AND property_name = ? AND {_ROW_NUMERIC} IS NOT NULL "
+                     f"ORDER BY property_category DESC, property_id DESC LIMIT 1)")
+
+# First row of a property of material m with the text value standing in for NULL
+_PROPERTY_FIRST = ("(SELECT CASE WHEN property_value IS NULL AND property_value_text != '' "
+                   "THEN property_value_text ELSE property_value END FROM properties "
+                   "WHERE material_id = m.material_id AND property_name = ? "
+                   "ORDER BY property_category, property_id LIMIT 1)")
+
+# Latest calculation of material m
+_LATEST_CALCULATION = ("(SELECT {column} FROM calculations WHERE material_id = m.material_id "
+                       "ORDER BY created_at DESC, rowid DESC LIMIT 1)")
+
 
 class PropertyAggregator:
     """Aggregates properties by material groups."""
@@ -35,7 +130,27 @@ class PropertyAggregator:
         'sum': sum,
         'count': len,
         'stdev': lambda x: statistics.stdev(x) if len(x) > 1 else 0,
-        'range': lambda x: max(x) - min(x) if x else 0
+        'range': lambda x: max(x) - min(x) if x else 0,
+        'p10': lambda x: percentile(x, 10),
+        'p25': lambda x: percentile(x, 25),
+        'p75': lambda x: percentile(x, 75),
+        'p90': lambda x: percentile(x, 90)
+    }
+    
+    # The same functions as SQLite aggregate expressions over a value column
+    SQL_AGGREGATES = {
+        'mean': 'AVG({v})',
+        'median': 'mace_median({v})',
+        'min': 'MIN({v})',
+        'max': 'MAX({v})',
+        'sum': 'SUM({v})',
+        'count': 'COUNT({v})',
+        'stdev': 'COALESCE(mace_stdev({v}), 0)',
+        'range': 'MAX({v}) - MIN({v})',
+        'p10': 'mace_percentile({v}, 10)',
+        'p25': 'mace_percentile({v}, 25)',
+        'p75': 'mace_percentile({v}, 75)',
+        'p90': 'mace_percentile({v}, 90)'
     }
     
     def __init__(self, db):
@@ -49,7 +164,8 @@ class PropertyAggregator:
         
     def aggregate_by_group(self, group_by: str, properties: List[str],
                          aggregation: str = 'mean',
-                         filters: List[str] = None) -> Dict[str, Any]:
+                         filters: List[str] = None,
+                         pushdown: bool = True) -> Dict[str, Any]:
         """
         Aggregate properties by specified grouping.
         
@@ -57,40 +173,31 @@ class PropertyAggregator:
             group_by: Grouping criterion
             properties: Properties to aggregate
             aggregation: Aggregation function (mean, median, min, max, etc.)
-            filters: Optional property filters
+            filters: Optional filter expressions (advanced filter syntax), combined with AND
+            pushdown: Group and aggregate inside SQLite (False computes in Python)
             
         Returns:
             Aggregation results
         """
+        expression = " AND ".join(f"({f})" for f in filters) if filters else None
+        
+        if pushdown:
+            try:
+                return self._aggregate_sql(group_by, properties, aggregation, expression)
+            except sqlite3.Error as e:
+                print(f"Warning: SQL aggregation failed, using Python aggregation: {e}")
+                
         # Get all materials
         materials = self.db.get_all_materials()
         
         # Apply filters if provided
-        if filters:
-            from ..query.filters import PropertyFilter
-            filter_obj = PropertyFilter()
-            for filter_str in filters:
-                # Parse filter string
-                parts = filter_str.split()
-                if len(parts) >= 3:
-                    prop = parts[0]
-                    op = parts[1]
-                    val = ' '.join(parts[2:])
-                    try:
-                        val = float(val)
-                    except ValueError:
-                        pass
-                    filter_obj.add_filter(prop, op, val)
-                    
-            # Filter materials
-            filtered_materials = []
-            for mat in materials:
-                if filter_obj.matches(mat['material_id'], self.db):
-                    filtered_materials.append(mat)
-            materials = filtered_materials
+        if expression:
+            matching = {m['material_id'] for m in self.db.filter_materials_advanced(expression, pushdown=False)}
+            materials = [m for m in materials if m['material_id'] in matching]
             
         # Group materials
-        groups = self._group_materials(materials, group_by)
+        matrix = get_property_matrix(self.db)
+        groups = self._group_materials(materials, group_by, matrix)
         
         # Aggregate properties for each group
         results = {
@@ -104,7 +211,7 @@ class PropertyAggregator:
         
         for group_name, material_ids in groups.items():
             group_data = self._aggregate_group(
-                group_name, material_ids, properties, aggregation
+                group_name, material_ids, properties, aggregation, matrix
             )
             results['groups'][group_name] = group_data
             
@@ -113,9 +220,175 @@ class PropertyAggregator:
         
         return results
         
-    def _group_materials(self, materials: List[Dict], group_by: str) -> Dict[str, List[str]]:
+    def _group_expression(self, group_by: str) -> Tuple[str, List[Any], str]:
+        """
+        SQL for a grouping criterion, evaluated in two steps: the inner
+        expression (over materials m) computes a raw value g once per material,
+        the outer expression maps g to the group name.
+        
+        Returns:
+            (inner SQL, inner parameters, outer SQL)
+        """
+        if group_by == 'space_group':
+            return "m.space_group", [], "COALESCE(CAST(g AS TEXT), 'None')"
+            
+        if group_by == 'crystal_system':
+            systems = [(1, 2, 'triclinic'), (3, 15, 'monoclinic'), (16, 74, 'orthorhombic'),
+                       (75, 142, 'tetragonal'), (143, 167, 'trigonal'), (168, 194, 'hexagonal'),
+                       (195, 230, 'cubic')]
+            cases = " ".join(f"WHEN g BETWEEN {low} AND {high} THEN '{name}'" for low, high, name in systems)
+            return "m.space_group", [], f"CASE WHEN g IS NULL OR g = 0 OR g = '' THEN 'Unknown' {cases} ELSE 'unknown' END"
+            
+        if group_by == 'formula_prefix':
+            return "m.formula", [], ("CASE WHEN g GLOB '[A-Z][a-z]*' THEN substr(g, 1, 2) "
+                                     "WHEN g GLOB '[A-Z]*' THEN substr(g, 1, 1) ELSE 'Unknown' END")
+            
+        if group_by == 'conductivity_type':
+            return _PROPERTY_FIRST, ['conductivity_type'], \
+                "CASE WHEN g IS NULL OR g = '' OR g = 0 THEN 'Unknown' ELSE g END"
+                
+        if group_by == 'band_gap_range':
+            return _PROPERTY_NUMERIC, ['band_gap'], (
+                "CASE WHEN g IS NULL THEN 'No band gap data' "
+                "WHEN g < 0.1 THEN 'Metal (< 0.1 eV)' "
+                "WHEN g < 1.5 THEN 'Small gap (0.1-1.5 eV)' "
+                "WHEN g < 3.0 THEN 'Medium gap (1.5-3.0 eV)' "
+                "WHEN g < 6.0 THEN 'Large gap (3.0-6.0 eV)' "
+                "ELSE 'Very large gap (> 6.0 eV)' END")
+                
+        if group_by == 'energy_range':
+            return _PROPERTY_NUMERIC, ['total_energy'], (
+                "CASE WHEN g IS NULL THEN 'No energy data' "
+                "WHEN g > 0 THEN 'Positive energy' "
+                "WHEN g > -100 THEN 'High energy (-100 to 0)' "
+                "WHEN g > -1000 THEN 'Medium energy (-1000 to -100)' "
+                "ELSE 'Low energy (< -1000)' END")
+                
+        if group_by == 'atoms_range':
+            return _PROPERTY_NUMERIC, ['atoms_in_unit_cell'], (
+                "CASE WHEN g IS NULL THEN 'No atom count data' "
+                "WHEN CAST(g AS INTEGER) <= 10 THEN 'Small (≤ 10 atoms)' "
+                "WHEN CAST(g AS INTEGER) <= 50 THEN 'Medium (11-50 atoms)' "
+                "WHEN CAST(g AS INTEGER) <= 200 THEN 'Large (51-200 atoms)' "
+                "ELSE 'Very large (> 200 atoms)' END")
+                
+        if group_by == 'calculation_type':
+            return _LATEST_CALCULATION.format(column='calc_type'), [], "COALESCE(g, 'No calculations')"
+            
+        if group_by == 'convergence_status':
+            return _LATEST_CALCULATION.format(column='status'), [], "COALESCE(g, 'No calculations')"
+            
+        return "NULL", [], "'Unknown'"
+        
+    def _aggregate_sql(self, group_by: str, properties: List[str], aggregation: str,
+                       expression: Optional[str]) -> Dict[str, Any]:
+        """aggregate_by_group() as a single GROUP BY query."""
+        from mace.database.query.advanced_filters import AdvancedFilterParser
+        from mace.database.query.sql_filters import compile_advanced_filter, register_filter_functions
+        
+        inner_group, params, outer_group = self._group_expression(group_by)
+        value_columns = [f"{_PROPERTY_NUMERIC} AS v{i}" for i in range(len(properties))]
+        params += list(properties)
+        
+        # Restrict to the filtered materials, in SQL when the filter compiles
+        where = ""
+        if expression:
+            try:
+                ast = AdvancedFilterParser().parse(expression)
+            except ValueError as e:
+                print(f"Warning: Invalid filter expression '{expression}': {e}")
+                ast = None
+            compiled = compile_advanced_filter(ast) if ast else None
+            if compiled:
+                where = f"WHERE m.material_id IN (SELECT material_id FROM ({compiled.sql}))"
+                params += compiled.params
+            else:
+                matching = [] if ast is None else \
+                    [m['material_id'] for m in self.db.filter_materials_advanced(expression, pushdown=False)]
+                where = "WHERE m.material_id IN (SELECT value FROM json_each(?))"
+                params.append(json.dumps(matching))
+                
+        agg_template = self.SQL_AGGREGATES.get(aggregation, self.SQL_AGGREGATES['mean'])
+        aggregate_columns = []
+        for i in range(len(properties)):
+            v = f"v{i}"
+            aggregate_columns += [f"COUNT({v}) AS n{i}", f"{agg_template.format(v=v)} AS a{i}",
+                                  f"MIN({v}) AS min{i}", f"MAX({v}) AS max{i}", f"mace_stdev({v}) AS sd{i}"]
+        value_names = "".join(f", v{i}" for i in range(len(properties)))
+        
+        sql = f"""
+            SELECT grp, COUNT(*) AS material_count, MIN(position) AS first_position,
+                   json_group_array(json_array(group_rank, material_id)) FILTER (WHERE group_rank <= 10) AS sample
+                   {''.join(', ' + column for column in aggregate_columns)}
+            FROM (
+                SELECT material_id, position, {outer_group} AS grp{value_names},
+                       ROW_NUMBER() OVER (PARTITION BY {outer_group} ORDER BY position) AS group_rank
+                FROM (
+                    SELECT m.material_id,
+                           ROW_NUMBER() OVER (ORDER BY m.created_at DESC) AS position,
+                           {inner_group} AS g
+                           {''.join(', ' + column for column in value_columns)}
+                    FROM materials m
+                    {where}
+                )
+            )
+            GROUP BY grp
+            ORDER BY first_position
+        """
+        
+        with self.db._get_read_connection() as conn:
+            register_filter_functions(conn)
+            register_aggregate_functions(conn)
+            rows = conn.execute(sql, params).fetchall()
+            
+        results = {
+            'group_by': group_by,
+            'aggregation': aggregation,
+            'properties': properties,
+            'total_materials': sum(row['material_count'] for row in rows),
+            'total_groups': len(rows),
+            'groups': {}
+        }
+        
+        for row in rows:
+            material_count = row['material_count']
+            sample = sorted(json.loads(row['sample'] or '[]'))
+            group_data = {
+                'name': row['grp'],
+                'material_count': material_count,
+                'material_ids': [mat_id for _, mat_id in sample],
+                'properties': {}
+            }
+            if material_count > 10:
+                group_data['material_ids_truncated'] = True
+                
+            for i, prop_name in enumerate(properties):
+                count = row[f'n{i}']
+                if not count:
+                    continue
+                group_data['properties'][prop_name] = {
+                    'value': row[f'a{i}'],
+                    'count': count,
+                    'coverage': count / material_count
+                }
+                if aggregation in ['mean', 'median'] and count > 1:
+                    group_data['properties'][prop_name]['min'] = row[f'min{i}']
+                    group_data['properties'][prop_name]['max'] = row[f'max{i}']
+                    group_data['properties'][prop_name]['stdev'] = row[f'sd{i}']
+                    
+            results['groups'][row['grp']] = group_data
+            
+        # Add summary statistics
+        self._add_summary_stats(results)
+        
+        return results
+        
+    def _group_materials(self, materials: List[Dict], group_by: str,
+                         matrix: PropertyMatrix = None) -> Dict[str, List[str]]:
         """Group materials by specified criterion."""
         groups = defaultdict(list)
+        if matrix is None and group_by in ('band_gap_range', 'energy_range', 'atoms_range'):
+            matrix = get_property_matrix(self.db)
         
         for material in materials:
             mat_id = material['material_id']
@@ -153,16 +426,8 @@ class PropertyAggregator:
                 
             elif group_by == 'band_gap_range':
                 # Get band gap and categorize
-                props = self.db.get_material_properties(mat_id)
-                band_gap = None
-                for prop in props:
-                    if prop['property_name'] == 'band_gap':
-                        try:
-                            band_gap = float(prop['property_value'])
-                        except ValueError:
-                            pass
-                        break
-                        
+                band_gap = matrix.value(mat_id, 'band_gap')
+                
                 if band_gap is not None:
                     if band_gap < 0.1:
                         group = 'Metal (< 0.1 eV)'
@@ -179,16 +444,8 @@ class PropertyAggregator:
                     
             elif group_by == 'energy_range':
                 # Get total energy and categorize
-                props = self.db.get_material_properties(mat_id)
-                energy = None
-                for prop in props:
-                    if prop['property_name'] == 'total_energy':
-                        try:
-                            energy = float(prop['property_value'])
-                        except ValueError:
-                            pass
-                        break
-                        
+                energy = matrix.value(mat_id, 'total_energy')
+                
                 if energy is not None:
                     if energy > 0:
                         group = 'Positive energy'
@@ -203,16 +460,10 @@ class PropertyAggregator:
                     
             elif group_by == 'atoms_range':
                 # Get atom count and categorize
-                props = self.db.get_material_properties(mat_id)
-                atoms = None
-                for prop in props:
-                    if prop['property_name'] == 'atoms_in_unit_cell':
-                        try:
-                            atoms = int(prop['property_value'])
-                        except ValueError:
-                            pass
-                        break
-                        
+                atoms = matrix.value(mat_id, 'atoms_in_unit_cell')
+                if atoms is not None:
+                    atoms = int(atoms)
+                
                 if atoms is not None:
                     if atoms <= 10:
                         group = 'Small (≤ 10 atoms)'
@@ -225,6 +476,15 @@ class PropertyAggregator:
                 else:
                     group = 'No atom count data'
                     
+            elif group_by in ('calculation_type', 'convergence_status'):
+                # Type or status of the latest calculation
+                calculations = self.db.get_material_calculations(mat_id)
+                if calculations:
+                    column = 'calc_type' if group_by == 'calculation_type' else 'status'
+                    group = calculations[0].get(column)
+                else:
+                    group = 'No calculations'
+                    
             else:
                 group = 'Unknown'
                 
@@ -252,8 +512,12 @@ class PropertyAggregator:
             return 'unknown'
             
     def _aggregate_group(self, group_name: str, material_ids: List[str],
-                       properties: List[str], aggregation: str) -> Dict[str, Any]:
+                       properties: List[str], aggregation: str,
+                       matrix: PropertyMatrix = None) -> Dict[str, Any]:
         """Aggregate properties for a group of materials."""
+        if matrix is None:
+            matrix = get_property_matrix(self.db)
+            
         group_data = {
             'name': group_name,
             'material_count': len(material_ids),
@@ -269,20 +533,9 @@ class PropertyAggregator:
         
         # Aggregate each property
         for prop_name in properties:
-            values = []
-            
             # Collect values from all materials in group
-            for mat_id in material_ids:
-                props = self.db.get_material_properties(mat_id)
-                for prop in props:
-                    if prop['property_name'] == prop_name:
-                        try:
-                            value = float(prop['property_value'])
-                            values.append(value)
-                        except (ValueError, TypeError):
-                            pass
-                        break
-                        
+            values = matrix.column_values(prop_name, material_ids)
+            
             # Calculate aggregation
             if values:
                 if aggregation == 'count':
@@ -2,6 +2,14 @@
 Property Correlation Analysis
 =============================
 Analyze correlations between material properties.
+
+With NumPy available, all property pairs are computed at once from the
+columnar property cache (a dense material x property matrix, NaN = missing,
+see property_matrix.py): pairwise-complete sample counts, Pearson r and
+regression lines come from masked matrix products. Spearman ranks each pair
+over the materials that have both properties; pairs whose properties are
+present on the same materials reuse the ranks of the whole columns.
+Without NumPy the same statistics are computed pair by pair in Python.
 """
 
 from typing import List, Dict, Any, Tuple, Optional
@@ -9,6 +17,17 @@ import json
 import math
 from collections import defaultdict
 
+try:
+    import numpy as np
+    from mace.database.analysis.property_matrix import PropertyMatrix, get_property_matrix
+    HAS_NUMPY = True
+except ImportError:
+    HAS_NUMPY = False
+
+
+# Variances below this (in units of the column standard deviation) count as zero
+_ZERO_VARIANCE = 1e-12
+
 
 class PropertyCorrelation:
     """Analyzes correlations between material properties."""
@@ -24,7 +43,9 @@ class PropertyCorrelation:
         
     def calculate_correlations(self, property_pairs: List[Tuple[str, str]] = None,
                              min_samples: int = 3,
-                             material_ids: List[str] = None) -> Dict[str, Any]:
+                             material_ids: List[str] = None,
+                             include_materials: bool = True,
+                             vectorized: bool = True) -> Dict[str, Any]:
         """
         Calculate correlations between properties.
         
@@ -32,41 +53,26 @@ class PropertyCorrelation:
             property_pairs: List of (prop1, prop2) tuples to analyze (None = all numeric pairs)
             min_samples: Minimum number of materials with both properties
             material_ids: Specific materials to analyze (None = all)
+            include_materials: List the material IDs of every pair
+            vectorized: Use the NumPy matrix engine when available
             
         Returns:
             Correlation analysis results
         """
-        # Get all properties
-        all_properties = self.db.get_all_properties()
-        
-        # Filter by materials if specified
-        if material_ids:
-            material_set = set(material_ids)
-            all_properties = [p for p in all_properties if p['material_id'] in material_set]
-            
-        # Group properties by material
-        props_by_material = defaultdict(dict)
-        for prop in all_properties:
-            mat_id = prop['material_id']
-            prop_name = prop['property_name']
-            prop_value = prop['property_value']
-            
-            # Try to convert to numeric
-            try:
-                numeric_value = float(prop_value)
-                props_by_material[mat_id][prop_name] = numeric_value
-            except (ValueError, TypeError):
-                # Skip non-numeric properties
-                pass
-                
-        # Get all numeric property names
-        all_prop_names = set()
-        for mat_props in props_by_material.values():
-            all_prop_names.update(mat_props.keys())
+        if HAS_NUMPY:
+            matrix = get_property_matrix(self.db, material_ids=material_ids or None)
+            all_prop_names = matrix.property_names
+            total_materials = len(matrix.material_ids)
+        else:
+            props_by_material = self._load_numeric_properties(material_ids)
+            all_prop_names = set()
+            for mat_props in props_by_material.values():
+                all_prop_names.update(mat_props.keys())
+            total_materials = len(props_by_material)
             
         # Determine property pairs to analyze
         if property_pairs:
-            pairs_to_analyze = property_pairs
+            pairs_to_analyze = list(property_pairs)
         else:
             # Generate all unique pairs
             prop_list = sorted(all_prop_names)
@@ -79,13 +85,87 @@ class PropertyCorrelation:
         results = {
             'correlations': [],
             'summary': {
-                'total_materials': len(props_by_material),
+                'total_materials': total_materials,
                 'total_properties': len(all_prop_names),
                 'pairs_analyzed': len(pairs_to_analyze)
             }
         }
         
-        for prop1, prop2 in pairs_to_analyze:
+        if vectorized and HAS_NUMPY:
+            correlations = self._correlate_matrix(matrix, pairs_to_analyze,
+                                                  min_samples, include_materials)
+        else:
+            if HAS_NUMPY:
+                props_by_material = matrix.to_dict()
+            correlations = self._correlate_pairs(props_by_material, pairs_to_analyze,
+                                                 min_samples, include_materials)
+        results['correlations'] = correlations
+            
+        # Sort by absolute correlation
+        results['correlations'].sort(key=lambda x: abs(x['correlation']), reverse=True)
+        
+        # Add summary statistics
+        self._add_summary_stats(results)
+        
+        return results
+        
+    def _load_numeric_properties(self, material_ids: List[str] = None) -> Dict[str, Dict[str, float]]:
+        """
+        Numeric property values per material, read in one query (used
+        when NumPy, and with it the property cache, is not available).
+        
+        Like get_all_properties(), the text value stands in for a NULL numeric
+        value; the last convertible row of a property wins.
+        """
+        material_set = set(material_ids) if material_ids else None
+        props_by_material = defaultdict(dict)
+        
+        with self.db._get_read_connection() as conn:
+            cursor = conn.execute("""
+                SELECT material_id, property_name, property_value, property_value_text
+                FROM properties
+                ORDER BY material_id, property_category, property_name, property_id
+            """)
+            for mat_id, prop_name, value, text in cursor:
+                if material_set is not None and mat_id not in material_set:
+                    continue
+                if value is None:
+                    if not text:
+                        continue
+                    value = text
+                # Try to convert to numeric
+                try:
+                    props_by_material[mat_id][prop_name] = float(value)
+                except (ValueError, TypeError):
+                    # Skip non-numeric properties
+                    pass
+                    
+        return props_by_material
+        
+    def _pair_result(self, prop1: str, prop2: str, materials: List[str], correlation: float,
+                     spearman: float, r_squared: float, slope: float, intercept: float,
+                     sample_count: int, x_range: List, y_range: List) -> Dict[str, Any]:
+        return {
+            'property_1': prop1,
+            'property_2': prop2,
+            'correlation': correlation,
+            'spearman': spearman,
+            'r_squared': r_squared,
+            'slope': slope,
+            'intercept': intercept,
+            'sample_count': sample_count,
+            'materials': materials,
+            'x_range': x_range,
+            'y_range': y_range
+        }
+        
+    def _correlate_pairs(self, props_by_material: Dict[str, Dict[str, float]],
+                         pairs: List[Tuple[str, str]], min_samples: int,
+                         include_materials: bool) -> List[Dict[str, Any]]:
+        """Pure-Python engine: one pass over the materials per pair."""
+        correlations = []
+        
+        for prop1, prop2 in pairs:
             # Collect paired values
             x_values = []
             y_values = []
@@ -101,35 +181,198 @@ class PropertyCorrelation:
             if len(x_values) < min_samples:
                 continue
                 
-            # Calculate correlation
+            # Calculate correlation (Spearman ranks over the common materials only)
             correlation = self._pearson_correlation(x_values, y_values)
+            spearman = self._pearson_correlation(self._average_ranks(x_values),
+                                                 self._average_ranks(y_values))
             
             # Calculate linear regression
             slope, intercept, r_squared = self._linear_regression(x_values, y_values)
             
-            # Store results
-            result = {
-                'property_1': prop1,
-                'property_2': prop2,
-                'correlation': correlation,
-                'r_squared': r_squared,
-                'slope': slope,
-                'intercept': intercept,
-                'sample_count': len(x_values),
-                'materials': materials,
-                'x_range': [min(x_values), max(x_values)] if x_values else [None, None],
-                'y_range': [min(y_values), max(y_values)] if y_values else [None, None]
-            }
+            correlations.append(self._pair_result(
+                prop1, prop2, materials if include_materials else [],
+                correlation, spearman, r_squared, slope, intercept, len(x_values),
+                [min(x_values), max(x_values)] if x_values else [None, None],
+                [min(y_values), max(y_values)] if y_values else [None, None]
+            ))
             
-            results['correlations'].append(result)
+        return correlations
+        
+    @staticmethod
+    def _average_ranks(values: List[float]) -> List[float]:
+        """Average ranks (1-based, ties share their mean rank) of values."""
+        order = sorted(range(len(values)), key=values.__getitem__)
+        ranks = [0.0] * len(values)
+        i = 0
+        while i < len(order):
+            j = i
+            while j + 1 < len(order) and values[order[j + 1]] == values[order[i]]:
+                j += 1
+            average_rank = (i + j) / 2.0 + 1
+            for k in range(i, j + 1):
+                ranks[order[k]] = average_rank
+            i = j + 1
+        return ranks
+        
+    def _correlate_matrix(self, matrix: 'PropertyMatrix',
+                          pairs: List[Tuple[str, str]], min_samples: int,
+                          include_materials: bool) -> List[Dict[str, Any]]:
+        """NumPy engine: all pairs from masked matrix products."""
+        material_list = matrix.material_ids
+        prop_index = matrix.property_index
+        values = np.asarray(matrix.values)
+        present = ~np.isnan(values)
+        
+        # Pairs with unknown properties have no common samples
+        known = [(prop_index[p1], prop_index[p2]) for p1, p2 in pairs
+                 if p1 in prop_index and p2 in prop_index]
+        if not known and min_samples > 0:
+            return []
             
-        # Sort by absolute correlation
-        results['correlations'].sort(key=lambda x: abs(x['correlation']), reverse=True)
+        stats = self._pairwise_statistics(values, present)
+        rank_stats = self._pairwise_statistics(self._column_ranks(values, present), present)
+        counts = stats['n']
+        column_counts = present.sum(axis=0)
         
-        # Add summary statistics
-        self._add_summary_stats(results)
+        correlations = []
+        by_first = defaultdict(list)
+        for i, j in known:
+            if counts[i, j] >= min_samples:
+                by_first[i].append(j)
+                
+        # Ranges and material lists need the common-material mask of each
+        # pair; group the pairs by their first property to batch them
+        material_array = np.asarray(material_list, dtype=object)
+        pair_details = {}
+        for i, js in by_first.items():
+            js = np.asarray(js)
+            mask = present[:, js] & present[:, [i]]
+            x_min = np.where(mask, values[:, [i]], np.inf).min(axis=0)
+            x_max = np.where(mask, values[:, [i]], -np.inf).max(axis=0)
+            y_min = np.where(mask, values[:, js], np.inf).min(axis=0)
+            y_max = np.where(mask, values[:, js], -np.inf).max(axis=0)
+            
+            # Column ranks are only valid for pairs present on the same
+            # materials; rank the others again over their common materials
+            spearman = rank_stats['r'][i, js].copy()
+            partial = np.flatnonzero((counts[i, js] != column_counts[i]) | (counts[i, js] != column_counts[js]))
+            if partial.size:
+                common = mask[:, partial]
+                x_ranks = self._column_ranks(np.repeat(values[:, [i]], partial.size, axis=1), common)
+                y_ranks = self._column_ranks(values[:, js[partial]], common)
+                spearman[partial] = self._masked_correlation(x_ranks, y_ranks, common)
+                
+            for k, j in enumerate(js.tolist()):
+                if counts[i, j] == 0:
+                    x_range, y_range = [None, None], [None, None]
+                else:
+                    x_range = [float(x_min[k]), float(x_max[k])]
+                    y_range = [float(y_min[k]), float(y_max[k])]
+                materials = material_array[mask[:, k]].tolist() if include_materials else []
+                pair_details[(i, j)] = (float(spearman[k]), x_range, y_range, materials)
+                
+        for p1, p2 in pairs:
+            i, j = prop_index.get(p1), prop_index.get(p2)
+            if i is None or j is None:
+                if min_samples <= 0:
+                    correlations.append(self._pair_result(p1, p2, [], 0.0, 0.0, 0.0, 0.0, 0.0, 0,
+                                                          [None, None], [None, None]))
+                continue
+            if (i, j) not in pair_details:
+                continue
+            spearman, x_range, y_range, materials = pair_details[(i, j)]
+            correlations.append(self._pair_result(
+                p1, p2, materials,
+                float(stats['r'][i, j]), spearman,
+                float(stats['r_squared'][i, j]), float(stats['slope'][i, j]),
+                float(stats['intercept'][i, j]), int(counts[i, j]), x_range, y_range
+            ))
+            
+        return correlations
         
-        return results
+    @staticmethod
+    def _column_ranks(values: 'np.ndarray', present: 'np.ndarray') -> 'np.ndarray':
+        """Average ranks of every column over its present values (NaN elsewhere)."""
+        if values.size == 0:
+            return np.full(values.shape, np.nan)
+        # Missing values sort last; NaN never equals NaN, so they never join a tie
+        keyed = np.where(present, values, np.nan)
+        order = np.argsort(keyed, axis=0, kind='mergesort')
+        sorted_values = np.take_along_axis(keyed, order, axis=0)
+        n_rows = values.shape[0]
+        position = np.broadcast_to(np.arange(n_rows)[:, np.newaxis], values.shape)
+        
+        starts = np.ones(values.shape, dtype=bool)
+        starts[1:] = sorted_values[1:] != sorted_values[:-1]
+        ends = np.ones(values.shape, dtype=bool)
+        ends[:-1] = starts[1:]
+        first = np.maximum.accumulate(np.where(starts, position, 0), axis=0)
+        last = np.minimum.accumulate(np.where(ends, position, n_rows)[::-1], axis=0)[::-1]
+        
+        ranks = np.empty(values.shape)
+        np.put_along_axis(ranks, order, (first + last) / 2.0 + 1, axis=0)
+        return np.where(present, ranks, np.nan)
+        
+    @staticmethod
+    def _masked_correlation(x: 'np.ndarray', y: 'np.ndarray', mask: 'np.ndarray') -> 'np.ndarray':
+        """Pearson r of x[:, k] and y[:, k] over mask[:, k], for every column k."""
+        n = np.maximum(mask.sum(axis=0), 1)
+        x_centered = np.where(mask, x - np.where(mask, x, 0.0).sum(axis=0) / n, 0.0)
+        y_centered = np.where(mask, y - np.where(mask, y, 0.0).sum(axis=0) / n, 0.0)
+        var_x = (x_centered ** 2).sum(axis=0)
+        var_y = (y_centered ** 2).sum(axis=0)
+        both = (var_x > _ZERO_VARIANCE * n) & (var_y > _ZERO_VARIANCE * n)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            r = np.where(both, (x_centered * y_centered).sum(axis=0) / np.sqrt(var_x * var_y), 0.0)
+        return np.clip(r, -1.0, 1.0)
+        
+    @staticmethod
+    def _pairwise_statistics(values: 'np.ndarray', present: 'np.ndarray') -> Dict[str, 'np.ndarray']:
+        """
+        Pairwise-complete statistics for all column pairs (i = x, j = y).
+        
+        Columns are standardised first so the sums of squares do not lose
+        precision for large, narrowly spread values such as total energies.
+        """
+        weights = present.astype(float)
+        counts = np.maximum(present.sum(axis=0), 1)
+        mean = np.where(present, values, 0.0).sum(axis=0) / counts
+        centered = np.where(present, values - mean, 0.0)
+        std = np.sqrt((centered ** 2).sum(axis=0) / counts)
+        std[std == 0] = 1.0
+        z = centered / std
+        
+        n = weights.T @ weights
+        sum_x = z.T @ weights
+        sum_y = sum_x.T
+        sum_xx = (z * z).T @ weights
+        sum_yy = sum_xx.T
+        sum_xy = z.T @ z
+        
+        with np.errstate(divide='ignore', invalid='ignore'):
+            safe_n = np.maximum(n, 1)
+            mean_x = sum_x / safe_n
+            mean_y = sum_y / safe_n
+            cov = sum_xy - sum_x * mean_y
+            var_x = sum_xx - sum_x * mean_x
+            var_y = sum_yy - sum_y * mean_y
+            has_x = var_x > _ZERO_VARIANCE * safe_n
+            has_y = var_y > _ZERO_VARIANCE * safe_n
+            both = has_x & has_y
+            r = np.where(both, cov / np.sqrt(var_x * var_y), 0.0)
+            r = np.clip(r, -1.0, 1.0)
+            slope_z = np.where(has_x, cov / var_x, 0.0)
+            
+        # Back to the original units of x (column i) and y (column j)
+        slope = slope_z * std[np.newaxis, :] / std[:, np.newaxis]
+        slope = np.where(has_x, slope, 0.0)
+        mean_x_orig = mean_x * std[:, np.newaxis] + mean[:, np.newaxis]
+        mean_y_orig = mean_y * std[np.newaxis, :] + mean[np.newaxis, :]
+        intercept = np.where(n > 0, mean_y_orig - slope * mean_x_orig, 0.0)
+        r_squared = np.where(both, r * r, 0.0)
+        
+        return {'n': n, 'r': np.where(n > 0, r, 0.0), 'slope': slope,
+                'intercept': intercept, 'r_squared': r_squared}
         
     def _pearson_correlation(self, x: List[float], y: List[float]) -> float:
         """Calculate Pearson correlation coefficient."""
@@ -414,7 +657,9 @@ def calculate_property_correlations(db, property_pairs: List[Tuple[str, str]] =
         Formatted results
     """
     analyzer = PropertyCorrelation(db)
-    results = analyzer.calculate_correlations(property_pairs, min_samples)
+    # The text report does not list the materials of each pair
+    results = analyzer.calculate_correlations(property_pairs, min_samples,
+                                              include_materials=output_format != 'report')
     
     if output_format == 'report':
         return analyzer.format_correlation_report(results, top_n)
@@ -2,6 +2,11 @@
 Property Distribution Analysis
 ==============================
 Analyze distributions and histograms of material properties.
+
+Numeric properties come from the columnar property cache (one value per
+material), or without NumPy from one query with the same values;
+properties with any non-numeric value are analyzed as categorical from
+their property rows.
 """
 
 from typing import List, Dict, Any, Tuple, Optional
@@ -9,6 +14,15 @@ import json
 import math
 from collections import defaultdict, Counter
 
+from mace.database.analysis.property_matrix import read_numeric_properties
+
+try:
+    import numpy as np
+    from mace.database.analysis.property_matrix import get_property_matrix
+    HAS_NUMPY = True
+except ImportError:
+    HAS_NUMPY = False
+
 
 class PropertyDistribution:
     """Analyzes distributions of material properties."""
@@ -36,45 +50,64 @@ class PropertyDistribution:
         Returns:
             Distribution analysis results
         """
-        # Get all properties
-        all_properties = self.db.get_all_properties()
+        material_set = set(material_ids) if material_ids else None
         
-        # Filter by materials if specified
-        if material_ids:
-            material_set = set(material_ids)
-            all_properties = [p for p in all_properties if p['material_id'] in material_set]
-            
-        # Group properties by name
+        # Properties with any non-numeric value are categorical; collect all of their rows
         props_by_name = defaultdict(list)
-        for prop in all_properties:
-            prop_name = prop['property_name']
-            prop_value = prop['property_value']
-            
-            # Skip if specific properties requested and this isn't one
-            if properties and prop_name not in properties:
-                continue
-                
-            # Try to convert to numeric
-            try:
-                numeric_value = float(prop_value)
-                props_by_name[prop_name].append({
-                    'value': numeric_value,
-                    'material_id': prop['material_id']
-                })
-            except (ValueError, TypeError):
-                # Handle non-numeric properties separately
-                props_by_name[prop_name].append({
-                    'value': str(prop_value),
-                    'material_id': prop['material_id'],
-                    'is_categorical': True
-                })
+        categorical = self._categorical_properties(properties, material_set)
+        if categorical:
+            with self.db._get_read_connection() as conn:
+                placeholders = ','.join('?' * len(categorical))
+                cursor = conn.execute(f"""
+                    SELECT material_id, property_name, property_value, property_value_text
+                    FROM properties WHERE property_name IN ({placeholders})
+                    ORDER BY material_id, property_category, property_name, property_id
+                """, sorted(categorical))
+                for mat_id, prop_name, value, text in cursor:
+                    if material_set is not None and mat_id not in material_set:
+                        continue
+                    if value is None and text:
+                        value = text
+                    try:
+                        value = float(value)
+                    except (ValueError, TypeError):
+                        value = str(value)
+                    props_by_name[prop_name].append({
+                        'value': value,
+                        'material_id': mat_id,
+                        'is_categorical': True
+                    })
+                    
+        # Numeric properties: one value per material from the property cache
+        if HAS_NUMPY:
+            matrix = get_property_matrix(self.db, material_ids=material_set, properties=properties)
+            for prop_name in matrix.property_names:
+                if prop_name in categorical:
+                    continue
+                column = np.asarray(matrix.column(prop_name))
+                for row in np.flatnonzero(~np.isnan(column)):
+                    props_by_name[prop_name].append({
+                        'value': float(column[row]),
+                        'material_id': matrix.material_ids[row]
+                    })
+        else:
+            with self.db._get_read_connection() as conn:
+                props_by_material = read_numeric_properties(conn, material_set)
+            numeric = defaultdict(list)
+            for mat_id in sorted(props_by_material):
+                for prop_name, value in props_by_material[mat_id].items():
+                    if prop_name in categorical or (properties and prop_name not in properties):
+                        continue
+                    numeric[prop_name].append({'value': value, 'material_id': mat_id})
+            for prop_name in sorted(numeric):
+                props_by_name[prop_name].extend(numeric[prop_name])
                 
         # Analyze each property
         results = {
             'distributions': {},
             'summary': {
                 'total_properties': len(props_by_name),
-                'total_materials': len(set(p['material_id'] for props in all_properties for p in [props]))
+                'total_materials': self._count_materials(material_set)
             }
         }
         
@@ -92,6 +125,36 @@ class PropertyDistribution:
                 
         return results
         
+    def _categorical_properties(self, properties: List[str] = None, material_set: set = None) -> set:
+        """Names of properties with at least one value that is not a number."""
+        categorical = set()
+        with self.db._get_read_connection() as conn:
+            cursor = conn.execute("""
+                SELECT material_id, property_name, property_value, property_value_text FROM properties
+                WHERE typeof(property_value) NOT IN ('real', 'integer')
+            """)
+            for mat_id, prop_name, value, text in cursor:
+                if properties and prop_name not in properties:
+                    continue
+                if material_set is not None and mat_id not in material_set:
+                    continue
+                if value is None and text:
+                    value = text
+                try:
+                    float(value)
+                except (ValueError, TypeError):
+                    categorical.add(prop_name)
+        return categorical
+        
+    def _count_materials(self, material_set: set = None) -> int:
+        """Number of materials with any property."""
+        with self.db._get_read_connection() as conn:
+            cursor = conn.execute("SELECT DISTINCT material_id FROM properties")
+            material_ids = {row[0] for row in cursor}
+        if material_set is not None:
+            material_ids &= material_set
+        return len(material_ids)
+        
     def _analyze_numeric(self, prop_name: str, values: List[Dict], n_bins: int) -> Dict:
         """Analyze numeric property distribution."""
         numeric_values = [v['value'] for v in values]
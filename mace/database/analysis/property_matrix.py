@@ -0,0 +1,430 @@
+"""
+Columnar Property Cache
+=======================
+A wide material x property matrix of numeric property values, kept on disk
+next to the database and memory-mapped on load.
+
+Each cell holds the value a get_all_properties() pivot would keep: the text
+value stands in for a NULL numeric value and the last float-convertible row
+of a property wins (rows ordered by category and property_id). Missing
+values are NaN; materials and properties without any numeric value are
+left out.
+
+Every write to the properties table is recorded in the property_changes
+table by triggers, so a refresh only re-reads the materials that changed
+since the cache was written. The database prunes the changelog on write to
+its last PROPERTY_CHANGES_KEEP entries; reading the cache never writes.
+The cache is rebuilt from scratch when the changelog has been pruned past
+it, the database was replaced, or most of the matrix changed.
+
+NumPy is required for the matrix itself; read_numeric_properties gives the
+same values as plain dictionaries without it.
+
+Usage:
+    from mace.database.analysis.property_matrix import get_property_matrix
+    matrix = get_property_matrix(db)
+    band_gaps = matrix.column('band_gap')
+    frame = matrix.to_dataframe()
+"""
+
+import os
+import json
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Iterable
+
+try:
+    import numpy as np
+    HAS_NUMPY = True
+except ImportError:
+    HAS_NUMPY = False
+
+try:
+    import fcntl
+    HAS_FCNTL = True
+except ImportError:
+    HAS_FCNTL = False
+
+
+CACHE_FORMAT_VERSION = 1
+
+# Rebuild instead of patching when more than this fraction of the rows changed
+_REBUILD_FRACTION = 0.25
+
+
+def numeric_property_value(value, text) -> Optional[float]:
+    """The float a property row contributes, or None if it is not numeric."""
+    if value is None:
+        if not text:
+            return None
+        value = text
+    try:
+        value = float(value)
+    except (ValueError, TypeError):
+        return None
+    # NaN cannot be told apart from a missing value in the matrix
+    return None if value != value else value
+
+
+def read_numeric_properties(conn, material_ids: Iterable[str] = None) -> Dict[str, Dict[str, float]]:
+    """Numeric values per material from the properties table (all, or some materials)."""
+    props_by_material = {}
+
+    def consume(cursor):
+        for mat_id, prop_name, value, text in cursor:
+            value = numeric_property_value(value, text)
+            if value is not None:
+                props_by_material.setdefault(mat_id, {})[prop_name] = value
+
+    if material_ids is None:
+        consume(conn.execute("""
+            SELECT material_id, property_name, property_value, property_value_text
+            FROM properties
+            ORDER BY material_id, property_category, property_name, property_id
+        """))
+    else:
+        material_ids = sorted(material_ids)
+        for start in range(0, len(material_ids), 500):
+            chunk = material_ids[start:start + 500]
+            placeholders = ','.join('?' * len(chunk))
+            consume(conn.execute(f"""
+                SELECT material_id, property_name, property_value, property_value_text
+                FROM properties WHERE material_id IN ({placeholders})
+                ORDER BY material_id, property_category, property_name, property_id
+            """, chunk))
+    return props_by_material
+
+
+class PropertyMatrix:
+    """Dense material x property float matrix (NaN = missing)."""
+
+    def __init__(self, material_ids: List[str], property_names: List[str],
+                 values: 'np.ndarray', change_id: int = 0):
+        self.material_ids = list(material_ids)
+        self.property_names = list(property_names)
+        self.values = values
+        self.change_id = change_id
+        self.material_index = {mat_id: i for i, mat_id in enumerate(self.material_ids)}
+        self.property_index = {name: j for j, name in enumerate(self.property_names)}
+
+    @property
+    def shape(self):
+        return self.values.shape
+
+    def __contains__(self, property_name: str) -> bool:
+        return property_name in self.property_index
+
+    def column(self, property_name: str) -> 'np.ndarray':
+        """Values of one property for all materials (all NaN if unknown)."""
+        j = self.property_index.get(property_name)
+        if j is None:
+            return np.full(len(self.material_ids), np.nan)
+        return self.values[:, j]
+
+    def row(self, material_id: str) -> Dict[str, float]:
+        """Numeric properties of one material."""
+        i = self.material_index.get(material_id)
+        if i is None:
+            return {}
+        row = self.values[i]
+        return {name: float(row[j]) for j, name in enumerate(self.property_names)
+                if not np.isnan(row[j])}
+
+    def value(self, material_id: str, property_name: str) -> Optional[float]:
+        """One cell, or None if missing."""
+        i = self.material_index.get(material_id)
+        j = self.property_index.get(property_name)
+        if i is None or j is None or np.isnan(self.values[i, j]):
+            return None
+        return float(self.values[i, j])
+
+    def column_values(self, property_name: str, material_ids: Iterable[str] = None) -> List[float]:
+        """Present values of a property, in the order of material_ids (default: matrix order)."""
+        column = self.column(property_name)
+        if material_ids is None:
+            selected = column
+        else:
+            rows = [self.material_index[m] for m in material_ids if m in self.material_index]
+            selected = column[rows]
+        return selected[~np.isnan(selected)].tolist()
+
+    def select(self, material_ids: Iterable[str] = None,
+               properties: Iterable[str] = None) -> 'PropertyMatrix':
+        """
+        Sub-matrix in matrix order; rows and columns left without any value
+        are dropped.
+        """
+        rows = np.arange(len(self.material_ids))
+        cols = np.arange(len(self.property_names))
+        if material_ids is not None:
+            wanted = set(material_ids)
+            rows = np.array([i for i, m in enumerate(self.material_ids) if m in wanted], dtype=int)
+        if properties is not None:
+            wanted = set(properties)
+            cols = np.array([j for j, p in enumerate(self.property_names) if p in wanted], dtype=int)
+        values = np.asarray(self.values)[np.ix_(rows, cols)]
+        present = ~np.isnan(values)
+        keep_rows = present.any(axis=1)
+        keep_cols = present.any(axis=0)
+        return PropertyMatrix(
+            [self.material_ids[i] for i in rows[keep_rows]],
+            [self.property_names[j] for j in cols[keep_cols]],
+            values[np.ix_(keep_rows, keep_cols)],
+            self.change_id
+        )
+
+    def to_dict(self) -> Dict[str, Dict[str, float]]:
+        """{material_id: {property_name: value}} for the present values."""
+        result = {}
+        values = np.asarray(self.values)
+        present = ~np.isnan(values)
+        for i, mat_id in enumerate(self.material_ids):
+            cols = np.flatnonzero(present[i])
+            if cols.size:
+                result[mat_id] = {self.property_names[j]: float(values[i, j]) for j in cols}
+        return result
+
+    def to_dataframe(self):
+        """pandas DataFrame indexed by material_id with one column per property."""
+        try:
+            import pandas as pd
+        except ImportError:
+            raise ImportError("pandas is required for PropertyMatrix.to_dataframe()")
+        return pd.DataFrame(self.values, index=pd.Index(self.material_ids, name='material_id'),
+                            columns=self.property_names)
+
+
+class PropertyMatrixCache:
+    """On-disk PropertyMatrix of one database, refreshed from the property changelog."""
+
+    def __init__(self, db, cache_dir: str = None, mmap: bool = True):
+        """
+        Args:
+            db: MaterialDatabase instance
+            cache_dir: Cache directory (default: <db name>_property_cache next to the database)
+            mmap: Memory-map the stored matrix instead of reading it into memory
+        """
+        if not HAS_NUMPY:
+            raise ImportError("NumPy is required for the property cache")
+        self.db = db
+        db_path = Path(db.db_path)
+        self.cache_dir = Path(cache_dir) if cache_dir else db_path.parent / f"{db_path.stem}_property_cache"
+        self.mmap = mmap
+        self.lock = threading.Lock()
+        self._matrix: Optional[PropertyMatrix] = None
+
+    @property
+    def index_path(self) -> Path:
+        return self.cache_dir / "index.json"
+
+    # ------------------------------------------------------------------
+    # Public API
+    # ------------------------------------------------------------------
+
+    def load(self, refresh: bool = True) -> PropertyMatrix:
+        """Return the matrix, bringing it up to date with the database first if refresh is set."""
+        with self.lock:
+            if self._matrix is None:
+                self._matrix = self._read()
+            if refresh:
+                self._refresh_locked()
+            if self._matrix is None:
+                self._matrix = self._build()
+                self._write(self._matrix)
+            return self._matrix
+
+    def refresh(self) -> Dict[str, Any]:
+        """Bring the cache up to date; returns what was done."""
+        with self.lock:
+            if self._matrix is None:
+                self._matrix = self._read()
+            return self._refresh_locked()
+
+    def rebuild(self) -> PropertyMatrix:
+        """Rebuild the cache from the properties table."""
+        with self.lock:
+            self._matrix = self._build()
+            self._write(self._matrix)
+            return self._matrix
+
+    def clear(self):
+        """Delete the cache files."""
+        with self.lock:
+            self._matrix = None
+            if self.cache_dir.exists():
+                for path in self.cache_dir.iterdir():
+                    if path.name == "index.json" or path.suffix == ".npy":
+                        path.unlink()
+
+    # ------------------------------------------------------------------
+    # Refresh
+    # ------------------------------------------------------------------
+
+    def _last_change_id(self, conn) -> int:
+        row = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'property_changes'").fetchone()
+        return row[0] if row else 0
+
+    def _refresh_locked(self) -> Dict[str, Any]:
+        matrix = self._matrix
+        with self.db._get_read_connection() as conn:
+            last_change = self._last_change_id(conn)
+            if matrix is not None and matrix.change_id == last_change:
+                return {'mode': 'current', 'changes': 0, 'change_id': last_change}
+
+            changed = None
+            if matrix is not None and matrix.change_id < last_change:
+                cursor = conn.execute("""
+                    SELECT change_id, material_id FROM property_changes
+                    WHERE change_id > ? AND change_id <= ? ORDER BY change_id
+                """, (matrix.change_id, last_change))
+                rows = cursor.fetchall()
+                # Change ids are consecutive; a gap means the changelog was pruned past the cache
+                if rows and rows[0][0] == matrix.change_id + 1 and rows[-1][0] == last_change:
+                    changed = {row[1] for row in rows}
+
+        if changed is None or len(changed) > max(100, _REBUILD_FRACTION * len(matrix.material_ids)):
+            self._matrix = self._build()
+            self._write(self._matrix)
+            return {'mode': 'rebuild', 'changes': None, 'change_id': self._matrix.change_id}
+
+        self._matrix = self._patch(matrix, changed, last_change)
+        self._write(self._matrix)
+        return {'mode': 'incremental', 'changes': len(changed), 'change_id': last_change}
+
+    def _build(self) -> PropertyMatrix:
+        with self.db._get_read_connection() as conn:
+            # Read the change id first: later changes are applied again on the next refresh
+            change_id = self._last_change_id(conn)
+            props_by_material = read_numeric_properties(conn)
+
+        material_ids = sorted(props_by_material)
+        property_names = sorted({name for props in props_by_material.values() for name in props})
+        property_index = {name: j for j, name in enumerate(property_names)}
+        values = np.full((len(material_ids), len(property_names)), np.nan)
+        for i, mat_id in enumerate(material_ids):
+            for name, value in props_by_material[mat_id].items():
+                values[i, property_index[name]] = value
+        return PropertyMatrix(material_ids, property_names, values, change_id)
+
+    def _patch(self, matrix: PropertyMatrix, changed: set, change_id: int) -> PropertyMatrix:
+        """Re-read the rows of the changed materials into a copy of the matrix."""
+        with self.db._get_read_connection() as conn:
+            props_by_material = read_numeric_properties(conn, changed)
+
+        material_ids = sorted(set(matrix.material_ids) | set(props_by_material))
+        property_names = sorted(set(matrix.property_names) |
+                                {name for props in props_by_material.values() for name in props})
+        material_index = {mat_id: i for i, mat_id in enumerate(material_ids)}
+        property_index = {name: j for j, name in enumerate(property_names)}
+
+        values = np.full((len(material_ids), len(property_names)), np.nan)
+        old_rows = np.array([material_index[m] for m in matrix.material_ids], dtype=int)
+        old_cols = np.array([property_index[p] for p in matrix.property_names], dtype=int)
+        values[np.ix_(old_rows, old_cols)] = matrix.values
+
+        for mat_id in changed:
+            if mat_id not in material_index:
+                continue
+            i = material_index[mat_id]
+            values[i, :] = np.nan
+            for name, value in props_by_material.get(mat_id, {}).items():
+                values[i, property_index[name]] = value
+
+        patched = PropertyMatrix(material_ids, property_names, values, change_id)
+        return patched.select()
+
+    # ------------------------------------------------------------------
+    # Storage
+    # ------------------------------------------------------------------
+
+    def _read(self) -> Optional[PropertyMatrix]:
+        """Load the stored matrix, or None if there is no usable cache."""
+        try:
+            with open(self.index_path, 'r') as f:
+                index = json.load(f)
+            if index.get('version') != CACHE_FORMAT_VERSION or index.get('db_path') != str(self.db.db_path):
+                return None
+            values = np.load(self.cache_dir / index['values_file'], mmap_mode='r' if self.mmap else None)
+        except (OSError, ValueError, KeyError):
+            return None
+        if values.shape != (len(index['material_ids']), len(index['property_names'])):
+            return None
+        return PropertyMatrix(index['material_ids'], index['property_names'], values, index['change_id'])
+
+    def _write(self, matrix: PropertyMatrix):
+        """Store the matrix; the index is replaced last so readers never see a partial cache."""
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            lock_file = open(self.cache_dir / ".lock", 'w')
+        except OSError as e:
+            print(f"⚠️  Property cache not written ({self.cache_dir}): {e}")
+            return
+
+        try:
+            if HAS_FCNTL:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            values_file = f"values_{matrix.change_id}_{os.getpid()}_{threading.get_ident()}.npy"
+            np.save(self.cache_dir / values_file, np.ascontiguousarray(matrix.values))
+            index = {
+                'version': CACHE_FORMAT_VERSION,
+                'db_path': str(self.db.db_path),
+                'change_id': matrix.change_id,
+                'values_file': values_file,
+                'material_ids': matrix.material_ids,
+                'property_names': matrix.property_names,
+                'written_at': datetime.now().isoformat()
+            }
+            tmp_index = self.cache_dir / f"index.json.{os.getpid()}.tmp"
+            with open(tmp_index, 'w') as f:
+                json.dump(index, f)
+            os.replace(tmp_index, self.index_path)
+
+            # Readers that already mapped an old file keep their mapping
+            for path in self.cache_dir.glob("values_*.npy"):
+                if path.name != values_file:
+                    path.unlink()
+        except OSError as e:
+            print(f"⚠️  Property cache not written ({self.cache_dir}): {e}")
+        finally:
+            if HAS_FCNTL:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+            lock_file.close()
+
+        if self.mmap:
+            stored = self._read()
+            if stored is not None and stored.change_id == matrix.change_id:
+                matrix.values = stored.values
+
+
+_caches: Dict[tuple, PropertyMatrixCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_property_cache(db, cache_dir: str = None) -> PropertyMatrixCache:
+    """Return the process-wide PropertyMatrixCache of a database."""
+    key = (str(db.db_path), str(cache_dir) if cache_dir else None)
+    with _caches_lock:
+        cache = _caches.get(key)
+        if cache is None or cache.db is not db:
+            cache = PropertyMatrixCache(db, cache_dir)
+            _caches[key] = cache
+        return cache
+
+
+def get_property_matrix(db, material_ids: Iterable[str] = None, properties: Iterable[str] = None,
+                        refresh: bool = True) -> PropertyMatrix:
+    """
+    Up-to-date property matrix of a database, optionally restricted to some
+    materials and properties.
+
+    Args:
+        db: MaterialDatabase instance
+        material_ids: Materials to keep (None = all)
+        properties: Properties to keep (None = all)
+        refresh: Apply pending property changes first
+    """
+    matrix = get_property_cache(db).load(refresh=refresh)
+    if material_ids is None and properties is None:
+        return matrix
+    return matrix.select(material_ids, properties)
@@ -0,0 +1,384 @@
+"""
+Array Store for Band Structure and DOS Data
+===========================================
+Keeps the large numeric arrays of BAND and DOSS calculations (energy grids,
+total and projected DOS, k-points, eigenvalues) as binary .npy files next to
+the database instead of JSON text in properties.property_value_text. The
+calculation_arrays table is the index: one row per (calc_id, array_name)
+with dtype, shape, column labels and the file location.
+
+Arrays are memory-mapped on load, so reading a DOS for plotting touches only
+the pages that are used and never parses decimal text. Files are written to
+a temporary name and renamed into place only after the index rows are
+committed, so readers never see a partial array and a failed transaction
+leaves neither index rows nor files behind. The property extractor commits
+the index rows in the same transaction as the property rows.
+
+The property row of a stored array keeps a small JSON reference
+({"array_store": name, "shape": [...], "dtype": ...}) in property_value_text;
+load_property_array() also reads databases written before the array store.
+
+Usage:
+    from mace.database.array_store import ArrayStore
+    store = ArrayStore(db)
+    store.save_many(calc_id, {'energy_points': energies, 'total_dos': dos}, material_id)
+
+    records = store.stage_many(calc_id, arrays, material_id)  # index in your own transaction
+    with db._get_connection() as conn:
+        write_array_index(conn, records)
+        ...
+    store.publish(records)                                   # or store.discard(records)
+    energies = store.load(calc_id, 'energy_points')         # read-only memmap
+    projected, labels = store.load_labeled(calc_id, 'projected_dos')
+
+    mace database --action migrate-arrays
+"""
+
+import os
+import re
+import json
+import tempfile
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+
+# Properties produced by DatFileProcessor that are stored as arrays
+ARRAY_PROPERTIES = ('energy_points', 'total_dos', 'projected_dos', 'k_points', 'eigenvalues')
+
+DEFAULT_DTYPE = 'float64'
+
+_UNSAFE_CHARS = re.compile(r'[^\w.-]')
+
+
+def to_array(values: Any, dtype: str = DEFAULT_DTYPE) -> Tuple[np.ndarray, Optional[List[str]]]:
+    """
+    Convert a property value to an array.
+
+    Lists (of numbers or of equal-length lists) become 1-D / 2-D arrays; a
+    dict of equal-length columns (projected_dos) becomes a 2-D array with one
+    row per key, and the keys are returned as labels.
+
+    Raises:
+        ValueError: The value is not a rectangular numeric array
+    """
+    labels = None
+    if isinstance(values, dict):
+        labels = [str(key) for key in values]
+        values = list(values.values())
+    try:
+        array = np.asarray(values, dtype=dtype)
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"not a numeric array: {e}")
+    if array.ndim == 0 or array.dtype == object:
+        raise ValueError("not a numeric array")
+    return array, labels
+
+
+def write_array_index(conn, records: Iterable[Dict]):
+    """Insert or replace the calculation_arrays rows of index records in conn's transaction."""
+    conn.executemany("""
+        INSERT OR REPLACE INTO calculation_arrays
+        (calc_id, array_name, material_id, dtype, shape_json, labels_json,
+         file_path, byte_size, created_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """, [(r['calc_id'], r['array_name'], r['material_id'], r['dtype'],
+           json.dumps(r['shape']), json.dumps(r['labels']) if r['labels'] else None,
+           r['file_path'], r['byte_size'], r['created_at'])
+          for r in records])
+
+
+def array_reference(record: Dict) -> str:
+    """property_value_text stored in place of the array's JSON."""
+    return json.dumps({'array_store': record['array_name'],
+                       'shape': record['shape'], 'dtype': record['dtype']})
+
+
+class ArrayStore:
+    """Binary array storage for calculation data, indexed in the database."""
+
+    def __init__(self, db, store_dir: Optional[str] = None):
+        """
+        Args:
+            db: MaterialDatabase instance
+            store_dir: Directory for the .npy files
+                       (default: <database name>_arrays next to the database)
+        """
+        self.db = db
+        db_path = Path(db.db_path)
+        self.base_dir = db_path.parent
+        self.store_dir = Path(store_dir) if store_dir else self.base_dir / f"{db_path.stem}_arrays"
+
+    # ------------------------------------------------------------------
+    # Writing
+    # ------------------------------------------------------------------
+
+    def save(self, calc_id: str, name: str, values: Any, material_id: str = None,
+             labels: List[str] = None, dtype: str = DEFAULT_DTYPE) -> Dict:
+        """Store one array; returns its index record."""
+        return self.save_many(calc_id, {name: values}, material_id,
+                              labels={name: labels} if labels else None, dtype=dtype)[name]
+
+    def save_many(self, calc_id: str, arrays: Dict[str, Any], material_id: str = None,
+                  labels: Dict[str, List[str]] = None, dtype: str = DEFAULT_DTYPE) -> Dict[str, Dict]:
+        """
+        Store several arrays of one calculation; the index is updated in one transaction.
+
+        Args:
+            calc_id: Calculation the arrays belong to
+            arrays: Array name -> values (list, nested list, dict of columns or ndarray)
+            material_id: Material of the calculation
+            labels: Array name -> row labels (taken from dict keys when not given)
+            dtype: Storage dtype ('float64', or 'float32' to halve the size)
+
+        Returns:
+            Array name -> index record
+
+        Raises:
+            ValueError: A value is not a rectangular numeric array (nothing is written)
+        """
+        records = self.stage_many(calc_id, arrays, material_id, labels, dtype)
+        try:
+            with self.db._get_connection() as conn:
+                write_array_index(conn, records.values())
+        except BaseException:
+            self.discard(records)
+            raise
+        self.publish(records)
+        return records
+
+    def stage_many(self, calc_id: str, arrays: Dict[str, Any], material_id: str = None,
+                   labels: Dict[str, List[str]] = None, dtype: str = DEFAULT_DTYPE) -> Dict[str, Dict]:
+        """
+        Write several arrays of one calculation to temporary files, without
+        touching the index or the stored arrays.
+
+        Arguments and returned records are those of save_many. Write the
+        records with write_array_index, then call publish() after the
+        transaction committed or discard() if it failed.
+
+        Raises:
+            ValueError: A value is not a rectangular numeric array (nothing is written)
+        """
+        converted = {}
+        for name, values in arrays.items():
+            array, keys = to_array(values, dtype)
+            converted[name] = (array, (labels or {}).get(name) or keys)
+
+        calc_dir = self.store_dir / _UNSAFE_CHARS.sub('_', calc_id)
+        calc_dir.mkdir(parents=True, exist_ok=True)
+        now = datetime.now().isoformat()
+        records = {}
+        try:
+            for name, (array, row_labels) in converted.items():
+                path = calc_dir / f"{_UNSAFE_CHARS.sub('_', name)}.npy"
+                tmp_path = self._write_temporary(path, array)
+                records[name] = {
+                    'calc_id': calc_id,
+                    'array_name': name,
+                    'material_id': material_id,
+                    'dtype': str(array.dtype),
+                    'shape': list(array.shape),
+                    'labels': row_labels,
+                    'file_path': self._relative(path),
+                    'byte_size': tmp_path.stat().st_size,
+                    'created_at': now,
+                    'staged_path': str(tmp_path),
+                }
+        except BaseException:
+            self.discard(records)
+            raise
+        return records
+
+    def publish(self, records: Dict[str, Dict]):
+        """Rename staged files into place once their index rows are committed."""
+        for record in records.values():
+            staged = record.pop('staged_path', None)
+            if staged:
+                os.replace(staged, self._resolve(record['file_path']))
+
+    def discard(self, records: Dict[str, Dict]):
+        """Remove the staged files of a write whose transaction failed."""
+        for record in records.values():
+            staged = record.pop('staged_path', None)
+            if staged:
+                try:
+                    os.unlink(staged)
+                except OSError:
+                    pass
+
+    def _write_temporary(self, path: Path, array: np.ndarray) -> Path:
+        """Write an array next to path under a temporary name."""
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.stem}.", suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                np.save(f, array, allow_pickle=False)
+        except BaseException:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            raise
+        return Path(tmp_path)
+
+    def _relative(self, path: Path) -> str:
+        """Path stored in the index: relative to the database directory when possible."""
+        try:
+            return str(path.relative_to(self.base_dir))
+        except ValueError:
+            return str(path)
+
+    def _resolve(self, file_path: str) -> Path:
+        path = Path(file_path)
+        return path if path.is_absolute() else self.base_dir / path
+
+    # ------------------------------------------------------------------
+    # Reading
+    # ------------------------------------------------------------------
+
+    def list_arrays(self, calc_id: str = None) -> List[Dict]:
+        """Index records, of one calculation or of all."""
+        with self.db._get_read_connection() as conn:
+            if calc_id is None:
+                cursor = conn.execute("SELECT * FROM calculation_arrays ORDER BY calc_id, array_name")
+            else:
+                cursor = conn.execute("SELECT * FROM calculation_arrays WHERE calc_id = ? ORDER BY array_name",
+                                      (calc_id,))
+            return [self._record(row) for row in cursor.fetchall()]
+
+    def get_record(self, calc_id: str, name: str) -> Optional[Dict]:
+        """Index record of one array, or None."""
+        with self.db._get_read_connection() as conn:
+            row = conn.execute("SELECT * FROM calculation_arrays WHERE calc_id = ? AND array_name = ?",
+                               (calc_id, name)).fetchone()
+        return self._record(row) if row else None
+
+    def _record(self, row) -> Dict:
+        record = dict(row)
+        record['shape'] = json.loads(record.pop('shape_json'))
+        labels_json = record.pop('labels_json')
+        record['labels'] = json.loads(labels_json) if labels_json else None
+        return record
+
+    def load(self, calc_id: str, name: str, mmap: bool = True) -> Optional[np.ndarray]:
+        """
+        Load an array (read-only memory map unless mmap=False).
+
+        Returns:
+            The array, or None if it is not stored or its file is missing
+        """
+        record = self.get_record(calc_id, name)
+        return self._load_record(record, mmap) if record else None
+
+    def load_labeled(self, calc_id: str, name: str,
+                     mmap: bool = True) -> Tuple[Optional[np.ndarray], Optional[List[str]]]:
+        """Load an array together with its row labels."""
+        record = self.get_record(calc_id, name)
+        if not record:
+            return None, None
+        return self._load_record(record, mmap), record['labels']
+
+    def load_all(self, calc_id: str, mmap: bool = True) -> Dict[str, np.ndarray]:
+        """All stored arrays of a calculation."""
+        arrays = {}
+        for record in self.list_arrays(calc_id):
+            array = self._load_record(record, mmap)
+            if array is not None:
+                arrays[record['array_name']] = array
+        return arrays
+
+    def _load_record(self, record: Dict, mmap: bool) -> Optional[np.ndarray]:
+        path = self._resolve(record['file_path'])
+        try:
+            return np.load(path, mmap_mode='r' if mmap else None, allow_pickle=False)
+        except FileNotFoundError:
+            print(f"⚠️  Array file missing for {record['calc_id']}/{record['array_name']}: {path}")
+            return None
+
+    # ------------------------------------------------------------------
+    # Maintenance
+    # ------------------------------------------------------------------
+
+    def delete(self, calc_id: str, name: str = None) -> int:
+        """Remove the arrays of a calculation (or one of them); returns the number removed."""
+        records = [r for r in self.list_arrays(calc_id) if name is None or r['array_name'] == name]
+        with self.db._get_connection() as conn:
+            conn.executemany("DELETE FROM calculation_arrays WHERE calc_id = ? AND array_name = ?",
+                             [(r['calc_id'], r['array_name']) for r in records])
+        for record in records:
+            try:
+                self._resolve(record['file_path']).unlink()
+            except FileNotFoundError:
+                pass
+        return len(records)
+
+    def migrate_text_properties(self, names: Tuple[str, ...] = ARRAY_PROPERTIES,
+                                dtype: str = DEFAULT_DTYPE) -> Dict[str, int]:
+        """
+        Move array properties stored as JSON text into the store.
+
+        Each migrated property row keeps a JSON reference to the stored array.
+
+        Returns:
+            Counts of migrated and skipped (non-array) property rows
+        """
+        placeholders = ','.join('?' * len(names))
+        with self.db._get_read_connection() as conn:
+            rows = conn.execute(f"""
+                SELECT property_id, material_id, calc_id, property_name, property_value_text
+                FROM properties
+                WHERE property_name IN ({placeholders}) AND calc_id IS NOT NULL
+                  AND property_value_text IS NOT NULL
+                  AND substr(ltrim(property_value_text), 1, 1) IN ('[', '{{')
+                ORDER BY calc_id
+            """, names).fetchall()
+
+        migrated = skipped = 0
+        for row in rows:
+            try:
+                values = json.loads(row['property_value_text'])
+                if isinstance(values, dict) and 'array_store' in values:
+                    continue  # Already a reference
+                record = self.save(row['calc_id'], row['property_name'], values,
+                                   material_id=row['material_id'], dtype=dtype)
+            except ValueError:
+                skipped += 1
+                continue
+            with self.db._get_connection() as conn:
+                conn.execute("UPDATE properties SET property_value_text = ? WHERE property_id = ?",
+                             (array_reference(record), row['property_id']))
+            migrated += 1
+        return {'migrated': migrated, 'skipped': skipped}
+
+
+def load_property_array(db, calc_id: str, name: str, store: ArrayStore = None,
+                        mmap: bool = True) -> Tuple[Optional[np.ndarray], Optional[List[str]]]:
+    """
+    Load an array property from the store, or from its JSON text for
+    databases written before the array store.
+
+    Returns:
+        (array, row labels); (None, None) if the property does not exist
+    """
+    store = store or ArrayStore(db)
+    array, labels = store.load_labeled(calc_id, name, mmap)
+    if array is not None:
+        return array, labels
+
+    with db._get_read_connection() as conn:
+        row = conn.execute("""
+            SELECT property_value_text FROM properties
+            WHERE calc_id = ? AND property_name = ?
+            ORDER BY property_id DESC LIMIT 1
+        """, (calc_id, name)).fetchone()
+    if not row or not row[0]:
+        return None, None
+    try:
+        values = json.loads(row[0])
+        if isinstance(values, dict) and 'array_store' in values:
+            return None, None  # Reference whose array is gone
+        return to_array(values)
+    except ValueError:
+        return None, None
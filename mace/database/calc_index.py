@@ -0,0 +1,164 @@
+"""
+Per-Material Calculation Index
+==============================
+Request-scoped view of the calculations of a set of materials. The
+recovery sweep and the workflow engine ask many small questions about a
+material's calculations (does a BAND2 exist, which types are completed,
+how often was this calculation recovered). Asking the database each time
+costs one query per question and per failed calculation. The index loads
+all calculations of the affected materials with a single query, on first
+use, and answers from memory:
+
+- by material, calc_type and status
+- by parent: recovery attempts (settings_json 'parent_calc_id' with
+  'is_recovery_attempt') and workflow children (prerequisite_calc_id)
+
+The index is a snapshot. After writing calculations of a material, call
+invalidate(material_id); the next lookup reloads that material only.
+
+Usage:
+    from mace.database.calc_index import MaterialCalcIndex
+    index = MaterialCalcIndex(db, {calc['material_id'] for calc in failed_calcs})
+    retries = index.retry_count(calc_id)
+    band_exists = bool(index.of_type(material_id, 'BAND'))
+"""
+
+import json
+import threading
+from typing import Dict, Iterable, List, Optional, Set
+
+
+class MaterialCalcIndex:
+    """Calculations of a set of materials, loaded in one query and indexed in memory."""
+
+    def __init__(self, db, material_ids: Iterable[str]):
+        """
+        Args:
+            db: MaterialDatabase (anything with get_calculations_for_materials)
+            material_ids: Materials covered by the index
+        """
+        self.db = db
+        self.material_ids: Set[str] = set(material_ids)
+        self.queries = 0  # Database queries made by the index
+        self._lock = threading.RLock()
+        self._stale: Set[str] = set(self.material_ids)
+        self._by_material: Dict[str, List[Dict]] = {}
+        self._by_id: Dict[str, Dict] = {}
+        self._children: Optional[Dict[str, List[Dict]]] = None  # Built on first parent lookup
+        self._recoveries: Optional[Dict[str, List[Dict]]] = None
+
+    @classmethod
+    def for_calculations(cls, db, calcs: Iterable[Dict]) -> 'MaterialCalcIndex':
+        """Index of the materials of the given calculation records."""
+        return cls(db, {calc['material_id'] for calc in calcs})
+
+    def covers(self, material_id: str) -> bool:
+        """True if the index answers for this material."""
+        return material_id in self.material_ids
+
+    def invalidate(self, material_id: Optional[str] = None):
+        """Reload a material (default: all materials) on the next lookup."""
+        with self._lock:
+            self._stale.update([material_id] if material_id else self.material_ids)
+
+    def _ensure_loaded(self):
+        with self._lock:
+            if not self._stale:
+                return
+            stale = sorted(self._stale)
+            rows = self.db.get_calculations_for_materials(stale)
+            self.queries += 1
+            for material_id in stale:
+                for calc in self._by_material.pop(material_id, []):
+                    self._by_id.pop(calc['calc_id'], None)
+                self._by_material[material_id] = []
+            for calc in rows:
+                self._by_material.setdefault(calc['material_id'], []).append(calc)
+                self._by_id[calc['calc_id']] = calc
+            self._stale.clear()
+            self._children = self._recoveries = None
+
+    def _ensure_parents(self):
+        self._ensure_loaded()
+        with self._lock:
+            if self._children is not None:
+                return
+            self._children, self._recoveries = {}, {}
+            for calc in self._by_id.values():
+                settings = _settings(calc)
+                parent_id = settings.get('parent_calc_id')
+                if parent_id and settings.get('is_recovery_attempt'):
+                    self._recoveries.setdefault(parent_id, []).append(calc)
+                for parent in {parent_id, calc.get('prerequisite_calc_id')} - {None}:
+                    self._children.setdefault(parent, []).append(calc)
+
+    def calculations(self, material_id: str) -> List[Dict]:
+        """All calculations of a material, newest first (like get_calculations_by_status)."""
+        self._ensure_loaded()
+        return list(self._by_material.get(material_id, []))
+
+    def get(self, calc_id: str) -> Optional[Dict]:
+        """Calculation record by ID, if it belongs to a covered material."""
+        self._ensure_loaded()
+        return self._by_id.get(calc_id)
+
+    def of_type(self, material_id: str, calc_type: str) -> List[Dict]:
+        """Calculations of a material with exactly this calc_type (e.g. 'BAND2')."""
+        return [calc for calc in self.calculations(material_id) if calc['calc_type'] == calc_type]
+
+    def with_status(self, material_id: str, status: str) -> List[Dict]:
+        """Calculations of a material in one status."""
+        return [calc for calc in self.calculations(material_id) if calc['status'] == status]
+
+    def completed_types(self, material_id: str) -> Set[str]:
+        """calc_types of the completed calculations of a material."""
+        return {calc['calc_type'] for calc in self.with_status(material_id, 'completed')}
+
+    def children(self, calc_id: str) -> List[Dict]:
+        """Calculations created from this one (recovery attempts and workflow steps)."""
+        self._ensure_parents()
+        return list(self._children.get(calc_id, []))
+
+    def recovery_attempts(self, calc_id: str) -> List[Dict]:
+        """Recovery attempts created for this calculation."""
+        self._ensure_parents()
+        return list(self._recoveries.get(calc_id, []))
+
+    def recovery_root(self, calc_id: str) -> str:
+        """The original calculation of a chain of recovery attempts."""
+        self._ensure_loaded()
+        seen = {calc_id}
+        calc = self._by_id.get(calc_id)
+        while calc is not None:
+            settings = _settings(calc)
+            parent_id = settings.get('parent_calc_id')
+            if not settings.get('is_recovery_attempt') or not parent_id or parent_id in seen:
+                break
+            calc_id = parent_id
+            seen.add(calc_id)
+            calc = self._by_id.get(calc_id)
+        return calc_id
+
+    def retry_count(self, calc_id: str) -> int:
+        """Recovery attempts made for the chain this calculation belongs to."""
+        count = 0
+        pending = [self.recovery_root(calc_id)]
+        while pending:
+            attempts = self.recovery_attempts(pending.pop())
+            count += len(attempts)
+            pending.extend(attempt['calc_id'] for attempt in attempts)
+        return count
+
+
+def _settings(calc: Dict) -> Dict:
+    """Parsed settings_json of a calculation record (cached in calc['settings'])."""
+    settings = calc.get('settings')
+    if settings is None:
+        try:
+            settings = json.loads(calc.get('settings_json') or '{}')
+        except (json.JSONDecodeError, TypeError):
+            settings = {}
+        if not isinstance(settings, dict):
+            settings = {}
+        calc['settings'] = settings
+    return settings
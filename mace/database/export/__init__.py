@@ -4,7 +4,8 @@ Export module for MACE database
 Provides multi-format export capabilities for materials data.
 """
 
-from .formats import ExportFormatter, export_materials
+from .formats import ExportFormatter, ExportStats, export_materials, iter_materials, iter_properties
 from .visualization import VisualizationExporter
 
-__all__ = ['ExportFormatter', 'export_materials', 'VisualizationExporter']
\ No newline at end of file
+__all__ = ['ExportFormatter', 'ExportStats', 'export_materials', 'iter_materials',
+           'iter_properties', 'VisualizationExporter']
\ No newline at end of file
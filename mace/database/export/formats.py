@@ -4,134 +4,331 @@ Multi-format Export for MACE Database
 Supports exporting materials data to various formats:
 - CSV (default)
 - JSON
+- JSON lines (.jsonl)
+- Parquet (requires pyarrow)
 - Excel (.xlsx)
 - LaTeX tables
+- HTML tables
+
+CSV, JSON, JSON lines and Parquet are written as a stream: records are read
+from SQLite with fetchmany() in chunks of chunk_size rows, filtered one at a
+time and appended to the output file, so memory is bounded by the chunk size
+instead of the size of the database. Excel, LaTeX and HTML need the whole
+table and are still built in memory.
+
+Usage:
+    from mace.database.export import export_materials
+    export_materials(db, format='parquet', output_file='materials.parquet')
+
+    formatter = ExportFormatter(chunk_size=5000)
+    formatter.export(iter_materials(db), 'materials.jsonl', format='jsonl')
+    print(formatter.last_stats)
 """
 
 import json
 import csv
+import time
+import sqlite3
+from dataclasses import dataclass
+from itertools import islice
 from pathlib import Path
-from typing import List, Dict, Any, Optional, Union
+from typing import List, Dict, Any, Optional, Union, Iterable, Iterator
 from datetime import datetime
 
 
+DEFAULT_CHUNK_SIZE = 5000
+
+# Formats written record by record
+STREAMING_FORMATS = ('csv', 'json', 'jsonl', 'parquet')
+
+# Always kept by the properties filter
+ID_FIELDS = ('material_id', 'calc_id')
+
+STRUCTURE_FIELDS = frozenset(['structure_json', 'structure_ase', 'atomic_positions',
+                              'initial_atomic_positions', 'final_atomic_positions'])
+
+# Columns returned by MaterialDatabase.get_all_properties()
+PROPERTY_COLUMNS = ('property_id', 'material_id', 'calc_id', 'property_category',
+                    'property_name', 'property_value', 'property_value_text',
+                    'property_unit', 'confidence', 'extractor_script', 'extracted_at')
+
+
+@dataclass
+class ExportStats:
+    """Size and throughput of one export."""
+    rows: int = 0
+    seconds: float = 0.0
+    bytes_written: int = 0
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows / self.seconds if self.seconds > 0 else 0.0
+
+    def __str__(self) -> str:
+        return (f"{self.rows} rows in {self.seconds:.2f}s "
+                f"({self.rows_per_second:,.0f} rows/s, {self.bytes_written / 1e6:.1f} MB)")
+
+
+class _RecordCounter:
+    """Iterates over records while counting them."""
+
+    def __init__(self, records: Iterable[Dict]):
+        self.records = records
+        self.count = 0
+
+    def __iter__(self) -> Iterator[Dict]:
+        for record in self.records:
+            self.count += 1
+            yield record
+
+
 class ExportFormatter:
     """Handles formatting and exporting of materials data to various formats."""
-    
-    def __init__(self):
-        """Initialize the formatter."""
-        self.supported_formats = ['csv', 'json', 'excel', 'latex', 'html']
-        
-    def export(self, data: List[Dict], output_file: str, format: str = 'csv',
+
+    def __init__(self, chunk_size: int = DEFAULT_CHUNK_SIZE):
+        """
+        Initialize the formatter.
+
+        Args:
+            chunk_size: Records buffered at a time by the streaming writers
+        """
+        self.supported_formats = ['csv', 'json', 'jsonl', 'parquet', 'excel', 'latex', 'html']
+        self.chunk_size = max(1, chunk_size)
+        self.last_stats: Optional[ExportStats] = None
+
+    def export(self, data: Iterable[Dict], output_file: str, format: str = 'csv',
                properties_filter: List[str] = None,
                include_structures: bool = False,
-               metadata: Dict = None) -> bool:
+               metadata: Dict = None,
+               fieldnames: List[str] = None) -> bool:
         """
         Export data to specified format.
-        
+
         Args:
-            data: List of records to export (materials or properties)
+            data: Records to export (materials or properties); a list or any
+                  iterable, e.g. iter_materials() / iter_properties()
             output_file: Output file path
-            format: Export format (csv, json, excel, latex, html)
+            format: Export format (csv, json, jsonl, parquet, excel, latex, html)
             properties_filter: List of property names to include (None = all)
             include_structures: Whether to include structure data
             metadata: Additional metadata to include in export
-            
+            fieldnames: Columns of the records when known up front; otherwise
+                        they are collected from a list, or from the first chunk
+                        of an iterator
+
         Returns:
-            True if successful
+            True if successful (throughput is stored in self.last_stats)
         """
         format = format.lower()
         if format not in self.supported_formats:
             raise ValueError(f"Unsupported format: {format}. Choose from {self.supported_formats}")
-            
-        # Filter data if needed
-        if properties_filter and data:
-            data = self._filter_properties(data, properties_filter)
-            
-        # Remove structure data if not requested
-        if not include_structures and data:
-            data = self._remove_structure_data(data)
-            
+
+        start = time.perf_counter()
+        if fieldnames is None and isinstance(data, list):
+            fieldnames = sorted(set().union(*(record.keys() for record in data)))
+        if fieldnames is not None:
+            fieldnames = self._filter_fieldnames(fieldnames, properties_filter, include_structures)
+
+        # Filter records one at a time as they are written
+        records = _RecordCounter(self.prepare_records(data, properties_filter, include_structures))
+
         # Export based on format
         if format == 'csv':
-            return self._export_csv(data, output_file)
+            success = self._export_csv(records, output_file, fieldnames)
         elif format == 'json':
-            return self._export_json(data, output_file, metadata)
-        elif format == 'excel':
-            return self._export_excel(data, output_file, metadata)
-        elif format == 'latex':
-            return self._export_latex(data, output_file, metadata)
-        elif format == 'html':
-            return self._export_html(data, output_file, metadata)
-            
+            success = self._export_json(records, output_file, metadata)
+        elif format == 'jsonl':
+            success = self._export_jsonl(records, output_file)
+        elif format == 'parquet':
+            success = self._export_parquet(records, output_file, fieldnames, metadata)
+        else:
+            rows = list(records)
+            if format == 'excel':
+                success = self._export_excel(rows, output_file, metadata)
+            elif format == 'latex':
+                success = self._export_latex(rows, output_file, metadata)
+            else:
+                success = self._export_html(rows, output_file, metadata)
+
+        output_path = Path(output_file)
+        self.last_stats = ExportStats(
+            rows=records.count,
+            seconds=time.perf_counter() - start,
+            bytes_written=output_path.stat().st_size if success and output_path.exists() else 0
+        )
+        return success
+
+    def prepare_records(self, data: Iterable[Dict], properties_filter: List[str] = None,
+                        include_structures: bool = False) -> Iterator[Dict]:
+        """Apply the properties filter and structure removal to each record lazily."""
+        keep = set(properties_filter) if properties_filter else None
+        for record in data:
+            if keep is not None:
+                record = self._filter_record(record, keep)
+            if not include_structures:
+                record = self._strip_structure(record)
+            yield record
+
+    def _filter_fieldnames(self, fieldnames: List[str], properties_filter: List[str] = None,
+                           include_structures: bool = False) -> List[str]:
+        """Columns left after the properties filter and structure removal."""
+        if properties_filter:
+            fieldnames = [key for key in fieldnames if key in properties_filter or key in ID_FIELDS]
+        if not include_structures:
+            fieldnames = [key for key in fieldnames if key not in STRUCTURE_FIELDS]
+        return fieldnames
+
+    def _filter_record(self, record: Dict, properties) -> Dict:
+        return {key: value for key, value in record.items()
+                if key in properties or key in ID_FIELDS}  # Always include IDs
+
+    def _strip_structure(self, record: Dict) -> Dict:
+        if STRUCTURE_FIELDS.isdisjoint(record):
+            return record
+        return {key: value for key, value in record.items() if key not in STRUCTURE_FIELDS}
+
     def _filter_properties(self, data: List[Dict], properties: List[str]) -> List[Dict]:
         """Filter data to include only specified properties."""
-        filtered = []
-        for record in data:
-            filtered_record = {}
-            for key, value in record.items():
-                if key in properties or key in ['material_id', 'calc_id']:  # Always include IDs
-                    filtered_record[key] = value
-            filtered.append(filtered_record)
-        return filtered
-        
+        keep = set(properties)
+        return [self._filter_record(record, keep) for record in data]
+
     def _remove_structure_data(self, data: List[Dict]) -> List[Dict]:
         """Remove large structure-related fields."""
-        structure_fields = ['structure_json', 'structure_ase', 'atomic_positions',
-                          'initial_atomic_positions', 'final_atomic_positions']
-        
-        cleaned = []
-        for record in data:
-            cleaned_record = {}
-            for key, value in record.items():
-                if key not in structure_fields:
-                    cleaned_record[key] = value
-            cleaned.append(cleaned_record)
-        return cleaned
-        
-    def _export_csv(self, data: List[Dict], output_file: str) -> bool:
-        """Export to CSV format."""
-        if not data:
+        return [self._strip_structure(record) for record in data]
+
+    def _first_chunk(self, data: Iterable[Dict]):
+        """Split records into the first chunk and an iterator over the rest."""
+        records = iter(data)
+        return list(islice(records, self.chunk_size)), records
+
+    def _chunks(self, first: List[Dict], rest: Iterator[Dict]) -> Iterator[List[Dict]]:
+        chunk = first
+        while chunk:
+            yield chunk
+            chunk = list(islice(rest, self.chunk_size))
+
+    def _export_csv(self, data: Iterable[Dict], output_file: str,
+                    fieldnames: List[str] = None) -> bool:
+        """Export to CSV format, one chunk of rows at a time."""
+        first, rest = self._first_chunk(data)
+        if not first:
             return False
-            
+
         output_path = Path(output_file)
         output_path.parent.mkdir(parents=True, exist_ok=True)
-        
-        # Get all unique keys
-        all_keys = set()
-        for record in data:
-            all_keys.update(record.keys())
-        fieldnames = sorted(all_keys)
-        
+
+        if fieldnames is None:
+            # Columns of the first chunk; later keys cannot be added to the header
+            fieldnames = sorted(set().union(*(record.keys() for record in first)))
+        columns = set(fieldnames)
+        dropped = set()
+
         with open(output_path, 'w', newline='', encoding='utf-8') as f:
-            writer = csv.DictWriter(f, fieldnames=fieldnames)
+            writer = csv.DictWriter(f, fieldnames=fieldnames, extrasaction='ignore')
             writer.writeheader()
-            writer.writerows(data)
-            
+            for chunk in self._chunks(first, rest):
+                for record in chunk:
+                    if not columns.issuperset(record):
+                        dropped.update(key for key in record if key not in columns)
+                writer.writerows(chunk)
+
+        if dropped:
+            print(f"Warning: Columns not in the CSV header were skipped: {', '.join(sorted(dropped))}")
         return True
-        
-    def _export_json(self, data: List[Dict], output_file: str, metadata: Dict = None) -> bool:
-        """Export to JSON format."""
+
+    def _export_json(self, data: Iterable[Dict], output_file: str, metadata: Dict = None) -> bool:
+        """
+        Export to JSON format.
+
+        Records are written as they arrive; the metadata block (with the record
+        count) follows the data array.
+        """
         output_path = Path(output_file)
         output_path.parent.mkdir(parents=True, exist_ok=True)
-        
-        export_data = {
-            'metadata': {
+
+        count = 0
+        with open(output_path, 'w', encoding='utf-8') as f:
+            f.write('{\n  "data": [')
+            for record in data:
+                f.write(',\n    ' if count else '\n    ')
+                f.write(json.dumps(record, indent=2, default=str).replace('\n', '\n    '))
+                count += 1
+            f.write('\n  ],\n' if count else '],\n')
+
+            export_metadata = {
                 'export_date': datetime.now().isoformat(),
-                'record_count': len(data),
+                'record_count': count,
                 'mace_version': '1.0.0'
-            },
-            'data': data
-        }
-        
-        if metadata:
-            export_data['metadata'].update(metadata)
-            
+            }
+            if metadata:
+                export_metadata.update(metadata)
+            f.write('  "metadata": ')
+            f.write(json.dumps(export_metadata, indent=2, default=str).replace('\n', '\n  '))
+            f.write('\n}')
+
+        return True
+
+    def _export_jsonl(self, data: Iterable[Dict], output_file: str) -> bool:
+        """Export to JSON lines format (one record per line)."""
+        output_path = Path(output_file)
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+
         with open(output_path, 'w', encoding='utf-8') as f:
-            json.dump(export_data, f, indent=2, default=str)
-            
+            for record in data:
+                f.write(json.dumps(record, default=str))
+                f.write('\n')
+
         return True
-        
+
+    def _export_parquet(self, data: Iterable[Dict], output_file: str,
+                        fieldnames: List[str] = None, metadata: Dict = None) -> bool:
+        """
+        Export to Parquet, one row group per chunk.
+
+        Column types are inferred from the first chunk: booleans, integers,
+        floats (integers mixed with floats) and strings (everything else, with
+        dicts and lists as JSON). Later values that do not fit their column
+        are converted where possible and written as null otherwise.
+        """
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError as e:
+            raise ImportError(f"Parquet export requires pyarrow: pip install pyarrow ({e})")
+
+        first, rest = self._first_chunk(data)
+        if not first:
+            return False
+
+        output_path = Path(output_file)
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+
+        if fieldnames is None:
+            fieldnames = sorted(set().union(*(record.keys() for record in first)))
+        kinds = {name: _column_kind([record.get(name) for record in first]) for name in fieldnames}
+        arrow_types = {'bool': pa.bool_(), 'int': pa.int64(), 'float': pa.float64(), 'string': pa.string()}
+        schema_metadata = {'mace_export': json.dumps(metadata, default=str)} if metadata else None
+        schema = pa.schema([(name, arrow_types[kinds[name]]) for name in fieldnames],
+                           metadata=schema_metadata)
+
+        rejected = 0
+        with pq.ParquetWriter(str(output_path), schema) as writer:
+            for chunk in self._chunks(first, rest):
+                arrays = []
+                for field in schema:
+                    values = [record.get(field.name) for record in chunk]
+                    try:
+                        arrays.append(pa.array(values, type=field.type))
+                    except (pa.ArrowInvalid, pa.ArrowTypeError, OverflowError):
+                        values, bad = _coerce_column(values, kinds[field.name])
+                        rejected += bad
+                        arrays.append(pa.array(values, type=field.type))
+                writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+
+        if rejected:
+            print(f"Warning: {rejected} values did not match their Parquet column type and were written as null")
+        return True
+
     def _export_excel(self, data: List[Dict], output_file: str, metadata: Dict = None) -> bool:
         """Export to Excel format with formatting."""
         try:
@@ -370,14 +567,195 @@ class ExportFormatter:
         return text
 
 
+def _column_kind(values: List[Any]) -> str:
+    """Parquet column kind for a sample of values: bool, int, float or string."""
+    kinds = {type(value) for value in values if value is not None}
+    if kinds == {bool}:
+        return 'bool'
+    if kinds == {int}:
+        return 'int'
+    if kinds and kinds <= {int, float}:
+        return 'float'
+    return 'string'
+
+
+def _coerce_column(values: List[Any], kind: str):
+    """Convert values to a column kind; returns (values, number written as null)."""
+    coerced, rejected = [], 0
+    for value in values:
+        if value is not None:
+            if kind == 'string':
+                value = json.dumps(value, default=str) if isinstance(value, (dict, list)) else str(value)
+            elif kind == 'float':
+                try:
+                    value = float(value)
+                except (TypeError, ValueError):
+                    value = None
+            elif kind == 'int':
+                if isinstance(value, float) and value.is_integer():
+                    value = int(value)
+                elif not isinstance(value, int) or isinstance(value, bool) or abs(value) >= 2 ** 63:
+                    value = None
+            elif not isinstance(value, bool):
+                value = None
+            rejected += value is None
+        coerced.append(value)
+    return coerced, rejected
+
+
+# ----------------------------------------------------------------------
+# Streaming sources
+# ----------------------------------------------------------------------
+
+def _query_chunks(db, sql: str, params=(), chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[List[sqlite3.Row]]:
+    """Run a query and yield its rows chunk_size at a time from the open cursor."""
+    from mace.database.query.sql_filters import register_filter_functions
+
+    with db._get_read_connection() as conn:
+        register_filter_functions(conn)
+        cursor = conn.execute(sql, params)
+        try:
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    return
+                yield rows
+        finally:
+            cursor.close()
+
+
+def _material_record(row) -> Dict:
+    material = dict(row)
+    if material.get('metadata_json'):
+        material['metadata'] = json.loads(material['metadata_json'])
+    return material
+
+
+def _is_advanced_expression(filters: List[str]) -> bool:
+    """Whether the filters are a single advanced filter expression."""
+    return len(filters) == 1 and any(op in filters[0] for op in ['(', ')', ' AND ', ' OR ', ' LIKE ', ' IN ', ' IS '])
+
+
+def _material_chunks(db, filters: List[str], logic: str, chunk_size: int) -> Iterator[List[Dict]]:
+    """Material records in chunks, filtered inside SQLite when the filter compiles."""
+    from mace.database.query.sql_filters import CompiledFilter, compile_advanced_filter, compile_property_filter
+
+    if not filters:
+        compiled = CompiledFilter("SELECT * FROM materials ORDER BY created_at DESC")
+        fallback = db.get_all_materials
+    elif _is_advanced_expression(filters):
+        from mace.database.query.advanced_filters import AdvancedFilterParser
+        try:
+            ast = AdvancedFilterParser().parse(filters[0])
+        except ValueError as e:
+            print(f"Warning: Invalid filter expression '{filters[0]}': {e}")
+            return
+        compiled = compile_advanced_filter(ast)
+        fallback = lambda: db.filter_materials_advanced(filters[0], pushdown=False)
+    else:
+        from mace.database.query.filters import create_filter_from_strings
+        compiled = compile_property_filter(create_filter_from_strings(filters, logic))
+        fallback = lambda: db.filter_materials_by_properties(filters, logic, pushdown=False)
+
+    if compiled:
+        started = False
+        try:
+            for rows in _query_chunks(db, compiled.sql, compiled.params, chunk_size):
+                started = True
+                yield [_material_record(row) for row in rows]
+            return
+        except sqlite3.Error as e:
+            if started:
+                raise
+            print(f"Warning: SQL filter failed, using Python evaluation: {e}")
+
+    # Filters the compiler cannot express are evaluated in memory
+    materials = fallback()
+    for start in range(0, len(materials), chunk_size):
+        yield materials[start:start + chunk_size]
+
+
+def _attach_properties(db, materials: List[Dict], property_names: List[str]):
+    """Add the requested property values to a chunk of material records."""
+    by_id = {material['material_id']: material for material in materials}
+    with db._get_read_connection() as conn:
+        cursor = conn.execute("""
+            SELECT material_id, property_name, property_value, property_value_text
+            FROM properties
+            WHERE material_id IN (SELECT value FROM json_each(?))
+              AND property_name IN (SELECT value FROM json_each(?))
+            ORDER BY material_id, property_category, property_name, property_id
+        """, (json.dumps(list(by_id)), json.dumps(list(property_names))))
+        for material_id, name, value, text in cursor:
+            # Same value as get_material_properties(): text if the number is missing
+            by_id[material_id][name] = text if value is None and text else value
+
+
+def iter_materials(db, filters: List[str] = None, logic: str = 'AND',
+                   include_properties: List[str] = None,
+                   chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[Dict]:
+    """
+    Stream material records (newest first) without loading the table.
+
+    Args:
+        db: MaterialDatabase instance
+        filters: Property filters or a single advanced filter expression
+        logic: Filter logic (AND/OR)
+        include_properties: Property values to add to each material record
+        chunk_size: Rows fetched from SQLite at a time
+
+    Yields:
+        Material dictionaries, as returned by get_all_materials()
+    """
+    for chunk in _material_chunks(db, filters, logic, chunk_size):
+        if include_properties:
+            _attach_properties(db, chunk, include_properties)
+        yield from chunk
+
+
+def iter_properties(db, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[Dict]:
+    """Stream property records in the order and form of get_all_properties()."""
+    sql = f"""
+        SELECT {', '.join(PROPERTY_COLUMNS)}
+        FROM properties
+        ORDER BY material_id, property_category, property_name, property_id
+    """
+    for rows in _query_chunks(db, sql, (), chunk_size):
+        for row in rows:
+            prop = dict(row)
+            # Use text value if numeric value is null
+            if prop['property_value'] is None and prop['property_value_text']:
+                prop['property_value'] = prop['property_value_text']
+            yield prop
+
+
+def material_fieldnames(db, include_properties: List[str] = None) -> List[str]:
+    """Columns of the records produced by iter_materials()."""
+    with db._get_read_connection() as conn:
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(materials)")}
+        if conn.execute("SELECT 1 FROM materials WHERE metadata_json != '' LIMIT 1").fetchone():
+            columns.add('metadata')
+        if include_properties:
+            cursor = conn.execute("""
+                SELECT DISTINCT property_name FROM properties
+                WHERE property_name IN (SELECT value FROM json_each(?))
+            """, (json.dumps(list(include_properties)),))
+            columns.update(row[0] for row in cursor)
+    return sorted(columns)
+
+
 def export_materials(db, format: str = 'csv', output_file: str = None,
                     filters: List[str] = None, logic: str = 'AND',
                     properties_only: bool = False,
                     include_properties: List[str] = None,
-                    include_structures: bool = False) -> str:
+                    include_structures: bool = False,
+                    chunk_size: int = DEFAULT_CHUNK_SIZE) -> str:
     """
     Convenience function to export materials from database.
-    
+
+    Records are streamed from SQLite, so CSV, JSON, JSON lines and Parquet
+    exports hold at most chunk_size records in memory.
+
     Args:
         db: MaterialDatabase instance
         format: Export format
@@ -387,62 +765,45 @@ def export_materials(db, format: str = 'csv', output_file: str = None,
         properties_only: Export properties instead of materials
         include_properties: List of property names to include
         include_structures: Whether to include structure data
-        
+        chunk_size: Rows fetched and written at a time
+
     Returns:
         Path to exported file
     """
-    formatter = ExportFormatter()
-    
+    format = format.lower()
+    formatter = ExportFormatter(chunk_size=chunk_size)
+
     # Generate output filename if not provided
     if not output_file:
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         extension = 'xlsx' if format == 'excel' else format
         output_file = f"mace_export_{timestamp}.{extension}"
-        
+
     # Get data based on options
     if properties_only:
         # Export properties
-        data = db.get_all_properties()
+        data = iter_properties(db, chunk_size)
+        fieldnames = sorted(PROPERTY_COLUMNS)
         metadata = {'export_type': 'properties'}
     else:
         # Export materials
-        if filters:
-            # Check if it's a single advanced filter expression
-            if len(filters) == 1 and any(op in filters[0] for op in ['(', ')', ' AND ', ' OR ', ' LIKE ', ' IN ', ' IS ']):
-                # Use advanced filtering
-                data = db.filter_materials_advanced(filters[0])
-                metadata = {
-                    'export_type': 'filtered_materials',
-                    'filters': filters,
-                    'filter_type': 'advanced'
-                }
-            else:
-                # Use regular filtering
-                data = db.filter_materials_by_properties(filters, logic)
-                metadata = {
-                    'export_type': 'filtered_materials',
-                    'filters': filters,
-                    'filter_logic': logic
-                }
-        else:
-            data = db.get_all_materials()
+        data = iter_materials(db, filters, logic, include_properties, chunk_size)
+        fieldnames = material_fieldnames(db, include_properties)
+        if not filters:
             metadata = {'export_type': 'all_materials'}
-            
-        # Add properties to materials if requested
-        if include_properties and data:
-            for material in data:
-                mat_id = material['material_id']
-                props = db.get_material_properties(mat_id)
-                
-                # Convert properties to dict
-                prop_dict = {}
-                for prop in props:
-                    prop_name = prop['property_name']
-                    if include_properties is None or prop_name in include_properties:
-                        prop_dict[prop_name] = prop['property_value']
-                        
-                material.update(prop_dict)
-                
+        elif _is_advanced_expression(filters):
+            metadata = {
+                'export_type': 'filtered_materials',
+                'filters': filters,
+                'filter_type': 'advanced'
+            }
+        else:
+            metadata = {
+                'export_type': 'filtered_materials',
+                'filters': filters,
+                'filter_logic': logic
+            }
+
     # Export
     success = formatter.export(
         data,
@@ -450,7 +811,10 @@ def export_materials(db, format: str = 'csv', output_file: str = None,
         format=format,
         properties_filter=include_properties,
         include_structures=include_structures,
-        metadata=metadata
+        metadata=metadata,
+        fieldnames=fieldnames
     )
-    
-    return output_file if success else None
\ No newline at end of file
+
+    if success:
+        print(f"📊 Exported {formatter.last_stats}")
+    return output_file if success else None
@@ -11,6 +11,8 @@ from datetime import datetime
 from collections import defaultdict
 import numpy as np
 
+from mace.database.analysis.property_matrix import get_property_matrix
+
 
 class VisualizationExporter:
     """Export data formatted for various visualization tools."""
@@ -61,40 +63,31 @@ class VisualizationExporter:
         if material_ids:
             materials = [m for m in materials if m['material_id'] in material_ids]
             
+        matrix = get_property_matrix(self.db)
         for material in materials:
             mat_id = material['material_id']
-            props = self.db.get_material_properties(mat_id)
             
             # Get property values
-            prop_dict = {p['property_name']: p['property_value'] for p in props}
+            x = matrix.value(mat_id, x_property)
+            y = matrix.value(mat_id, y_property)
             
-            if x_property in prop_dict and y_property in prop_dict:
-                try:
-                    point = {
-                        'material_id': mat_id,
-                        'formula': material.get('formula', 'Unknown'),
-                        'x': float(prop_dict[x_property]),
-                        'y': float(prop_dict[y_property])
-                    }
+            if x is not None and y is not None:
+                point = {
+                    'material_id': mat_id,
+                    'formula': material.get('formula', 'Unknown'),
+                    'x': x,
+                    'y': y
+                }
+                
+                # Add color property if requested
+                if color_by and matrix.value(mat_id, color_by) is not None:
+                    point['color'] = matrix.value(mat_id, color_by)
                     
-                    # Add color property if requested
-                    if color_by and color_by in prop_dict:
-                        try:
-                            point['color'] = float(prop_dict[color_by])
-                        except ValueError:
-                            point['color'] = prop_dict[color_by]
-                            
-                    # Add size property if requested
-                    if size_by and size_by in prop_dict:
-                        try:
-                            point['size'] = float(prop_dict[size_by])
-                        except ValueError:
-                            pass
-                            
-                    data_points.append(point)
+                # Add size property if requested
+                if size_by and matrix.value(mat_id, size_by) is not None:
+                    point['size'] = matrix.value(mat_id, size_by)
                     
-                except (ValueError, TypeError):
-                    pass
+                data_points.append(point)
                     
         # Format based on requested format
         if format == 'plotly':
@@ -246,21 +239,8 @@ class VisualizationExporter:
             Formatted histogram data
         """
         # Collect values
-        values = []
-        
-        materials = self.db.get_all_materials()
-        if material_ids:
-            materials = [m for m in materials if m['material_id'] in material_ids]
-            
-        for material in materials:
-            props = self.db.get_material_properties(material['material_id'])
-            for prop in props:
-                if prop['property_name'] == property_name:
-                    try:
-                        values.append(float(prop['property_value']))
-                    except (ValueError, TypeError):
-                        pass
-                    break
+        matrix = get_property_matrix(self.db)
+        values = matrix.column_values(property_name, material_ids or None)
                     
         if not values:
             return {'error': f'No numeric values found for {property_name}'}
@@ -349,23 +329,11 @@ class VisualizationExporter:
         if material_ids:
             materials = [m for m in materials if m['material_id'] in material_ids]
             
+        matrix = get_property_matrix(self.db)
         for material in materials:
-            mat_props = self.db.get_material_properties(material['material_id'])
-            prop_dict = {p['property_name']: p['property_value'] for p in mat_props}
-            
             # Check if material has all requested properties
-            has_all = True
-            values = {}
-            for prop in properties:
-                if prop in prop_dict:
-                    try:
-                        values[prop] = float(prop_dict[prop])
-                    except (ValueError, TypeError):
-                        has_all = False
-                        break
-                else:
-                    has_all = False
-                    break
+            values = {prop: matrix.value(material['material_id'], prop) for prop in properties}
+            has_all = all(value is not None for value in values.values())
                     
             if has_all:
                 for prop, value in values.items():
@@ -444,31 +412,24 @@ class VisualizationExporter:
         if material_ids:
             materials = [m for m in materials if m['material_id'] in material_ids]
             
+        matrix = get_property_matrix(self.db)
         for material in materials:
             mat_id = material['material_id']
-            props = self.db.get_material_properties(mat_id)
-            prop_dict = {p['property_name']: p['property_value'] for p in props}
+            coordinates = [matrix.value(mat_id, p) for p in [x_property, y_property, z_property]]
             
-            if all(p in prop_dict for p in [x_property, y_property, z_property]):
-                try:
-                    point = {
-                        'material_id': mat_id,
-                        'formula': material.get('formula', 'Unknown'),
-                        'x': float(prop_dict[x_property]),
-                        'y': float(prop_dict[y_property]),
-                        'z': float(prop_dict[z_property])
-                    }
-                    
-                    if color_by and color_by in prop_dict:
-                        try:
-                            point['color'] = float(prop_dict[color_by])
-                        except ValueError:
-                            point['color'] = prop_dict[color_by]
-                            
-                    data_points.append(point)
+            if all(value is not None for value in coordinates):
+                point = {
+                    'material_id': mat_id,
+                    'formula': material.get('formula', 'Unknown'),
+                    'x': coordinates[0],
+                    'y': coordinates[1],
+                    'z': coordinates[2]
+                }
+                
+                if color_by and matrix.value(mat_id, color_by) is not None:
+                    point['color'] = matrix.value(mat_id, color_by)
                     
-                except (ValueError, TypeError):
-                    pass
+                data_points.append(point)
                     
         # Format based on requested format
         if format == 'plotly':
@@ -12,6 +12,7 @@ import sqlite3
 import json
 import os
 import threading
+import weakref
 from datetime import datetime
 from pathlib import Path
 from contextlib import contextmanager
@@ -19,16 +20,70 @@ from typing import Dict, List, Optional, Tuple, Any
 import tempfile
 import shutil
 
-# ASE integration for structure storage
-try:
-    from ase.db import connect as ase_connect
-    from ase import Atoms
-    HAS_ASE = True
-except ImportError:
-    HAS_ASE = False
+# ASE integration for structure storage (ase is imported when the structure
+# database is first used - importing it costs more than a whole callback)
+import importlib.util
+HAS_ASE = importlib.util.find_spec('ase') is not None
+if not HAS_ASE:
     print("Warning: ASE not available. Structure storage will be limited.")
 
 
+# Composite indexes of the base schema: (index name, table and columns)
+# (check query plans with: mace database --action analyze-indexes)
+COMPOSITE_INDEXES = [
+    # Property lookups by material and name, optionally for one calculation
+    ('idx_properties_material_name', 'properties (material_id, property_name, calc_id)'),
+    # Properties produced by a calculation
+    ('idx_properties_calc_name', 'properties (calc_id, property_name)'),
+    # Calculations of a material by type, newest first
+    ('idx_calculations_material_type', 'calculations (material_id, calc_type, created_at)'),
+    # Queue manager status polling, newest first
+    ('idx_calculations_status_created', 'calculations (status, created_at)'),
+    # Output/work directory lookups when matching files to calculations
+    ('idx_calculations_output_file', 'calculations (output_file)'),
+    ('idx_calculations_work_dir', 'calculations (work_dir)'),
+    # Workflow instance listings
+    ('idx_workflow_instances_material', 'workflow_instances (material_id, started_at)'),
+    ('idx_workflow_instances_status', 'workflow_instances (status, started_at)'),
+]
+
+# Property changelog rows kept for the property caches (older caches rebuild);
+# the prune runs in a trigger on every PROPERTY_CHANGES_PRUNE_EVERY-th change
+PROPERTY_CHANGES_KEEP = 50000
+PROPERTY_CHANGES_PRUNE_EVERY = 1000
+
+
+def _close_connections(connections: List[sqlite3.Connection]):
+    """Close and forget a list of SQLite connections."""
+    while connections:
+        try:
+            connections.pop().close()
+        except sqlite3.Error:
+            pass
+
+
+class _ThreadConnections:
+    """
+    Persistent connections of one thread.
+    
+    Only the thread's threading.local slot refers to the holder, so it is
+    collected when the thread exits and its finalizer closes the connections.
+    Short-lived worker threads therefore do not leave connections behind.
+    """
+    
+    def __init__(self):
+        self.write_conn = None
+        self.read_conn = None
+        self.connections = []
+        self._finalizer = weakref.finalize(self, _close_connections, self.connections)
+        
+    def close(self):
+        """Close this thread's connections now."""
+        self.write_conn = None
+        self.read_conn = None
+        _close_connections(self.connections)
+
+
 class MaterialDatabase:
     """
     Thread-safe database for tracking CRYSTAL calculations and materials.
@@ -37,36 +92,50 @@ class MaterialDatabase:
     Handles concurrent access from multiple queue manager instances.
     """
     
-    def __init__(self, db_path: str = "materials.db", ase_db_path: str = "structures.db", auto_initialize: bool = True):
+    def __init__(self, db_path: str = "materials.db", ase_db_path: str = "structures.db", auto_initialize: bool = True,
+                 persistent_connections: bool = True):
         self.db_path = Path(db_path).resolve()
         self.ase_db_path = Path(ase_db_path).resolve()
         self.lock = threading.RLock()
         self._initialized = False
         
+        # Per-thread persistent connections (PRAGMAs applied once per connection)
+        self.persistent_connections = persistent_connections
+        self._local = threading.local()
+        # Connection holders of live threads (closed by close())
+        self._thread_holders = weakref.WeakSet()
+        self._connections_lock = threading.Lock()
+        self._ase_db = None
+        
         # Only initialize if auto_initialize is True
         if auto_initialize:
             self._initialize_database()
             
-            # Initialize ASE database if available
-            if HAS_ASE:
-                self.ase_db = ase_connect(str(self.ase_db_path))
-            else:
-                self.ase_db = None
-        else:
-            self.ase_db = None
+    @property
+    def ase_db(self):
+        """ASE structure database, connected on first use (None if ASE is not available)."""
+        if self._ase_db is None and HAS_ASE:
+            from ase.db import connect as ase_connect
+            self._ase_db = ase_connect(str(self.ase_db_path))
+        return self._ase_db
+        
+    @ase_db.setter
+    def ase_db(self, value):
+        self._ase_db = value
             
     def _ensure_initialized(self):
         """Ensure database is initialized before use."""
         if not self._initialized:
             self._initialize_database()
-            if HAS_ASE and self.ase_db is None:
-                self.ase_db = ase_connect(str(self.ase_db_path))
             self._initialized = True
             
     def _initialize_database(self):
         """Create database tables if they don't exist."""
         self._initialized = True
         with self._get_connection() as conn:
+            # Tables that existed before; the migrations only report and backfill changes to those
+            existing_tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+            
             conn.executescript("""
                 -- Materials table: Core material information
                 CREATE TABLE IF NOT EXISTS materials (
@@ -117,6 +186,7 @@ class MaterialDatabase:
                     error_message TEXT,
                     recovery_attempts INTEGER DEFAULT 0,  -- Number of recovery attempts
                     completion_type TEXT DEFAULT 'first_try',  -- first_try, recovered, manual
+                    input_settings_json TEXT,  -- Settings parsed from the input file
                     
                     -- Dependencies
                     prerequisite_calc_id TEXT,  -- Which calculation this depends on
@@ -142,7 +212,29 @@ class MaterialDatabase:
                     FOREIGN KEY (material_id) REFERENCES materials (material_id),
                     FOREIGN KEY (calc_id) REFERENCES calculations (calc_id)
                 );
-                
+
+                -- Property changelog: filled by triggers, consumed by the columnar property cache
+                CREATE TABLE IF NOT EXISTS property_changes (
+                    change_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    material_id TEXT NOT NULL,
+                    property_name TEXT NOT NULL
+                );
+
+                -- Array store index: BAND/DOSS arrays kept as .npy files next to the database
+                CREATE TABLE IF NOT EXISTS calculation_arrays (
+                    calc_id TEXT NOT NULL,
+                    array_name TEXT NOT NULL,  -- energy_points, total_dos, projected_dos, ...
+                    material_id TEXT,
+                    dtype TEXT NOT NULL,
+                    shape_json TEXT NOT NULL,
+                    labels_json TEXT,  -- Row labels of 2-D arrays (e.g. projection names)
+                    file_path TEXT NOT NULL,  -- Relative to the database directory
+                    byte_size INTEGER,
+                    created_at TEXT NOT NULL,
+
+                    PRIMARY KEY (calc_id, array_name)
+                );
+
                 -- Files table: Track all files associated with calculations
                 CREATE TABLE IF NOT EXISTS files (
                     file_id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -157,6 +249,19 @@ class MaterialDatabase:
                     FOREIGN KEY (calc_id) REFERENCES calculations (calc_id)
                 );
                 
+                -- Output file fingerprints: skip re-reading files that have not changed
+                CREATE TABLE IF NOT EXISTS file_fingerprints (
+                    file_path TEXT PRIMARY KEY,
+                    file_size INTEGER NOT NULL,
+                    mtime_ns INTEGER NOT NULL,
+                    inode INTEGER NOT NULL,
+                    scanned_offset INTEGER DEFAULT 0,  -- Bytes already scanned for completion markers
+                    completed INTEGER DEFAULT 0,
+                    checksum TEXT,
+                    parse_result_json TEXT,  -- Last scan result for this file
+                    updated_at TEXT NOT NULL
+                );
+                
                 -- Workflow templates for common calculation sequences
                 CREATE TABLE IF NOT EXISTS workflow_templates (
                     template_id TEXT PRIMARY KEY,
@@ -212,13 +317,80 @@ class MaterialDatabase:
                 CREATE INDEX IF NOT EXISTS idx_files_calc ON files (calc_id);
                 CREATE INDEX IF NOT EXISTS idx_workflow_states_material ON workflow_states (material_id);
                 CREATE INDEX IF NOT EXISTS idx_workflow_states_status ON workflow_states (status);
+                
+                -- Workflow outbox: one event per calculation completion, written by trigger
+                CREATE TABLE IF NOT EXISTS workflow_events (
+                    event_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    event_type TEXT NOT NULL,  -- calculation_completed
+                    calc_id TEXT NOT NULL,
+                    material_id TEXT,
+                    created_at TEXT NOT NULL,
+                    claimed_by TEXT,  -- Consumer processing the event
+                    claimed_at TEXT,
+                    consumed_at TEXT,
+                    result_json TEXT
+                );
+                CREATE INDEX IF NOT EXISTS idx_workflow_events_pending
+                ON workflow_events (event_type, event_id) WHERE consumed_at IS NULL;
+                CREATE INDEX IF NOT EXISTS idx_workflow_events_calc ON workflow_events (calc_id);
+                
+                CREATE TRIGGER IF NOT EXISTS trg_calculations_completed_event
+                AFTER UPDATE OF status ON calculations
+                WHEN NEW.status = 'completed' AND OLD.status IS NOT 'completed'
+                BEGIN
+                    INSERT INTO workflow_events (event_type, calc_id, material_id, created_at)
+                    VALUES ('calculation_completed', NEW.calc_id, NEW.material_id,
+                            strftime('%Y-%m-%dT%H:%M:%f', 'now', 'localtime'));
+                END;
+                CREATE TRIGGER IF NOT EXISTS trg_calculations_insert_completed_event
+                AFTER INSERT ON calculations
+                WHEN NEW.status = 'completed'
+                BEGIN
+                    INSERT INTO workflow_events (event_type, calc_id, material_id, created_at)
+                    VALUES ('calculation_completed', NEW.calc_id, NEW.material_id,
+                            strftime('%Y-%m-%dT%H:%M:%f', 'now', 'localtime'));
+                END;
+
+                -- Record every property write for incremental cache refreshes
+                CREATE TRIGGER IF NOT EXISTS trg_properties_insert_log AFTER INSERT ON properties
+                BEGIN
+                    INSERT INTO property_changes (material_id, property_name)
+                    VALUES (NEW.material_id, NEW.property_name);
+                END;
+                CREATE TRIGGER IF NOT EXISTS trg_properties_update_log AFTER UPDATE ON properties
+                BEGIN
+                    INSERT INTO property_changes (material_id, property_name)
+                    VALUES (NEW.material_id, NEW.property_name);
+                    INSERT INTO property_changes (material_id, property_name)
+                    SELECT OLD.material_id, OLD.property_name
+                    WHERE OLD.material_id != NEW.material_id OR OLD.property_name != NEW.property_name;
+                END;
+                CREATE TRIGGER IF NOT EXISTS trg_properties_delete_log AFTER DELETE ON properties
+                BEGIN
+                    INSERT INTO property_changes (material_id, property_name)
+                    VALUES (OLD.material_id, OLD.property_name);
+                END;
+            """ + "".join(f"CREATE INDEX IF NOT EXISTS {index_name} ON {definition};\n"
+                          for index_name, definition in COMPOSITE_INDEXES))
+            
+            # Keep the changelog bounded on write, whoever writes the properties
+            conn.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS trg_property_changes_prune AFTER INSERT ON property_changes
+                WHEN NEW.change_id % {int(PROPERTY_CHANGES_PRUNE_EVERY)} = 0
+                BEGIN
+                    DELETE FROM property_changes WHERE change_id <= NEW.change_id - {int(PROPERTY_CHANGES_KEEP)};
+                END
             """)
             
             # Apply any necessary migrations
-            self._apply_migrations()
+            self._apply_migrations(existing_tables)
             
-    def _apply_migrations(self):
-        """Apply database schema migrations for existing databases."""
+    def _apply_migrations(self, existing_tables: set):
+        """Apply database schema migrations for existing databases.
+        
+        Args:
+            existing_tables: Tables the database had before the base schema ran
+        """
         with self._get_connection() as conn:
             # Check if recovery_attempts column exists in calculations table
             cursor = conn.execute("PRAGMA table_info(calculations)")
@@ -248,35 +420,172 @@ class MaterialDatabase:
                 print("Adding workflow_scripts_json column to workflow_instances table...")
                 conn.execute("ALTER TABLE workflow_instances ADD COLUMN workflow_scripts_json TEXT")
             
-    @contextmanager
-    def _get_connection(self):
-        """Thread-safe database connection context manager with WAL mode for concurrency."""
-        # Ensure database is initialized before connecting
-        self._ensure_initialized()
-        
-        with self.lock:
+            # One row per (material, calculation, property) so extractions can upsert in bulk
+            cursor = conn.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'index' AND name = 'idx_properties_unique'"
+            )
+            if not cursor.fetchone():
+                if 'properties' in existing_tables:
+                    print("Adding unique (material_id, calc_id, property_name) index to properties table...")
+                    # Keep only the most recent row of any duplicated property
+                    cursor = conn.execute("""
+                        DELETE FROM properties WHERE property_id NOT IN (
+                            SELECT MAX(property_id) FROM properties
+                            GROUP BY material_id, IFNULL(calc_id, ''), property_name
+                        )
+                    """)
+                    if cursor.rowcount > 0:
+                        print(f"Removed {cursor.rowcount} duplicate property rows (kept the most recent of each)")
+                conn.execute("""
+                    CREATE UNIQUE INDEX idx_properties_unique
+                    ON properties (material_id, IFNULL(calc_id, ''), property_name)
+                """)
+            
+            # Completed calculations the workflow engine has not processed yet, for
+            # databases created before the workflow_events table
+            if 'calculations' in existing_tables and 'workflow_events' not in existing_tables:
+                print("Adding workflow_events table...")
+                conn.execute("""
+                    INSERT INTO workflow_events (event_type, calc_id, material_id, created_at)
+                    SELECT 'calculation_completed', calc_id, material_id, COALESCE(completed_at, created_at)
+                    FROM calculations
+                    WHERE status = 'completed'
+                      AND NOT COALESCE(CASE WHEN json_valid(settings_json)
+                                            THEN json_extract(settings_json, '$.workflow_processed') END, 0)
+                    ORDER BY COALESCE(completed_at, created_at)
+                """)
+            
+            # Property history written by upsert_properties
+            from mace.database.utils.history import ensure_history_tables
+            ensure_history_tables(conn)
+            
+    def _open_connection(self, read_only: bool = False) -> sqlite3.Connection:
+        """Open a new SQLite connection and apply the connection PRAGMAs once."""
+        if read_only:
+            conn = sqlite3.connect(
+                Path(self.db_path).resolve().as_uri() + "?mode=ro",
+                uri=True,
+                timeout=30.0,
+                check_same_thread=False
+            )
+        else:
             conn = sqlite3.connect(
                 str(self.db_path),
                 timeout=30.0,  # 30 second timeout for database locks
                 check_same_thread=False
             )
-            conn.row_factory = sqlite3.Row  # Enable column access by name
-            
+        conn.row_factory = sqlite3.Row  # Enable column access by name
+        
+        if not read_only:
             # Enable WAL mode for better concurrent access
             conn.execute("PRAGMA journal_mode=WAL")
             conn.execute("PRAGMA synchronous=NORMAL")
-            conn.execute("PRAGMA busy_timeout=30000")  # 30 second timeout
-            conn.execute("PRAGMA cache_size=-64000")  # 64MB cache
+        else:
+            conn.execute("PRAGMA query_only=ON")
+        conn.execute("PRAGMA busy_timeout=30000")  # 30 second timeout
+        conn.execute("PRAGMA cache_size=-64000")  # 64MB cache
+        return conn
+        
+    def _thread_connection(self, read_only: bool = False) -> sqlite3.Connection:
+        """Return this thread's persistent connection, opening it on first use."""
+        local = self._local
+        # Connections must never be shared across a fork
+        if getattr(local, 'pid', None) != os.getpid():
+            local.pid = os.getpid()
+            local.holder = _ThreadConnections()
+            local.depth = 0
+            with self._connections_lock:
+                self._thread_holders.add(local.holder)
+            
+        holder = local.holder
+        attr = 'read_conn' if read_only else 'write_conn'
+        conn = getattr(holder, attr)
+        if conn is None:
+            conn = self._open_connection(read_only=read_only)
+            holder.connections.append(conn)
+            setattr(holder, attr, conn)
+        return conn
+        
+    @contextmanager
+    def _get_connection(self):
+        """Thread-safe database connection context manager with WAL mode for concurrency."""
+        # Ensure database is initialized before connecting
+        self._ensure_initialized()
+        
+        with self.lock:
+            if not self.persistent_connections:
+                conn = self._open_connection()
+                try:
+                    yield conn
+                    conn.commit()
+                except Exception:
+                    conn.rollback()
+                    raise
+                finally:
+                    conn.close()
+                return
             
+            conn = self._thread_connection()
+            local = self._local
+            local.depth += 1
             try:
                 yield conn
-                conn.commit()
+                # Only the outermost block on this thread ends the transaction
+                if local.depth == 1:
+                    conn.commit()
             except Exception:
-                conn.rollback()
+                if local.depth == 1:
+                    conn.rollback()
                 raise
             finally:
-                conn.close()
+                local.depth -= 1
                 
+    @contextmanager
+    def _get_read_connection(self):
+        """
+        Read-only connection context manager that does not take the write lock.
+        
+        WAL mode lets readers run concurrently with the single writer. Inside an
+        open write block on the same thread the write connection is reused so
+        uncommitted changes stay visible.
+        """
+        self._ensure_initialized()
+        
+        if not self.persistent_connections:
+            with self._get_connection() as conn:
+                yield conn
+            return
+            
+        local = self._local
+        if getattr(local, 'pid', None) == os.getpid() and local.depth:
+            # Already inside a write block on this thread
+            yield local.holder.write_conn
+            return
+            
+        try:
+            conn = self._thread_connection(read_only=True)
+        except sqlite3.OperationalError:
+            # Database file not created yet - fall back to the write path
+            with self._get_connection() as conn:
+                yield conn
+            return
+        yield conn
+        
+    def close(self):
+        """Close the persistent connections of all threads using this database instance."""
+        with self._connections_lock:
+            holders = list(self._thread_holders)
+            self._thread_holders = weakref.WeakSet()
+        for holder in holders:
+            holder.close()
+        self._local = threading.local()
+        
+    def __del__(self):
+        try:
+            self.close()
+        except Exception:
+            pass
+            
     def create_material(self, material_id: str, formula: str, space_group: int = None,
                        dimensionality: str = 'CRYSTAL', source_type: str = None,
                        source_file: str = None, metadata: Dict = None) -> str:
@@ -365,6 +674,35 @@ class MaterialDatabase:
             error_type: Type of error if failed
             error_message: Error message details
         """
+        with self._get_connection() as conn:
+            self._update_calculation_status(conn, calc_id, status, slurm_job_id, slurm_state,
+                                            output_file, exit_code, error_type, error_message)
+            
+    def update_calculation_statuses(self, updates: List[Dict[str, Any]]) -> int:
+        """
+        Apply many calculation status updates in a single transaction.
+        
+        Args:
+            updates: Dicts with the keyword arguments of update_calculation_status
+                     (calc_id and status required)
+                     
+        Returns:
+            Number of updates applied
+        """
+        if not updates:
+            return 0
+            
+        with self._get_connection() as conn:
+            for update in updates:
+                self._update_calculation_status(conn, **update)
+                
+        return len(updates)
+        
+    def _update_calculation_status(self, conn, calc_id: str, status: str, slurm_job_id: str = None,
+                                   slurm_state: str = None, output_file: str = None,
+                                   exit_code: int = None, error_type: str = None,
+                                   error_message: str = None):
+        """Update one calculation's status on an open write connection."""
         now = datetime.now().isoformat()
         
         # Determine which timestamp to update based on status
@@ -376,48 +714,47 @@ class MaterialDatabase:
         elif status in ['completed', 'failed', 'cancelled']:
             timestamp_updates.append(('completed_at', now))
             
-        with self._get_connection() as conn:
-            # Build dynamic update query
-            update_fields = ['status = ?']
-            update_values = [status]
-            
-            if slurm_job_id:
-                # Only update slurm_job_id if it's not already set to avoid UNIQUE constraint violations
-                cursor = conn.execute('SELECT slurm_job_id FROM calculations WHERE calc_id = ?', (calc_id,))
-                current_row = cursor.fetchone()
-                if current_row and not current_row[0]:  # Only if current slurm_job_id is NULL
-                    update_fields.append('slurm_job_id = ?')
-                    update_values.append(slurm_job_id)
-                
-            if slurm_state:
-                update_fields.append('slurm_state = ?')
-                update_values.append(slurm_state)
-                
-            if output_file:
-                update_fields.append('output_file = ?')
-                update_values.append(output_file)
-                
-            if exit_code is not None:
-                update_fields.append('exit_code = ?')
-                update_values.append(exit_code)
-                
-            if error_type:
-                update_fields.append('error_type = ?')
-                update_values.append(error_type)
-                
-            if error_message:
-                update_fields.append('error_message = ?')
-                update_values.append(error_message)
-                
-            # Add timestamp updates
-            for field, value in timestamp_updates:
-                update_fields.append(f'{field} = ?')
-                update_values.append(value)
-                
-            update_values.append(calc_id)
-            
-            query = f"UPDATE calculations SET {', '.join(update_fields)} WHERE calc_id = ?"
-            conn.execute(query, update_values)
+        # Build dynamic update query
+        update_fields = ['status = ?']
+        update_values = [status]
+        
+        if slurm_job_id:
+            # Only update slurm_job_id if it's not already set to avoid UNIQUE constraint violations
+            cursor = conn.execute('SELECT slurm_job_id FROM calculations WHERE calc_id = ?', (calc_id,))
+            current_row = cursor.fetchone()
+            if current_row and not current_row[0]:  # Only if current slurm_job_id is NULL
+                update_fields.append('slurm_job_id = ?')
+                update_values.append(slurm_job_id)
+            
+        if slurm_state:
+            update_fields.append('slurm_state = ?')
+            update_values.append(slurm_state)
+            
+        if output_file:
+            update_fields.append('output_file = ?')
+            update_values.append(output_file)
+            
+        if exit_code is not None:
+            update_fields.append('exit_code = ?')
+            update_values.append(exit_code)
+            
+        if error_type:
+            update_fields.append('error_type = ?')
+            update_values.append(error_type)
+            
+        if error_message:
+            update_fields.append('error_message = ?')
+            update_values.append(error_message)
+            
+        # Add timestamp updates
+        for field, value in timestamp_updates:
+            update_fields.append(f'{field} = ?')
+            update_values.append(value)
+            
+        update_values.append(calc_id)
+        
+        query = f"UPDATE calculations SET {', '.join(update_fields)} WHERE calc_id = ?"
+        conn.execute(query, update_values)
             
     def update_calculation_settings(self, calc_id: str, settings: Dict[str, Any], merge: bool = False):
         """Update calculation settings."""
@@ -442,9 +779,102 @@ class MaterialDatabase:
                 (settings_json, calc_id)
             )
             
+    def claim_workflow_events(self, consumer: str, limit: int = 100,
+                              event_type: str = 'calculation_completed',
+                              lease_seconds: int = 3600) -> List[Dict]:
+        """
+        Claim unconsumed workflow events, oldest first.
+        
+        Events claimed by another consumer are skipped until their lease
+        expires (the consumer died before completing them).
+        
+        Args:
+            consumer: Name of the claiming consumer
+            limit: Maximum number of events to claim
+            event_type: Type of events to claim
+            lease_seconds: Age after which a claim is considered abandoned
+            
+        Returns:
+            Claimed event records
+        """
+        now = datetime.now()
+        expired = datetime.fromtimestamp(now.timestamp() - lease_seconds).isoformat()
+        
+        with self._get_connection() as conn:
+            if not conn.in_transaction:
+                conn.execute("BEGIN IMMEDIATE")
+            cursor = conn.execute("""
+                SELECT * FROM workflow_events
+                WHERE event_type = ? AND consumed_at IS NULL
+                  AND (claimed_at IS NULL OR claimed_at < ?)
+                ORDER BY event_id LIMIT ?
+            """, (event_type, expired, limit))
+            events = [dict(row) for row in cursor.fetchall()]
+            conn.executemany(
+                "UPDATE workflow_events SET claimed_by = ?, claimed_at = ? WHERE event_id = ?",
+                [(consumer, now.isoformat(), event['event_id']) for event in events]
+            )
+            
+        return events
+        
+    def complete_workflow_event(self, event_id: int, result: Dict[str, Any] = None):
+        """
+        Mark a workflow event consumed.
+        
+        For calculation_completed events the calculation's settings get the
+        workflow_processed flag in the same transaction.
+        """
+        now = datetime.now().isoformat()
+        result = result or {}
+        
+        with self._get_connection() as conn:
+            row = conn.execute(
+                "SELECT event_type, calc_id FROM workflow_events WHERE event_id = ?", (event_id,)
+            ).fetchone()
+            if not row:
+                return
+            conn.execute(
+                "UPDATE workflow_events SET consumed_at = ?, result_json = ? WHERE event_id = ?",
+                (now, json.dumps(result), event_id)
+            )
+            if row['event_type'] == 'calculation_completed':
+                conn.execute("""
+                    UPDATE calculations SET settings_json = json_set(
+                        CASE WHEN json_valid(settings_json) THEN settings_json ELSE '{}' END,
+                        '$.workflow_processed', json('true'),
+                        '$.workflow_process_timestamp', ?,
+                        '$.workflow_steps_generated', ?)
+                    WHERE calc_id = ?
+                """, (now, result.get('steps_generated', 0), row['calc_id']))
+                
+    def release_workflow_event(self, event_id: int):
+        """Give up the claim on a workflow event so it is processed again."""
+        with self._get_connection() as conn:
+            conn.execute(
+                "UPDATE workflow_events SET claimed_by = NULL, claimed_at = NULL "
+                "WHERE event_id = ? AND consumed_at IS NULL", (event_id,)
+            )
+            
+    def count_pending_workflow_events(self, event_type: str = 'calculation_completed') -> int:
+        """Number of workflow events not consumed yet."""
+        with self._get_read_connection() as conn:
+            return conn.execute(
+                "SELECT COUNT(*) FROM workflow_events WHERE event_type = ? AND consumed_at IS NULL",
+                (event_type,)
+            ).fetchone()[0]
+            
+    def prune_workflow_events(self, older_than_days: int = 30) -> int:
+        """Delete consumed workflow events older than the given age; returns the number deleted."""
+        cutoff = datetime.fromtimestamp(datetime.now().timestamp() - older_than_days * 86400).isoformat()
+        with self._get_connection() as conn:
+            cursor = conn.execute(
+                "DELETE FROM workflow_events WHERE consumed_at IS NOT NULL AND consumed_at < ?", (cutoff,)
+            )
+            return cursor.rowcount
+            
     def get_calculation_by_slurm_id(self, slurm_job_id: str) -> Optional[Dict]:
         """Get calculation record by SLURM job ID."""
-        with self._get_connection() as conn:
+        with self._get_read_connection() as conn:
             cursor = conn.execute("""
                 SELECT * FROM calculations WHERE slurm_job_id = ?
             """, (slurm_job_id,))
@@ -471,7 +901,7 @@ class MaterialDatabase:
             
         where_clause = " WHERE " + " AND ".join(conditions) if conditions else ""
         
-        with self._get_connection() as conn:
+        with self._get_read_connection() as conn:
             cursor = conn.execute(f"""
                 SELECT * FROM calculations{where_clause} ORDER BY created_at DESC
             """, params)
@@ -479,7 +909,7 @@ class MaterialDatabase:
             
     def get_material(self, material_id: str) -> Optional[Dict]:
         """Get material record by ID."""
-        with self._get_connection() as conn:
+        with self._get_read_connection() as conn:
             cursor = conn.execute("""
                 SELECT * FROM materials WHERE material_id = ?
             """, (material_id,))
@@ -494,7 +924,7 @@ class MaterialDatabase:
             
     def get_materials_by_status(self, status: str = 'active') -> List[Dict]:
         """Get all materials with given status."""
-        with self._get_connection() as conn:
+        with self._get_read_connection() as conn:
             cursor = conn.execute("""
                 SELECT * FROM materials WHERE status = ? ORDER BY created_at DESC
             """, (status,))
@@ -508,7 +938,7 @@ class MaterialDatabase:
             
     def get_all_materials(self) -> List[Dict]:
         """Get all materials in the database."""
-        with self._get_connection() as conn:
+        with self._get_read_connection() as conn:
             cursor = conn.execute("""
                 SELECT * FROM materials ORDER BY created_at DESC
             """)
@@ -538,7 +968,7 @@ class MaterialDatabase:
         
     def get_material_calculations(self, material_id: str) -> List[Dict]:
         """Get all calculations for a specific material."""
-        with self._get_connection() as conn:
+        with self._get_read_connection() as conn:
             cursor = conn.execute("""
                 SELECT * FROM calculations 
                 WHERE material_id = ? 
@@ -556,7 +986,7 @@ class MaterialDatabase:
             
     def get_all_calculations(self) -> List[Dict]:
         """Get all calculations in the database."""
-        with self._get_connection() as conn:
+        with self._get_read_connection() as conn:
             cursor = conn.execute("""
                 SELECT * FROM calculations ORDER BY created_at DESC
             """)
@@ -564,7 +994,7 @@ class MaterialDatabase:
     
     def get_recent_calculations(self, limit: int = 20) -> List[Dict]:
         """Get recent calculations with detailed information."""
-        with self._get_connection() as conn:
+        with self._get_read_connection() as conn:
             cursor = conn.execute("""
                 SELECT * FROM calculations ORDER BY created_at DESC LIMIT ?
             """, (limit,))
@@ -572,7 +1002,7 @@ class MaterialDatabase:
             
     def get_calculation(self, calc_id: str) -> Optional[Dict]:
         """Get calculation record by ID."""
-        with self._get_connection() as conn:
+        with self._get_read_connection() as conn:
             cursor = conn.execute("""
                 SELECT * FROM calculations WHERE calc_id = ?
             """, (calc_id,))
@@ -581,12 +1011,37 @@ class MaterialDatabase:
             
     def get_calculations_by_material(self, material_id: str) -> List[Dict]:
         """Get all calculations for a specific material."""
-        with self._get_connection() as conn:
+        with self._get_read_connection() as conn:
             cursor = conn.execute("""
                 SELECT * FROM calculations WHERE material_id = ? ORDER BY created_at DESC
             """, (material_id,))
             return [dict(row) for row in cursor.fetchall()]
-            
+
+    def get_calculations_for_materials(self, material_ids: List[str]) -> List[Dict]:
+        """
+        Get all calculations of several materials in one query (newest first).
+
+        Args:
+            material_ids: Materials to load
+
+        Returns:
+            Calculation records of all the materials
+        """
+        material_ids = list(dict.fromkeys(material_ids))
+        calculations = []
+        with self._get_read_connection() as conn:
+            # SQLite limits the number of bound parameters per statement
+            for start in range(0, len(material_ids), 900):
+                chunk = material_ids[start:start + 900]
+                cursor = conn.execute(f"""
+                    SELECT * FROM calculations WHERE material_id IN ({','.join('?' * len(chunk))})
+                    ORDER BY created_at DESC
+                """, chunk)
+                calculations.extend(dict(row) for row in cursor.fetchall())
+        if len(material_ids) > 900:
+            calculations.sort(key=lambda calc: calc['created_at'] or '', reverse=True)
+        return calculations
+
     def add_file_record(self, calc_id: str, file_type: str, file_name: str,
                        file_path: str, checksum: str = None):
         """Add a file record associated with a calculation."""
@@ -611,7 +1066,7 @@ class MaterialDatabase:
         # Standard workflow: OPT -> SP -> (BAND + DOSS in parallel)
         completed_calcs = set()
         
-        with self._get_connection() as conn:
+        with self._get_read_connection() as conn:
             cursor = conn.execute("""
                 SELECT calc_type FROM calculations 
                 WHERE material_id = ? AND status = 'completed'
@@ -680,7 +1135,7 @@ class MaterialDatabase:
     
     def get_workflow_template(self, template_id: str) -> Optional[Dict]:
         """Get a workflow template by ID."""
-        with self._get_connection() as conn:
+        with self._get_read_connection() as conn:
             cursor = conn.execute(
                 "SELECT * FROM workflow_templates WHERE template_id = ?",
                 (template_id,)
@@ -694,7 +1149,7 @@ class MaterialDatabase:
     
     def get_all_workflow_templates(self) -> List[Dict]:
         """Get all workflow templates."""
-        with self._get_connection() as conn:
+        with self._get_read_connection() as conn:
             cursor = conn.execute("SELECT * FROM workflow_templates ORDER BY created_at DESC")
             templates = []
             for row in cursor.fetchall():
@@ -764,7 +1219,7 @@ class MaterialDatabase:
     
     def get_workflow_instance(self, instance_id: str) -> Optional[Dict]:
         """Get a workflow instance by ID with parsed JSON fields."""
-        with self._get_connection() as conn:
+        with self._get_read_connection() as conn:
             cursor = conn.execute(
                 "SELECT * FROM workflow_instances WHERE instance_id = ?",
                 (instance_id,)
@@ -790,7 +1245,7 @@ class MaterialDatabase:
     
     def get_workflow_instances_by_material(self, material_id: str) -> List[Dict]:
         """Get all workflow instances for a material."""
-        with self._get_connection() as conn:
+        with self._get_read_connection() as conn:
             cursor = conn.execute(
                 "SELECT * FROM workflow_instances WHERE material_id = ? ORDER BY started_at DESC",
                 (material_id,)
@@ -799,7 +1254,7 @@ class MaterialDatabase:
     
     def get_active_workflow_instances(self) -> List[Dict]:
         """Get all active workflow instances."""
-        with self._get_connection() as conn:
+        with self._get_read_connection() as conn:
             cursor = conn.execute(
                 "SELECT * FROM workflow_instances WHERE status = 'active' ORDER BY started_at"
             )
@@ -807,7 +1262,7 @@ class MaterialDatabase:
     
     def get_all_workflow_instances(self) -> List[Dict]:
         """Get all workflow instances with parsed JSON fields."""
-        with self._get_connection() as conn:
+        with self._get_read_connection() as conn:
             cursor = conn.execute("SELECT * FROM workflow_instances ORDER BY started_at DESC")
             instances = []
             for row in cursor.fetchall():
@@ -908,7 +1363,7 @@ class MaterialDatabase:
     
     def get_workflow_state(self, workflow_id: str) -> Optional[Dict]:
         """Get workflow state record"""
-        with self._get_connection() as conn:
+        with self._get_read_connection() as conn:
             cursor = conn.execute("""
                 SELECT * FROM workflow_states WHERE workflow_id = ?
             """, (workflow_id,))
@@ -1013,7 +1468,7 @@ class MaterialDatabase:
         Returns:
             Dictionary with calculation type summaries per material
         """
-        with self._get_connection() as conn:
+        with self._get_read_connection() as conn:
             if material_id:
                 # Get calculation types for specific material
                 cursor = conn.execute("""
@@ -1084,7 +1539,7 @@ class MaterialDatabase:
 
     def get_database_stats(self) -> Dict:
         """Get statistics about the database contents."""
-        with self._get_connection() as conn:
+        with self._get_read_connection() as conn:
             stats = {}
             
             # Material counts
@@ -1144,9 +1599,88 @@ class MaterialDatabase:
             conn.commit()
             return property_id
             
+    def upsert_properties(self, rows: List[Tuple], record_history: bool = True,
+                          changed_by: Optional[str] = None,
+                          change_reason: Optional[str] = None) -> int:
+        """
+        Insert or update many properties in a single transaction.
+        
+        Args:
+            rows: Tuples of (material_id, calc_id, property_category, property_name,
+                  property_value, property_value_text, property_unit,
+                  extracted_at, extractor_script)
+            record_history: Append the changed values to property_history in
+                            the same transaction (unchanged values are skipped)
+            changed_by: Recorded in the history (default: the extractor script)
+            change_reason: Recorded in the history
+                  
+        Returns:
+            Number of rows written
+        """
+        if not rows:
+            return 0
+            
+        with self._get_connection() as conn:
+            return self._upsert_properties(conn, rows, record_history, changed_by, change_reason)
+            
+    def _upsert_properties(self, conn, rows: List[Tuple], record_history: bool = True,
+                           changed_by: Optional[str] = None,
+                           change_reason: Optional[str] = None) -> int:
+        """upsert_properties inside the caller's transaction."""
+        if record_history:
+            from mace.database.utils.history import write_history, changes_from_rows
+            write_history(conn, changes_from_rows(rows), changed_by, change_reason,
+                          skip_unchanged=True)
+        conn.executemany("""
+            INSERT INTO properties
+            (material_id, calc_id, property_category, property_name,
+             property_value, property_value_text, property_unit,
+             extracted_at, extractor_script)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (material_id, IFNULL(calc_id, ''), property_name) DO UPDATE SET
+                property_category = excluded.property_category,
+                property_value = excluded.property_value,
+                property_value_text = excluded.property_value_text,
+                property_unit = excluded.property_unit,
+                extracted_at = excluded.extracted_at,
+                extractor_script = excluded.extractor_script
+        """, rows)
+        return len(rows)
+        
+    def get_file_fingerprints(self, path_prefix: str = None) -> Dict[str, Dict]:
+        """Get stored output file fingerprints keyed by file path."""
+        with self._get_read_connection() as conn:
+            if path_prefix:
+                cursor = conn.execute(
+                    "SELECT * FROM file_fingerprints WHERE file_path >= ? AND file_path < ?",
+                    (path_prefix, path_prefix + '\uffff')
+                )
+            else:
+                cursor = conn.execute("SELECT * FROM file_fingerprints")
+            return {row['file_path']: dict(row) for row in cursor.fetchall()}
+            
+    def upsert_file_fingerprints(self, records: List[Dict]) -> int:
+        """Insert or replace many file fingerprints in a single transaction."""
+        if not records:
+            return 0
+            
+        now = datetime.now().isoformat()
+        with self._get_connection() as conn:
+            conn.executemany("""
+                INSERT OR REPLACE INTO file_fingerprints
+                (file_path, file_size, mtime_ns, inode, scanned_offset,
+                 completed, checksum, parse_result_json, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, [(r['file_path'], r['file_size'], r['mtime_ns'], r['inode'],
+                   r.get('scanned_offset', 0), int(bool(r.get('completed'))),
+                   r.get('checksum'), r.get('parse_result_json'), now)
+                  for r in records])
+            
+        return len(records)
+        
     def get_material_properties(self, material_id: str) -> List[Dict]:
         """Get all properties for a specific material."""
-        with self._get_connection() as conn:
+        with self._get_read_connection() as conn:
             cursor = conn.execute("""
                 SELECT property_id, material_id, calc_id, property_category,
                        property_name, property_value, property_value_text,
@@ -1170,14 +1704,14 @@ class MaterialDatabase:
             
     def get_all_properties(self) -> List[Dict]:
         """Get all properties from the database."""
-        with self._get_connection() as conn:
+        with self._get_read_connection() as conn:
             cursor = conn.execute("""
                 SELECT property_id, material_id, calc_id, property_category,
                        property_name, property_value, property_value_text,
                        property_unit, confidence, extractor_script,
                        extracted_at
                 FROM properties
-                ORDER BY material_id, property_category, property_name
+                ORDER BY material_id, property_category, property_name, property_id
             """)
             
             columns = [desc[0] for desc in cursor.description]
@@ -1193,7 +1727,7 @@ class MaterialDatabase:
             
     def get_properties_by_name(self, property_name: str) -> List[Dict]:
         """Get all values of a specific property across materials."""
-        with self._get_connection() as conn:
+        with self._get_read_connection() as conn:
             cursor = conn.execute("""
                 SELECT m.material_id, m.formula, p.property_value, 
                        p.property_value_text, p.property_unit, p.calc_id,
@@ -1233,37 +1767,49 @@ class MaterialDatabase:
             backup_conn.close()
             
         # Also backup ASE database if it exists
-        if self.ase_db and os.path.exists(self.ase_db_path):
+        if HAS_ASE and os.path.exists(self.ase_db_path):
             ase_backup_path = backup_dir / f"structures_backup_{timestamp}.db"
             shutil.copy2(self.ase_db_path, ase_backup_path)
             
         return backup_path
     
-    def filter_materials_by_properties(self, filter_strings: List[str], logic: str = 'AND') -> List[Dict]:
+    def filter_materials_by_properties(self, filter_strings: List[str], logic: str = 'AND',
+                                       pushdown: bool = True) -> List[Dict]:
         """
         Filter materials by property value ranges.
         
         Args:
             filter_strings: List of filter strings like ["band_gap > 3.0", "total_energy < -1000"]
             logic: Logic to combine filters ('AND' or 'OR')
+            pushdown: Evaluate the filter inside SQLite (False forces the Python evaluator)
             
         Returns:
             List of materials that match the filters
         """
         from mace.database.query.filters import create_filter_from_strings
+        from mace.database.query.sql_filters import compile_property_filter
+        
+        filter_obj = create_filter_from_strings(filter_strings, logic)
+        
+        if pushdown:
+            compiled = compile_property_filter(filter_obj)
+            if compiled:
+                try:
+                    return self._select_materials(compiled)
+                except sqlite3.Error as e:
+                    print(f"Warning: SQL filter failed, using Python evaluation: {e}")
         
         # Get all materials and properties
         all_materials = self.get_all_materials()
         all_properties = self.get_all_properties()
         
-        # Create and apply filter
-        filter_obj = create_filter_from_strings(filter_strings, logic)
-        matching_material_ids = filter_obj.apply_to_materials(all_materials, all_properties)
+        # Apply filter
+        matching_material_ids = set(filter_obj.apply_to_materials(all_materials, all_properties))
         
         # Return full material records for matching IDs
         return [m for m in all_materials if m['material_id'] in matching_material_ids]
         
-    def filter_materials_advanced(self, expression: str) -> List[Dict]:
+    def filter_materials_advanced(self, expression: str, pushdown: bool = True) -> List[Dict]:
         """
         Filter materials using advanced SQL-like syntax.
         
@@ -1273,13 +1819,33 @@ class MaterialDatabase:
         - IN operator: space_group IN (225, 227, 229)
         - IS NULL/IS NOT NULL: transport_seebeck IS NOT NULL
         
+        The expression is compiled once into a single SQL query; expressions
+        the compiler does not support are evaluated in Python instead.
+        
         Args:
             expression: Advanced filter expression
+            pushdown: Evaluate the filter inside SQLite (False forces the Python evaluator)
             
         Returns:
             List of materials that match the filter
         """
-        from mace.database.query.advanced_filters import evaluate_advanced_filter
+        from mace.database.query.advanced_filters import AdvancedFilterParser
+        from mace.database.query.sql_filters import compile_advanced_filter
+        
+        parser = AdvancedFilterParser()
+        try:
+            ast = parser.parse(expression)
+        except ValueError as e:
+            print(f"Warning: Invalid filter expression '{expression}': {e}")
+            return []
+        
+        if pushdown:
+            compiled = compile_advanced_filter(ast)
+            if compiled:
+                try:
+                    return self._select_materials(compiled)
+                except sqlite3.Error as e:
+                    print(f"Warning: SQL filter failed, using Python evaluation: {e}")
         
         # Get all materials and their properties
         all_materials = self.get_all_materials()
@@ -1300,7 +1866,7 @@ class MaterialDatabase:
             mat_props = props_by_material.get(mat_id, [])
             
             try:
-                if evaluate_advanced_filter(expression, material, mat_props):
+                if parser.evaluate(ast, material, mat_props):
                     matching_materials.append(material)
             except Exception as e:
                 # Log error but continue filtering
@@ -1308,6 +1874,21 @@ class MaterialDatabase:
                 
         return matching_materials
         
+    def _select_materials(self, compiled) -> List[Dict]:
+        """Run a compiled filter query and return material records."""
+        from mace.database.query.sql_filters import register_filter_functions
+        
+        with self._get_read_connection() as conn:
+            register_filter_functions(conn)
+            cursor = conn.execute(compiled.sql, compiled.params)
+            materials = []
+            for row in cursor.fetchall():
+                material = dict(row)
+                if material['metadata_json']:
+                    material['metadata'] = json.loads(material['metadata_json'])
+                materials.append(material)
+            return materials
+        
     def filter_properties(self, filter_strings: List[str], material_id: str = None) -> List[Dict]:
         """
         Filter properties by value ranges.
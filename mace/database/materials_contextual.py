@@ -9,7 +9,6 @@ Author: Workflow isolation enhancement
 """
 
 import os
-import sys
 from pathlib import Path
 from typing import Optional, Union, Dict, Any, List
 
@@ -17,7 +16,6 @@ from typing import Optional, Union, Dict, Any, List
 from mace.database.materials import MaterialDatabase
 
 # Import context management
-sys.path.insert(0, str(Path(__file__).parent.parent))
 from mace.workflow.context import get_current_context, require_context
 
 
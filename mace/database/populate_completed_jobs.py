@@ -11,12 +11,14 @@ import json
 from datetime import datetime
 
 
-def scan_for_completed_calculations(base_dir: Path) -> List[Dict]:
+def scan_for_completed_calculations(base_dir: Path, fingerprints=None) -> List[Dict]:
     """
     Scan directory for completed CRYSTAL calculations.
     
     Args:
         base_dir: Base directory to scan
+        fingerprints: Optional OutputFingerprintCache; unchanged outputs are then
+                      answered from their stored fingerprint without being opened
         
     Returns:
         List of calculation info dictionaries
@@ -31,10 +33,18 @@ def scan_for_completed_calculations(base_dir: Path) -> List[Dict]:
             
         # Check if calculation completed
         try:
-            with open(out_file, 'r') as f:
-                content = f.read()
-                if "TERMINATION" not in content:
+            if fingerprints is not None:
+                if not fingerprints.has_marker(out_file, "TERMINATION"):
                     continue
+                cached = fingerprints.get_result(out_file)
+                if cached is not None:
+                    completed_calcs.append(cached)
+                    continue
+            else:
+                with open(out_file, 'r') as f:
+                    content = f.read()
+                    if "TERMINATION" not in content:
+                        continue
                     
             # Extract material name from file
             material_name = out_file.stem
@@ -81,12 +91,17 @@ def scan_for_completed_calculations(base_dir: Path) -> List[Dict]:
                 except:
                     pass
                     
+            if fingerprints is not None:
+                fingerprints.set_result(out_file, calc_info)
             completed_calcs.append(calc_info)
             
         except Exception as e:
             print(f"  Error scanning {out_file}: {e}")
             continue
             
+    if fingerprints is not None:
+        fingerprints.flush()
+        
     return completed_calcs
 
 
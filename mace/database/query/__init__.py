@@ -6,8 +6,10 @@ Provides advanced filtering and query capabilities.
 
 from .filters import PropertyFilter, parse_filter_string
 from .advanced_filters import AdvancedFilterParser, parse_advanced_filter, evaluate_advanced_filter
+from .sql_filters import compile_advanced_filter, compile_property_filter, register_filter_functions
 from .queries import query_materials, execute_custom_query
 
 __all__ = ['PropertyFilter', 'parse_filter_string',
            'AdvancedFilterParser', 'parse_advanced_filter', 'evaluate_advanced_filter',
+           'compile_advanced_filter', 'compile_property_filter', 'register_filter_functions',
            'query_materials', 'execute_custom_query']
\ No newline at end of file
@@ -0,0 +1,340 @@
+"""
+SQL Pushdown for Filter Expressions
+===================================
+Compiles the AST produced by AdvancedFilterParser (and PropertyFilter
+objects) into one parameterised SQL query over the materials table, so
+filtering runs inside SQLite instead of loading every material and property
+row into Python.
+
+Each property named in the expression becomes one LEFT JOIN against the
+properties table, selecting the same row the Python evaluator would use
+(first row per material for advanced filters, last row for PropertyFilter).
+Material columns such as formula and space_group are used directly.
+
+The Python evaluators convert values before comparing them (numeric strings
+become floats, numbers are compared with str() in LIKE, ...). The generated
+SQL reproduces those rules exactly; the few conversions SQL cannot express
+are done by small SQLite functions registered with register_filter_functions().
+Expressions the compiler cannot reproduce faithfully return None, and the
+caller falls back to the Python evaluator.
+
+Usage:
+    compiled = compile_advanced_filter(parse_advanced_filter("band_gap > 3 AND formula LIKE 'Zn%'"))
+    if compiled:
+        register_filter_functions(conn)
+        rows = conn.execute(compiled.sql, compiled.params).fetchall()
+"""
+
+import re
+import sqlite3
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+from .filters import PropertyFilter
+
+
+# Columns of the materials table that the Python evaluator reads from the
+# material record instead of from properties
+MATERIAL_COLUMNS = (
+    'material_id', 'formula', 'space_group', 'dimensionality', 'created_at',
+    'updated_at', 'source_type', 'source_file', 'status', 'metadata_json', 'notes',
+)
+
+_REGEX_SPECIAL = set('.^$*+?{}[]\\|()')
+
+_NUMERIC = "typeof({x}) IN ('integer', 'real')"
+_TEXT = "typeof({x}) = 'text'"
+
+
+class UnsupportedFilter(Exception):
+    """Raised internally for expressions that must be evaluated in Python."""
+
+
+@dataclass
+class CompiledFilter:
+    """A filter compiled to a SELECT over materials."""
+    sql: str
+    params: List[Any] = field(default_factory=list)
+
+
+# ----------------------------------------------------------------------
+# SQLite functions reproducing the Python conversions
+# ----------------------------------------------------------------------
+
+def _material_value(value):
+    """AdvancedFilterParser._get_property_value for a material column."""
+    if isinstance(value, str) and value.replace('.', '').replace('-', '').isdigit():
+        try:
+            return float(value) if '.' in value else int(value)
+        except ValueError:
+            pass
+    return value
+
+
+def _property_value(value, text):
+    """AdvancedFilterParser._get_property_value for a property row."""
+    if value is None and text:
+        value = text
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except (ValueError, TypeError):
+        return str(value)
+
+
+def _to_float(value):
+    """float(value), or NULL if Python cannot convert it."""
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except (ValueError, TypeError):
+        return None
+
+
+def _to_str(value):
+    """str(value) the way Python prints it (e.g. 1e-05, not 1.0e-05)."""
+    return str(value)
+
+
+_like_cache: Dict[str, Any] = {}
+
+
+def _like(value, pattern):
+    """The LIKE implementation of AdvancedFilterParser (regex, case-insensitive)."""
+    if value is None:
+        return None
+    regex = _like_cache.get(pattern)
+    if regex is None:
+        regex = re.compile('^' + pattern.replace('%', '.*').replace('_', '.') + '$', re.IGNORECASE)
+        _like_cache[pattern] = regex
+    return 1 if regex.match(str(value)) else 0
+
+
+def register_filter_functions(conn: sqlite3.Connection):
+    """Register the helper functions used by compiled filters on a connection."""
+    functions = (
+        ('mace_material_value', 1, _material_value),
+        ('mace_property_value', 2, _property_value),
+        ('mace_float', 1, _to_float),
+        ('mace_str', 1, _to_str),
+        ('mace_like', 2, _like),
+    )
+    for name, n_args, func in functions:
+        try:
+            conn.create_function(name, n_args, func, deterministic=True)
+        except (TypeError, sqlite3.NotSupportedError):
+            # Python < 3.8 or SQLite < 3.8.3
+            conn.create_function(name, n_args, func)
+
+
+# ----------------------------------------------------------------------
+# Compilers
+# ----------------------------------------------------------------------
+
+class _QueryBuilder:
+    """Collects property joins and their parameters while compiling."""
+
+    def __init__(self, first_row: bool = True):
+        self.first_row = first_row
+        self.aliases: Dict[str, str] = {}
+        self.joins: List[str] = []
+        self.join_params: List[Any] = []
+
+    def property_row(self, property_name: str) -> str:
+        """Alias of the joined properties row for a property name."""
+        alias = self.aliases.get(property_name)
+        if alias is None:
+            alias = f"p{len(self.aliases)}"
+            self.aliases[property_name] = alias
+            order = "property_category, property_id" if self.first_row else \
+                    "property_category DESC, property_id DESC"
+            self.joins.append(
+                f"LEFT JOIN properties {alias} ON {alias}.property_id = ("
+                f"SELECT property_id FROM properties "
+                f"WHERE material_id = m.material_id AND property_name = ? "
+                f"ORDER BY {order} LIMIT 1)"
+            )
+            self.join_params.append(property_name)
+        return alias
+
+    def build(self, where: str, where_params: List[Any]) -> CompiledFilter:
+        sql = "SELECT m.* FROM materials m"
+        if self.joins:
+            sql += "\n" + "\n".join(self.joins)
+        sql += f"\nWHERE {where}\nORDER BY m.created_at DESC"
+        return CompiledFilter(sql, self.join_params + where_params)
+
+
+def _is_number(value) -> bool:
+    return isinstance(value, (int, float))
+
+
+def _sql_number(value):
+    return int(value) if isinstance(value, bool) else value
+
+
+def _is_simple_like(pattern: str) -> bool:
+    """True if SQL LIKE and the regex translation agree for this pattern."""
+    return pattern.isascii() and not (_REGEX_SPECIAL & set(pattern))
+
+
+class AdvancedFilterCompiler:
+    """Compiles AdvancedFilterParser ASTs to SQL."""
+
+    def compile(self, ast: Optional[Dict[str, Any]]) -> Optional[CompiledFilter]:
+        """
+        Compile an AST into a query returning the matching material rows.
+
+        Returns:
+            CompiledFilter, or None if the expression must be evaluated in Python
+        """
+        builder = _QueryBuilder(first_row=True)
+        params: List[Any] = []
+        try:
+            where = self._node(ast, builder, params) if ast else "1"
+        except UnsupportedFilter:
+            return None
+        return builder.build(where, params)
+
+    def _node(self, node: Dict[str, Any], builder: _QueryBuilder, params: List[Any]) -> str:
+        if node.get('type') == 'logical' and node.get('operator') in ('AND', 'OR'):
+            left = self._node(node['left'], builder, params)
+            right = self._node(node['right'], builder, params)
+            return f"({left} {node['operator']} {right})"
+        if node.get('type') == 'comparison':
+            return self._comparison(node, builder, params)
+        raise UnsupportedFilter(f"Unknown node {node.get('type')}")
+
+    def _operand(self, name: str, builder: _QueryBuilder) -> str:
+        """SQL expression whose value and type match the Python evaluator's."""
+        if name in MATERIAL_COLUMNS:
+            column = f"m.{name}"
+            # Only digit-like strings are converted; test for them in SQL first
+            return (f"(CASE WHEN typeof({column}) = 'text' AND ({column} NOT GLOB '*[^0-9.-]*' "
+                    f"OR length({column}) != length(CAST({column} AS BLOB))) "
+                    f"THEN mace_material_value({column}) ELSE {column} END)")
+        if name == 'metadata':
+            raise UnsupportedFilter("metadata is a parsed JSON object")
+        alias = builder.property_row(name)
+        return (f"(CASE WHEN typeof({alias}.property_value) = 'real' THEN {alias}.property_value "
+                f"ELSE mace_property_value({alias}.property_value, {alias}.property_value_text) END)")
+
+    def _equals(self, x: str, value, params: List[Any]) -> str:
+        """Python `actual == value` (never NULL)."""
+        params.append(_sql_number(value) if _is_number(value) else value)
+        guard = _NUMERIC if _is_number(value) else _TEXT
+        return f"({guard.format(x=x)} AND {x} = ?)"
+
+    def _comparison(self, node: Dict[str, Any], builder: _QueryBuilder, params: List[Any]) -> str:
+        op = node['operator']
+        value = node['value']
+        x = self._operand(node['property'], builder)
+
+        if op in ('IS', 'IS NOT'):
+            if value is None:
+                return f"({x} IS {'NOT ' if op == 'IS NOT' else ''}NULL)"
+            if not isinstance(value, (int, float, str)):
+                raise UnsupportedFilter(f"Unsupported value {value!r}")
+            equals = self._equals(x, value, params)
+            return equals if op == 'IS' else f"(NOT {equals})"
+
+        if op in ('LIKE', 'NOT LIKE'):
+            if not isinstance(value, str):
+                # The Python evaluator raises for these
+                raise UnsupportedFilter("LIKE needs a string pattern")
+            if _is_simple_like(value):
+                # Native LIKE for plain ASCII text; numbers, newlines and
+                # non-ASCII characters go through the regex implementation
+                match = (f"(CASE WHEN typeof({x}) = 'text' AND length({x}) = length(CAST({x} AS BLOB)) "
+                         f"AND instr({x}, char(10)) = 0 THEN {x} LIKE ? ELSE mace_like({x}, ?) END)")
+                params.extend([value, value])
+            else:
+                match = f"mace_like({x}, ?)"
+                params.append(value)
+            return match if op == 'LIKE' else f"({x} IS NOT NULL AND NOT {match})"
+
+        if op in ('IN', 'NOT IN'):
+            if not isinstance(value, list):
+                raise UnsupportedFilter(f"{op} needs a list")
+            numbers = [_sql_number(v) for v in value if _is_number(v)]
+            strings = [v for v in value if isinstance(v, str)]
+            if len(numbers) + len(strings) != len(value):
+                raise UnsupportedFilter(f"Unsupported list {value!r}")
+            parts = []
+            if numbers:
+                parts.append(f"({_NUMERIC.format(x=x)} AND {x} IN ({', '.join('?' * len(numbers))}))")
+                params.extend(numbers)
+            if strings:
+                parts.append(f"({_TEXT.format(x=x)} AND {x} IN ({', '.join('?' * len(strings))}))")
+                params.extend(strings)
+            member = f"({' OR '.join(parts)})" if parts else "0"
+            return member if op == 'IN' else f"({x} IS NOT NULL AND NOT {member})"
+
+        sql_op = {'==': '=', '<>': '!='}.get(op, op)
+        if sql_op not in ('=', '!=', '<', '<=', '>', '>='):
+            raise UnsupportedFilter(f"Unsupported operator {op}")
+
+        if _is_number(value):
+            # Strings are converted with float() before numeric comparisons
+            params.append(_sql_number(value))
+            return f"((CASE WHEN typeof({x}) = 'text' THEN mace_float({x}) ELSE {x} END) {sql_op} ?)"
+        if isinstance(value, str):
+            params.append(value)
+            if sql_op == '!=':
+                # Numbers never equal a string
+                return f"({_NUMERIC.format(x=x)} OR ({_TEXT.format(x=x)} AND {x} != ?))"
+            # ==, and orderings between str and numbers (TypeError) are False
+            return f"({_TEXT.format(x=x)} AND {x} {sql_op} ?)"
+        raise UnsupportedFilter(f"Unsupported value {value!r}")
+
+
+def compile_advanced_filter(ast: Optional[Dict[str, Any]]) -> Optional[CompiledFilter]:
+    """
+    Compile a parsed advanced filter expression to SQL.
+
+    Args:
+        ast: AST from parse_advanced_filter()
+
+    Returns:
+        CompiledFilter, or None if the expression must be evaluated in Python
+    """
+    return AdvancedFilterCompiler().compile(ast)
+
+
+def compile_property_filter(filter_obj: PropertyFilter) -> Optional[CompiledFilter]:
+    """
+    Compile a PropertyFilter to SQL with the semantics of apply_to_materials().
+
+    Returns:
+        CompiledFilter, or None if the filter must be evaluated in Python
+    """
+    builder = _QueryBuilder(first_row=False)
+    if not filter_obj.filters:
+        return builder.build("1", [])
+
+    params: List[Any] = []
+    conditions = []
+    for filt in filter_obj.filters:
+        sql_op = {'==': '='}.get(filt['operator'], filt['operator'])
+        if sql_op not in ('=', '!=', '<', '<=', '>', '>='):
+            return None
+        alias = builder.property_row(filt['property'])
+        # get_all_properties() substitutes the text value for NULL numeric values
+        raw = (f"(CASE WHEN {alias}.property_value IS NULL AND {alias}.property_value_text != '' "
+               f"THEN {alias}.property_value_text ELSE {alias}.property_value END)")
+        if filt['type'] == 'numeric':
+            compare_value = _to_float(filt['value'])
+            if compare_value is None:
+                return None
+            conditions.append(f"({alias}.property_id IS NOT NULL AND "
+                              f"(CASE WHEN typeof({raw}) = 'real' THEN {raw} ELSE mace_float({raw}) END) {sql_op} ?)")
+            params.append(compare_value)
+        else:
+            # str() of the stored value, including 'None' for NULL
+            conditions.append(f"({alias}.property_id IS NOT NULL AND "
+                              f"(CASE WHEN {raw} IS NULL THEN 'None' ELSE mace_str({raw}) END) {sql_op} ?)")
+            params.append(str(filt['value']))
+
+    return builder.build(f" {filter_obj.logic} ".join(conditions), params)
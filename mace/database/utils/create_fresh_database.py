@@ -64,6 +64,9 @@ class WorkflowDatabaseCreator:
         print(f"   Workflow directory: {self.workflow_dir}")
         print(f"   Database path: {self.db_path}")
         
+        # Release persistent connections before the file goes away
+        self.db.close()
+        
         # Remove existing database if it exists
         if Path(self.db_path).exists():
             Path(self.db_path).unlink()
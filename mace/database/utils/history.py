@@ -2,6 +2,25 @@
 Property History and Versioning
 ================================
 Track changes to material properties over time.
+
+History is append-only. Every batch of changes to a material is one material
+version (property_history.material_version); each property also keeps its own
+version counter. Both are assigned inside the write transaction, so
+concurrent writers cannot hand out the same number. MaterialDatabase
+.upsert_properties records the history of a bulk write in the same
+transaction, skipping properties whose value did not change.
+
+Every SNAPSHOT_INTERVAL changes a material gets a snapshot of all its
+properties (history_snapshots), so rebuilding the material at any version
+reads one snapshot plus the changes made after it.
+
+Usage:
+    history = PropertyHistory('materials.db')
+    history.record_property_changes([
+        {'material_id': 'mat_1', 'property_name': 'band_gap', 'value': 2.1, 'unit': 'eV'},
+    ], changed_by='me')
+    state = history.get_material_state('mat_1', version=3)
+    diff = history.compare_states('mat_1', 2, 5)
 """
 
 from typing import List, Dict, Any, Optional, Tuple
@@ -11,17 +30,353 @@ import sqlite3
 from contextlib import contextmanager
 
 
+# Changes of a material between two snapshots
+SNAPSHOT_INTERVAL = 200
+
+
+def ensure_history_tables(conn: sqlite3.Connection):
+    """Create the history tables on an open connection (and migrate older ones)."""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS property_history (
+            history_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            material_id TEXT NOT NULL,
+            property_name TEXT NOT NULL,
+            property_value TEXT,
+            property_unit TEXT,
+            property_category TEXT,
+            calc_id TEXT,
+            changed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            changed_by TEXT,
+            change_reason TEXT,
+            old_value TEXT,
+            version INTEGER DEFAULT 1,
+            material_version INTEGER,  -- Version of the material this change belongs to
+            FOREIGN KEY (material_id) REFERENCES materials(material_id)
+        )
+    """)
+
+    columns = [row[1] for row in conn.execute("PRAGMA table_info(property_history)")]
+    if 'material_version' not in columns:
+        print("Adding material_version column to property_history table...")
+        conn.execute("ALTER TABLE property_history ADD COLUMN material_version INTEGER")
+        # Every earlier change was written on its own: one material version each.
+        # Numbered in one pass, then applied by primary key lookups
+        conn.execute("""
+            CREATE TEMP TABLE history_backfill (
+                history_id INTEGER PRIMARY KEY,
+                material_version INTEGER NOT NULL
+            )
+        """)
+        conn.execute("""
+            INSERT INTO history_backfill (history_id, material_version)
+            SELECT history_id,
+                   ROW_NUMBER() OVER (PARTITION BY material_id ORDER BY history_id)
+            FROM property_history
+        """)
+        conn.execute("""
+            UPDATE property_history SET material_version = (
+                SELECT b.material_version FROM history_backfill b
+                WHERE b.history_id = property_history.history_id
+            )
+        """)
+        conn.execute("DROP TABLE temp.history_backfill")
+
+    # Create indices for efficient queries
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_prop_history_material
+        ON property_history(material_id, property_name)
+    """)
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_prop_history_time
+        ON property_history(changed_at)
+    """)
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_prop_history_version
+        ON property_history(material_id, property_name, version)
+    """)
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_prop_history_material_version
+        ON property_history(material_id, material_version)
+    """)
+
+    # Material version tracking
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS material_versions (
+            version_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            material_id TEXT NOT NULL,
+            version_number INTEGER NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            created_by TEXT,
+            version_notes TEXT,
+            properties_snapshot TEXT,  -- JSON snapshot of all properties
+            FOREIGN KEY (material_id) REFERENCES materials(material_id),
+            UNIQUE(material_id, version_number)
+        )
+    """)
+
+    # Compaction snapshots: all properties of a material at one material_version
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS history_snapshots (
+            material_id TEXT NOT NULL,
+            material_version INTEGER NOT NULL,
+            created_at TEXT NOT NULL,
+            properties_json TEXT NOT NULL,
+            PRIMARY KEY (material_id, material_version)
+        )
+    """)
+
+
+def history_value(value: Any, text: Any = None) -> Optional[str]:
+    """Text stored in property_history for a property value."""
+    if text is not None:
+        return str(text)
+    return None if value is None else str(value)
+
+
+def changes_from_rows(rows: List[Tuple]) -> List[Dict[str, Any]]:
+    """
+    History changes for rows in MaterialDatabase.upsert_properties format
+    (material_id, calc_id, property_category, property_name, property_value,
+    property_value_text, property_unit, extracted_at, extractor_script).
+    """
+    return [{
+        'material_id': row[0],
+        'calc_id': row[1],
+        'category': row[2],
+        'property_name': row[3],
+        'value': history_value(row[4], row[5]),
+        'unit': row[6],
+        'changed_by': row[8],
+        'stored': (row[4], row[5], row[6]),
+    } for row in rows]
+
+
+def _current_properties(conn, material_ids: List[str]) -> Tuple[Dict, Dict]:
+    """
+    Properties rows of the given materials.
+
+    Returns:
+        ((material_id, calc_id or '', property_name) -> row,
+         (material_id, property_name) -> most recent row)
+    """
+    exact, latest = {}, {}
+    cursor = conn.execute("""
+        SELECT material_id, IFNULL(calc_id, ''), property_name,
+               property_value, property_value_text, property_unit
+        FROM properties
+        WHERE material_id IN (SELECT value FROM json_each(?))
+        ORDER BY property_id
+    """, (json.dumps(material_ids),))
+    for row in cursor:
+        row = tuple(row)
+        exact[row[:3]] = row[3:]
+        latest[(row[0], row[2])] = row[3:]
+    return exact, latest
+
+
+def write_history(conn: sqlite3.Connection, changes: List[Dict[str, Any]],
+                  changed_by: Optional[str] = None, change_reason: Optional[str] = None,
+                  skip_unchanged: bool = False,
+                  snapshot_interval: int = SNAPSHOT_INTERVAL) -> List[int]:
+    """
+    Append a batch of property changes to the history on an open connection.
+
+    Must run before the properties table is updated, so the old values can
+    be read. Starts a write transaction if none is open; the caller commits.
+    All changes to one material in the batch share one new material version.
+
+    Args:
+        conn: Connection to the materials database
+        changes: Dicts with material_id, property_name, value and optionally
+                 unit, category, calc_id, changed_by and stored (the
+                 (property_value, property_value_text, property_unit) being
+                 written, compared against the current row by skip_unchanged)
+        changed_by: Default for changes without their own changed_by
+        change_reason: Reason recorded for every change
+        skip_unchanged: Do not record properties whose stored value is unchanged
+        snapshot_interval: Snapshot a material once this many changes
+                           accumulated since its last snapshot (0 disables)
+
+    Returns:
+        History IDs of the recorded changes
+    """
+    if not changes:
+        return []
+    if not conn.in_transaction:
+        conn.execute("BEGIN IMMEDIATE")
+
+    material_ids = list(dict.fromkeys(change['material_id'] for change in changes))
+    exact, latest = _current_properties(conn, material_ids)
+
+    recorded = []
+    for change in changes:
+        key = (change['material_id'], change.get('calc_id') or '', change['property_name'])
+        current = exact.get(key)
+        if current is None and change.get('calc_id') is None:
+            current = latest.get((change['material_id'], change['property_name']))
+        stored = change.get('stored')
+        if skip_unchanged and current is not None and stored is not None and tuple(current) == tuple(stored):
+            continue
+        old_value = history_value(current[0], current[1]) if current is not None else None
+        recorded.append((change, old_value))
+        # Later changes to the same property in this batch see this value
+        if stored is not None:
+            exact[key] = stored
+        else:
+            exact[key] = (None, change['value'], change.get('unit'))
+    if not recorded:
+        return []
+
+    # Current per-property and per-material versions (index lookups)
+    pairs = list(dict.fromkeys((c['material_id'], c['property_name']) for c, _ in recorded))
+    property_versions = {(row[0], row[1]): row[2] or 0 for row in conn.execute("""
+        SELECT json_extract(j.value, '$[0]'), json_extract(j.value, '$[1]'),
+               (SELECT MAX(version) FROM property_history h
+                WHERE h.material_id = json_extract(j.value, '$[0]')
+                  AND h.property_name = json_extract(j.value, '$[1]'))
+        FROM json_each(?) j
+    """, (json.dumps(pairs),))}
+
+    changed_materials = list(dict.fromkeys(c['material_id'] for c, _ in recorded))
+    heads = {row[0]: (row[1] or 0, row[2] or 0) for row in conn.execute("""
+        SELECT j.value,
+               (SELECT MAX(material_version) FROM property_history h WHERE h.material_id = j.value),
+               (SELECT MAX(material_version) FROM history_snapshots s WHERE s.material_id = j.value)
+        FROM json_each(?) j
+    """, (json.dumps(changed_materials),))}
+
+    now = datetime.now().isoformat()
+    rows = []
+    for change, old_value in recorded:
+        material_id, name = change['material_id'], change['property_name']
+        property_versions[(material_id, name)] += 1
+        rows.append((material_id, name, change['value'], change.get('unit'),
+                     change.get('category'), change.get('calc_id'), now,
+                     change.get('changed_by') or changed_by, change_reason, old_value,
+                     property_versions[(material_id, name)], heads[material_id][0] + 1))
+
+    conn.executemany("""
+        INSERT INTO property_history
+        (material_id, property_name, property_value, property_unit, property_category,
+         calc_id, changed_at, changed_by, change_reason, old_value, version, material_version)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """, rows)
+    last_id = conn.execute("SELECT last_insert_rowid()").fetchone()[0]
+
+    if snapshot_interval:
+        _snapshot_due(conn, heads, snapshot_interval, now)
+
+    # AUTOINCREMENT ids of one transaction are consecutive
+    return list(range(last_id - len(rows) + 1, last_id + 1))
+
+
+def _snapshot_due(conn, heads: Dict[str, Tuple[int, int]], interval: int, now: str):
+    """Snapshot the materials with at least interval changes since their last snapshot."""
+    for material_id, (head, snapshot_version) in heads.items():
+        pending = conn.execute("""
+            SELECT COUNT(*) FROM property_history
+            WHERE material_id = ? AND material_version > ?
+        """, (material_id, snapshot_version)).fetchone()[0]
+        if pending >= interval:
+            version, properties = material_state(conn, material_id)
+            conn.execute("""
+                INSERT OR REPLACE INTO history_snapshots
+                (material_id, material_version, created_at, properties_json)
+                VALUES (?, ?, ?, ?)
+            """, (material_id, version, now, json.dumps(properties)))
+
+
+def material_state(conn: sqlite3.Connection, material_id: str,
+                   version: Optional[int] = None) -> Tuple[int, Dict[str, Dict[str, Any]]]:
+    """
+    Properties of a material at a material version (default: the latest).
+
+    Starts from the last snapshot at or before the version and applies the
+    changes made after it.
+
+    Returns:
+        (material version, property name -> {'value', 'unit', 'category',
+        'calc_id', 'version'})
+    """
+    upper = version if version is not None else 2 ** 62
+    row = conn.execute("""
+        SELECT material_version, properties_json FROM history_snapshots
+        WHERE material_id = ? AND material_version <= ?
+        ORDER BY material_version DESC LIMIT 1
+    """, (material_id, upper)).fetchone()
+    base, properties = (row[0], json.loads(row[1])) if row else (0, {})
+
+    state_version = base
+    cursor = conn.execute("""
+        SELECT property_name, property_value, property_unit, property_category,
+               calc_id, version, material_version
+        FROM property_history
+        WHERE material_id = ? AND material_version > ? AND material_version <= ?
+        ORDER BY material_version, history_id
+    """, (material_id, base, upper))
+    for name, value, unit, category, calc_id, property_version, material_version in cursor:
+        properties[name] = {'value': value, 'unit': unit, 'category': category,
+                            'calc_id': calc_id, 'version': property_version}
+        state_version = material_version
+    return state_version, properties
+
+
+def diff_properties(props1: Dict[str, Dict], props2: Dict[str, Dict]) -> Dict[str, Any]:
+    """Added, removed, changed and unchanged properties between two property snapshots."""
+    added = []
+    removed = []
+    changed = []
+    unchanged = []
+
+    all_props = set(props1.keys()) | set(props2.keys())
+
+    for prop in all_props:
+        if prop in props1 and prop not in props2:
+            removed.append({
+                'property': prop,
+                'old_value': props1[prop]['value'],
+                'old_unit': props1[prop].get('unit')
+            })
+        elif prop not in props1 and prop in props2:
+            added.append({
+                'property': prop,
+                'new_value': props2[prop]['value'],
+                'new_unit': props2[prop].get('unit')
+            })
+        elif prop in props1 and prop in props2:
+            if props1[prop]['value'] != props2[prop]['value']:
+                changed.append({
+                    'property': prop,
+                    'old_value': props1[prop]['value'],
+                    'new_value': props2[prop]['value'],
+                    'old_unit': props1[prop].get('unit'),
+                    'new_unit': props2[prop].get('unit')
+                })
+            else:
+                unchanged.append(prop)
+
+    return {
+        'added': added,
+        'removed': removed,
+        'changed': changed,
+        'unchanged_count': len(unchanged),
+        'total_changes': len(added) + len(removed) + len(changed)
+    }
+
+
 class PropertyHistory:
     """Manages property history and versioning."""
     
-    def __init__(self, db_path: str = 'materials.db'):
+    def __init__(self, db_path: str = 'materials.db', snapshot_interval: int = SNAPSHOT_INTERVAL):
         """
         Initialize property history manager.
         
         Args:
             db_path: Path to the materials database
+            snapshot_interval: Changes of a material between compaction snapshots
         """
         self.db_path = db_path
+        self.snapshot_interval = snapshot_interval
         self._ensure_history_tables()
         
     @contextmanager
@@ -37,53 +392,7 @@ class PropertyHistory:
     def _ensure_history_tables(self):
         """Create history tables if they don't exist."""
         with self._get_connection() as conn:
-            cursor = conn.cursor()
-            
-            # Property history table
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS property_history (
-                    history_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    material_id TEXT NOT NULL,
-                    property_name TEXT NOT NULL,
-                    property_value TEXT,
-                    property_unit TEXT,
-                    property_category TEXT,
-                    calc_id TEXT,
-                    changed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    changed_by TEXT,
-                    change_reason TEXT,
-                    old_value TEXT,
-                    version INTEGER DEFAULT 1,
-                    FOREIGN KEY (material_id) REFERENCES materials(material_id)
-                )
-            """)
-            
-            # Create indices for efficient queries
-            cursor.execute("""
-                CREATE INDEX IF NOT EXISTS idx_prop_history_material 
-                ON property_history(material_id, property_name)
-            """)
-            
-            cursor.execute("""
-                CREATE INDEX IF NOT EXISTS idx_prop_history_time 
-                ON property_history(changed_at)
-            """)
-            
-            # Material version tracking
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS material_versions (
-                    version_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    material_id TEXT NOT NULL,
-                    version_number INTEGER NOT NULL,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    created_by TEXT,
-                    version_notes TEXT,
-                    properties_snapshot TEXT,  -- JSON snapshot of all properties
-                    FOREIGN KEY (material_id) REFERENCES materials(material_id),
-                    UNIQUE(material_id, version_number)
-                )
-            """)
-            
+            ensure_history_tables(conn)
             conn.commit()
             
     def record_property_change(self, material_id: str, property_name: str,
@@ -106,46 +415,117 @@ class PropertyHistory:
         Returns:
             History record ID
         """
-        with self._get_connection() as conn:
-            cursor = conn.cursor()
-            
-            # Get current value if exists
-            cursor.execute("""
-                SELECT property_value, property_unit 
-                FROM properties 
-                WHERE material_id = ? AND property_name = ?
-                ORDER BY property_id DESC LIMIT 1
-            """, (material_id, property_name))
-            
-            current = cursor.fetchone()
-            old_value = None
-            
-            if current:
-                old_value = current['property_value']
-                
-            # Get current version number
-            cursor.execute("""
-                SELECT MAX(version) as max_version 
-                FROM property_history 
-                WHERE material_id = ? AND property_name = ?
-            """, (material_id, property_name))
+        return self.record_property_changes([{
+            'material_id': material_id,
+            'property_name': property_name,
+            'value': new_value,
+            'unit': new_unit,
+            'calc_id': calc_id,
+        }], changed_by=changed_by, change_reason=change_reason)[0]
+        
+    def record_property_changes(self, changes: List[Dict[str, Any]],
+                                changed_by: Optional[str] = None,
+                                change_reason: Optional[str] = None) -> List[int]:
+        """
+        Record many property changes in one transaction.
+        
+        Args:
+            changes: Dicts with material_id, property_name, value and
+                     optionally unit, category, calc_id and changed_by
+            changed_by: User/system that made the changes
+            change_reason: Reason for the changes
             
-            result = cursor.fetchone()
-            version = (result['max_version'] or 0) + 1
+        Returns:
+            History record IDs, in the order of changes
+        """
+        changes = [dict(change, value=history_value(change.get('value'))) for change in changes]
+        with self._get_connection() as conn:
+            try:
+                history_ids = write_history(conn, changes, changed_by, change_reason,
+                                            snapshot_interval=self.snapshot_interval)
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+        return history_ids
+        
+    def get_material_version(self, material_id: str) -> int:
+        """Latest material version (0 if the material has no history)."""
+        with self._get_connection() as conn:
+            row = conn.execute("""
+                SELECT MAX(material_version) FROM property_history WHERE material_id = ?
+            """, (material_id,)).fetchone()
+        return row[0] or 0
+        
+    def get_material_state(self, material_id: str, version: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Rebuild the properties of a material at a material version.
+        
+        Args:
+            material_id: Material identifier
+            version: Material version (None for the latest)
             
-            # Insert history record
-            cursor.execute("""
-                INSERT INTO property_history 
-                (material_id, property_name, property_value, property_unit, 
-                 calc_id, changed_by, change_reason, old_value, version)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, (material_id, property_name, str(new_value), new_unit,
-                  calc_id, changed_by, change_reason, old_value, version))
-                  
-            history_id = cursor.lastrowid
-            conn.commit()
+        Returns:
+            {'material_version': ..., 'properties': {name: {'value', 'unit',
+            'category', 'calc_id', 'version'}}}
+        """
+        with self._get_connection() as conn:
+            state_version, properties = material_state(conn, material_id, version)
+        return {'material_version': state_version, 'properties': properties}
+        
+    def compare_states(self, material_id: str, version1: int, version2: int) -> Dict[str, Any]:
+        """
+        Compare a material at two material versions of its history.
+        
+        Args:
+            material_id: Material identifier
+            version1: First material version
+            version2: Second material version
             
-            return history_id
+        Returns:
+            Comparison results (same layout as compare_versions)
+        """
+        with self._get_connection() as conn:
+            _, props1 = material_state(conn, material_id, version1)
+            _, props2 = material_state(conn, material_id, version2)
+        result = {
+            'material_id': material_id,
+            'version1': {'number': version1},
+            'version2': {'number': version2},
+        }
+        result.update(diff_properties(props1, props2))
+        return result
+        
+    def compact(self, material_id: Optional[str] = None) -> int:
+        """
+        Snapshot every material (or one) with changes since its last snapshot.
+        
+        Returns:
+            Number of snapshots written
+        """
+        with self._get_connection() as conn:
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+                query = """
+                    SELECT h.material_id, MAX(h.material_version) AS head,
+                           (SELECT MAX(material_version) FROM history_snapshots s
+                            WHERE s.material_id = h.material_id) AS snapshot
+                    FROM property_history h
+                """
+                params = []
+                if material_id:
+                    query += " WHERE h.material_id = ?"
+                    params.append(material_id)
+                query += " GROUP BY h.material_id"
+                heads = {row['material_id']: (row['head'], row['snapshot'] or 0)
+                         for row in conn.execute(query, params).fetchall()
+                         if row['head'] > (row['snapshot'] or 0)}
+                _snapshot_due(conn, heads, 1, datetime.now().isoformat())
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+        return len(heads)
             
     def get_property_history(self, material_id: str, property_name: str,
                            limit: Optional[int] = None) -> List[Dict[str, Any]]:
@@ -380,43 +760,7 @@ class PropertyHistory:
         if not snapshot1 or not snapshot2:
             return {'error': 'One or both versions not found'}
             
-        props1 = snapshot1['properties']
-        props2 = snapshot2['properties']
-        
-        # Find differences
-        added = []
-        removed = []
-        changed = []
-        unchanged = []
-        
-        all_props = set(props1.keys()) | set(props2.keys())
-        
-        for prop in all_props:
-            if prop in props1 and prop not in props2:
-                removed.append({
-                    'property': prop,
-                    'old_value': props1[prop]['value'],
-                    'old_unit': props1[prop].get('unit')
-                })
-            elif prop not in props1 and prop in props2:
-                added.append({
-                    'property': prop,
-                    'new_value': props2[prop]['value'],
-                    'new_unit': props2[prop].get('unit')
-                })
-            elif prop in props1 and prop in props2:
-                if props1[prop]['value'] != props2[prop]['value']:
-                    changed.append({
-                        'property': prop,
-                        'old_value': props1[prop]['value'],
-                        'new_value': props2[prop]['value'],
-                        'old_unit': props1[prop].get('unit'),
-                        'new_unit': props2[prop].get('unit')
-                    })
-                else:
-                    unchanged.append(prop)
-                    
-        return {
+        result = {
             'material_id': material_id,
             'version1': {
                 'number': version1,
@@ -425,13 +769,10 @@ class PropertyHistory:
             'version2': {
                 'number': version2,
                 'created_at': snapshot2['created_at']
-            },
-            'added': added,
-            'removed': removed,
-            'changed': changed,
-            'unchanged_count': len(unchanged),
-            'total_changes': len(added) + len(removed) + len(changed)
+            }
         }
+        result.update(diff_properties(snapshot1['properties'], snapshot2['properties']))
+        return result
         
     def get_recent_changes(self, limit: int = 100,
                          material_id: Optional[str] = None) -> List[Dict[str, Any]]:
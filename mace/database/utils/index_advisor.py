@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+Index Advisor for the MACE Materials Database
+=============================================
+Runs EXPLAIN QUERY PLAN over a recorded set of the queries MACE issues most
+often (database API, queue manager, property extraction, filters) and flags
+plans that scan a whole table or build a temporary index. Sorts in a
+temporary b-tree are listed as notes.
+
+Queries that are meant to read a whole table (exports, listings) are marked
+as expected scans and are not flagged.
+
+Usage:
+    from mace.database.utils.index_advisor import analyze_indexes, format_index_report
+    results = analyze_indexes(db)
+    print(format_index_report(results))
+
+    mace database --action analyze-indexes [--update-stats] [--all]
+"""
+
+import re
+import sqlite3
+from typing import Dict, List, Tuple
+
+
+# (name, where it comes from, SQL, expected full scan)
+RECORDED_QUERIES = [
+    ('material by id', 'MaterialDatabase.get_material',
+     "SELECT * FROM materials WHERE material_id = ?", False),
+    ('materials by status', 'MaterialDatabase.get_materials_by_status',
+     "SELECT * FROM materials WHERE status = ? ORDER BY created_at DESC", False),
+    ('all materials', 'MaterialDatabase.get_all_materials',
+     "SELECT * FROM materials ORDER BY created_at DESC", True),
+    ('calculation by id', 'MaterialDatabase.get_calculation',
+     "SELECT * FROM calculations WHERE calc_id = ?", False),
+    ('calculation by SLURM job', 'MaterialDatabase.get_calculation_by_slurm_id',
+     "SELECT * FROM calculations WHERE slurm_job_id = ?", False),
+    ('calculations of a material', 'MaterialDatabase.get_material_calculations',
+     "SELECT * FROM calculations WHERE material_id = ? ORDER BY created_at DESC", False),
+    ('calculations of a material by type', 'MaterialDatabase.get_calculations_by_status',
+     "SELECT * FROM calculations WHERE calc_type = ? AND material_id = ? ORDER BY created_at DESC", False),
+    ('calculations by status', 'MaterialDatabase.get_calculations_by_status',
+     "SELECT * FROM calculations WHERE status = ? ORDER BY created_at DESC", False),
+    ('completed calc types of a material', 'MaterialDatabase.get_next_calculation_in_workflow',
+     "SELECT calc_type FROM calculations WHERE material_id = ? AND status = 'completed'", False),
+    ('calculation by output file', 'EnhancedCrystalQueueManager._populate_completed_jobs_from_outputs',
+     "SELECT * FROM calculations WHERE output_file = ?", False),
+    ('calculation by output file or directory', 'CrystalPropertyExtractor._find_calc_id_for_output',
+     "SELECT calc_id FROM calculations WHERE output_file = ? OR work_dir = ?", False),
+    ('property count of a calculation', 'EnhancedCrystalQueueManager._populate_completed_jobs_from_outputs',
+     "SELECT COUNT(*) FROM properties WHERE calc_id = ?", False),
+    ('property of a calculation', 'property extraction',
+     "SELECT property_id, property_value FROM properties WHERE calc_id = ? AND property_name = ?", False),
+    ('property of a material from one calculation', 'property extraction',
+     "SELECT property_id, property_value FROM properties "
+     "WHERE material_id = ? AND property_name = ? AND calc_id = ?", False),
+    ('properties of a material', 'MaterialDatabase.get_material_properties',
+     "SELECT * FROM properties WHERE material_id = ? ORDER BY property_category, property_name", False),
+    ('values of one property', 'MaterialDatabase.get_properties_by_name',
+     "SELECT m.material_id, m.formula, p.property_value FROM properties p "
+     "JOIN materials m ON p.material_id = m.material_id "
+     "WHERE p.property_name = ? ORDER BY p.property_value", False),
+    ('advanced filter property join', 'compile_advanced_filter',
+     "SELECT m.* FROM materials m LEFT JOIN properties p0 ON p0.property_id = ("
+     "SELECT property_id FROM properties WHERE material_id = m.material_id AND property_name = ? "
+     "ORDER BY property_category, property_id LIMIT 1) WHERE p0.property_value > ?", True),
+    ('all properties', 'MaterialDatabase.get_all_properties',
+     "SELECT * FROM properties ORDER BY material_id, property_category, property_name, property_id", True),
+    ('workflow state', 'MaterialDatabase.update_workflow_state',
+     "SELECT * FROM workflow_states WHERE workflow_id = ?", False),
+    ('active workflow instances', 'MaterialDatabase.get_active_workflow_instances',
+     "SELECT * FROM workflow_instances WHERE status = 'active' ORDER BY started_at", False),
+    ('workflow instances of a material', 'MaterialDatabase.get_workflow_instances_by_material',
+     "SELECT * FROM workflow_instances WHERE material_id = ? ORDER BY started_at DESC", False),
+    ('fingerprints under a directory', 'MaterialDatabase.get_file_fingerprints',
+     "SELECT * FROM file_fingerprints WHERE file_path >= ? AND file_path < ?", False),
+]
+
+# "SCAN materials" (SQLite >= 3.36) or "SCAN TABLE materials" (older), with
+# or without "USING [COVERING] INDEX"; "SCAN CONSTANT ROW" is not a table scan
+_SCAN_RE = re.compile(r'^SCAN (?:TABLE )?(?!CONSTANT ROW)(\w+)')
+_AUTO_INDEX_RE = re.compile(r'AUTOMATIC (?:PARTIAL )?(?:COVERING )?INDEX')
+
+
+def explain_query(conn: sqlite3.Connection, sql: str) -> List[str]:
+    """Return the EXPLAIN QUERY PLAN detail lines for a query (parameters bound to NULL)."""
+    n_params = sql.count('?')
+    cursor = conn.execute(f"EXPLAIN QUERY PLAN {sql}", [None] * n_params)
+    return [row[3] for row in cursor.fetchall()]
+
+
+def classify_plan(plan: List[str]) -> Tuple[List[str], List[str]]:
+    """Return (problems, notes) for a query plan: scans are problems, sorts are notes."""
+    problems, notes = [], []
+    for detail in plan:
+        match = _SCAN_RE.match(detail)
+        if match:
+            problems.append(f"full scan of {match.group(1)}: {detail}")
+        elif _AUTO_INDEX_RE.search(detail):
+            problems.append(f"temporary index: {detail}")
+        elif detail.startswith('USE TEMP B-TREE'):
+            notes.append(f"temporary sort: {detail}")
+    return problems, notes
+
+
+def analyze_indexes(db, update_stats: bool = False) -> List[Dict]:
+    """
+    Explain every recorded query against the database.
+
+    Args:
+        db: MaterialDatabase instance
+        update_stats: Run ANALYZE first so the planner has table statistics
+
+    Returns:
+        One dictionary per query with its plan and flagged problems
+    """
+    if update_stats:
+        with db._get_connection() as conn:
+            conn.execute("ANALYZE")
+
+    results = []
+    with db._get_read_connection() as conn:
+        for name, source, sql, expected_scan in RECORDED_QUERIES:
+            result = {'name': name, 'source': source, 'sql': sql,
+                      'expected_scan': expected_scan, 'plan': [], 'problems': [], 'notes': [],
+                      'error': None}
+            try:
+                result['plan'] = explain_query(conn, sql)
+            except sqlite3.Error as e:
+                result['error'] = str(e)
+            else:
+                problems, result['notes'] = classify_plan(result['plan'])
+                if not expected_scan:
+                    result['problems'] = problems
+            results.append(result)
+    return results
+
+
+def format_index_report(results: List[Dict], show_all: bool = False) -> str:
+    """Format analyze_indexes() results as a text report."""
+    lines = ["=== Query Plan Analysis ===", ""]
+    flagged = [r for r in results if r['problems'] or r['error']]
+
+    for result in results:
+        if not show_all and not (result['problems'] or result['error']):
+            continue
+        status = "ERROR" if result['error'] else ("FLAG " if result['problems'] else "ok   ")
+        lines.append(f"[{status}] {result['name']}  ({result['source']})")
+        lines.append(f"        {result['sql']}")
+        for detail in result['plan']:
+            lines.append(f"        -> {detail}")
+        for problem in result['problems']:
+            lines.append(f"        ⚠️  {problem}")
+        for note in result['notes']:
+            lines.append(f"        ℹ️  {note}")
+        if result['error']:
+            lines.append(f"        ❌ {result['error']}")
+        lines.append("")
+
+    lines.append(f"{len(results)} queries analyzed, {len(flagged)} flagged")
+    if not flagged:
+        lines.append("✅ All recorded queries use indexes")
+    return "\n".join(lines)
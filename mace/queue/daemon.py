@@ -0,0 +1,436 @@
+#!/usr/bin/env python3
+"""
+Resident Queue Manager Daemon
+-----------------------------
+Optional long-running mode for EnhancedCrystalQueueManager. Without it,
+every SLURM job end starts a queue manager process: it imports MACE, opens
+the database, sleeps in CallbackThrottler and waits for the QueueLockManager
+lock, and hundreds of near-simultaneous job ends mostly wait on each other.
+
+With a daemon running, a job end only drops a notification (a small JSON
+spool file on the shared filesystem, plus a wake-up datagram on a Unix
+socket when it runs on the daemon's host). The daemon keeps one queue
+manager, one database connection set and a cache of database reads in
+memory. Every tick it drains the spool and runs each requested callback mode
+once for the whole batch, under the same locks the callbacks use.
+
+Liveness is a heartbeat file touched every tick, so job ends on compute nodes
+can tell whether the daemon is alive; when it is not they fall back to
+running the callback themselves. Notifications written while no daemon ran
+are processed when the next one starts.
+
+Usage:
+  python manager.py --daemon [--daemon-tick 5]        # start the daemon
+  python manager.py --callback-mode completion         # forwards to a running daemon
+  python -m mace.queue.daemon notify --mode completion # notification only
+  python -m mace.queue.daemon status
+"""
+
+import os
+import sys
+import json
+import time
+import uuid
+import select
+import signal
+import socket
+import argparse
+import functools
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+
+DEFAULT_TICK = float(os.environ.get('MACE_QUEUE_DAEMON_TICK', '5'))
+COALESCE_DELAY = 1.0  # Wait after a wake-up so near-simultaneous job ends share a batch
+IDLE_CHECK_INTERVAL = 600  # Run a completion check this often even without notifications
+HEARTBEAT_STALE = 120  # Seconds without a heartbeat before the daemon counts as dead
+
+# Callback modes in the order a batch runs them
+MODE_ORDER = ('completion', 'early_failure', 'status_check', 'submit_new', 'full_check')
+
+PID_FILE = 'daemon.json'
+HEARTBEAT_FILE = 'heartbeat'
+SOCKET_FILE = 'daemon.sock'
+SPOOL_DIR = 'spool'
+
+
+def daemon_dir(d12_dir: str = '.') -> Path:
+    """
+    Directory of the daemon's pid, heartbeat, socket and spool files.
+
+    MACE_QUEUE_DAEMON_DIR if set, otherwise next to the queue locks (the
+    workflow context's lock directory, or <d12_dir>/.queue_locks).
+    """
+    if os.environ.get('MACE_QUEUE_DAEMON_DIR'):
+        return Path(os.environ['MACE_QUEUE_DAEMON_DIR'])
+    from mace.workflow.context import get_current_context
+    ctx = get_current_context()
+    if ctx:
+        return Path(ctx.get_lock_dir()) / 'daemon'
+    return Path(d12_dir).resolve() / '.queue_locks' / 'daemon'
+
+
+def read_daemon_info(directory: Path) -> Optional[Dict[str, Any]]:
+    """Pid file contents of the daemon, or None."""
+    try:
+        with open(Path(directory) / PID_FILE) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def is_daemon_running(directory: Path) -> bool:
+    """True if a daemon for this directory has a fresh heartbeat (and a live pid on this host)."""
+    directory = Path(directory)
+    info = read_daemon_info(directory)
+    if not info:
+        return False
+    try:
+        age = time.time() - (directory / HEARTBEAT_FILE).stat().st_mtime
+    except OSError:
+        return False
+    if age > max(HEARTBEAT_STALE, 3 * info.get('tick', DEFAULT_TICK)):
+        return False
+    if info.get('host') == socket.gethostname():
+        try:
+            os.kill(info['pid'], 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            pass
+    return True
+
+
+def notify(directory: Path, mode: str = 'completion', **details) -> Path:
+    """
+    Queue a callback request for the daemon.
+
+    Args:
+        directory: Daemon directory
+        mode: Callback mode (see MODE_ORDER)
+        details: Extra JSON-serialisable fields (e.g. job_id), for the log
+
+    Returns:
+        Path of the spool file
+    """
+    spool = Path(directory) / SPOOL_DIR
+    spool.mkdir(parents=True, exist_ok=True)
+    host = socket.gethostname()
+    name = f"{time.time_ns()}_{host}_{os.getpid()}_{uuid.uuid4().hex[:8]}"
+    note = dict(details, mode=mode, host=host, pid=os.getpid(), created=time.time())
+
+    # Write then rename, so the daemon never reads a partial file
+    tmp_path = spool / f".{name}.tmp"
+    path = spool / f"{name}.json"
+    with open(tmp_path, 'w') as f:
+        json.dump(note, f)
+    os.replace(tmp_path, path)
+
+    _wake(directory)
+    return path
+
+
+def _wake(directory: Path):
+    """Wake the daemon early (only reaches a daemon on this host; errors are ignored)."""
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+    try:
+        sock.sendto(b'wake', str(Path(directory) / SOCKET_FILE))
+    except OSError:
+        pass
+    finally:
+        sock.close()
+
+
+def drain_spool(directory: Path) -> List[Dict[str, Any]]:
+    """Read and remove all pending notifications, oldest first."""
+    spool = Path(directory) / SPOOL_DIR
+    try:
+        paths = sorted(spool.glob('*.json'))
+    except OSError:
+        return []
+    notes = []
+    for path in paths:
+        try:
+            with open(path) as f:
+                notes.append(json.load(f))
+        except ValueError:
+            print(f"⚠️  Ignoring unreadable notification {path.name}")
+        except OSError:
+            continue  # Taken by another reader
+        try:
+            path.unlink()
+        except OSError:
+            pass
+    return notes
+
+
+def batch_modes(notes: List[Dict[str, Any]]) -> List[str]:
+    """Distinct callback modes requested by a batch of notifications, in run order."""
+    requested = {note.get('mode', 'completion') for note in notes}
+    unknown = requested - set(MODE_ORDER)
+    for mode in sorted(unknown):
+        print(f"⚠️  Ignoring unknown callback mode: {mode}")
+    return [mode for mode in MODE_ORDER if mode in requested]
+
+
+class StateCache:
+    """
+    Read cache in front of a MaterialDatabase.
+
+    Results of the read methods in CACHED_METHODS are reused until any
+    connection commits to the database file, detected with SQLite's
+    PRAGMA data_version on the read connection (it changes whenever another
+    connection, including this process's write connection, commits). The
+    counter is per connection, so only calls from the thread that created the
+    cache are cached. All other attributes are passed through to the database.
+    """
+
+    CACHED_METHODS = frozenset({
+        'get_calculation', 'get_calculations_by_status', 'get_calculation_by_slurm_id',
+        'get_all_calculations', 'get_material', 'get_materials_by_status',
+        'get_database_stats',
+    })
+    MAX_ENTRIES = 1024
+
+    def __init__(self, db):
+        self._db = db
+        self._thread = threading.get_ident()
+        self._version = None
+        self._results = {}
+        self.hits = 0
+        self.misses = 0
+
+    def __getattr__(self, name):
+        attr = getattr(self._db, name)
+        if name in self.CACHED_METHODS and callable(attr):
+            return functools.partial(self._cached, name, attr)
+        return attr
+
+    def _usable(self) -> bool:
+        """Only persistent read connections give a meaningful data_version."""
+        if threading.get_ident() != self._thread:
+            return False
+        if not getattr(self._db, 'persistent_connections', False):
+            return False
+        # Reads inside an open write block see uncommitted changes
+        return not getattr(self._db._local, 'depth', 0)
+
+    def _data_version(self) -> int:
+        with self._db._get_read_connection() as conn:
+            return conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def _cached(self, name, method, *args, **kwargs):
+        if not self._usable():
+            return method(*args, **kwargs)
+
+        key = (name, args, tuple(sorted(kwargs.items())))
+        version = self._data_version()
+        if version != self._version:
+            self._results.clear()
+            self._version = version
+        if key in self._results:
+            self.hits += 1
+            return _copy(self._results[key])
+        self.misses += 1
+        result = method(*args, **kwargs)
+        if len(self._results) >= self.MAX_ENTRIES:
+            self._results.clear()
+        self._results[key] = result
+        return _copy(result)
+
+    def invalidate(self):
+        """Drop all cached results."""
+        self._results.clear()
+        self._version = None
+
+
+def _copy(result):
+    """Copy of a cached result that callers may modify."""
+    if isinstance(result, list):
+        return [dict(item) if isinstance(item, dict) else item for item in result]
+    if isinstance(result, dict):
+        return dict(result)
+    return result
+
+
+class QueueDaemon:
+    """Resident loop that serves queue manager callbacks from the spool."""
+
+    def __init__(self, manager, directory: Path = None, tick: float = DEFAULT_TICK,
+                 coalesce_delay: float = COALESCE_DELAY,
+                 idle_check_interval: float = IDLE_CHECK_INTERVAL):
+        """
+        Args:
+            manager: EnhancedCrystalQueueManager serving the callbacks
+            directory: Daemon directory (default: daemon_dir(manager.d12_dir))
+            tick: Seconds between spool checks
+            coalesce_delay: Seconds to wait after a wake-up before draining
+            idle_check_interval: Seconds between completion checks without
+                                 notifications (0 disables)
+        """
+        self.manager = manager
+        self.directory = Path(directory) if directory else daemon_dir(manager.d12_dir)
+        self.tick = tick
+        self.coalesce_delay = coalesce_delay
+        self.idle_check_interval = idle_check_interval
+        self.batches = 0
+        self.notifications = 0
+        self._stop = threading.Event()
+        self._sock = None
+
+        if manager.db is not None and not isinstance(manager.db, StateCache):
+            manager.db = StateCache(manager.db)
+
+    def _claim(self) -> bool:
+        """Write the pid file unless another daemon is alive."""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        (self.directory / SPOOL_DIR).mkdir(exist_ok=True)
+        if is_daemon_running(self.directory):
+            info = read_daemon_info(self.directory) or {}
+            print(f"⚠️  A queue daemon is already running: pid {info.get('pid')} on {info.get('host')}")
+            return False
+        info = {'pid': os.getpid(), 'host': socket.gethostname(), 'tick': self.tick,
+                'started_at': time.time(), 'd12_dir': str(self.manager.d12_dir)}
+        tmp_path = self.directory / f".{PID_FILE}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(info, f)
+        os.replace(tmp_path, self.directory / PID_FILE)
+        self._heartbeat()
+        return True
+
+    def _heartbeat(self):
+        (self.directory / HEARTBEAT_FILE).touch()
+
+    def _bind_socket(self):
+        path = self.directory / SOCKET_FILE
+        try:
+            path.unlink()
+        except OSError:
+            pass
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        try:
+            sock.bind(str(path))
+            sock.setblocking(False)
+            self._sock = sock
+        except OSError as e:
+            # e.g. path too long for AF_UNIX - spool polling still works
+            print(f"Warning: Queue daemon socket unavailable ({e}), polling the spool every {self.tick}s")
+            sock.close()
+
+    def _release(self):
+        if self._sock:
+            self._sock.close()
+            self._sock = None
+        for name in (SOCKET_FILE, PID_FILE, HEARTBEAT_FILE):
+            try:
+                if name == PID_FILE and (read_daemon_info(self.directory) or {}).get('pid') != os.getpid():
+                    continue
+                (self.directory / name).unlink()
+            except OSError:
+                pass
+
+    def _wait(self) -> bool:
+        """Sleep until the next tick or a wake-up; True if woken."""
+        if not self._sock:
+            self._stop.wait(self.tick)
+            return False
+        readable, _, _ = select.select([self._sock], [], [], self.tick)
+        if not readable:
+            return False
+        # Read every queued wake-up datagram
+        while True:
+            try:
+                self._sock.recv(64)
+            except (BlockingIOError, OSError):
+                break
+        return True
+
+    def stop(self):
+        """Ask the loop to exit after the current batch."""
+        self._stop.set()
+        _wake(self.directory)
+
+    def run_once(self, idle_due: bool = False) -> List[str]:
+        """Drain the spool and run one batch; returns the modes run."""
+        notes = drain_spool(self.directory)
+        modes = batch_modes(notes)
+        if not modes and idle_due:
+            modes = ['completion']
+        if not modes:
+            return []
+
+        self.notifications += len(notes)
+        self.batches += 1
+        print(f"🔄 Queue daemon batch {self.batches}: {len(notes)} notification(s), modes {', '.join(modes)}")
+        try:
+            self.manager.run_callback_batch(modes)
+        except Exception as e:
+            print(f"❌ Error in queue daemon batch: {e}")
+        return modes
+
+    def run(self, max_batches: Optional[int] = None) -> bool:
+        """
+        Serve callbacks until stopped (SIGTERM/SIGINT) or max_batches batches ran.
+
+        Returns:
+            False if another daemon is already running
+        """
+        if not self._claim():
+            return False
+        self._bind_socket()
+        if threading.current_thread() is threading.main_thread():
+            for signum in (signal.SIGTERM, signal.SIGINT):
+                signal.signal(signum, lambda *_: self._stop.set())
+
+        print(f"Queue daemon running (pid {os.getpid()}), spool: {self.directory / SPOOL_DIR}")
+        last_batch = time.time()
+        try:
+            # Notifications left from before the daemon started
+            if self.run_once():
+                last_batch = time.time()
+            while not self._stop.is_set():
+                if max_batches is not None and self.batches >= max_batches:
+                    break
+                self._heartbeat()
+                if self._wait() and self.coalesce_delay:
+                    self._stop.wait(self.coalesce_delay)
+                if self._stop.is_set():
+                    break
+                idle_due = bool(self.idle_check_interval) and \
+                    time.time() - last_batch >= self.idle_check_interval
+                if self.run_once(idle_due):
+                    last_batch = time.time()
+        finally:
+            self._release()
+            print(f"Queue daemon stopped after {self.batches} batch(es), "
+                  f"{self.notifications} notification(s)")
+        return True
+
+
+def main():
+    """Send a notification to, or show the status of, the queue daemon."""
+    parser = argparse.ArgumentParser(description="MACE queue manager daemon notifications")
+    parser.add_argument("action", choices=['notify', 'status'], help="Action to perform")
+    parser.add_argument("--mode", default='completion', choices=MODE_ORDER, help="Callback mode to request")
+    parser.add_argument("--d12-dir", default=".", help="Queue manager directory (default: current directory)")
+    parser.add_argument("--daemon-dir", help="Daemon directory (default: next to the queue locks)")
+    parser.add_argument("--job-id", default=os.environ.get('SLURM_JOB_ID'), help="Job ID recorded in the notification")
+    args = parser.parse_args()
+
+    directory = Path(args.daemon_dir) if args.daemon_dir else daemon_dir(args.d12_dir)
+    running = is_daemon_running(directory)
+    if args.action == 'status':
+        info = read_daemon_info(directory) or {}
+        pending = len(list((directory / SPOOL_DIR).glob('*.json'))) if (directory / SPOOL_DIR).exists() else 0
+        print(json.dumps({'running': running, 'directory': str(directory),
+                          'pending_notifications': pending, **info}, indent=2))
+        return
+    notify(directory, args.mode, job_id=args.job_id)
+    if not running:
+        print(f"Warning: No queue daemon running for {directory} - the notification waits for the next one")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -26,7 +26,6 @@ import argparse
 import json
 import tempfile
 import shutil
-import re
 import signal
 from datetime import datetime, timedelta
 from pathlib import Path
@@ -37,6 +36,8 @@ import threading
 from mace.database.materials import MaterialDatabase, create_material_id_from_file, extract_formula_from_d12, find_material_by_similarity
 from mace.database.materials_contextual import ContextualMaterialDatabase
 from mace.workflow.context import get_current_context
+from mace.queue.snapshot import get_queue_snapshot, slurm_state_to_status
+from mace.queue.submission import SubmissionJob, get_submission_queue, is_script_generator
 
 # Import lock manager for race condition prevention
 try:
@@ -315,7 +316,15 @@ class EnhancedCrystalQueueManager:
                         if current == current.parent:  # Reached root
                             break
             
-            completed_calcs = scan_for_completed_calculations(scan_dir)
+            # Unchanged outputs are answered from their stored fingerprints
+            fingerprints = None
+            try:
+                from mace.utils.output_fingerprints import OutputFingerprintCache
+                fingerprints = OutputFingerprintCache(self.db, path_prefix=str(scan_dir))
+            except ImportError:
+                pass
+            
+            completed_calcs = scan_for_completed_calculations(scan_dir, fingerprints=fingerprints)
             
             if completed_calcs:
                 print(f"  Found {len(completed_calcs)} completed calculations")
@@ -414,7 +423,13 @@ class EnhancedCrystalQueueManager:
                 base_dir = str(self.d12_dir)
             
             # Initialize workflow engine with same database and correct base directory
-            workflow_engine = WorkflowEngine(self.db_path, base_dir)
+            # (kept for the next callback when the manager runs as a daemon)
+            workflow_engine = getattr(self, '_workflow_engine', None)
+            if workflow_engine is None or workflow_engine.base_work_dir != Path(base_dir):
+                if workflow_engine is not None:
+                    workflow_engine.close()
+                workflow_engine = WorkflowEngine(self.db_path, base_dir)
+                self._workflow_engine = workflow_engine
             
             # Process completed calculations and generate next steps
             new_calc_ids = workflow_engine.process_completed_calculations()
@@ -565,6 +580,45 @@ class EnhancedCrystalQueueManager:
         Returns:
             calc_id if successful, None if failed
         """
+        job = self.prepare_calculation(d12_file, calc_type, material_id, prerequisite_calc_id)
+        if job is None:
+            return None
+        get_submission_queue().submit_job(job)
+        calc_id = self._record_submission(job)
+        if job.job_id:
+            self.save_legacy_status()
+            # The new job must show up in the next queue check
+            get_queue_snapshot().invalidate()
+        return calc_id
+        
+    def submit_calculations(self, d12_files: List[Path]) -> List[Optional[str]]:
+        """
+        Submit several calculations concurrently through the shared submission queue.
+        
+        Materials, folders and calculation records are created one file at a
+        time, then all sbatch calls run at once (rate-limited, with retries).
+        
+        Returns:
+            calc_id (None if failed) for each file, in order
+        """
+        jobs = [self.prepare_calculation(d12_file) for d12_file in d12_files]
+        get_submission_queue().submit_many([job for job in jobs if job is not None])
+        calc_ids = [self._record_submission(job) if job is not None else None for job in jobs]
+        if any(job is not None and job.job_id for job in jobs):
+            self.save_legacy_status()
+            get_queue_snapshot().invalidate()
+        return calc_ids
+        
+    def prepare_calculation(self, d12_file: Path, calc_type: str = None,
+                            material_id: str = None, prerequisite_calc_id: str = None) -> Optional[SubmissionJob]:
+        """
+        Create the material, calculation folder and calculation record for a
+        .d12 file and return the SLURM submission for it (not yet submitted).
+        
+        Returns:
+            SubmissionJob carrying calc_id, material_id, calc_type and input_file
+            in its context, or None if no submission script is available
+        """
         # Extract material information
         if material_id is None:
             material_id, formula, metadata = self.extract_material_info_from_d12(d12_file)
@@ -615,46 +669,41 @@ class EnhancedCrystalQueueManager:
             )
             print(f"    Enhanced QM: created calc_id='{calc_id}'")
             
-        # Submit to SLURM
-        slurm_job_id = self.submit_to_slurm(calc_input_file, calc_dir, calc_type)
-        
-        if slurm_job_id:
-            # Update tracking database
-            if self.enable_tracking and calc_id:
-                self.db.update_calculation_status(
-                    calc_id, 
-                    'submitted', 
-                    slurm_job_id=slurm_job_id
-                )
-                
-            # Update legacy tracking
-            self.legacy_job_status["submitted"][slurm_job_id] = {
-                "file": str(calc_input_file),
-                "calc_id": calc_id,
-                "material_id": material_id,
-                "calc_type": calc_type,
-                "submitted_time": datetime.now().isoformat()
-            }
-            self.save_legacy_status()
-            
-            print(f"Submitted {calc_type} calculation for {material_id}: Job {slurm_job_id}")
-            return calc_id
-        else:
+        job = self._submission_job(calc_input_file, calc_dir, calc_type)
+        if job is None:
+            print(f"Failed to submit calculation for {material_id}")
+            return None
+        job.context.update(calc_id=calc_id, material_id=material_id, calc_type=calc_type,
+                           input_file=str(calc_input_file))
+        return job
+        
+    def _record_submission(self, job: SubmissionJob) -> Optional[str]:
+        """Record a submitted job in the database and legacy tracking; returns its calc_id."""
+        calc_id = job.context.get('calc_id')
+        material_id = job.context.get('material_id')
+        calc_type = job.context.get('calc_type')
+        if not job.job_id:
+            print(f"Error submitting job: {job.error}")
             print(f"Failed to submit calculation for {material_id}")
             return None
             
-    def submit_to_slurm(self, input_file: Path, work_dir: Path, calc_type: str) -> Optional[str]:
-        """
-        Submit job to SLURM using appropriate submission script.
-        
-        Args:
-            input_file: Path to .d12 input file
-            work_dir: Working directory for calculation
-            calc_type: Type of calculation (determines which script to use)
+        # Update tracking database
+        if self.enable_tracking and calc_id:
+            self.db.update_calculation_status(calc_id, 'submitted', slurm_job_id=job.job_id)
+            
+        # Update legacy tracking (saved by the caller)
+        self.legacy_job_status["submitted"][job.job_id] = {
+            "file": job.context.get('input_file'),
+            "calc_id": calc_id,
+            "material_id": material_id,
+            "calc_type": calc_type,
+            "submitted_time": datetime.now().isoformat()
+        }
+        print(f"Submitted {calc_type} calculation for {material_id}: Job {job.job_id}")
+        return calc_id
             
-        Returns:
-            SLURM job ID if successful, None if failed
-        """
+    def _submission_job(self, input_file: Path, work_dir: Path, calc_type: str) -> Optional[SubmissionJob]:
+        """Build the submission for an input file, or None if no submit script is available."""
         # Determine which submission script to use based on context
         submit_script = self._get_submit_script_for_calc_type(calc_type)
         if not submit_script:
@@ -665,136 +714,77 @@ class EnhancedCrystalQueueManager:
             print(f"Submit script not found: {submit_script}")
             return None
             
-        # Change to working directory
-        original_cwd = os.getcwd()
-        try:
-            os.chdir(work_dir)
+        # Check if this is a script generator (template) or actual SLURM script
+        script_path = Path(submit_script).resolve()
+        job_name = input_file.stem  # Remove .d12 extension
+        
+        with open(script_path, 'r') as f:
+            script_content = f.read()
             
-            # Check if this is a script generator (template) or actual SLURM script
-            script_path = Path(submit_script)
-            job_name = input_file.stem  # Remove .d12 extension
+        if is_script_generator(script_content):
+            # Template: run locally (in work_dir) to generate and sbatch the actual script
+            print(f"  Running script generator: {script_path.name}")
+            command = None
+        else:
+            # Regular SLURM script - run it directly
+            print(f"  Submitting SLURM script: {script_path.name}")
+            command = [str(script_path), job_name]
             
-            # Check if the script contains script generation logic
-            with open(script_path, 'r') as f:
-                script_content = f.read()
+        # Runs with cwd=work_dir through the shared, rate-limited submission queue
+        return SubmissionJob(script_path, work_dir, job_name=job_name, command=command)
+        
+    def submit_to_slurm(self, input_file: Path, work_dir: Path, calc_type: str) -> Optional[str]:
+        """
+        Submit job to SLURM using appropriate submission script.
+        
+        Args:
+            input_file: Path to .d12 input file
+            work_dir: Working directory for calculation
+            calc_type: Type of calculation (determines which script to use)
             
-            if 'echo \'#!/bin/bash --login\' >' in script_content or 'echo "#SBATCH' in script_content:
-                # This is a script generator template - run locally to generate actual script
-                print(f"  Running script generator: {script_path.name}")
-                cmd = ['bash', str(script_path), job_name]
-                result = subprocess.run(cmd, capture_output=True, text=True)
-                
-                if result.returncode == 0:
-                    # Extract job ID from sbatch output (the template runs sbatch at the end)
-                    output = result.stdout.strip()
-                    job_id_match = re.search(r'Submitted batch job (\d+)', output)
-                    if job_id_match:
-                        return job_id_match.group(1)
-                    else:
-                        print(f"Could not extract job ID from template output: {output}")
-                        # Maybe the template just generated the script but didn't submit it
-                        # Look for generated script and submit it manually
-                        generated_script = work_dir / f"{job_name}.sh"
-                        if generated_script.exists():
-                            print(f"  Found generated script: {generated_script}")
-                            cmd = ['sbatch', str(generated_script)]
-                            result = subprocess.run(cmd, capture_output=True, text=True)
-                            if result.returncode == 0:
-                                job_id_match = re.search(r'Submitted batch job (\d+)', result.stdout)
-                                if job_id_match:
-                                    return job_id_match.group(1)
-                        return None
-                else:
-                    print(f"Error running script generator: {result.stderr}")
-                    return None
-                    
-            else:
-                # This is a regular SLURM script - submit directly
-                print(f"  Submitting SLURM script: {script_path.name}")
-                cmd = [str(script_path), job_name]
-                result = subprocess.run(cmd, capture_output=True, text=True)
-                
-                if result.returncode == 0:
-                    # Extract job ID from sbatch output
-                    output = result.stdout.strip()
-                    job_id_match = re.search(r'Submitted batch job (\d+)', output)
-                    if job_id_match:
-                        return job_id_match.group(1)
-                    else:
-                        print(f"Could not extract job ID from: {output}")
-                        return None
-                else:
-                    print(f"Error submitting job: {result.stderr}")
-                    return None
-                
-        finally:
-            os.chdir(original_cwd)
+        Returns:
+            SLURM job ID if successful, None if failed
+        """
+        job = self._submission_job(input_file, work_dir, calc_type)
+        if job is None:
+            return None
+        get_submission_queue().submit_job(job)
+        if not job.job_id:
+            print(f"Error submitting job: {job.error}")
+        return job.job_id
             
     def check_queue(self) -> Tuple[int, int]:
         """Check SLURM queue and return (running, pending) job counts.
         
+        Uses the shared queue snapshot, so repeated checks within its TTL
+        do not run squeue again.
+        
         Returns:
             Tuple of (running_jobs, pending_jobs)
         """
-        try:
-            result = subprocess.run(
-                ['squeue', '-u', os.environ.get('USER', 'unknown'), '-o', '%i,%T,%S'],
-                capture_output=True, text=True, check=False
-            )
-            
-            if result.returncode != 0:
-                raise Exception(f"squeue error: {result.stderr}")
-                
-            # Count jobs by state
-            running = 0
-            pending = 0
-            
-            for line in result.stdout.strip().split('\n')[1:]:  # Skip header
-                if line.strip():
-                    parts = line.strip().split(',')
-                    if len(parts) >= 2:
-                        state = parts[1]
-                        if state == 'RUNNING':
-                            running += 1
-                        elif state in ['PENDING', 'CONFIGURING']:
-                            pending += 1
-                            
-            return running, pending
-            
-        except FileNotFoundError:
+        snapshot = get_queue_snapshot()
+        running, pending = snapshot.counts()
+        
+        if snapshot.slurm_missing:
             raise Exception("SLURM (squeue) not found - this command requires SLURM to be available")
-        except Exception as e:
-            raise Exception(f"Error checking queue: {e}")
+        if snapshot.error:
+            raise Exception(f"Error checking queue: {snapshot.error}")
+            
+        return running, pending
     
     def check_queue_status(self):
         """Check SLURM queue and update calculation statuses."""
-        # Get current queue status
-        try:
-            result = subprocess.run(
-                ['squeue', '-u', os.environ.get('USER', 'unknown'), '-o', '%i,%T,%S'],
-                capture_output=True, text=True
-            )
-            
-            if result.returncode != 0:
-                print(f"Error checking queue: {result.stderr}")
-                return
-                
-            # Parse squeue output
-            queue_jobs = {}
-            for line in result.stdout.strip().split('\n')[1:]:  # Skip header
-                if line.strip():
-                    parts = line.strip().split(',')
-                    if len(parts) >= 2:
-                        job_id, state = parts[0], parts[1]
-                        queue_jobs[job_id] = state
-                        
-        except FileNotFoundError:
+        # Get current queue status from the shared snapshot
+        snapshot = get_queue_snapshot()
+        snapshot.get_jobs()
+        
+        if snapshot.slurm_missing:
             # SLURM not available
             if self.enable_tracking:
                 print("  SLURM not available - skipping queue status check")
             return
-        except Exception as e:
-            print(f"Error checking queue status: {e}")
+        if snapshot.error:
+            print(f"Error checking queue: {snapshot.error}")
             return
             
         # Update calculation statuses
@@ -802,37 +792,46 @@ class EnhancedCrystalQueueManager:
             running_calcs = self.db.get_calculations_by_status('submitted') + \
                            self.db.get_calculations_by_status('running')
                            
+            # Queued jobs come from squeue, jobs that left the queue from one
+            # batched sacct call
+            slurm_states = snapshot.resolve(
+                calc['slurm_job_id'] for calc in running_calcs if calc['slurm_job_id']
+            )
+            
+            updates = []
+            failed, unresolved = [], []
             for calc in running_calcs:
                 slurm_job_id = calc['slurm_job_id']
                 if not slurm_job_id:
                     continue
                     
-                if slurm_job_id in queue_jobs:
-                    slurm_state = queue_jobs[slurm_job_id]
+                slurm_state = slurm_states.get(str(slurm_job_id))
+                status = slurm_state_to_status(slurm_state) if slurm_state else None
+                if slurm_state is None or status == 'completed':
+                    # Unknown to squeue and sacct, or finished: CRYSTAL can exit
+                    # 0 after an SCF or geometry failure, so the output file
+                    # decides between completed and failed
+                    unresolved.append(calc)
+                    continue
                     
-                    # Map SLURM state to our status
-                    if slurm_state in ['PENDING', 'CONFIGURING']:
-                        status = 'submitted'
-                    elif slurm_state in ['RUNNING']:
-                        status = 'running'
-                    elif slurm_state in ['COMPLETED']:
-                        status = 'completed'
-                        self.handle_completed_calculation(calc['calc_id'])
-                    elif slurm_state in ['FAILED', 'CANCELLED', 'TIMEOUT', 'NODE_FAIL']:
-                        status = 'failed'
-                        self.handle_failed_calculation(calc['calc_id'], slurm_state)
-                    else:
-                        continue  # Unknown state, don't update
-                        
-                    # Update database
-                    if calc['status'] != status:
-                        self.db.update_calculation_status(
-                            calc['calc_id'], status, slurm_state=slurm_state
-                        )
-                        
-                else:
-                    # Job not in queue - check if it completed or failed
-                    self.check_completed_or_failed_job(calc)
+                # Map SLURM state to our status
+                if status is None:
+                    continue  # Unknown state, don't update
+                if status == 'failed':
+                    failed.append((calc['calc_id'], slurm_state))
+                    
+                if calc['status'] != status:
+                    updates.append({'calc_id': calc['calc_id'], 'status': status,
+                                    'slurm_state': slurm_state})
+                    
+            # All status changes in one transaction, before the follow-up handlers
+            self.db.update_calculation_statuses(updates)
+            
+            for calc_id, slurm_state in failed:
+                self.handle_failed_calculation(calc_id, slurm_state)
+            for calc in unresolved:
+                # Job left the queue - check if it completed or failed
+                self.check_completed_or_failed_job(calc)
                     
     def check_early_job_failure(self):
         """Check for jobs that are failing early and cancel them if needed."""
@@ -1331,7 +1330,13 @@ class EnhancedCrystalQueueManager:
                 base_dir = str(self.d12_dir)
             
             # Initialize workflow engine with same database and correct base directory
-            workflow_engine = WorkflowEngine(self.db_path, base_dir)
+            # (kept for the next callback when the manager runs as a daemon)
+            workflow_engine = getattr(self, '_workflow_engine', None)
+            if workflow_engine is None or workflow_engine.base_work_dir != Path(base_dir):
+                if workflow_engine is not None:
+                    workflow_engine.close()
+                workflow_engine = WorkflowEngine(self.db_path, base_dir)
+                self._workflow_engine = workflow_engine
             
             # Process completed calculations and generate next steps
             new_calc_ids = workflow_engine.execute_workflow_step(material_id, completed_calc_id)
@@ -1341,19 +1346,28 @@ class EnhancedCrystalQueueManager:
                 
                 # If auto-submission is enabled, submit the new calculations
                 if self.auto_submit_followups:
+                    jobs = []
                     for calc_id in new_calc_ids:
-                        calc = next((c for c in self.db.get_all_calculations() 
-                                   if c['calc_id'] == calc_id), None)
+                        calc = self.db.get_calculation(calc_id)
                         if calc and calc.get('input_file'):
                             print(f"Auto-submitting generated calculation: {calc_id}")
-                            slurm_job_id = self.submit_to_slurm(
+                            job = self._submission_job(
                                 Path(calc['input_file']), 
                                 Path(calc['input_file']).parent,
                                 calc['calc_type']
                             )
-                            if slurm_job_id:
-                                self.db.update_calculation_status(calc_id, 'submitted', slurm_job_id=slurm_job_id)
-                                print(f"Submitted {calc_id} as SLURM job {slurm_job_id}")
+                            if job is not None:
+                                job.context['calc_id'] = calc_id
+                                jobs.append(job)
+                    for job in get_submission_queue().submit_many(jobs):
+                        calc_id = job.context['calc_id']
+                        if job.job_id:
+                            self.db.update_calculation_status(calc_id, 'submitted', slurm_job_id=job.job_id)
+                            print(f"Submitted {calc_id} as SLURM job {job.job_id}")
+                        else:
+                            print(f"Error submitting job: {job.error}")
+                    if any(job.job_id for job in jobs):
+                        get_queue_snapshot().invalidate()
             else:
                 print(f"No new workflow steps needed for {material_id}")
                 
@@ -1429,11 +1443,13 @@ class EnhancedCrystalQueueManager:
         # Remove duplicates (in case a file appears in both searches)
         d12_files = list(set(d12_files))
         
-        submitted_count = 0
+        # Pick the files to submit this callback, then submit them together
+        pending = []
+        current_jobs = len(self.legacy_job_status["submitted"])
         
         for d12_file in d12_files:
             # Check if we've reached the submission limit for this callback
-            if submitted_count >= self.max_submit_per_callback:
+            if len(pending) >= self.max_submit_per_callback:
                 print(f"Reached max submissions per callback ({self.max_submit_per_callback})")
                 break
             # Check if this file has already been submitted
@@ -1448,15 +1464,14 @@ class EnhancedCrystalQueueManager:
                     continue
                     
             # Check queue capacity
-            current_jobs = len(self.legacy_job_status["submitted"])
-            if current_jobs >= (self.max_jobs - self.reserve_slots):
-                print(f"Queue nearly full ({current_jobs}/{self.max_jobs}), skipping new submissions")
+            if current_jobs + len(pending) >= (self.max_jobs - self.reserve_slots):
+                print(f"Queue nearly full ({current_jobs + len(pending)}/{self.max_jobs}), skipping new submissions")
                 break
                 
-            # Submit the calculation
-            calc_id = self.submit_calculation(d12_file)
-            if calc_id:
-                submitted_count += 1
+            pending.append(d12_file)
+            
+        if pending:
+            self.submit_calculations(pending)
             
     def run_monitoring_cycle(self):
         """Run one cycle of queue monitoring and management."""
@@ -1485,6 +1500,20 @@ class EnhancedCrystalQueueManager:
         if self.throttler:
             self.throttler.throttle(f"callback_{mode}")
             
+        self._run_with_lock(mode)
+        
+    def run_callback_batch(self, modes):
+        """
+        Run several callback modes in one go (used by the queue daemon).
+        
+        No throttling: the daemon already serialises callbacks, it only takes
+        the locks to stay exclusive with callbacks run outside the daemon.
+        """
+        for mode in modes:
+            self._run_with_lock(mode)
+            
+    def _run_with_lock(self, mode):
+        """Run one callback mode under its distributed lock."""
         # Acquire distributed lock
         if self.lock_manager:
             lock_name = f"queue_manager_{mode}"
@@ -1720,9 +1749,39 @@ def main():
         default=3, 
         help="Maximum recovery attempts per job (default: 3)"
     )
+    parser.add_argument(
+        "--daemon", 
+        action="store_true", 
+        help="Run as a resident daemon serving callbacks from job-end notifications"
+    )
+    parser.add_argument(
+        "--daemon-tick", 
+        type=float, 
+        default=None, 
+        help="Seconds between daemon spool checks (default: 5)"
+    )
+    parser.add_argument(
+        "--daemon-dir", 
+        help="Daemon notification directory (default: next to the queue locks)"
+    )
+    parser.add_argument(
+        "--no-daemon", 
+        action="store_true", 
+        help="Run the callback in this process even if a daemon is running"
+    )
     
     args = parser.parse_args()
     
+    from mace.queue.daemon import QueueDaemon, daemon_dir, is_daemon_running, notify, DEFAULT_TICK
+    directory = Path(args.daemon_dir) if args.daemon_dir else daemon_dir(args.d12_dir)
+    
+    # Hand the callback to a running daemon instead of starting a manager
+    if not (args.daemon or args.status or args.submit_file or args.no_daemon):
+        if is_daemon_running(directory):
+            notify(directory, args.callback_mode, job_id=os.environ.get('SLURM_JOB_ID'))
+            print(f"Callback ({args.callback_mode}) queued for the queue daemon in {directory}")
+            return
+    
     # Create queue manager
     manager = EnhancedCrystalQueueManager(
         d12_dir=args.d12_dir,
@@ -1755,6 +1814,12 @@ def main():
             print("Failed to submit calculation")
             sys.exit(1)
             
+    elif args.daemon:
+        # Serve callbacks until stopped
+        daemon = QueueDaemon(manager, directory, tick=args.daemon_tick or DEFAULT_TICK)
+        if not daemon.run():
+            sys.exit(1)
+            
     else:
         # Run callback check
         manager.run_callback_check(args.callback_mode)
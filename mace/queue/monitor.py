@@ -25,7 +25,6 @@ from datetime import datetime, timedelta
 from pathlib import Path
 from typing import Dict, List, Optional, Tuple
 import threading
-import subprocess
 from collections import defaultdict, Counter
 import signal
 
@@ -35,6 +34,7 @@ try:
     from mace.database.materials_contextual import ContextualMaterialDatabase
     from mace.workflow.context import get_current_context, WorkflowContext
     from mace.utils.file_manager import CrystalFileManager
+    from mace.queue.snapshot import get_queue_snapshot
     try:
         from mace.recovery.detector import CrystalErrorDetector
         HAS_ERROR_DETECTOR = True
@@ -87,7 +87,7 @@ class MaterialMonitor:
             
         self.file_manager = CrystalFileManager(str(actual_base_dir), self.db_path)
         if HAS_ERROR_DETECTOR:
-            self.error_detector = CrystalErrorDetector(str(actual_base_dir), self.db_path)
+            self.error_detector = CrystalErrorDetector(str(actual_base_dir), self.db_path, scan_mode='tail')
         else:
             self.error_detector = None
         
@@ -170,23 +170,12 @@ class MaterialMonitor:
         }
         
         try:
-            # Get SLURM queue information
-            result = subprocess.run(
-                ['squeue', '-u', os.environ.get('USER', 'unknown'), '-o', '%i,%T,%S,%j'],
-                capture_output=True, text=True, timeout=30
-            )
+            # Get SLURM queue information from the shared snapshot
+            snapshot = get_queue_snapshot()
+            status_counts = Counter(snapshot.state_counts())
             
-            if result.returncode == 0:
-                lines = result.stdout.strip().split('\n')[1:]  # Skip header
-                queue['total_jobs'] = len(lines)
-                
-                status_counts = Counter()
-                for line in lines:
-                    if line.strip():
-                        parts = line.split(',')
-                        if len(parts) >= 2:
-                            status_counts[parts[1]] += 1
-                            
+            if snapshot.error is None:
+                queue['total_jobs'] = sum(status_counts.values())
                 queue['by_status'] = dict(status_counts)
                 
                 # Check for potential issues
@@ -200,13 +189,13 @@ class MaterialMonitor:
                     
                 queue['status'] = 'healthy' if not queue['issues'] else 'warning'
                 
+            elif 'timed out' in snapshot.error:
+                queue['status'] = 'error'
+                queue['issues'].append('SLURM queue check timed out')
             else:
                 queue['status'] = 'error'
                 queue['issues'].append('Cannot access SLURM queue')
                 
-        except subprocess.TimeoutExpired:
-            queue['status'] = 'error'
-            queue['issues'].append('SLURM queue check timed out')
         except Exception as e:
             queue['status'] = 'error'
             queue['issues'].append(f'Queue check failed: {e}')
@@ -698,15 +687,9 @@ class MaterialMonitor:
             
         try:
             # Quick queue check
-            result = subprocess.run(
-                ['squeue', '-u', os.environ.get('USER', 'unknown')],
-                capture_output=True, text=True, timeout=10
-            )
-            if result.returncode == 0:
-                lines = result.stdout.strip().split('\n')[1:]  # Skip header
-                stats['queue_jobs'] = len(lines)
-            else:
-                stats['queue_jobs'] = 'N/A'
+            snapshot = get_queue_snapshot()
+            jobs = snapshot.get_jobs()
+            stats['queue_jobs'] = len(jobs) if snapshot.error is None else 'N/A'
         except:
             stats['queue_jobs'] = 'N/A'
             
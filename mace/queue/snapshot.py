@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+"""
+Shared SLURM Queue Snapshot
+---------------------------
+One squeue call per cycle, shared by every component in the process.
+
+QueueSnapshot runs a single `squeue` for the current user and caches the
+parsed job table for a configurable TTL. Jobs that are no longer in the queue
+are resolved with one batched `sacct --jobs=<id,id,...>` call instead of
+per-calculation file checks; final sacct states never change, so they are
+cached for the lifetime of the process.
+
+The squeue/sacct executables can be overridden with the MACE_SQUEUE and
+MACE_SACCT environment variables (or constructor arguments), which is how
+the snapshot is exercised against fake executables without SLURM.
+
+Usage:
+  snapshot = get_queue_snapshot()
+  running, pending = snapshot.counts()
+  states = snapshot.resolve(['123456', '123457'])
+"""
+
+import os
+import time
+import threading
+import subprocess
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+# SLURM states grouped the way MACE maps them onto calculation statuses
+PENDING_STATES = {'PENDING', 'CONFIGURING', 'REQUEUED', 'RESIZING', 'SUSPENDED'}
+RUNNING_STATES = {'RUNNING', 'COMPLETING', 'STAGE_OUT'}
+COMPLETED_STATES = {'COMPLETED'}
+FAILED_STATES = {'FAILED', 'CANCELLED', 'TIMEOUT', 'NODE_FAIL', 'OUT_OF_MEMORY',
+                 'BOOT_FAIL', 'DEADLINE', 'PREEMPTED'}
+FINAL_STATES = COMPLETED_STATES | FAILED_STATES
+
+DEFAULT_TTL = 30.0  # Seconds, unless MACE_QUEUE_SNAPSHOT_TTL sets another
+SACCT_BATCH_SIZE = 500  # Job ids per sacct call, keeps the command line short
+
+
+def slurm_state_to_status(slurm_state: str) -> Optional[str]:
+    """Map a SLURM job state to a calculation status (None if unknown)."""
+    if slurm_state in PENDING_STATES:
+        return 'submitted'
+    if slurm_state in RUNNING_STATES:
+        return 'running'
+    if slurm_state in COMPLETED_STATES:
+        return 'completed'
+    if slurm_state in FAILED_STATES:
+        return 'failed'
+    return None
+
+
+def _default_ttl() -> float:
+    """Snapshot TTL from MACE_QUEUE_SNAPSHOT_TTL, or DEFAULT_TTL if it is unset or invalid."""
+    value = os.environ.get('MACE_QUEUE_SNAPSHOT_TTL')
+    if value is None:
+        return DEFAULT_TTL
+    try:
+        ttl = float(value)
+    except ValueError:
+        ttl = None
+    if ttl is None or not ttl >= 0:
+        print(f"Warning: Invalid MACE_QUEUE_SNAPSHOT_TTL {value!r}, using {DEFAULT_TTL:g}s")
+        return DEFAULT_TTL
+    return ttl
+
+
+class QueueSnapshot:
+    """Cached view of the SLURM queue for the current user."""
+
+    def __init__(self, ttl: float = None, user: str = None,
+                 squeue_cmd: str = None, sacct_cmd: str = None, timeout: float = 60):
+        self.ttl = _default_ttl() if ttl is None else ttl
+        self.user = user or os.environ.get('USER', 'unknown')
+        self.squeue_cmd = squeue_cmd or os.environ.get('MACE_SQUEUE', 'squeue')
+        self.sacct_cmd = sacct_cmd or os.environ.get('MACE_SACCT', 'sacct')
+        self.timeout = timeout
+        self.lock = threading.RLock()
+
+        self.jobs: Dict[str, Dict[str, str]] = {}  # job_id -> {'state', 'start_time', 'submit_time', 'name'}
+        self.taken_at: Optional[float] = None
+        self.error: Optional[str] = None
+        self.slurm_missing = False
+        self._final_states: Dict[str, str] = {}  # job_id -> final sacct state
+        self.calls = {'squeue': 0, 'sacct': 0}
+
+    # ------------------------------------------------------------------
+    # squeue
+    # ------------------------------------------------------------------
+
+    def is_stale(self) -> bool:
+        return self.taken_at is None or time.monotonic() - self.taken_at >= self.ttl
+
+    def invalidate(self):
+        """Force the next access to run squeue again (e.g. after sbatch)."""
+        with self.lock:
+            self.taken_at = None
+
+    def refresh(self) -> bool:
+        """Run squeue once and replace the cached job table. Returns True on success."""
+        with self.lock:
+            self.calls['squeue'] += 1
+            self.taken_at = time.monotonic()
+            try:
+                result = subprocess.run(
+                    [self.squeue_cmd, '-u', self.user, '--noheader', '-o', '%i|%T|%S|%V|%j'],
+                    capture_output=True, text=True, timeout=self.timeout
+                )
+            except FileNotFoundError:
+                self.slurm_missing = True
+                self.error = "SLURM (squeue) not found"
+                self.jobs = {}
+                return False
+            except subprocess.TimeoutExpired:
+                self.error = "squeue timed out"
+                return False
+
+            if result.returncode != 0:
+                self.error = f"squeue error: {result.stderr.strip()}"
+                return False
+
+            jobs = {}
+            for line in result.stdout.splitlines():
+                parts = line.strip().split('|', 4)
+                if len(parts) >= 2 and parts[0]:
+                    jobs[parts[0]] = {
+                        'state': parts[1],
+                        'start_time': parts[2] if len(parts) > 2 else '',
+                        'submit_time': parts[3] if len(parts) > 3 else '',
+                        'name': parts[4] if len(parts) > 4 else '',
+                    }
+            self.jobs = jobs
+            self.error = None
+            self.slurm_missing = False
+            return True
+
+    def get_jobs(self) -> Dict[str, Dict[str, str]]:
+        """Queued jobs of the current user, refreshed at most once per TTL."""
+        with self.lock:
+            if self.is_stale():
+                self.refresh()
+            return self.jobs
+
+    def counts(self) -> Tuple[int, int]:
+        """Return (running, pending) job counts."""
+        running = pending = 0
+        for job in self.get_jobs().values():
+            if job['state'] == 'RUNNING':
+                running += 1
+            elif job['state'] in ('PENDING', 'CONFIGURING'):
+                pending += 1
+        return running, pending
+
+    def state_counts(self) -> Dict[str, int]:
+        """Number of queued jobs in each SLURM state."""
+        counts: Dict[str, int] = {}
+        for job in self.get_jobs().values():
+            counts[job['state']] = counts.get(job['state'], 0) + 1
+        return counts
+
+    # ------------------------------------------------------------------
+    # sacct
+    # ------------------------------------------------------------------
+
+    def _query_sacct(self, job_ids: List[str]) -> Dict[str, str]:
+        """Look up job states in the accounting database, in batches."""
+        states = {}
+        for start in range(0, len(job_ids), SACCT_BATCH_SIZE):
+            batch = job_ids[start:start + SACCT_BATCH_SIZE]
+            self.calls['sacct'] += 1
+            try:
+                result = subprocess.run(
+                    [self.sacct_cmd, '-X', '--noheader', '--parsable2',
+                     f'--jobs={",".join(batch)}', '--format=JobID,State'],
+                    capture_output=True, text=True, timeout=self.timeout
+                )
+            except (FileNotFoundError, subprocess.TimeoutExpired):
+                return states
+            if result.returncode != 0:
+                return states
+
+            for line in result.stdout.splitlines():
+                parts = line.strip().split('|')
+                if len(parts) >= 2 and parts[0]:
+                    # "CANCELLED by 1234" -> "CANCELLED"
+                    state = parts[1].split()[0] if parts[1].strip() else ''
+                    if state:
+                        states[parts[0]] = state
+        return states
+
+    def resolve(self, job_ids: Iterable[str]) -> Dict[str, str]:
+        """
+        Return the SLURM state of each job id that can be determined.
+
+        Queued jobs come from the cached squeue table; all remaining ids are
+        looked up with batched sacct calls. Ids unknown to both are omitted.
+        """
+        job_ids = [str(job_id) for job_id in job_ids if job_id]
+        queued = self.get_jobs()
+
+        with self.lock:
+            states = {}
+            missing = []
+            for job_id in job_ids:
+                if job_id in queued:
+                    states[job_id] = queued[job_id]['state']
+                elif job_id in self._final_states:
+                    states[job_id] = self._final_states[job_id]
+                else:
+                    missing.append(job_id)
+
+            if missing:
+                for job_id, state in self._query_sacct(missing).items():
+                    if job_id in missing:
+                        states[job_id] = state
+                        if state in FINAL_STATES:
+                            self._final_states[job_id] = state
+            return states
+
+
+_shared_snapshot: Optional[QueueSnapshot] = None
+_shared_lock = threading.Lock()
+
+
+def get_queue_snapshot(ttl: float = None) -> QueueSnapshot:
+    """Return the process-wide QueueSnapshot, creating it on first use."""
+    global _shared_snapshot
+    with _shared_lock:
+        if _shared_snapshot is None:
+            _shared_snapshot = QueueSnapshot(ttl=ttl)
+        elif ttl is not None:
+            _shared_snapshot.ttl = ttl
+        return _shared_snapshot
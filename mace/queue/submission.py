@@ -0,0 +1,317 @@
+#!/usr/bin/env python3
+"""
+Bulk SLURM Submission Queue
+---------------------------
+Submit many SLURM jobs concurrently without changing the process working
+directory.
+
+- Every submission runs sbatch (or the MACE script generator template) with
+  cwd=<work_dir>, so submissions are safe to run from a thread pool.
+- A token bucket limits the sbatch rate seen by the SLURM controller.
+- Transient sbatch failures (controller unreachable, "try again" errors) are
+  retried with exponential backoff.
+- After a socket timeout the job may have been queued anyway, so squeue is
+  asked once for it. A queued job counts as this submission if it carries
+  the job's name, was submitted since the sbatch call and was not submitted
+  by this queue for another job. If no such job is queued the submission is
+  retried. If several are, or squeue does not answer, the error is reported
+  and the job is not resubmitted.
+
+The queue manager submits the new .d12 files of a callback and the
+follow-ups of a workflow step with submit_many. The workflow engine
+submits each generated step from its step fan-out threads with
+submit_script, so those calls share the same rate limit and retries.
+
+The sbatch executable can be overridden with the MACE_SBATCH environment
+variable (or the sbatch_cmd argument), e.g. to run against a stub sbatch.
+
+Usage:
+  queue = SubmissionQueue(max_workers=8, rate=5.0)
+  jobs = queue.submit_many([SubmissionJob(script, work_dir) for script, work_dir in pending])
+  for job in jobs:
+      print(job.work_dir, job.job_id or job.error)
+"""
+
+import os
+import re
+import time
+import math
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor, Future
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+
+from mace.queue.snapshot import QueueSnapshot, get_queue_snapshot
+
+JOB_ID_RE = re.compile(r'Submitted batch job (\d+)')
+
+# sbatch errors worth retrying; anything else is reported immediately
+TRANSIENT_ERRORS = (
+    'Resource temporarily unavailable',
+    'Unable to contact slurm controller',
+    'slurm_receive_msg',
+    'Slurm temporarily unable',
+    'try again',
+    'Connection refused',
+)
+
+# sbatch errors after which the controller may have queued the job anyway
+UNCONFIRMED_ERRORS = (
+    'Socket timed out',
+)
+
+def is_script_generator(script_content: str) -> bool:
+    """True for MACE submit templates that write and sbatch the real job script."""
+    return 'echo \'#!/bin/bash --login\' >' in script_content or 'echo "#SBATCH' in script_content
+
+
+def parse_job_id(output: str) -> Optional[str]:
+    """Extract the job id from sbatch output."""
+    match = JOB_ID_RE.search(output or '')
+    return match.group(1) if match else None
+
+
+@dataclass
+class SubmissionJob:
+    """One job to submit and, after submission, its outcome."""
+    script_path: Path
+    work_dir: Path
+    job_name: Optional[str] = None  # Defaults to the script stem
+    command: Optional[List[str]] = None  # Overrides the template/sbatch detection
+    job_id: Optional[str] = None
+    error: Optional[str] = None
+    attempts: int = 0
+    context: Dict = field(default_factory=dict)  # Caller data carried through
+
+    def __post_init__(self):
+        self.script_path = Path(self.script_path)
+        self.work_dir = Path(self.work_dir)
+        if self.job_name is None:
+            self.job_name = self.script_path.stem
+
+
+def _submitted_since(submit_time: Optional[str], since: datetime) -> bool:
+    """True if an squeue submit time (%V) is not earlier than since."""
+    try:
+        return datetime.fromisoformat(submit_time) >= since
+    except (TypeError, ValueError):
+        return False
+
+
+class TokenBucket:
+    """Thread-safe token bucket: at most `rate` acquisitions per second, bursts up to `burst`."""
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.capacity = max(1, burst)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a token is available."""
+        if self.rate <= 0:
+            return
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class SubmissionQueue:
+    """Bounded thread pool for sbatch submissions with rate limiting and retries."""
+
+    def __init__(self, max_workers: int = 8, rate: float = 5.0, burst: int = 10,
+                 max_retries: int = 3, backoff: float = 2.0, timeout: float = 120,
+                 sbatch_cmd: str = None, queue_snapshot: QueueSnapshot = None):
+        self.max_workers = max(1, max_workers)
+        self.bucket = TokenBucket(rate, burst)
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.sbatch_cmd = sbatch_cmd or os.environ.get('MACE_SBATCH', 'sbatch')
+        self.queue_snapshot = queue_snapshot  # Defaults to the shared snapshot
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._executor_lock = threading.Lock()
+        self._submitted_ids: Set[str] = set()  # Never taken for another job after a timeout
+        self._submitted_lock = threading.Lock()
+
+    # ------------------------------------------------------------------
+    # Single submissions
+    # ------------------------------------------------------------------
+
+    def _command_for(self, job: SubmissionJob) -> Tuple[List[str], bool]:
+        """Return (command, is_template) for a job."""
+        if job.command:
+            return list(job.command), False
+        with open(job.script_path, 'r') as f:
+            script_content = f.read()
+        if is_script_generator(script_content):
+            return ['bash', str(job.script_path), job.job_name], True
+        return [self.sbatch_cmd, str(job.script_path)], False
+
+    def _run(self, command: List[str], work_dir: Path) -> subprocess.CompletedProcess:
+        env = None
+        if os.sep in self.sbatch_cmd:
+            # Templates call plain `sbatch`; put the configured one first on PATH
+            sbatch_dir = str(Path(self.sbatch_cmd).resolve().parent)
+            env = dict(os.environ, PATH=sbatch_dir + os.pathsep + os.environ.get('PATH', ''))
+        return subprocess.run(command, cwd=str(work_dir), capture_output=True,
+                              text=True, timeout=self.timeout, env=env)
+
+    def _find_queued_job(self, job: SubmissionJob,
+                         submitted_after: datetime) -> Tuple[bool, Optional[str], bool]:
+        """
+        Look for the job among those squeue lists as submitted since submitted_after.
+
+        Returns:
+            (squeue answered, id of the job, ambiguous) - ambiguous is True if
+            several new jobs carry the job's name, so none can be taken
+        """
+        snapshot = self.queue_snapshot or get_queue_snapshot()
+        if not snapshot.refresh():
+            return False, None, False
+        # sbatch names a job after its script file unless the script sets a name
+        names = {job.job_name, job.script_path.name}
+        with self._submitted_lock:
+            submitted_ids = set(self._submitted_ids)
+        new_ids = [job_id for job_id, queued in snapshot.get_jobs().items()
+                   if job_id not in submitted_ids and queued['name'] in names
+                   and _submitted_since(queued.get('submit_time'), submitted_after)]
+        if len(new_ids) > 1:
+            return True, None, True
+        return True, (new_ids[0] if new_ids else None), False
+
+    def submit_job(self, job: SubmissionJob) -> SubmissionJob:
+        """Submit one job in the calling thread, with rate limiting and retries."""
+        try:
+            command, is_template = self._command_for(job)
+        except OSError as e:
+            job.error = f"Cannot read script {job.script_path}: {e}"
+            return job
+
+        for attempt in range(self.max_retries + 1):
+            self.bucket.acquire()
+            job.attempts = attempt + 1
+            # squeue reports submit times in whole seconds
+            started = datetime.fromtimestamp(math.floor(time.time()))
+            try:
+                result = self._run(command, job.work_dir)
+            except subprocess.TimeoutExpired:
+                # The job may have been queued anyway, so never resubmit
+                job.error = f"Submission timed out after {self.timeout}s"
+                return job
+            except OSError as e:
+                job.error = f"Error submitting job: {e}"
+                return job
+            else:
+                job_id = parse_job_id(result.stdout)
+                if result.returncode == 0 and job_id:
+                    with self._submitted_lock:
+                        self._submitted_ids.add(job_id)
+                    job.job_id, job.error = job_id, None
+                    return job
+                if result.returncode == 0 and is_template:
+                    # The template only generated the script; submit it ourselves
+                    generated_script = job.work_dir / f"{job.job_name}.sh"
+                    if generated_script.exists():
+                        generated = self.submit_job(SubmissionJob(
+                            generated_script, job.work_dir, job_name=job.job_name,
+                            command=[self.sbatch_cmd, generated_script.name]
+                        ))
+                        job.job_id, job.error = generated.job_id, generated.error
+                        job.attempts += generated.attempts
+                        return job
+                    job.error = f"Could not extract job ID from: {result.stdout.strip()}"
+                    return job
+                job.error = (result.stderr or result.stdout).strip() or f"exit code {result.returncode}"
+                error = job.error.lower()
+                if any(marker.lower() in error for marker in UNCONFIRMED_ERRORS):
+                    # Only resubmit when squeue confirms the job was not queued
+                    answered, queued_id, ambiguous = self._find_queued_job(job, started)
+                    if queued_id:
+                        with self._submitted_lock:
+                            self._submitted_ids.add(queued_id)
+                        job.job_id, job.error = queued_id, None
+                        return job
+                    if ambiguous:
+                        job.error += " (not retried: several new jobs with the same name are queued)"
+                        return job
+                    if not answered:
+                        job.error += " (not retried: squeue could not confirm the job was not queued)"
+                        return job
+                elif not any(marker.lower() in error for marker in TRANSIENT_ERRORS):
+                    return job
+
+            if attempt < self.max_retries:
+                time.sleep(self.backoff * (2 ** attempt))
+        return job
+
+    # ------------------------------------------------------------------
+    # Bulk submissions
+    # ------------------------------------------------------------------
+
+    def _pool(self) -> ThreadPoolExecutor:
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                    thread_name_prefix='mace-sbatch')
+            return self._executor
+
+    def submit(self, job: SubmissionJob) -> Future:
+        """Queue one job; the future resolves to the same SubmissionJob."""
+        return self._pool().submit(self.submit_job, job)
+
+    def submit_many(self, jobs: List[SubmissionJob]) -> List[SubmissionJob]:
+        """Submit all jobs concurrently and wait for them, preserving order."""
+        jobs = list(jobs)
+        futures = [self.submit(job) for job in jobs]
+        for future in futures:
+            future.result()
+        return jobs
+
+    def shutdown(self):
+        with self._executor_lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
+                self._executor = None
+
+
+_shared_queue: Optional[SubmissionQueue] = None
+_shared_lock = threading.Lock()
+
+
+def get_submission_queue() -> SubmissionQueue:
+    """Return the process-wide SubmissionQueue (settings from MACE_SUBMIT_* variables)."""
+    global _shared_queue
+    with _shared_lock:
+        if _shared_queue is None:
+            _shared_queue = SubmissionQueue(
+                max_workers=int(os.environ.get('MACE_SUBMIT_WORKERS', '8')),
+                rate=float(os.environ.get('MACE_SUBMIT_RATE', '5')),
+                burst=int(os.environ.get('MACE_SUBMIT_BURST', '10')),
+            )
+        return _shared_queue
+
+
+def submit_script(script_path: Path, work_dir: Path, job_name: str = None,
+                  command: List[str] = None) -> Tuple[Optional[str], Optional[str]]:
+    """
+    Submit one job through the shared queue in the calling thread.
+
+    Returns:
+        (job_id, error) - job_id is None if the submission failed
+    """
+    job = get_submission_queue().submit_job(
+        SubmissionJob(script_path, work_dir, job_name=job_name, command=command)
+    )
+    return job.job_id, job.error
@@ -31,11 +31,13 @@ from mace.recovery.pandas_utils import (
     create_dataframe, to_datetime
 )
 PANDAS_AVAILABLE = pandas_available()
-pd = get_pandas() if PANDAS_AVAILABLE else None
 
 # Import MACE components
 from mace.database.materials import MaterialDatabase
 from mace.utils.file_manager import CrystalFileManager
+from mace.utils.crystal_output_stream import (
+    CrystalOutputStream, compile_alternation, read_head_lines, read_tail_lines
+)
 
 
 class CrystalErrorDetector:
@@ -47,9 +49,10 @@ class CrystalErrorDetector:
     """
     
     def __init__(self, base_dir: str = ".", db_path: str = "materials.db", 
-                 enable_tracking: bool = True):
+                 enable_tracking: bool = True, scan_mode: str = 'full'):
         self.base_dir = Path(base_dir).resolve()
         self.enable_tracking = enable_tracking
+        self.scan_mode = scan_mode  # 'full' or 'tail' (see analyze_output_file)
         self.lock = threading.RLock()
         
         # Initialize database connection
@@ -244,12 +247,20 @@ class CrystalErrorDetector:
             }
         }
         
-    def analyze_output_file(self, output_file: Path) -> Dict[str, any]:
+    def analyze_output_file(self, output_file: Path, scan_mode: str = None) -> Dict[str, any]:
         """
         Analyze a single CRYSTAL output file for errors and completion status.
         
         Args:
             output_file: Path to .out file to analyze
+            scan_mode: 'full' reads every line. 'tail' reads only the first and
+                       last 64 KB, where CRYSTAL writes its termination and error
+                       messages, and falls back to a full read when neither an
+                       error nor a completion marker is found there. A
+                       completion marker in the tail therefore wins over an
+                       error message in the middle of the file (a run that
+                       recovered), which only 'full' reports as an error.
+                       Defaults to the detector's scan_mode.
             
         Returns:
             Dictionary with analysis results
@@ -267,7 +278,8 @@ class CrystalErrorDetector:
             'file_size': 0,
             'last_modified': None,
             'runtime_info': {},
-            'performance_metrics': {}
+            'performance_metrics': {},
+            'scan_mode': 'full'
         }
         
         if not output_file.exists():
@@ -278,38 +290,141 @@ class CrystalErrorDetector:
             stat = output_file.stat()
             result['file_size'] = stat.st_size
             result['last_modified'] = datetime.fromtimestamp(stat.st_mtime).isoformat()
+        except Exception as e:
+            result['status'] = 'read_error'
+            result['error_details'].append(f"Could not read file: {e}")
+            return result
             
-            # Read file content
-            with open(output_file, 'r', errors='ignore') as f:
-                content = f.read()
-                lines = content.split('\n')
-                
+        # Single streaming pass: runtime info, errors, completion markers and
+        # calculation details are all collected line by line
+        try:
+            scan = None
+            if (scan_mode or self.scan_mode) == 'tail':
+                scan = self._scan_head_and_tail(output_file)
+                if scan is not None:
+                    result['scan_mode'] = 'tail'
+            if scan is None:
+                scan = self._scan_output_lines(CrystalOutputStream(output_file).iter_lines())
         except Exception as e:
             result['status'] = 'read_error'
             result['error_details'].append(f"Could not read file: {e}")
             return result
             
-        # Extract runtime and performance information
-        self._extract_runtime_info(lines, result)
+        result['runtime_info'] = scan['runtime_info']
         
         # Check for errors first (following updatelists2.py logic)
-        error_found = self._check_for_errors(lines, result)
+        error_found = self._apply_error_scan(scan, result)
         
         if not error_found:
             # Check for completion patterns
-            self._check_for_completion(lines, result)
+            self._apply_completion_scan(scan, result)
             
         # Additional analysis
-        self._analyze_performance_issues(lines, result)
-        self._extract_calculation_details(lines, result)
+        self._analyze_performance_issues(result)
+        result['calculation_details'] = scan['calculation_details']
         
         return result
         
-    def _check_for_errors(self, lines: List[str], result: Dict) -> bool:
-        """Check for error patterns in output file lines."""
-        for line in lines:
-            line_lower = line.lower()
+    def _compile_scan_patterns(self):
+        """Compile error and completion patterns into single alternations (cached)."""
+        if getattr(self, '_scan_patterns', None) is None:
+            self._scan_patterns = (
+                compile_alternation((pattern
+                                     for error_info in self.error_patterns.values()
+                                     for pattern in error_info['patterns']), re.IGNORECASE),
+                compile_alternation(pattern
+                                    for completion_info in self.completion_patterns.values()
+                                    for pattern in completion_info['patterns'])
+            )
+        return self._scan_patterns
+        
+    def _scan_head_and_tail(self, output_file: Path) -> Optional[Dict]:
+        """
+        Scan only the start and the end of the file.
+        
+        The tail is read backwards in blocks and reading stops early at the
+        first block containing an error message. Returns None when the
+        windows contain neither a known error nor a completion marker, in
+        which case the caller falls back to a full scan. Lines between the
+        windows are never read otherwise, so an error there is missed when
+        the tail shows the run completed.
+        """
+        error_re, _ = self._compile_scan_patterns()
+        tail_lines, covers_file = read_tail_lines(output_file, stop_re=error_re)
+        if covers_file:
+            # Small file: the tail is the whole file, so the answer is exact
+            return self._scan_output_lines(enumerate(tail_lines, 1))
             
+        head_lines = read_head_lines(output_file)
+        numbered_lines = list(enumerate(head_lines, 1))
+        numbered_lines.extend(enumerate(tail_lines, len(head_lines) + 1))
+        scan = self._scan_output_lines(numbered_lines)
+        if scan['error_line'] is None and not scan['completion_patterns']:
+            return None
+        return scan
+        
+    def _scan_output_lines(self, numbered_lines) -> Dict:
+        """Collect everything analyze_output_file needs in one pass over the lines."""
+        error_re, completion_re = self._compile_scan_patterns()
+        
+        scan = {
+            'error_line': None,         # First line matching a known error pattern
+            'generic_error_line': None, # First line containing 'error'
+            'completion_patterns': set(),
+            'head_lines': [],           # First 20 lines, for the 'ongoing' check
+            'runtime_info': {},
+            'calculation_details': {}
+        }
+        runtime_info = scan['runtime_info']
+        details = scan['calculation_details']
+        
+        for line_number, line in numbered_lines:
+            line = line.rstrip('\n')
+            if line_number <= 20:
+                scan['head_lines'].append(line)
+                
+            # Errors
+            if scan['error_line'] is None and error_re.search(line):
+                scan['error_line'] = line
+            if scan['generic_error_line'] is None:
+                line_lower = line.lower()
+                if 'error' in line_lower and not any(skip in line_lower
+                                                     for skip in ['no error', 'error correction', 'stderr']):
+                    scan['generic_error_line'] = line
+                    
+            # Completion markers
+            if completion_re.search(line):
+                for completion_info in self.completion_patterns.values():
+                    for pattern in completion_info['patterns']:
+                        if pattern in line:
+                            scan['completion_patterns'].add(pattern)
+                            
+            # Runtime information
+            self._scan_runtime_line(line, runtime_info)
+            
+            # Calculation details
+            if "PRIMITIVE CELL" in line and "VOLUME" in line:
+                volume_match = re.search(r'VOLUME\s*=\s*(\d+\.\d+)', line)
+                if volume_match:
+                    details['cell_volume'] = float(volume_match.group(1))
+                    
+            elif "NUMBER OF ATOMS" in line:
+                atom_match = re.search(r'(\d+)', line)
+                if atom_match:
+                    details['num_atoms'] = int(atom_match.group(1))
+                    
+            elif "SPACE GROUP" in line:
+                sg_match = re.search(r'(\d+)', line)
+                if sg_match:
+                    details['space_group'] = int(sg_match.group(1))
+                    
+        return scan
+        
+    def _apply_error_scan(self, scan: Dict, result: Dict) -> bool:
+        """Record the first error found during the scan in the result."""
+        line = scan['error_line']
+        if line is not None:
+            line_lower = line.lower()
             for error_type, error_info in self.error_patterns.items():
                 for pattern in error_info['patterns']:
                     if pattern.lower() in line_lower:
@@ -326,80 +441,63 @@ class CrystalErrorDetector:
                         return True
                         
         # Check for generic errors
-        for line in lines:
-            if 'error' in line.lower() and not any(skip in line.lower() 
-                                                  for skip in ['no error', 'error correction', 'stderr']):
-                result['status'] = 'unknown_error'
-                result['error_details'].append({
-                    'pattern': 'generic_error',
-                    'line': line.strip(),
-                    'severity': 'unknown',
-                    'description': 'Unclassified error message'
-                })
-                return True
-                
+        line = scan['generic_error_line']
+        if line is not None:
+            result['status'] = 'unknown_error'
+            result['error_details'].append({
+                'pattern': 'generic_error',
+                'line': line.strip(),
+                'severity': 'unknown',
+                'description': 'Unclassified error message'
+            })
+            return True
+            
         return False
         
-    def _check_for_completion(self, lines: List[str], result: Dict):
-        """Check for completion patterns in output file lines."""
+    def _apply_completion_scan(self, scan: Dict, result: Dict):
+        """Record the completion status found during the scan in the result."""
+        found = scan['completion_patterns']
         for completion_type, completion_info in self.completion_patterns.items():
             for pattern in completion_info['patterns']:
-                if any(pattern in line for line in lines):
+                if pattern in found:
                     result['status'] = 'completed'
                     result['completion_type'] = completion_type
                     result['calc_type'] = completion_info['calc_type']
                     return
                     
         # If no completion found, check if calculation is still running
-        if any('CRYSTAL' in line and 'CALCULATION' in line for line in lines[:20]):
+        if any('CRYSTAL' in line and 'CALCULATION' in line for line in scan['head_lines']):
             result['status'] = 'ongoing'
         else:
             result['status'] = 'incomplete'
             
-    def _extract_runtime_info(self, lines: List[str], result: Dict):
-        """Extract runtime and timing information from output."""
-        runtime_info = {}
-        
-        for line in lines:
-            # Extract CPU time
-            if "TOTAL CPU TIME =" in line:
-                try:
-                    time_match = re.search(r'(\d+\.\d+)', line)
-                    if time_match:
-                        runtime_info['total_cpu_time'] = float(time_match.group(1))
-                except:
-                    pass
-                    
-            # Extract wall time
-            elif "ELAPSED TIME =" in line:
-                try:
-                    time_match = re.search(r'(\d+\.\d+)', line)
-                    if time_match:
-                        runtime_info['wall_time'] = float(time_match.group(1))
-                except:
-                    pass
-                    
-            # Extract SCF cycles
-            elif "SCF CYCLE" in line:
-                try:
-                    cycle_match = re.search(r'CYCLE\s+(\d+)', line)
-                    if cycle_match:
-                        runtime_info['scf_cycles'] = int(cycle_match.group(1))
-                except:
-                    pass
-                    
-            # Extract memory usage
-            elif "MEMORY" in line and "MB" in line:
-                try:
-                    mem_match = re.search(r'(\d+)\s*MB', line)
-                    if mem_match:
-                        runtime_info['memory_mb'] = int(mem_match.group(1))
-                except:
-                    pass
-                    
-        result['runtime_info'] = runtime_info
+    def _scan_runtime_line(self, line: str, runtime_info: Dict):
+        """Extract runtime and timing information from one output line."""
+        # Extract CPU time
+        if "TOTAL CPU TIME =" in line:
+            time_match = re.search(r'(\d+\.\d+)', line)
+            if time_match:
+                runtime_info['total_cpu_time'] = float(time_match.group(1))
+                
+        # Extract wall time
+        elif "ELAPSED TIME =" in line:
+            time_match = re.search(r'(\d+\.\d+)', line)
+            if time_match:
+                runtime_info['wall_time'] = float(time_match.group(1))
+                
+        # Extract SCF cycles
+        elif "SCF CYCLE" in line:
+            cycle_match = re.search(r'CYCLE\s+(\d+)', line)
+            if cycle_match:
+                runtime_info['scf_cycles'] = int(cycle_match.group(1))
+                
+        # Extract memory usage
+        elif "MEMORY" in line and "MB" in line:
+            mem_match = re.search(r'(\d+)\s*MB', line)
+            if mem_match:
+                runtime_info['memory_mb'] = int(mem_match.group(1))
         
-    def _analyze_performance_issues(self, lines: List[str], result: Dict):
+    def _analyze_performance_issues(self, result: Dict):
         """Analyze performance-related issues and bottlenecks."""
         performance = {}
         
@@ -432,29 +530,6 @@ class CrystalErrorDetector:
             
         result['performance_metrics'] = performance
         
-    def _extract_calculation_details(self, lines: List[str], result: Dict):
-        """Extract calculation-specific details from output."""
-        details = {}
-        
-        # Extract geometry information
-        for line in lines:
-            if "PRIMITIVE CELL" in line and "VOLUME" in line:
-                volume_match = re.search(r'VOLUME\s*=\s*(\d+\.\d+)', line)
-                if volume_match:
-                    details['cell_volume'] = float(volume_match.group(1))
-                    
-            elif "NUMBER OF ATOMS" in line:
-                atom_match = re.search(r'(\d+)', line)
-                if atom_match:
-                    details['num_atoms'] = int(atom_match.group(1))
-                    
-            elif "SPACE GROUP" in line:
-                sg_match = re.search(r'(\d+)', line)
-                if sg_match:
-                    details['space_group'] = int(sg_match.group(1))
-                    
-        result['calculation_details'] = details
-        
     def run_updatelists_integration(self, directory: Path = None) -> Dict[str, any]:
         """
         Run analysis using existing updatelists2.py integration.
@@ -517,7 +592,7 @@ class CrystalErrorDetector:
                     try:
                         df = read_csv(csv_path)
                         category = csv_file.replace('_list.csv', '')
-                        if PANDAS_AVAILABLE:
+                        if get_pandas():
                             results['categories'][category] = df['data_files'].tolist()
                         else:
                             # Extract data_files column from list of dicts
@@ -648,13 +723,12 @@ class CrystalErrorDetector:
         """Calculate trending errors over time."""
         from collections import Counter
         
-        if not all_errors or not PANDAS_AVAILABLE:
+        if not all_errors or not get_pandas():
             return
             
         # Convert to DataFrame for easier analysis
         df = create_dataframe(all_errors)
-        if PANDAS_AVAILABLE:
-            df['timestamp'] = to_datetime(df['timestamp'])
+        df['timestamp'] = to_datetime(df['timestamp'])
         
         # Group by day and error type
         daily_errors = df.groupby([df['timestamp'].dt.date, 'error_type']).size().reset_index(name='count')
@@ -878,11 +952,14 @@ def main():
     parser.add_argument("--output-file", help="Output file for analysis")
     parser.add_argument("--db-path", default="materials.db", help="Path to materials database")
     parser.add_argument("--days-back", type=int, default=7, help="Days to look back for error analysis")
+    parser.add_argument("--tail", action="store_true",
+                       help="Only read the start and end of output files (full read if inconclusive)")
     
     args = parser.parse_args()
     
     # Create error detector
-    detector = CrystalErrorDetector(args.base_dir, args.db_path)
+    detector = CrystalErrorDetector(args.base_dir, args.db_path,
+                                    scan_mode='tail' if args.tail else 'full')
     
     if args.action == 'analyze':
         if args.output_file:
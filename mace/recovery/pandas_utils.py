@@ -17,9 +17,11 @@ def get_pandas():
     return _pd
 
 def pandas_available():
-    """Check if pandas is available"""
-    pd = get_pandas()
-    return pd is not False
+    """Check if pandas is available (without importing it until it is used)"""
+    if _pd is not None:
+        return _pd is not False
+    import importlib.util
+    return importlib.util.find_spec('pandas') is not None
 
 def read_csv(filepath, **kwargs):
     """Read CSV file using pandas if available, otherwise fallback"""
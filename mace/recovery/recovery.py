@@ -33,6 +33,7 @@ import threading
 try:
     from mace.database.materials import MaterialDatabase
     from mace.database.materials_contextual import ContextualMaterialDatabase
+    from mace.database.calc_index import MaterialCalcIndex
     from mace.workflow.context import get_current_context
     from mace.recovery.detector import CrystalErrorDetector
 except ImportError as e:
@@ -161,6 +162,9 @@ class ErrorRecoveryEngine:
         failed_calcs = self.db.get_calculations_by_status('failed')
         recoverable = []
         
+        # All calculations of the affected materials, loaded once for the retry checks
+        calc_index = MaterialCalcIndex.for_calculations(self.db, failed_calcs)
+        
         for calc in failed_calcs:
             calc_id = calc['calc_id']
             error_type = calc.get('error_type', 'unknown')
@@ -169,8 +173,12 @@ class ErrorRecoveryEngine:
             if error_type not in self.config["error_recovery"]:
                 continue
                 
+            # Already recovered: the recovery attempt carries the chain on
+            if calc_index.recovery_attempts(calc_id):
+                continue
+                
             # Check retry limits
-            retry_count = self.get_retry_count(calc_id)
+            retry_count = self.get_retry_count(calc_id, calc_index)
             max_retries = self.config["error_recovery"][error_type].get("max_retries", 3)
             
             if retry_count < max_retries:
@@ -178,20 +186,23 @@ class ErrorRecoveryEngine:
                 
         return recoverable
         
-    def get_retry_count(self, calc_id: str) -> int:
-        """Get number of recovery attempts for a calculation."""
-        # Check database for recovery attempts
-        recovery_calcs = self.db.get_calculations_by_status(
-            material_id=self.db.get_calculation(calc_id)['material_id']
-        )
+    def get_retry_count(self, calc_id: str, calc_index: Optional[MaterialCalcIndex] = None) -> int:
+        """
+        Get number of recovery attempts for a calculation.
         
-        # Count calculations that are recovery attempts for this calc
-        retry_count = 0
-        for calc in recovery_calcs:
-            if calc.get('parent_calc_id') == calc_id and calc.get('is_recovery_attempt'):
-                retry_count += 1
-                
-        return retry_count
+        Attempts are counted over the whole chain (original calculation and
+        its recovery attempts), so a failed recovery does not restart the count.
+        
+        Args:
+            calc_id: Calculation ID
+            calc_index: Index covering the calculation's material (loaded if not given)
+        """
+        if calc_index is None or calc_index.get(calc_id) is None:
+            calc = self.db.get_calculation(calc_id)
+            if not calc:
+                return 0
+            calc_index = MaterialCalcIndex(self.db, [calc['material_id']])
+        return calc_index.retry_count(calc_id)
         
     def attempt_recovery(self, calc: Dict) -> bool:
         """
@@ -575,12 +586,12 @@ class ErrorRecoveryEngine:
             calc_type=calc_type,
             input_file=str(fixed_input_file),
             priority=original_calc.get('priority', 0) + 1,  # Higher priority for recovery
-            settings_json=json.dumps({
+            settings={
                 'is_recovery_attempt': True,
                 'parent_calc_id': original_calc['calc_id'],
                 'recovery_strategy': recovery_config.get('handler'),
                 'recovery_timestamp': datetime.now().isoformat()
-            })
+            }
         )
         
         print(f"Created recovery calculation {recovery_calc_id} for {original_calc['calc_id']}")
@@ -623,16 +634,17 @@ class ErrorRecoveryEngine:
         
         # Now analyze recovery attempts
         all_calcs = self.db.get_calculations_by_status()
+        calcs_by_id = {calc['calc_id']: calc for calc in all_calcs}
         
         for calc in all_calcs:
-            settings = json.loads(calc.get('settings_json', '{}'))
+            settings = json.loads(calc.get('settings_json') or '{}')
             if settings.get('is_recovery_attempt'):
                 stats['recovery_attempts'] += 1
                 if calc['status'] == 'completed':
                     stats['successful_recoveries'] += 1
                     
                 # Track recovery success by error type
-                parent_calc = self.db.get_calculation(settings.get('parent_calc_id'))
+                parent_calc = calcs_by_id.get(settings.get('parent_calc_id'))
                 if parent_calc:
                     error_type = parent_calc.get('error_type', 'unknown')
                     if error_type not in stats['recovery_breakdown']:
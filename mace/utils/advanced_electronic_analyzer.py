@@ -12,6 +12,10 @@ Usage:
     from advanced_electronic_analyzer import AdvancedElectronicAnalyzer
     analyzer = AdvancedElectronicAnalyzer()
     results = analyzer.analyze_material(band_file, doss_file)
+
+    # From arrays already in the database (no DAT parsing)
+    from mace.database.array_store import ArrayStore
+    results = analyzer.analyze_calculation(ArrayStore(db), band_calc_id, doss_calc_id)
 """
 
 import sys
@@ -113,6 +117,43 @@ class AdvancedElectronicAnalyzer:
             
         return Ev_max, Ec_min, np.array(k_points), np.array(all_energies)
     
+    def dos_from_arrays(self, energy_points: np.ndarray, total_dos: np.ndarray,
+                        projected_dos: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Energies and DOS as read_dos_data() returns them, from stored DOSS.DAT columns.
+        
+        Args:
+            energy_points: First DOSS.DAT column (Hartree)
+            total_dos: Second column
+            projected_dos: Remaining columns, one row per column
+        """
+        E = np.asarray(energy_points)
+        g = np.asarray(total_dos)
+        if projected_dos is not None and len(projected_dos):
+            # read_dos_data sums every column after the energy
+            g = g + np.asarray(projected_dos).sum(axis=0)
+        return E, g
+    
+    def band_from_arrays(self, k_points: np.ndarray,
+                         eigenvalues: np.ndarray) -> Tuple[float, float, np.ndarray, np.ndarray]:
+        """
+        Band edges, k coordinates and energies as read_band_data() returns them,
+        from stored BAND.DAT rows (DatFileProcessor splits each row into three
+        k_points values and the eigenvalues).
+        """
+        k_points = np.asarray(k_points)
+        eigenvalues = np.asarray(eigenvalues)
+        if k_points.size == 0:
+            return -np.inf, np.inf, np.array([]), np.array([])
+        
+        rows = np.hstack([k_points.reshape(len(k_points), -1), eigenvalues.reshape(len(k_points), -1)])
+        energies = rows[:, 1:]
+        occupied = energies[energies < 0]
+        unoccupied = energies[energies > 0]
+        Ev_max = float(occupied.max()) if occupied.size else -np.inf
+        Ec_min = float(unoccupied.min()) if unoccupied.size else np.inf
+        return Ev_max, Ec_min, rows[:, 0], energies
+    
     def classify_electronic_behavior(self, E: np.ndarray, g: np.ndarray, 
                                    Ev_max: float, Ec_min: float, 
                                    gcrit_factor: float = 0.05) -> Dict[str, Any]:
@@ -325,10 +366,10 @@ class AdvancedElectronicAnalyzer:
         
         # Mobility calculation (Drude model approximation)
         # μ = qτ/m* where τ is scattering time
+        # Assume scattering time ~1e-14 s for order of magnitude
+        scattering_time = 1e-14  # seconds
+        elementary_charge = 1.602e-19  # Coulombs
         if electron_mass is not None and electron_mass > 0:
-            # Assume scattering time ~1e-14 s for order of magnitude
-            scattering_time = 1e-14  # seconds
-            elementary_charge = 1.602e-19  # Coulombs
             electron_mass_kg = electron_mass * 9.109e-31  # kg
             
             electron_mobility = (elementary_charge * scattering_time / electron_mass_kg) * 1e4  # cm²/(V·s)
@@ -378,22 +419,68 @@ class AdvancedElectronicAnalyzer:
             }
         }
         
+        dos = band = None
+        
+        # Read DOS data if available
+        if doss_file and doss_file.exists():
+            dos = self.read_dos_data(doss_file)
+        
+        # Read BAND data if available
+        if band_file and band_file.exists():
+            band = self.read_band_data(band_file)
+        
+        return self._analyze(results, dos, band)
+    
+    def analyze_calculation(self, store, band_calc_id: Optional[str] = None,
+                            doss_calc_id: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Complete electronic structure analysis from arrays in the database array store.
+        
+        Args:
+            store: mace.database.array_store.ArrayStore of the materials database
+            band_calc_id: BAND calculation whose k_points/eigenvalues are stored
+            doss_calc_id: DOSS calculation whose energy_points/total_dos are stored
+        
+        Arrays are memory-mapped, so no DAT file is parsed.
+        """
+        results = {
+            'analysis_method': 'advanced_band_dos_analysis',
+            'files_analyzed': {
+                'band_file': f"array_store:{band_calc_id}" if band_calc_id else None,
+                'doss_file': f"array_store:{doss_calc_id}" if doss_calc_id else None
+            }
+        }
+        dos = band = None
+        
+        if doss_calc_id:
+            arrays = store.load_all(doss_calc_id)
+            if 'energy_points' in arrays and 'total_dos' in arrays:
+                dos = self.dos_from_arrays(arrays['energy_points'], arrays['total_dos'],
+                                           arrays.get('projected_dos'))
+        
+        if band_calc_id:
+            arrays = store.load_all(band_calc_id)
+            if 'k_points' in arrays and 'eigenvalues' in arrays:
+                band = self.band_from_arrays(arrays['k_points'], arrays['eigenvalues'])
+        
+        return self._analyze(results, dos, band)
+    
+    def _analyze(self, results: Dict[str, Any], dos: Optional[Tuple], band: Optional[Tuple]) -> Dict[str, Any]:
+        """Run the analysis on (E, g) DOS data and (Ev_max, Ec_min, k, energies) band data."""
         # Initialize default values
         E, g = np.array([]), np.array([])
         Ev_max, Ec_min = -np.inf, np.inf
         k_points, energies = np.array([]), np.array([])
         
-        # Read DOS data if available
-        if doss_file and doss_file.exists():
-            E, g = self.read_dos_data(doss_file)
+        if dos is not None:
+            E, g = dos
             results['dos_data_available'] = len(E) > 0
             if len(E) > 0:
                 results['dos_energy_range'] = [float(E.min()), float(E.max())]
                 results['dos_points'] = len(E)
         
-        # Read BAND data if available
-        if band_file and band_file.exists():
-            Ev_max, Ec_min, k_points, energies = self.read_band_data(band_file)
+        if band is not None:
+            Ev_max, Ec_min, k_points, energies = band
             results['band_data_available'] = len(k_points) > 0
             if len(k_points) > 0:
                 results['band_k_points'] = len(k_points)
@@ -0,0 +1,318 @@
+#!/usr/bin/env python3
+"""
+Parallel Bulk Property Extraction
+=================================
+Backfill the properties table from a whole workflow tree of CRYSTAL outputs.
+
+Parsing runs in a process pool (CrystalPropertyExtractor.extract_all_properties
+in each worker, without a database handle), while the parent process is the
+only writer: results are collected and written with one upsert transaction
+per batch. After every committed batch a JSON checkpoint records the
+processed files (path -> size, mtime_ns), so an interrupted run restarted
+with --resume skips everything that was already stored and unchanged.
+Files whose extraction failed are listed separately under 'failed' and are
+extracted again by --resume.
+
+Usage:
+  mace extract /path/to/workflow_outputs --jobs 8
+  mace extract /path/to/workflow_outputs --jobs 8 --resume
+  python bulk_extractor.py /path/to/outputs --jobs 8 --db-path materials.db
+"""
+
+import os
+import io
+import sys
+import json
+import time
+import argparse
+import contextlib
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+# Import MACE components
+try:
+    from mace.database.materials import MaterialDatabase
+    from mace.utils.property_extractor import CrystalPropertyExtractor
+except ImportError as e:
+    print(f"Error importing MACE components: {e}")
+    sys.exit(1)
+
+
+DEFAULT_CHECKPOINT = ".mace_extract_checkpoint.json"
+
+
+def _extract_worker(task: Tuple[str, Optional[str], Optional[str]]) -> Tuple[str, Dict, Optional[str]]:
+    """
+    Extract properties from one output file in a worker process.
+
+    Returns (output_file, properties, error). The per-file progress printed by
+    the extractor is suppressed; the parent reports aggregate progress instead.
+    """
+    output_file, material_id, calc_id = task
+    try:
+        extractor = CrystalPropertyExtractor(db_path=None)
+        with contextlib.redirect_stdout(io.StringIO()):
+            properties = extractor.extract_all_properties(
+                Path(output_file), material_id=material_id, calc_id=calc_id
+            )
+        return output_file, properties, None
+    except Exception as e:
+        return output_file, {}, str(e)
+
+
+def _file_signature(path: Path) -> Optional[List[int]]:
+    """Return [size, mtime_ns] for a file, or None if it cannot be stat'ed."""
+    try:
+        stat = path.stat()
+        return [stat.st_size, stat.st_mtime_ns]
+    except OSError:
+        return None
+
+
+class BulkPropertyExtractor:
+    """Extract properties from many output files in parallel, writing from one process."""
+
+    def __init__(self, db_path: str = "materials.db", jobs: int = None,
+                 batch_size: int = 200, checkpoint_file: str = None):
+        self.db_path = db_path
+        self.jobs = max(1, jobs or os.cpu_count() or 1)
+        self.batch_size = max(1, batch_size)
+        self.checkpoint_file = Path(checkpoint_file) if checkpoint_file else None
+        self.db = MaterialDatabase(db_path)
+        self.writer = CrystalPropertyExtractor(db_path)
+        self.checkpoint: Dict[str, List[int]] = {}
+        self.failed: Set[str] = set()
+
+    # ------------------------------------------------------------------
+    # Checkpointing
+    # ------------------------------------------------------------------
+
+    def load_checkpoint(self) -> int:
+        """Load the checkpoint file, returning the number of recorded files."""
+        if not self.checkpoint_file or not self.checkpoint_file.exists():
+            return 0
+        try:
+            with open(self.checkpoint_file, 'r') as f:
+                data = json.load(f)
+            self.checkpoint = data.get('processed', {})
+            self.failed = set(data.get('failed', []))
+        except (OSError, ValueError) as e:
+            print(f"⚠️  Could not read checkpoint {self.checkpoint_file}: {e}")
+            self.checkpoint = {}
+            self.failed = set()
+        return len(self.checkpoint)
+
+    def save_checkpoint(self):
+        """Atomically write the checkpoint file."""
+        if not self.checkpoint_file:
+            return
+        tmp_file = self.checkpoint_file.with_name(self.checkpoint_file.name + '.tmp')
+        with open(tmp_file, 'w') as f:
+            json.dump({'db_path': str(self.db_path), 'processed': self.checkpoint,
+                       'failed': sorted(self.failed)}, f)
+        os.replace(tmp_file, self.checkpoint_file)
+
+    def is_checkpointed(self, path: Path) -> bool:
+        """True if the file was already stored and has not changed since."""
+        recorded = self.checkpoint.get(str(path))
+        return recorded is not None and recorded == _file_signature(path)
+
+    # ------------------------------------------------------------------
+    # Discovery
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def find_output_files(directory: Path, pattern: str = "*.out") -> List[Path]:
+        """Find CRYSTAL output files below a directory, in a stable order."""
+        return sorted(p for p in Path(directory).rglob(pattern) if p.is_file())
+
+    def _calculation_lookup(self) -> Tuple[Dict[str, Tuple], Dict[str, Tuple]]:
+        """
+        Map output_file and work_dir to (calc_id, material_id) with one query,
+        so workers never need to touch the database.
+        """
+        by_output, by_work_dir = {}, {}
+        try:
+            with self.db._get_read_connection() as conn:
+                cursor = conn.execute(
+                    "SELECT calc_id, material_id, output_file, work_dir FROM calculations"
+                )
+                for calc_id, material_id, output_file, work_dir in cursor:
+                    if output_file:
+                        by_output.setdefault(str(output_file), (calc_id, material_id))
+                    if work_dir:
+                        by_work_dir.setdefault(str(work_dir), (calc_id, material_id))
+        except Exception as e:
+            print(f"⚠️  Could not load calculation records: {e}")
+        return by_output, by_work_dir
+
+    # ------------------------------------------------------------------
+    # Extraction
+    # ------------------------------------------------------------------
+
+    def _build_tasks(self, output_files: Iterable[Path]) -> List[Tuple[str, Optional[str], Optional[str]]]:
+        by_output, by_work_dir = self._calculation_lookup()
+        tasks = []
+        for path in output_files:
+            calc_id, material_id = by_output.get(str(path)) or by_work_dir.get(str(path.parent)) or (None, None)
+            tasks.append((str(path), material_id, calc_id))
+        return tasks
+
+    def _iter_results(self, tasks):
+        if self.jobs == 1:
+            for task in tasks:
+                yield _extract_worker(task)
+            return
+        chunksize = max(1, min(16, len(tasks) // (self.jobs * 4)))
+        with ProcessPoolExecutor(max_workers=self.jobs) as executor:
+            yield from executor.map(_extract_worker, tasks, chunksize=chunksize)
+
+    def _flush(self, batch: List[Tuple[str, Dict, Optional[str]]]) -> Optional[int]:
+        """
+        Write one batch of results in a single transaction and checkpoint it.
+        
+        Returns the number of properties saved, or None if the write failed;
+        a failed batch is not checkpointed, so --resume extracts it again.
+        Files whose extraction failed are recorded as failed rather than
+        processed, so --resume retries them as well.
+        """
+        try:
+            saved = self.writer.save_many_properties_to_database([props for _, props, _ in batch],
+                                                                 raise_errors=True)
+        except Exception as e:
+            print(f"   ❌ Could not store a batch of {len(batch)} files: {e}")
+            return None
+        for output_file, _, error in batch:
+            if error:
+                self.checkpoint.pop(output_file, None)
+                self.failed.add(output_file)
+                continue
+            self.failed.discard(output_file)
+            signature = _file_signature(Path(output_file))
+            if signature is not None:
+                self.checkpoint[output_file] = signature
+        try:
+            self.save_checkpoint()
+        except OSError as e:
+            print(f"⚠️  Could not write checkpoint {self.checkpoint_file}: {e}")
+        return saved
+
+    def _record_flush(self, stats: Dict[str, float], batch: List[Tuple[str, Dict, Optional[str]]]):
+        saved = self._flush(batch)
+        if saved is None:
+            stats['unsaved'] += len(batch)
+        else:
+            stats['properties'] += saved
+
+    def run(self, output_files: List[Path], resume: bool = False) -> Dict[str, float]:
+        """Extract and store properties for all files, returning run statistics."""
+        skipped = 0
+        if resume:
+            recorded = self.load_checkpoint()
+            if recorded:
+                print(f"📌 Resuming from checkpoint with {recorded} processed files")
+            if self.failed:
+                print(f"🔁 Retrying {len(self.failed)} files that failed before")
+            pending = [p for p in output_files if not self.is_checkpointed(p)]
+            skipped = len(output_files) - len(pending)
+            output_files = pending
+
+        total = len(output_files)
+        stats = {'files': 0, 'properties': 0, 'failed': 0, 'empty': 0,
+                 'unsaved': 0, 'skipped': skipped, 'elapsed': 0.0}
+        if not total:
+            print("✅ Nothing to extract")
+            return stats
+
+        print(f"🚀 Extracting {total} output files with {self.jobs} worker(s), "
+              f"batch size {self.batch_size}")
+
+        start = time.monotonic()
+        last_report = start
+        batch: List[Tuple[str, Dict, Optional[str]]] = []
+
+        for done, (output_file, properties, error) in enumerate(self._iter_results(self._build_tasks(output_files)), 1):
+            if error:
+                stats['failed'] += 1
+                print(f"   ❌ {Path(output_file).name}: {error}")
+            elif not properties:
+                stats['empty'] += 1
+
+            # Empty files are checkpointed too; failed ones are retried by --resume
+            batch.append((output_file, properties, error))
+            if len(batch) >= self.batch_size:
+                self._record_flush(stats, batch)
+                batch = []
+
+            stats['files'] = done
+            now = time.monotonic()
+            if now - last_report >= 5 or done == total:
+                last_report = now
+                elapsed = now - start
+                rate = done / elapsed if elapsed > 0 else 0.0
+                eta = (total - done) / rate if rate > 0 else 0.0
+                print(f"   📊 {done}/{total} files ({100.0 * done / total:.1f}%) | "
+                      f"{rate:.1f} files/s | {stats['properties'] / elapsed if elapsed > 0 else 0.0:.0f} props/s | "
+                      f"ETA {eta:.0f}s")
+
+        if batch:
+            self._record_flush(stats, batch)
+
+        stats['elapsed'] = time.monotonic() - start
+        return stats
+
+
+def main():
+    """Main function."""
+    parser = argparse.ArgumentParser(
+        description="Extract properties from many CRYSTAL output files in parallel"
+    )
+    parser.add_argument("directory", nargs="?", default=".", help="Directory tree to scan for output files")
+    parser.add_argument("--jobs", "-j", type=int, default=os.cpu_count() or 1,
+                        help="Number of worker processes (default: number of CPUs)")
+    parser.add_argument("--db-path", default="materials.db", help="Path to materials database")
+    parser.add_argument("--batch-size", type=int, default=200,
+                        help="Output files per database transaction (default: 200)")
+    parser.add_argument("--pattern", default="*.out", help="Output file glob pattern (default: *.out)")
+    parser.add_argument("--checkpoint", default=None,
+                        help=f"Checkpoint file (default: <directory>/{DEFAULT_CHECKPOINT})")
+    parser.add_argument("--resume", action="store_true",
+                        help="Skip files recorded in the checkpoint and unchanged since")
+    parser.add_argument("--no-banner", action="store_true", help=argparse.SUPPRESS)
+
+    args = parser.parse_args()
+
+    directory = Path(args.directory)
+    if not directory.is_dir():
+        print(f"❌ Directory not found: {directory}")
+        sys.exit(1)
+
+    checkpoint = args.checkpoint or str(directory / DEFAULT_CHECKPOINT)
+    output_files = BulkPropertyExtractor.find_output_files(directory, args.pattern)
+    print(f"🔍 Found {len(output_files)} output files in {directory}")
+
+    bulk = BulkPropertyExtractor(args.db_path, jobs=args.jobs,
+                                 batch_size=args.batch_size, checkpoint_file=checkpoint)
+    stats = bulk.run(output_files, resume=args.resume)
+
+    elapsed = stats['elapsed']
+    print(f"\n🎉 Extraction complete!")
+    print(f"   Files processed: {stats['files']}")
+    if stats['skipped']:
+        print(f"   Skipped (checkpoint): {stats['skipped']}")
+    print(f"   Without properties: {stats['empty']}")
+    print(f"   Failed: {stats['failed']}" + (" (retried by --resume)" if stats['failed'] else ""))
+    if stats['unsaved']:
+        print(f"   Not stored (database write failed, retried by --resume): {stats['unsaved']}")
+    print(f"   Properties saved: {stats['properties']}")
+    if elapsed > 0:
+        print(f"   Elapsed: {elapsed:.1f}s ({stats['files'] / elapsed:.1f} files/s, "
+              f"{stats['properties'] / elapsed:.0f} properties/s)")
+    print(f"   Checkpoint: {checkpoint}")
+    if stats['unsaved']:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
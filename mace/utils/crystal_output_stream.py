@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""
+CRYSTAL Output Stream Tokenizer
+===============================
+Single-pass, line-driven tokenizer for CRYSTAL output files (.out).
+
+The file is read line by line and split into typed sections by a small state
+machine keyed on the CRYSTAL section banners:
+
+- header:                everything before the first recognised banner
+- opt_point:             one geometry optimization step ("... OPTIMIZATION - POINT n")
+- opt_end:               from "OPT END - ..." up to the final geometry printout
+- final_geometry:        "FINAL OPTIMIZED GEOMETRY" block and what follows it
+- scf_end:               from "== SCF ENDED" (final SCF energy, populations) to the next banner
+- frequency:             the "FREQUENCY CALCULATION" module banner and its setup
+- force_constants:       the numerical force constant matrix, one row per displacement
+- born_charges:          "ATOMIC BORN CHARGE TENSOR" of every atom
+- mode_symmetry:         symmetry adaption of the vibrational modes
+- polarizability:        vibrational contributions to the static polarizability
+- ir_intensities:        "INTEGRATED IR INTENSITIES" definitions
+- harmonic_frequencies:  the table of harmonic frequencies (mass weighted Hessian eigenvalues)
+- raman_intensities:     "RAMAN INTENSITIES UNDER PLACZECK APPROXIMATION" tables
+- normal_modes:          the normal modes heading, then one section per printed block of modes
+- thermodynamics:        vibrational temperatures and thermodynamic functions
+- termination:           from "EEEEEEEEEE TERMINATION" to the end of the file
+
+Only one section is held in memory at a time, so consumers that react to
+section events run in memory bounded by the largest single section rather
+than the whole file. Each converged SCF starts a section, so the displaced
+geometries of a FREQ run are one section each; inside an optimization an
+scf_end section is the second half of the current step.
+
+read_tail_lines() and read_head_lines() read only the end or the start of
+a file, for checks whose answer is found there (termination and error
+messages).
+
+This module only depends on the standard library so that the standalone
+Crystal_d12 scripts can import it as well.
+
+Usage:
+  stream = CrystalOutputStream("material.out")
+  for section in stream.iter_sections():
+      print(section.kind, section.index, section.start_line)
+"""
+
+import os
+import re
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+
+# Section banners, matched with one compiled alternation per line
+SECTION_BANNER_RE = re.compile(
+    r'(?P<opt_point>OPTIMIZATION - POINT\s+\d+)'
+    r'|(?P<opt_end>OPT END -)'
+    r'|(?P<final_geometry>FINAL OPTIMIZED GEOMETRY)'
+    r'|(?P<scf_end>== SCF ENDED)'
+    r'|(?P<frequency>^\s*FREQUENCY CALCULATION\s*$)'
+    r'|(?P<force_constants>FORCE CONSTANT MATRIX - NUMERICAL ESTIMATE)'
+    r'|(?P<born_charges>ATOMIC BORN CHARGE TENSOR)'
+    r'|(?P<mode_symmetry>SYMMETRY ADAPTION OF VIBRATIONAL MODES)'
+    r'|(?P<polarizability>VIBRATIONAL CONTRIBUTIONS TO THE STATIC POLARIZABILITY TENSOR HAVE)'
+    r'|(?P<ir_intensities>INTEGRATED IR INTENSITIES,)'
+    r'|(?P<harmonic_frequencies>EIGENVALUES \(EIGV\) OF THE MASS WEIGHTED HESSIAN)'
+    r'|(?P<raman_intensities>RAMAN INTENSITIES UNDER)'
+    r'|(?P<normal_modes>NORMAL MODES NORMALIZED|^\s*FREQ\(CM\*\*-1\))'
+    r'|(?P<thermodynamics>VIBRATIONAL TEMPERATURES \(K\))'
+    r'|(?P<termination>EEEEEEEEEE TERMINATION)'
+)
+
+# Cheap substring pre-filter so the regex only runs on candidate lines
+_BANNER_HINTS = ('OPTIMIZATION - POINT', 'OPT END -', 'FINAL OPTIMIZED GEOMETRY', '== SCF ENDED',
+                 'FREQUENCY CALCULATION', 'FORCE CONSTANT MATRIX', 'BORN CHARGE TENSOR',
+                 'SYMMETRY ADAPTION OF VIBRATIONAL', 'STATIC POLARIZABILITY TENSOR HAVE',
+                 'INTEGRATED IR INTENSITIES', 'MASS WEIGHTED HESSIAN',
+                 'RAMAN INTENSITIES UNDER', 'NORMAL MODES NORMALIZED', 'FREQ(CM**-1)',
+                 'VIBRATIONAL TEMPERATURES', 'EEEEEEEEEE TERMINATION')
+
+# Section kinds holding the results of a frequency calculation
+FREQUENCY_SECTION_KINDS = ('frequency', 'force_constants', 'born_charges', 'mode_symmetry', 'polarizability',
+                           'ir_intensities', 'harmonic_frequencies', 'raman_intensities', 'normal_modes',
+                           'thermodynamics')
+
+
+@dataclass
+class OutputSection:
+    """One section of a CRYSTAL output file."""
+    kind: str
+    index: int  # Occurrence number of this kind of section (0-based)
+    start_line: int  # 1-based line number of the first line
+    lines: List[str] = field(default_factory=list)  # Lines including their newline
+
+    @property
+    def text(self) -> str:
+        return ''.join(self.lines)
+
+
+def classify_banner(line: str) -> Optional[str]:
+    """Return the section kind started by this line, or None."""
+    if not any(hint in line for hint in _BANNER_HINTS):
+        return None
+    match = SECTION_BANNER_RE.search(line)
+    return match.lastgroup if match else None
+
+
+class CrystalOutputStream:
+    """Stream a CRYSTAL output file as lines or typed section events."""
+
+    def __init__(self, output_file: Union[str, Path], errors: str = 'ignore'):
+        self.output_file = Path(output_file)
+        self.errors = errors
+        self.section_counts: Dict[str, int] = {}
+
+    def iter_lines(self) -> Iterator[Tuple[int, str]]:
+        """Yield (line_number, line) pairs, line numbers starting at 1."""
+        with open(self.output_file, 'r', errors=self.errors) as f:
+            for line_number, line in enumerate(f, 1):
+                yield line_number, line
+
+    def iter_sections(self) -> Iterator[OutputSection]:
+        """Yield sections in file order, holding only the current one in memory."""
+        self.section_counts = {}
+        current = OutputSection(kind='header', index=0, start_line=1)
+        self.section_counts['header'] = 1
+
+        for line_number, line in self.iter_lines():
+            kind = classify_banner(line)
+            if kind is not None:
+                if current.lines:
+                    yield current
+                index = self.section_counts.get(kind, 0)
+                self.section_counts[kind] = index + 1
+                current = OutputSection(kind=kind, index=index, start_line=line_number)
+            current.lines.append(line)
+
+        if current.lines:
+            yield current
+
+
+# Window sizes for head/tail reads; CRYSTAL termination and error messages
+# are written in the last few KB of the output
+TAIL_WINDOW_BYTES = 64 * 1024
+TAIL_BLOCK_BYTES = 8 * 1024
+
+
+def compile_alternation(patterns: Iterable[str], flags: int = 0) -> re.Pattern:
+    """Compile literal message patterns into a single regex alternation."""
+    return re.compile('|'.join(re.escape(pattern) for pattern in patterns), flags)
+
+
+def read_head_lines(output_file: Union[str, Path], max_bytes: int = TAIL_WINDOW_BYTES,
+                    errors: str = 'ignore') -> List[str]:
+    """Return the complete lines within the first max_bytes of the file."""
+    with open(output_file, 'rb') as f:
+        data = f.read(max_bytes + 1)
+    truncated = len(data) > max_bytes
+    lines = data[:max_bytes].decode('utf-8', errors=errors).splitlines(keepends=True)
+    if truncated and lines and not lines[-1].endswith('\n'):
+        lines.pop()  # Partial last line
+    return lines
+
+
+def read_tail_lines(output_file: Union[str, Path], stop_re: Optional[re.Pattern] = None,
+                    max_bytes: int = TAIL_WINDOW_BYTES, block_size: int = TAIL_BLOCK_BYTES,
+                    errors: str = 'ignore') -> Tuple[List[str], bool]:
+    """
+    Read whole lines from the end of the file, backwards in blocks.
+
+    Reading stops as soon as the lines read so far contain a match for
+    stop_re, or once max_bytes have been read.
+
+    Returns:
+        (lines, covers_file) where covers_file is True if the start of the
+        file was reached, i.e. the lines are the complete file.
+    """
+    with open(output_file, 'rb') as f:
+        f.seek(0, os.SEEK_END)
+        position = f.tell()
+        data = b''
+        while position > 0 and len(data) < max_bytes:
+            step = min(block_size, position)
+            position -= step
+            f.seek(position)
+            data = f.read(step) + data
+            if stop_re is not None and position > 0:
+                # Only whole lines are tested; the first one may be partial
+                newline = data.find(b'\n')
+                if newline >= 0 and stop_re.search(data[newline + 1:].decode('utf-8', errors=errors)):
+                    break
+
+    covers_file = position == 0
+    if not covers_file:
+        newline = data.find(b'\n')
+        data = data[newline + 1:] if newline >= 0 else b''
+    return data.decode('utf-8', errors=errors).splitlines(keepends=True), covers_file
+
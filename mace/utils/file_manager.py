@@ -27,10 +27,12 @@ import threading
 import subprocess
 import glob
 import re
+from contextlib import contextmanager
 
 # Import MACE components
 from mace.database.materials import MaterialDatabase, create_material_id_from_file
 from mace.utils.formula_extractor import extract_formula_from_d12
+from mace.utils.output_fingerprints import OutputFingerprintCache
 
 
 class CrystalFileManager:
@@ -46,12 +48,15 @@ class CrystalFileManager:
         self.base_dir = Path(base_dir).resolve()
         self.enable_tracking = enable_tracking
         self.lock = threading.RLock()
+        self._scan_depth = 0
         
         # Initialize database connection
         if self.enable_tracking:
             self.db = MaterialDatabase(db_path)
+            self.fingerprints = OutputFingerprintCache(self.db)
         else:
             self.db = None
+            self.fingerprints = None
             
         # File type patterns for automatic discovery
         self.file_patterns = {
@@ -275,6 +280,21 @@ class CrystalFileManager:
             
         return name if name else None
         
+    @contextmanager
+    def _fingerprint_scan(self):
+        """
+        Scope of a scan entry point: checksums computed during the scan are
+        written back when the outermost scan ends, also if it fails.
+        """
+        with self.lock:
+            self._scan_depth += 1
+            try:
+                yield
+            finally:
+                self._scan_depth -= 1
+                if self._scan_depth == 0 and self.fingerprints is not None:
+                    self.fingerprints.flush()
+    
     def check_file_integrity(self, file_path: Path) -> Dict[str, any]:
         """
         Check file integrity and extract basic information.
@@ -285,6 +305,11 @@ class CrystalFileManager:
         Returns:
             Dictionary with integrity information
         """
+        with self._fingerprint_scan():
+            return self._check_file_integrity(file_path)
+    
+    def _check_file_integrity(self, file_path: Path) -> Dict[str, any]:
+        """check_file_integrity without flushing the checksums it computes."""
         result = {
             'exists': file_path.exists(),
             'size': 0,
@@ -337,7 +362,9 @@ class CrystalFileManager:
         return result
         
     def _calculate_checksum(self, file_path: Path) -> str:
-        """Calculate MD5 checksum of file."""
+        """Calculate MD5 checksum of file, reusing the stored one if the file is unchanged."""
+        if self.fingerprints is not None:
+            return self.fingerprints.checksum(file_path)
         hash_md5 = hashlib.md5()
         with open(file_path, "rb") as f:
             for chunk in iter(lambda: f.read(4096), b""):
@@ -525,6 +552,11 @@ class CrystalFileManager:
         Returns:
             Dictionary with file report information
         """
+        with self._fingerprint_scan():
+            return self._generate_file_report(material_id)
+    
+    def _generate_file_report(self, material_id: str = None) -> Dict[str, any]:
+        """generate_file_report without flushing the checksums it computes."""
         report = {
             'generated_at': datetime.now().isoformat(),
             'materials': {},
@@ -574,7 +606,7 @@ class CrystalFileManager:
                     if not file_path.is_file():
                         continue
                         
-                    integrity = self.check_file_integrity(file_path)
+                    integrity = self._check_file_integrity(file_path)
                     file_info = {
                         'name': file_path.name,
                         'type': integrity['file_type'],
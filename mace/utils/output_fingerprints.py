@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+Output File Fingerprint Cache
+=============================
+Persistent (path, size, mtime_ns, inode) fingerprints for CRYSTAL output files,
+stored in the file_fingerprints table of the materials database.
+
+Each fingerprint keeps the completion status, the byte offset up to which the
+file has been scanned, an optional checksum and the last parse result. On the
+next scan a file is classified as:
+
+- unchanged: same size, mtime and inode -> cached result, file is not opened
+- grown:     same inode, larger size    -> only the appended bytes are read
+                                          (unless the file had already completed)
+- changed:   anything else (new, rewritten, truncated) -> full read
+
+so repeated scans of a workflow tree cost O(changed bytes) instead of
+O(total bytes on disk). Changes are written back in one transaction by flush().
+
+Usage:
+  cache = OutputFingerprintCache(db)
+  if cache.has_marker(out_file, "TERMINATION"):
+      ...
+  cache.flush()
+"""
+
+import os
+import json
+import hashlib
+from pathlib import Path
+from typing import Any, Dict, Optional, Union
+
+
+# Bytes re-read before the previous scan offset so markers split across the
+# old end of file are still found
+_OVERLAP = 256
+
+
+class OutputFingerprintCache:
+    """Fingerprint cache for output files backed by MaterialDatabase."""
+
+    def __init__(self, db, path_prefix: str = None):
+        self.db = db
+        self.path_prefix = path_prefix
+        self.records: Optional[Dict[str, Dict]] = None
+        self.dirty: Dict[str, Dict] = {}
+        self.stats = {'unchanged': 0, 'grown': 0, 'changed': 0, 'bytes_read': 0}
+
+    def _load(self):
+        if self.records is None:
+            try:
+                self.records = self.db.get_file_fingerprints(self.path_prefix)
+            except Exception as e:
+                print(f"  Warning: Could not load file fingerprints: {e}")
+                self.records = {}
+
+    @staticmethod
+    def _classify(record: Optional[Dict], stat: os.stat_result) -> str:
+        """Compare a stored fingerprint with the current stat of the file."""
+        if record is None or record['inode'] != stat.st_ino or stat.st_size < record['file_size']:
+            return 'changed'
+        if record['file_size'] == stat.st_size and record['mtime_ns'] == stat.st_mtime_ns:
+            return 'unchanged'
+        if stat.st_size > record['file_size']:
+            return 'grown'
+        # Same size but touched: content may have been rewritten in place
+        return 'changed'
+
+    def _lookup(self, file_path: Path, stat: os.stat_result):
+        """Return (state, record) for a file given its current stat."""
+        self._load()
+        record = self.records.get(str(file_path))
+        state = self._classify(record, stat)
+        return state, (None if state == 'changed' else record)
+
+    def _store(self, file_path: Path, stat: os.stat_result, **fields) -> Dict:
+        """Record the current fingerprint, invalidating whatever it no longer covers."""
+        key = str(file_path)
+        existing = self.records.get(key)
+        state = self._classify(existing, stat)
+        record = dict(existing or {})
+        if state != 'unchanged':
+            record.update({'checksum': None, 'parse_result_json': None})
+        if state == 'changed':
+            record.update({'scanned_offset': 0, 'completed': False})
+        record.update(fields)
+        record.update({
+            'file_path': key,
+            'file_size': stat.st_size,
+            'mtime_ns': stat.st_mtime_ns,
+            'inode': stat.st_ino,
+        })
+        self.records[key] = record
+        self.dirty[key] = record
+        return record
+
+    def has_marker(self, file_path: Union[str, Path], marker: str = "TERMINATION") -> bool:
+        """
+        True if the file contains the completion marker.
+
+        Unchanged files are answered from the fingerprint; files that grew
+        since the last scan are only read from the previous offset.
+        """
+        file_path = Path(file_path)
+        stat = file_path.stat()
+        state, record = self._lookup(file_path, stat)
+        self.stats[state] += 1
+
+        if state == 'unchanged':
+            if record.get('completed'):
+                return True
+            if record.get('scanned_offset', 0) >= stat.st_size:
+                return False
+
+        # A finished output that grows again has been restarted: rescan it all
+        if record is not None and not record.get('completed'):
+            start = max(0, record.get('scanned_offset', 0) - _OVERLAP)
+        else:
+            start = 0
+
+        needle = marker.encode()
+        found = False
+        with open(file_path, 'rb') as f:
+            f.seek(start)
+            tail = b''
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                self.stats['bytes_read'] += len(chunk)
+                if needle in tail + chunk:
+                    found = True
+                    break
+                tail = chunk[-len(needle):]
+
+        self._store(file_path, stat, scanned_offset=stat.st_size, completed=found)
+        return found
+
+    def get_result(self, file_path: Union[str, Path]) -> Optional[Any]:
+        """Return the stored parse result if the file is unchanged since it was stored."""
+        file_path = Path(file_path)
+        try:
+            stat = file_path.stat()
+        except OSError:
+            return None
+        state, record = self._lookup(file_path, stat)
+        if state != 'unchanged' or not record.get('parse_result_json'):
+            return None
+        try:
+            return json.loads(record['parse_result_json'])
+        except ValueError:
+            return None
+
+    def set_result(self, file_path: Union[str, Path], result: Any):
+        """Store the parse result for the file's current fingerprint."""
+        file_path = Path(file_path)
+        self._load()
+        self._store(file_path, file_path.stat(), parse_result_json=json.dumps(result, default=str))
+
+    def checksum(self, file_path: Union[str, Path]) -> str:
+        """MD5 checksum of the file, recomputed only when the fingerprint changed."""
+        file_path = Path(file_path)
+        stat = file_path.stat()
+        state, record = self._lookup(file_path, stat)
+        if state == 'unchanged' and record.get('checksum'):
+            return record['checksum']
+
+        hash_md5 = hashlib.md5()
+        with open(file_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                hash_md5.update(chunk)
+        checksum = hash_md5.hexdigest()
+        self._store(file_path, stat, checksum=checksum)
+        return checksum
+
+    def flush(self) -> int:
+        """Write changed fingerprints to the database in one transaction."""
+        if not self.dirty:
+            return 0
+        try:
+            written = self.db.upsert_file_fingerprints(list(self.dirty.values()))
+        except Exception as e:
+            print(f"  Warning: Could not save file fingerprints: {e}")
+            return 0
+        self.dirty = {}
+        return written
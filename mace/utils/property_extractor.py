@@ -28,16 +28,27 @@ from datetime import datetime
 # Import MACE components
 try:
     from mace.database.materials import MaterialDatabase
+    from mace.utils.crystal_output_stream import CrystalOutputStream, FREQUENCY_SECTION_KINDS
 except ImportError as e:
     print(f"Error importing MaterialDatabase: {e}")
     sys.exit(1)
 
+# Band gap keys reported together by one SCF
+BAND_GAP_KEYS = ('band_gap', 'alpha_band_gap', 'beta_band_gap', 'direct_band_gap', 'indirect_band_gap',
+                 'band_gap_type', 'spin_polarized')
+
+# Frequency sections read by _extract_frequency_properties; the others (Born
+# charges, polarizabilities, mode symmetry) are skipped while streaming
+FREQUENCY_RESULT_KINDS = ('frequency', 'force_constants', 'harmonic_frequencies', 'raman_intensities',
+                          'normal_modes', 'thermodynamics')
+
 
 class CrystalPropertyExtractor:
     """Extract comprehensive properties from CRYSTAL output files."""
     
-    def __init__(self, db_path: str = "materials.db"):
-        self.db = MaterialDatabase(db_path)
+    def __init__(self, db_path: Optional[str] = "materials.db"):
+        # db_path=None gives a parse-only extractor (used by bulk_extractor workers)
+        self.db = MaterialDatabase(db_path) if db_path else None
         self.properties = []
         
     def extract_all_properties(self, output_file: Path, material_id: str = None, calc_id: str = None) -> Dict[str, Any]:
@@ -48,36 +59,17 @@ class CrystalPropertyExtractor:
             print(f"❌ Output file not found: {output_file}")
             return {}
         
-        try:
-            with open(output_file, 'r') as f:
-                content = f.read()
-        except Exception as e:
-            print(f"❌ Error reading file: {e}")
-            return {}
-        
         # Auto-detect material_id and calc_id if not provided
         if not material_id:
             material_id = self._extract_material_id_from_filename(output_file)
         if not calc_id:
             calc_id = self._find_calc_id_for_output(output_file)
         
-        properties = {}
-        
-        # Extract different property categories
-        properties.update(self._extract_structural_properties(content))
-        properties.update(self._extract_electronic_properties(content))
-        properties.update(self._extract_population_analysis(content))
-        properties.update(self._extract_energy_properties(content))
-        properties.update(self._extract_geometry_optimization(content))
-        properties.update(self._extract_crystallographic_info(content))
-        properties.update(self._extract_neighbor_information(content))
-        properties.update(self._extract_computational_properties(content))
-        properties.update(self._extract_band_structure_properties(content, output_file))
-        properties.update(self._extract_dos_properties(content, output_file))
-        properties.update(self._extract_frequency_properties(content))
-        
-        # Extract SCF settings from output
-        properties.update(self._extract_scf_settings(content))
+        try:
+            properties = self._extract_section_properties(output_file)
+        except OSError as e:
+            print(f"❌ Error reading file: {e}")
+            return {}
         
         # Add electronic classification based on band gap
         properties.update(self._classify_electronic_properties(properties))
@@ -120,17 +112,184 @@ class CrystalPropertyExtractor:
         
         return properties
     
-    def _extract_structural_properties(self, content: str) -> Dict[str, Any]:
-        """Extract structural properties."""
+    def _extract_section_properties(self, output_file: Path) -> Dict[str, Any]:
+        """Extract properties section by section in one pass over the output.
+        
+        Only one section is held in memory at a time. Outputs without an
+        SCF or a frequency calculation (BAND, DOSS) are a single header section.
+        Values reported by every SCF come from the last section reporting them,
+        i.e. the final SCF of an optimization or of a FREQ run.
+        """
+        state = {'properties': {}, 'initial_geometry': {}, 'final_geometry': {}, 'atoms_in_unit_cell': None,
+                 'in_optimization': False, 'frequency_text': []}
+        handlers = {
+            'header': self._handle_header_section,
+            'opt_point': self._handle_opt_point_section,
+            'opt_end': self._handle_opt_end_section,
+            'final_geometry': self._handle_final_geometry_section,
+            'scf_end': self._handle_scf_end_section,
+            'termination': self._handle_termination_section,
+        }
+        for kind in FREQUENCY_SECTION_KINDS:
+            handlers[kind] = self._handle_frequency_section if kind in FREQUENCY_RESULT_KINDS else self._skip_section
+        handlers['frequency'] = self._handle_frequency_setup_section
+        handlers['normal_modes'] = self._handle_normal_modes_section
+        for section in CrystalOutputStream(output_file).iter_sections():
+            handlers[section.kind](section.text, output_file, state)
+        
+        results = state['properties']
+        if state['frequency_text']:
+            results.update(self._extract_frequency_properties(''.join(state['frequency_text'])))
+        if 'd3_dispersion_energy_au' in results and 'total_energy_au' in results:
+            if 'total_energy_plus_d3_au' not in results:
+                results['total_energy_plus_d3_au'] = results['total_energy_au'] + results['d3_dispersion_energy_au']
+                results['total_energy_plus_d3_ev'] = results['total_energy_plus_d3_au'] * 27.2114
+        
+        # Structural properties first, as the full-text extraction ordered them
+        properties = self._combine_geometries(state['initial_geometry'], state['final_geometry'])
+        if state['atoms_in_unit_cell'] is not None:
+            properties['atoms_in_unit_cell'] = state['atoms_in_unit_cell']
+        properties.update(results)
+        return properties
+    
+    def _handle_header_section(self, content: str, output_file: Path, state: Dict[str, Any]):
+        """Input echo, initial geometry and, for single-step runs, all results."""
+        state['initial_geometry'] = self._extract_initial_geometry(content)
+        state['final_geometry'] = self._extract_final_geometry(content)
+        atoms_match = re.search(r'ATOMS IN THE UNIT CELL:\s*(\d+)', content)
+        if atoms_match:
+            state['atoms_in_unit_cell'] = int(atoms_match.group(1))
+        
+        properties = state['properties']
+        properties.update(self._extract_electronic_properties(content))
+        properties.update(self._extract_population_analysis(content))
+        properties.update(self._extract_energy_properties(content))
+        properties.update(self._extract_geometry_optimization(content))
+        properties.update(self._extract_crystallographic_info(content))
+        properties.update(self._extract_neighbor_information(content))
+        properties.update(self._extract_computational_properties(content))
+        properties.update(self._extract_band_structure_properties(content, output_file))
+        properties.update(self._extract_dos_properties(content, output_file))
+        properties.update(self._extract_frequency_properties(content))
+        
+        # Extract SCF settings from output
+        properties.update(self._extract_scf_settings(content))
+    
+    def _handle_opt_point_section(self, content: str, output_file: Path, state: Dict[str, Any]):
+        """One geometry optimization step, or the part of it after its SCF ended."""
+        state['in_optimization'] = True
+        properties = state['properties']
+        self._update_scf_properties(content, properties)
+        energy = self._extract_energy_properties(content)
+        if 'TOTAL ENERGY + DISP' not in content:
+            # Derived from the final energy once every step has been read
+            energy.pop('total_energy_plus_d3_au', None)
+            energy.pop('total_energy_plus_d3_ev', None)
+        properties.update(energy)
+        
+        converged_match = re.search(r'CONVERGENCE TESTS SATISFIED AFTER\s+(\d+)\s+ENERGY AND GRADIENT CALCULATIONS', content)
+        if converged_match:
+            properties['optimization_cycles'] = int(converged_match.group(1))
+            properties['optimization_converged'] = True
+        grad_norm_matches = re.findall(r'GRADIENT NORM\s+([\d.E+-]+)', content)
+        if grad_norm_matches:
+            properties['final_gradient_norm'] = float(grad_norm_matches[-1])
+    
+    def _handle_opt_end_section(self, content: str, output_file: Path, state: Dict[str, Any]):
+        """Final SCF analysis printed after "OPT END".
+        
+        Its E(AU) repeats the last step's energy at lower precision, so the
+        energies are kept from the optimization steps.
+        """
+        state['in_optimization'] = False
+        self._update_scf_properties(content, state['properties'])
+        if 'NEIGHBORS' in content:
+            state['properties'].update(self._extract_neighbor_information(content))
+    
+    def _update_scf_properties(self, content: str, properties: Dict[str, Any]):
+        """Merge the band gaps and populations of a later SCF over earlier ones."""
+        properties['calculation_type'] = 'geometry_optimization'
+        properties.setdefault('optimization_converged', False)
+        properties.update(self._extract_computational_properties(content))
+        
+        # A later SCF's band gaps and population analysis replace earlier ones as a whole
+        electronic = self._extract_electronic_properties(content)
+        if any(key in electronic for key in BAND_GAP_KEYS):
+            for key in BAND_GAP_KEYS:
+                properties.pop(key, None)
+        properties.update(electronic)
+        
+        population = self._extract_population_analysis(content)
+        if len(population) > 1:
+            for key in [key for key in properties if key.startswith(('mulliken_', 'overlap_population'))]:
+                del properties[key]
+            properties.update(population)
+    
+    def _handle_scf_end_section(self, content: str, output_file: Path, state: Dict[str, Any]):
+        """Converged SCF: its energy, populations and band gaps.
+        
+        Inside an optimization it continues the current step. Otherwise it
+        holds the results of a single-point SCF, or of one geometry of a FREQ
+        run, and a later SCF's values replace an earlier one's.
+        """
+        if state['in_optimization']:
+            self._handle_opt_point_section(content, output_file, state)
+            return
+        
+        properties = state['properties']
+        properties.update(self._extract_electronic_properties(content))
+        properties.update(self._extract_population_analysis(content))
+        properties.update(self._extract_energy_properties(content))
+        properties.update(self._extract_neighbor_information(content))
+        properties.update(self._extract_computational_properties(content))
+    
+    def _handle_frequency_setup_section(self, content: str, output_file: Path, state: Dict[str, Any]):
+        """FREQCALC banner up to the displacements.
+        
+        CRYSTAL prints the banner in the input echo, so this section holds
+        the geometry, settings and neighbors of the equilibrium structure that
+        the header holds for other calculations.
+        """
+        header_state = {key: state[key] for key in ('initial_geometry', 'final_geometry', 'atoms_in_unit_cell')}
+        self._handle_header_section(content, output_file, state)
+        # Geometry found in the header is kept
+        state.update((key, value) for key, value in header_state.items() if value)
+        state['frequency_text'].append(content)
+    
+    def _handle_frequency_section(self, content: str, output_file: Path, state: Dict[str, Any]):
+        """Frequency results, extracted together once the file is read."""
+        state['frequency_text'].append(content)
+    
+    def _handle_normal_modes_section(self, content: str, output_file: Path, state: Dict[str, Any]):
+        """One block of normal modes, most of a FREQ output.
+        
+        Only its first line is kept: the extractor only checks that the
+        modes were printed.
+        """
+        state['frequency_text'].append(content.split('\n', 1)[0] + '\n')
+    
+    def _skip_section(self, content: str, output_file: Path, state: Dict[str, Any]):
+        """Sections no property is extracted from (Born charges, polarizabilities)."""
+    
+    def _handle_final_geometry_section(self, content: str, output_file: Path, state: Dict[str, Any]):
+        """Final optimized geometry printout."""
+        final_geometry = self._extract_final_geometry(content)
+        if final_geometry:
+            state['final_geometry'] = final_geometry
+        state['properties'].update(self._extract_computational_properties(content))
+    
+    def _handle_termination_section(self, content: str, output_file: Path, state: Dict[str, Any]):
+        """Timing summary after the termination banner."""
+        state['properties'].update(self._extract_computational_properties(content))
+    
+    def _combine_geometries(self, initial_geometry: Dict[str, Any], final_geometry: Dict[str, Any]) -> Dict[str, Any]:
+        """Prefixed initial/final geometries plus the final one (else initial) unprefixed."""
         props = {}
         
-        # Extract both initial and final geometries
-        initial_geometry = self._extract_initial_geometry(content)
         if initial_geometry:
             for key, value in initial_geometry.items():
                 props[f'initial_{key}'] = value
         
-        final_geometry = self._extract_final_geometry(content)
         if final_geometry:
             for key, value in final_geometry.items():
                 props[f'final_{key}'] = value
@@ -141,11 +300,6 @@ class CrystalPropertyExtractor:
         elif initial_geometry:
             props.update(initial_geometry)
         
-        # Number of atoms
-        atoms_match = re.search(r'ATOMS IN THE UNIT CELL:\s*(\d+)', content)
-        if atoms_match:
-            props['atoms_in_unit_cell'] = int(atoms_match.group(1))
-        
         return props
     
     def _extract_initial_geometry(self, content: str) -> Dict[str, Any]:
@@ -1007,6 +1161,8 @@ class CrystalPropertyExtractor:
     
     def _find_calc_id_for_output(self, output_file: Path) -> Optional[str]:
         """Find the calculation ID associated with this output file."""
+        if self.db is None:
+            return None
         try:
             with self.db._get_connection() as conn:
                 cursor = conn.execute(
@@ -1018,18 +1174,23 @@ class CrystalPropertyExtractor:
         except:
             return None
     
-    def save_properties_to_database(self, properties: Dict[str, Any]) -> int:
-        """Save extracted properties to the database."""
+    def _build_property_rows(self, properties: Dict[str, Any],
+                             stored_arrays: Dict[str, str] = None) -> List[Tuple]:
+        """
+        Convert one extraction result into rows for MaterialDatabase.upsert_properties.
+        
+        Properties in stored_arrays (name -> reference text) were written to the
+        array store and only keep the reference.
+        """
         if not properties or '_metadata' not in properties:
-            return 0
+            return []
         
         metadata = properties['_metadata']
         material_id = metadata['material_id']
         calc_id = metadata['calc_id']
+        stored_arrays = stored_arrays or {}
         
-        saved_count = 0
-        
-        # Save each property
+        rows = []
         for prop_name, prop_value in properties.items():
             if prop_name.startswith('_'):
                 continue  # Skip metadata
@@ -1038,7 +1199,10 @@ class CrystalPropertyExtractor:
             category = self._categorize_property(prop_name)
             
             # Handle complex values (convert to JSON)
-            if isinstance(prop_value, (dict, list)):
+            if prop_name in stored_arrays:
+                value_text = stored_arrays[prop_name]
+                value_numeric = None
+            elif isinstance(prop_value, (dict, list)):
                 value_text = json.dumps(prop_value)
                 value_numeric = None
             elif isinstance(prop_value, (int, float)):
@@ -1051,43 +1215,93 @@ class CrystalPropertyExtractor:
             # Determine units
             unit = self._get_property_unit(prop_name)
             
-            try:
-                # Check if property already exists
-                with self.db._get_connection() as conn:
-                    cursor = conn.execute(
-                        "SELECT property_id FROM properties WHERE material_id = ? AND property_name = ? AND calc_id = ?",
-                        (material_id, prop_name, calc_id)
-                    )
-                    existing = cursor.fetchone()
-                    
-                    if existing:
-                        # Update existing property
-                        conn.execute("""
-                            UPDATE properties 
-                            SET property_value = ?, property_value_text = ?, property_unit = ?,
-                                extracted_at = ?, extractor_script = ?
-                            WHERE property_id = ?
-                        """, (value_numeric, value_text, unit, 
-                              metadata['extracted_at'], 'crystal_property_extractor.py',
-                              existing[0]))
-                    else:
-                        # Insert new property
-                        conn.execute("""
-                            INSERT INTO properties 
-                            (material_id, calc_id, property_category, property_name, 
-                             property_value, property_value_text, property_unit, 
-                             extracted_at, extractor_script)
-                            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-                        """, (material_id, calc_id, category, prop_name,
-                              value_numeric, value_text, unit,
-                              metadata['extracted_at'], 'crystal_property_extractor.py'))
-                    
-                    saved_count += 1
-                    
-            except Exception as e:
-                print(f"⚠️  Error saving property {prop_name}: {e}")
+            rows.append((material_id, calc_id, category, prop_name,
+                         value_numeric, value_text, unit,
+                         metadata['extracted_at'], 'crystal_property_extractor.py'))
+        
+        return rows
+    
+    def save_properties_to_database(self, properties: Dict[str, Any]) -> int:
+        """Save extracted properties to the database in a single transaction."""
+        return self.save_many_properties_to_database([properties])
+    
+    def save_many_properties_to_database(self, properties_list: List[Dict[str, Any]],
+                                         raise_errors: bool = False) -> int:
+        """
+        Save the properties of several extractions in a single transaction.
+        
+        Args:
+            properties_list: Results of extract_all_properties
+            raise_errors: Re-raise a failed write instead of reporting it and
+                          returning 0 (for callers that record what was stored)
+        """
+        rows = []
+        staged = []  # (ArrayStore, records) whose index rows go into the same transaction
+        for properties in properties_list:
+            stored_arrays = self._store_arrays(properties, staged)
+            rows.extend(self._build_property_rows(properties, stored_arrays))
+        
+        if not rows:
+            return 0
+        
+        try:
+            with self.db._get_connection() as conn:
+                if staged:
+                    from mace.database.array_store import write_array_index
+                for store, records in staged:
+                    write_array_index(conn, records.values())
+                written = self.db._upsert_properties(conn, rows)
+        except Exception as e:
+            # Neither the index rows nor the array files outlive a failed write
+            for store, records in staged:
+                store.discard(records)
+            if raise_errors:
+                raise
+            print(f"⚠️  Error saving {len(rows)} properties: {e}")
+            return 0
+        for store, records in staged:
+            store.publish(records)
+        return written
+    
+    def _store_arrays(self, properties: Dict[str, Any], staged: List[Tuple]) -> Dict[str, str]:
+        """
+        Stage the BAND/DOSS arrays of one extraction in the array store.
+        
+        The staged (store, records) pair is appended to staged; the caller
+        writes its index rows with the properties and publishes or discards it.
+        
+        Returns:
+            Property name -> reference text for the arrays that were staged
+            (empty if there is no calculation ID or the store is unavailable,
+            in which case the arrays are saved as JSON text)
+        """
+        metadata = properties.get('_metadata') if properties else None
+        if self.db is None or not metadata or not metadata.get('calc_id'):
+            return {}
         
-        return saved_count
+        try:
+            from mace.database.array_store import ArrayStore, ARRAY_PROPERTIES, array_reference, to_array
+        except ImportError:
+            return {}
+        
+        arrays, labels = {}, {}
+        for name in ARRAY_PROPERTIES:
+            if properties.get(name):
+                try:
+                    arrays[name], labels[name] = to_array(properties[name])
+                except ValueError:
+                    pass  # Ragged data stays JSON text
+        if not arrays:
+            return {}
+        
+        store = ArrayStore(self.db)
+        try:
+            records = store.stage_many(metadata['calc_id'], arrays, metadata['material_id'], labels=labels)
+        except (ValueError, OSError) as e:
+            print(f"⚠️  Could not store arrays for {metadata['calc_id']}, saving as JSON: {e}")
+            return {}
+        staged.append((store, records))
+        return {name: array_reference(record) for name, record in records.items()}
     
     def _extract_computational_properties(self, content: str) -> Dict[str, Any]:
         """Extract computational performance and timing properties."""
@@ -24,20 +24,39 @@ import tempfile
 import json
 import re
 import uuid
+import functools
+import time
+import socket
 from datetime import datetime
 from pathlib import Path
-from typing import Dict, List, Optional, Tuple, Any, Set
+from typing import Callable, Dict, List, Optional, Tuple, Any, Set
 import threading
+from contextlib import contextmanager
 
 # Define which calculations are optional (can fail without blocking workflow)
 # These calculations can fail without preventing the workflow from continuing
 OPTIONAL_CALC_TYPES = {'BAND', 'DOSS', 'FREQ', 'TRANSPORT', 'CHARGE+POTENTIAL'}
 
+# Workflow directory cleanup runs in the background at most this often
+CLEANUP_INTERVAL_SECONDS = 3600
+CLEANUP_STAMP_FILE = '.last_cleanup'
+
+# Consumed workflow events are pruned by the cleanup after this many days
+WORKFLOW_EVENT_RETENTION_DAYS = 30
+
+# Working directories with a cleanup in progress in this process
+_cleanup_running: Set[str] = set()
+_cleanup_lock = threading.Lock()
+
 # Import MACE components
 from mace.database.materials import MaterialDatabase, create_material_id_from_file, extract_formula_from_d12
 from mace.database.materials_contextual import ContextualMaterialDatabase
+from mace.database.calc_index import MaterialCalcIndex
 from mace.workflow.context import get_current_context
+from mace.workflow.input_service import get_input_service
+from mace.workflow.fanout import StepFanout, StepTask, CANCELLED, format_timings, summarize_timings, stage, timed_stage
 from mace.utils.settings_extractor import extract_input_settings
+from mace.queue.submission import is_script_generator, submit_script
 
 
 class WorkflowEngine:
@@ -63,14 +82,23 @@ class WorkflowEngine:
         self.script_paths = self.get_script_paths()
         self.lock = threading.RLock()
         self.auto_submit = auto_submit  # Enable automatic submission by default
+        self.step_fanout = StepFanout()  # Concurrent generation/submission of independent steps
+        self.step_timings = {}  # Seconds per stage of the last fan-out
+        self._calc_indexes = {}  # material_id -> MaterialCalcIndex of the running request
+        self._calc_index_lock = threading.Lock()
         
         # Create workflow working directories
         self.workflow_dir = self.base_work_dir / "workflow_staging"
         self.workflow_dir.mkdir(exist_ok=True)
         
-        # Clean up old workflow staging directories (older than 7 days)
-        self._cleanup_old_workflow_dirs()
+        # Clean up old workflow staging directories (older than 7 days) in the background
+        self._schedule_workflow_dir_cleanup()
         
+    def close(self):
+        """Stop the step fan-out's worker threads and close the database."""
+        self.step_fanout.shutdown()
+        self.db.close()
+
     def get_workflow_sequence(self, workflow_id: str) -> Optional[List[str]]:
         """Get the planned workflow sequence for a workflow ID"""
         if not workflow_id:
@@ -225,6 +253,54 @@ class WorkflowEngine:
             print(f"Failed to resubmit {calc_type} calculation")
             return None
         
+    def _schedule_workflow_dir_cleanup(self, force: bool = False) -> bool:
+        """
+        Start the staging/failed workflow directory cleanup in a background thread.
+        
+        The same run prunes workflow events consumed more than
+        WORKFLOW_EVENT_RETENTION_DAYS ago.
+        
+        Runs at most once per CLEANUP_INTERVAL_SECONDS for a working directory,
+        across engine instances and processes: the time of the last run is the
+        modification time of a stamp file in the staging directory.
+        
+        Returns:
+            True if a cleanup was started
+        """
+        stamp = self.workflow_dir / CLEANUP_STAMP_FILE
+        with _cleanup_lock:
+            if str(self.base_work_dir) in _cleanup_running:
+                return False
+            try:
+                last_run = stamp.stat().st_mtime
+            except OSError:
+                last_run = 0
+            if not force and datetime.now().timestamp() - last_run < CLEANUP_INTERVAL_SECONDS:
+                return False
+            try:
+                stamp.touch()
+            except OSError:
+                pass
+            _cleanup_running.add(str(self.base_work_dir))
+            
+        def run():
+            try:
+                self._cleanup_old_workflow_dirs()
+            except Exception as e:
+                print(f"Warning: Workflow directory cleanup failed: {e}")
+            try:
+                removed = self.db.prune_workflow_events(WORKFLOW_EVENT_RETENTION_DAYS)
+                if removed:
+                    print(f"Pruned {removed} consumed workflow events")
+            except Exception as e:
+                print(f"Warning: Workflow event pruning failed: {e}")
+            finally:
+                with _cleanup_lock:
+                    _cleanup_running.discard(str(self.base_work_dir))
+                    
+        threading.Thread(target=run, name="workflow-dir-cleanup", daemon=True).start()
+        return True
+        
     def _cleanup_old_workflow_dirs(self):
         """Clean up old workflow staging directories to prevent accumulation"""
         if not self.workflow_dir.exists():
@@ -322,6 +398,7 @@ class WorkflowEngine:
         
         return script_paths
     
+    @timed_stage('slurm_script')
     def _create_slurm_script_for_calculation(self, calc_dir: Path, material_name: str, 
                                            calc_type: str, step_num: int, workflow_id: str) -> Path:
         """Create SLURM script for a calculation"""
@@ -721,84 +798,29 @@ fi'''
         else:  # G or no unit
             return float(value)
     
+    @timed_stage('submit')
     def _submit_calculation_to_slurm(self, script_path: Path, work_dir: Path) -> Optional[str]:
         """Submit calculation to SLURM and return job ID"""
-        import subprocess
-        import re
-        import os
-        
-        original_cwd = os.getcwd()
-        try:
-            os.chdir(work_dir)
-            
-            # Extract job name from the script path (using clean naming throughout)
-            job_name = script_path.stem
-            
-            # Use the script file name relative to work_dir since we changed to work_dir
-            script_filename = script_path.name
-            
-            # Check if the script contains script generation logic
-            print(f"  Reading script file: {script_filename} (from work_dir: {work_dir})")
-            with open(script_filename, 'r') as f:
-                script_content = f.read()
-            
-            if 'echo \'#!/bin/bash --login\' >' in script_content or 'echo "#SBATCH' in script_content:
-                # This is a script generator template - run locally to generate actual script
-                print(f"  Running script generator locally: {script_filename} with job name: {job_name}")
-                result = subprocess.run(
-                    ['bash', script_filename, job_name],
-                    capture_output=True,
-                    text=True
-                )
-                
-                if result.returncode == 0:
-                    # Extract job ID from sbatch output (the template runs sbatch at the end)
-                    output = result.stdout.strip()
-                    job_id_match = re.search(r'Submitted batch job (\d+)', output)
-                    if job_id_match:
-                        return job_id_match.group(1)
-                    
-                    # Maybe the template just generated the script but didn't submit it
-                    # Look for generated script and submit it manually
-                    generated_script = work_dir / f"{full_job_name}.sh"
-                    if generated_script.exists():
-                        print(f"  Found generated script: {generated_script.name}")
-                        result = subprocess.run(
-                            ['sbatch', generated_script.name],
-                            capture_output=True,
-                            text=True
-                        )
-                        if result.returncode == 0:
-                            job_id_match = re.search(r'Submitted batch job (\d+)', result.stdout)
-                            if job_id_match:
-                                return job_id_match.group(1)
-                else:
-                    print(f"Error running script generator: {result.stderr}")
-                    
-            else:
-                # This is a regular SLURM script - submit directly
-                print(f"  Submitting SLURM script directly: {script_path.name}")
-                result = subprocess.run(
-                    ['sbatch', str(script_path)],
-                    capture_output=True,
-                    text=True
-                )
-                
-                if result.returncode == 0:
-                    # Extract job ID from sbatch output
-                    output = result.stdout.strip()
-                    job_id_match = re.search(r'Submitted batch job (\d+)', output)
-                    if job_id_match:
-                        return job_id_match.group(1)
-                    else:
-                        print(f"Could not extract job ID from: {output}")
-                        return None
-                else:
-                    print(f"Error submitting job: {result.stderr}")
-                    return None
-                
-        finally:
-            os.chdir(original_cwd)
+        # Extract job name from the script path (using clean naming throughout)
+        job_name = script_path.stem
+        script_file = Path(work_dir) / script_path.name
+        
+        # Check if the script contains script generation logic
+        print(f"  Reading script file: {script_path.name} (from work_dir: {work_dir})")
+        with open(script_file, 'r') as f:
+            script_content = f.read()
+            
+        if is_script_generator(script_content):
+            # Template runs with cwd=work_dir, generates the real script and submits it
+            print(f"  Running script generator locally: {script_path.name} with job name: {job_name}")
+        else:
+            print(f"  Submitting SLURM script directly: {script_path.name}")
+            
+        # Shared submission queue: no chdir, rate-limited, retries transient sbatch errors
+        job_id, error = submit_script(script_file, Path(work_dir), job_name=job_name)
+        if not job_id:
+            print(f"Error submitting job: {error}")
+        return job_id
         
     def extract_core_material_id_from_complex_filename(self, filename: str) -> str:
         """
@@ -858,6 +880,7 @@ fi'''
         print(f"Created material record: {material_id}")
         return material_id
         
+    @timed_stage('setup')
     def create_isolated_calculation_directory(self, material_id: str, calc_type: str, 
                                             source_files: List[Path]) -> Path:
         """
@@ -886,6 +909,7 @@ fi'''
                 
         return calc_dir
         
+    @timed_stage('generate')
     def run_script_in_isolated_directory(self, script_path: Path, work_dir: Path, 
                                        args: List[str] = None, input_data: str = None) -> Tuple[bool, str, str]:
         """
@@ -1411,43 +1435,58 @@ fi'''
             # Create basic D3 configuration based on calc type
             d3_config = self._get_default_d3_config(target_calc_type)
             
-            # Save configuration to temp file
-            config_file = work_dir / f"{target_calc_type.lower()}_config.json"
-            import json
-            with open(config_file, 'w') as f:
-                json_config = {
-                    "version": "1.0",
-                    "type": "d3_configuration",
-                    "calculation_type": target_calc_type,
-                    "configuration": d3_config
-                }
-                json.dump(json_config, f, indent=2)
-            
-            # Run CRYSTALOptToD3.py
-            cmd = [
-                sys.executable, str(script_path),
-                "--input", str(wf_output_file),
-                "--calc-type", target_calc_type,
-                "--output-dir", str(work_dir),
-                "--config-file", str(config_file)
-            ]
-            
-            print(f"Running: {' '.join(cmd)}")
-            result = subprocess.run(cmd, capture_output=True, text=True)
-            
-            if result.returncode != 0:
-                print(f"CRYSTALOptToD3.py failed: {result.stderr}")
-                return None
+            d3_file = None
+            service = get_input_service(self.script_paths)
+            if service is not None:
+                with stage('generate'):
+                    generated = service.generate_d3(wf_output_file, d3_config, output_dir=work_dir)
+                if generated['success']:
+                    d3_file = Path(generated['d3_file'])
+                else:
+                    print(f"  Input service could not generate {target_calc_type} ({generated['error']}), "
+                          f"running CRYSTALOptToD3.py")
+            
+            if d3_file is None:
+                # Save configuration to temp file
+                config_file = work_dir / f"{target_calc_type.lower()}_config.json"
+                import json
+                with open(config_file, 'w') as f:
+                    json_config = {
+                        "version": "1.0",
+                        "type": "d3_configuration",
+                        "calculation_type": target_calc_type,
+                        "configuration": d3_config
+                    }
+                    json.dump(json_config, f, indent=2)
                 
-            # Find generated D3 file
-            # With --output-dir, files will be in work_dir
-            d3_files = list(work_dir.glob(f"*_{target_calc_type.lower()}.d3"))
-            if not d3_files:
-                print(f"No D3 file generated in {work_dir}")
-                return None
+                # Run CRYSTALOptToD3.py (the calculation type comes from the config,
+                # numbered types such as BAND2 are not valid --calc-type choices)
+                base_type, _ = self._parse_calc_type(target_calc_type)
+                cmd = [
+                    sys.executable, str(script_path),
+                    "--input", str(wf_output_file),
+                    "--calc-type", base_type,
+                    "--output-dir", str(work_dir),
+                    "--config-file", str(config_file)
+                ]
+                
+                print(f"Running: {' '.join(cmd)}")
+                with stage('generate'):
+                    result = subprocess.run(cmd, capture_output=True, text=True)
                 
-            # Get the generated D3 file
-            d3_file = d3_files[0]
+                if result.returncode != 0:
+                    print(f"CRYSTALOptToD3.py failed: {result.stderr}")
+                    return None
+                    
+                # Find generated D3 file
+                # With --output-dir, files will be in work_dir
+                d3_files = list(work_dir.glob(f"*_{base_type.lower()}.d3"))
+                if not d3_files:
+                    print(f"No D3 file generated in {work_dir}")
+                    return None
+                    
+                # Get the generated D3 file
+                d3_file = d3_files[0]
             
             # Create final directories in proper workflow step location
             base_type, calc_num = self._parse_calc_type(target_calc_type)
@@ -1456,16 +1495,17 @@ fi'''
             
             # Copy files to final location
             final_d3 = final_dir / f"{material_id}_{target_calc_type.lower()}.d3"
-            shutil.copy2(d3_file, final_d3)
-            
-            # Also copy the wavefunction file
-            # CRYSTALOptToD3.py creates a wavefunction file with matching name
-            wf_file = d3_file.with_suffix('.f9')
-            if wf_file.exists():
-                final_wf = final_dir / f"{material_id}_{target_calc_type.lower()}.f9"
-                shutil.copy2(wf_file, final_wf)
-            else:
-                print(f"Warning: Wavefunction file not found: {wf_file}")
+            with stage('setup'):
+                shutil.copy2(d3_file, final_d3)
+                
+                # Also copy the wavefunction file
+                # CRYSTALOptToD3.py creates a wavefunction file with matching name
+                wf_file = d3_file.with_suffix('.f9')
+                if wf_file.exists():
+                    final_wf = final_dir / f"{material_id}_{target_calc_type.lower()}.f9"
+                    shutil.copy2(wf_file, final_wf)
+                else:
+                    print(f"Warning: Wavefunction file not found: {wf_file}")
             
             # Create and submit calculation
             calc_id = self._create_and_submit_d3_calculation(
@@ -1571,7 +1611,7 @@ fi'''
         )
         
         # Submit job
-        job_id = self._submit_slurm_job(slurm_script, work_dir)
+        job_id = self._submit_calculation_to_slurm(slurm_script, work_dir)
         if job_id:
             self.db.update_calculation(calc_id, slurm_job_id=job_id, status='submitted')
             print(f"Submitted {calc_type} calculation: Job ID {job_id}, Calc ID {calc_id}")
@@ -1685,7 +1725,7 @@ fi'''
             return new_calc_ids
             
         # Get all calculations for this material
-        all_calcs = self.db.get_calculations_by_status(material_id=material_id)
+        all_calcs = self._material_calculations(material_id)
         
         # Build a map of completed calculations by type
         completed_by_type = {}
@@ -1697,6 +1737,7 @@ fi'''
                 completed_by_type[calc_type].append(calc)
         
         # Check if any pending calculations can now be started
+        triggers = {}  # Planned type -> source calculation ID (or 'CIF')
         for planned_type in planned_sequence:
             base_type, type_num = self._parse_calc_type(planned_type)
             
@@ -1768,56 +1809,77 @@ fi'''
             
             # Trigger the calculation if dependencies are met
             if can_start and source_calc_id:
-                print(f"Triggering pending {planned_type} calculation...")
-                
-                if base_type == "SP":
-                    if source_calc_id == 'CIF':
-                        # Generate from CIF
-                        # Find material_id from context or use planned_type to derive it
-                        material_id = None
-                        for calcs in completed_by_type.values():
-                            if calcs:
-                                material_id = calcs[0]['material_id']
-                                break
-                        # If no completed calcs, we need to get material_id from somewhere else
-                        # This would typically come from the workflow context
-                        if material_id:
-                            calc_id = self.generate_calculation_from_cif(material_id, planned_type)
-                        else:
-                            print(f"Cannot determine material_id for CIF generation")
-                            calc_id = None
-                    else:
-                        calc_id = self.generate_numbered_calculation(source_calc_id, planned_type)
-                elif base_type == "FREQ":
-                    # FREQ always uses generate_freq_from_opt with an OPT calculation
-                    # source_calc_id should already be from an OPT due to fixed dependency logic
-                    calc_id = self.generate_freq_from_opt(source_calc_id, planned_type)
-                elif base_type in ["BAND", "DOSS"]:
-                    calc_id = self.generate_property_calculation(source_calc_id, planned_type)
-                elif base_type == "OPT":
-                    if source_calc_id == 'CIF':
-                        # Generate from CIF
-                        # Find material_id from any completed calculation
-                        material_id = None
-                        for calcs in completed_by_type.values():
-                            if calcs:
-                                material_id = calcs[0]['material_id']
-                                break
-                        if material_id:
-                            calc_id = self.generate_calculation_from_cif(material_id, planned_type)
-                        else:
-                            print(f"Cannot determine material_id for CIF generation")
-                            calc_id = None
-                    else:
-                        calc_id = self.generate_numbered_calculation(source_calc_id, planned_type)
-                else:
-                    calc_id = None
-                    
-                if calc_id:
-                    new_calc_ids.append(calc_id)
-                    
+                triggers[planned_type] = source_calc_id
+        
+        # Source material for CIF generation: any completed calculation of this workflow
+        cif_material_id = None
+        for calcs in completed_by_type.values():
+            if calcs:
+                cif_material_id = calcs[0]['material_id']
+                break
+        
+        def trigger(planned_type: str) -> Optional[str]:
+            base_type, _ = self._parse_calc_type(planned_type)
+            source_calc_id = triggers[planned_type]
+            print(f"Triggering pending {planned_type} calculation...")
+            
+            if base_type in ["SP", "OPT"]:
+                if source_calc_id == 'CIF':
+                    # Generate from CIF
+                    # If no completed calcs, we need to get material_id from somewhere else
+                    # This would typically come from the workflow context
+                    if cif_material_id:
+                        return self.generate_calculation_from_cif(cif_material_id, planned_type)
+                    print(f"Cannot determine material_id for CIF generation")
+                    return None
+                return self.generate_numbered_calculation(source_calc_id, planned_type)
+            elif base_type == "FREQ":
+                # FREQ always uses generate_freq_from_opt with an OPT calculation
+                # source_calc_id should already be from an OPT due to fixed dependency logic
+                return self.generate_freq_from_opt(source_calc_id, planned_type)
+            elif base_type in ["BAND", "DOSS"]:
+                return self.generate_property_calculation(source_calc_id, planned_type)
+            return None
+        
+        # Pending steps whose dependencies are met are independent of each other
+        new_calc_ids.extend(self._run_ready_steps(material_id, list(triggers), trigger, reraise=True))
         return new_calc_ids
 
+    @contextmanager
+    def calc_index_scope(self, material_ids: List[str]):
+        """
+        Answer the calculation lookups of these materials from one MaterialCalcIndex.
+        
+        The calculations of all materials not already covered by an enclosing
+        scope are loaded with a single query on first use. Scopes may nest and
+        are shared by the fan-out worker threads.
+        """
+        with self._calc_index_lock:
+            new_ids = [m for m in dict.fromkeys(material_ids) if m not in self._calc_indexes]
+            index = MaterialCalcIndex(self.db, new_ids)
+            for material_id in new_ids:
+                self._calc_indexes[material_id] = index
+        try:
+            yield index
+        finally:
+            with self._calc_index_lock:
+                for material_id in new_ids:
+                    if self._calc_indexes.get(material_id) is index:
+                        del self._calc_indexes[material_id]
+                        
+    def _material_calculations(self, material_id: str) -> List[Dict]:
+        """All calculations of a material (newest first), from the request's index if there is one."""
+        index = self._calc_indexes.get(material_id)
+        if index is not None:
+            return index.calculations(material_id)
+        return self.db.get_calculations_by_status(material_id=material_id)
+        
+    def _invalidate_calc_index(self, material_id: str):
+        """Reload a material's calculations after writing some of them."""
+        index = self._calc_indexes.get(material_id)
+        if index is not None:
+            index.invalidate(material_id)
+            
     def execute_workflow_step(self, material_id: str, completed_calc_id: str) -> List[str]:
         """
         Execute the next workflow step(s) for a material.
@@ -1829,13 +1891,19 @@ fi'''
         Returns:
             List of new calculation IDs created
         """
+        with self.calc_index_scope([material_id]):
+            return self._execute_workflow_step(material_id, completed_calc_id)
+            
+    def _execute_workflow_step(self, material_id: str, completed_calc_id: str) -> List[str]:
+        """Body of execute_workflow_step, run inside a calculation index scope."""
         new_calc_ids = []
         
-        # Clean up any failed workflow directories proactively
-        self._cleanup_failed_workflow_dirs()
+        # Clean up any failed workflow directories proactively (throttled, in the background)
+        self._schedule_workflow_dir_cleanup()
         
         # Get the completed calculation
-        completed_calc = self.db.get_calculation(completed_calc_id)
+        index = self._calc_indexes.get(material_id)
+        completed_calc = (index and index.get(completed_calc_id)) or self.db.get_calculation(completed_calc_id)
         if not completed_calc:
             print(f"Completed calculation not found: {completed_calc_id}")
             return new_calc_ids
@@ -1880,9 +1948,10 @@ fi'''
                 print(f"DEBUG: Next steps: {next_steps}")
                 
                 # Track completed and failed calculations for dependency checking
-                all_calcs = self.db.get_calculations_by_status(material_id=material_id)
+                all_calcs = self._material_calculations(material_id)
                 completed_calcs = {calc['calc_type'] for calc in all_calcs if calc['status'] == 'completed'}
                 failed_generations = set()  # Track failures in this execution
+                ready_steps = []
                 
                 for next_calc_type in next_steps:
                     # Check if calculation already exists (submitted, running, or completed)
@@ -1900,54 +1969,58 @@ fi'''
                         print(f"Skipping {next_calc_type} - dependency {blocking_calc} not met")
                         continue
                     
+                    ready_steps.append(next_calc_type)
+                
+                def generate_step(next_calc_type: str) -> Optional[str]:
                     next_base_type, next_num = self._parse_calc_type(next_calc_type)
                     
                     if next_base_type == "OPT":
                         # Generate another optimization (OPT2, OPT3, etc.)
                         opt_calc_id = self.generate_numbered_calculation(completed_calc_id, next_calc_type)
-                        if opt_calc_id:
-                            new_calc_ids.append(opt_calc_id)
-                        else:
+                        if not opt_calc_id:
                             failed_generations.add(next_calc_type)
                             # OPT is usually critical
                             print(f"CRITICAL: Failed to generate {next_calc_type}")
+                        return opt_calc_id
                     elif next_base_type == "SP":
                         sp_calc_id = self.generate_numbered_calculation(completed_calc_id, next_calc_type)
-                        if sp_calc_id:
-                            new_calc_ids.append(sp_calc_id)
-                        else:
+                        if not sp_calc_id:
                             failed_generations.add(next_calc_type)
                             # SP is usually critical if BAND/DOSS follow
                             print(f"CRITICAL: Failed to generate {next_calc_type}")
+                        return sp_calc_id
                     elif next_base_type == "FREQ":
                         # FREQ needs optimized geometry from the highest numbered OPT calculation
-                        all_calcs = self.db.get_calculations_by_status(material_id=material_id)
+                        all_calcs = self._material_calculations(material_id)
                         
                         # Build completed_by_type dict for finding highest OPT
                         completed_by_type = {}
                         for calc in all_calcs:
                             if calc['status'] == 'completed':
-                                calc_type = calc['calc_type']
-                                if calc_type not in completed_by_type:
-                                    completed_by_type[calc_type] = []
-                                completed_by_type[calc_type].append(calc)
+                                completed_type = calc['calc_type']
+                                if completed_type not in completed_by_type:
+                                    completed_by_type[completed_type] = []
+                                completed_by_type[completed_type].append(calc)
                         
                         # Find the highest numbered OPT
                         opt_calc_id = self._find_highest_numbered_calc_of_type(completed_by_type, 'OPT')
                         
                         if opt_calc_id:
                             freq_calc_id = self.generate_freq_from_opt(opt_calc_id, next_calc_type)
-                            if freq_calc_id:
-                                new_calc_ids.append(freq_calc_id)
-                            else:
+                            if not freq_calc_id:
                                 failed_generations.add(next_calc_type)
                                 if self._is_calculation_optional(next_calc_type):
                                     print(f"Failed to generate optional {next_calc_type}, continuing...")
                                 else:
                                     print(f"CRITICAL: Failed to generate {next_calc_type}")
+                            return freq_calc_id
                         else:
                             print(f"No completed OPT calculation found for {next_calc_type} generation")
                             failed_generations.add(next_calc_type)
+                    return None
+                
+                # Independent steps are generated and submitted concurrently
+                new_calc_ids.extend(self._run_ready_steps(material_id, ready_steps, generate_step, reraise=True))
             else:
                 # Default behavior: generate SP only (FREQ should be explicitly requested in workflow)
                 sp_calc_id = self.generate_sp_from_opt(completed_calc_id)
@@ -1964,10 +2037,12 @@ fi'''
                 next_steps = self._get_next_steps_from_sequence(current_index, planned_sequence, calc_type)
                 
                 # Track completed and failed calculations for dependency checking
-                all_calcs = self.db.get_calculations_by_status(material_id=material_id)
+                all_calcs = self._material_calculations(material_id)
                 completed_calcs = {calc['calc_type'] for calc in all_calcs if calc['status'] == 'completed'}
                 failed_generations = set()  # Track failures in this execution
                 
+                ready_steps = []
+                
                 # Generate calculations for all next steps (which may be parallel)
                 for next_calc_type in next_steps:
                     # Check if calculation already exists (submitted, running, or completed)
@@ -1985,58 +2060,26 @@ fi'''
                         print(f"Skipping {next_calc_type} - dependency {blocking_calc} not met")
                         continue
                     
+                    ready_steps.append(next_calc_type)
+                
+                def generate_step(next_calc_type: str) -> Optional[str]:
                     try:
                         next_base_type, next_num = self._parse_calc_type(next_calc_type)
+                        new_calc_id = None
                         
-                        if next_base_type == "DOSS":
-                            print(f"Generating {next_calc_type} from planned sequence...")
-                            doss_calc_id = self.generate_property_calculation(completed_calc_id, next_calc_type)
-                            if doss_calc_id:
-                                new_calc_ids.append(doss_calc_id)
-                            else:
-                                # Generation failed
-                                failed_generations.add(next_calc_type)
-                                if self._is_calculation_optional(next_calc_type):
-                                    print(f"Failed to generate optional {next_calc_type}, continuing...")
-                                else:
-                                    print(f"CRITICAL: Failed to generate {next_calc_type}")
-                        elif next_base_type == "BAND":
+                        if next_base_type in ["DOSS", "BAND", "TRANSPORT", "CHARGE+POTENTIAL"]:
                             print(f"Generating {next_calc_type} from planned sequence...")
-                            band_calc_id = self.generate_property_calculation(completed_calc_id, next_calc_type)
-                            if band_calc_id:
-                                new_calc_ids.append(band_calc_id)
-                            else:
+                            new_calc_id = self.generate_property_calculation(completed_calc_id, next_calc_type)
+                            if not new_calc_id:
                                 # Generation failed
                                 failed_generations.add(next_calc_type)
                                 if self._is_calculation_optional(next_calc_type):
                                     print(f"Failed to generate optional {next_calc_type}, continuing...")
                                 else:
                                     print(f"CRITICAL: Failed to generate {next_calc_type}")
-                        elif next_base_type == "TRANSPORT":
-                            print(f"Generating {next_calc_type} from planned sequence...")
-                            transport_calc_id = self.generate_property_calculation(completed_calc_id, next_calc_type)
-                            if transport_calc_id:
-                                new_calc_ids.append(transport_calc_id)
-                            else:
-                                failed_generations.add(next_calc_type)
-                                if self._is_calculation_optional(next_calc_type):
-                                    print(f"Failed to generate optional {next_calc_type}, continuing...")
-                                else:
-                                    print(f"CRITICAL: Failed to generate {next_calc_type}")
-                        elif next_base_type == "CHARGE+POTENTIAL":
-                            print(f"Generating {next_calc_type} from planned sequence...")
-                            charge_potential_calc_id = self.generate_property_calculation(completed_calc_id, next_calc_type)
-                            if charge_potential_calc_id:
-                                new_calc_ids.append(charge_potential_calc_id)
-                            else:
-                                failed_generations.add(next_calc_type)
-                                if self._is_calculation_optional(next_calc_type):
-                                    print(f"Failed to generate optional {next_calc_type}, continuing...")
-                                else:
-                                    print(f"CRITICAL: Failed to generate {next_calc_type}")
                         elif next_base_type == "OPT":
                             # Check if we have a previous OPT to use
-                            all_calcs = self.db.get_calculations_by_status(material_id=material_id)
+                            all_calcs = self._material_calculations(material_id)
                             completed_by_type = {}
                             for calc in all_calcs:
                                 if calc['status'] == 'completed':
@@ -2051,15 +2094,13 @@ fi'''
                             if opt_source:
                                 # Use existing OPT as source
                                 print(f"Generating {next_calc_type} from previous OPT...")
-                                opt_calc_id = self.generate_numbered_calculation(opt_source, next_calc_type)
+                                new_calc_id = self.generate_numbered_calculation(opt_source, next_calc_type)
                             else:
                                 # No OPT exists, generate from CIF
                                 print(f"No previous OPT found. Generating {next_calc_type} from CIF...")
-                                opt_calc_id = self.generate_calculation_from_cif(material_id, next_calc_type)
+                                new_calc_id = self.generate_calculation_from_cif(material_id, next_calc_type)
                             
-                            if opt_calc_id:
-                                new_calc_ids.append(opt_calc_id)
-                            else:
+                            if not new_calc_id:
                                 # Generation failed
                                 failed_generations.add(next_calc_type)
                                 if self._is_calculation_optional(next_calc_type):
@@ -2069,12 +2110,10 @@ fi'''
                         elif next_base_type == "SP":
                             # Generate another SP from current SP
                             print(f"Generating {next_calc_type} from SP...")
-                            sp_calc_id = self.generate_numbered_calculation(completed_calc_id, next_calc_type)
-                            if sp_calc_id:
-                                new_calc_ids.append(sp_calc_id)
+                            new_calc_id = self.generate_numbered_calculation(completed_calc_id, next_calc_type)
                         elif next_base_type == "FREQ":
                             # FREQ needs optimized geometry from the highest numbered OPT calculation
-                            all_calcs = self.db.get_calculations_by_status(material_id=material_id)
+                            all_calcs = self._material_calculations(material_id)
                             
                             # Build completed_by_type dict for finding highest OPT
                             completed_by_type = {}
@@ -2090,10 +2129,8 @@ fi'''
                             
                             if opt_calc_id:
                                 print(f"Generating {next_calc_type} from OPT...")
-                                freq_calc_id = self.generate_freq_from_opt(opt_calc_id, next_calc_type)
-                                if freq_calc_id:
-                                    new_calc_ids.append(freq_calc_id)
-                                else:
+                                new_calc_id = self.generate_freq_from_opt(opt_calc_id, next_calc_type)
+                                if not new_calc_id:
                                     print(f"Failed to generate {next_calc_type}")
                                     failed_generations.add(next_calc_type)
                             else:
@@ -2103,6 +2140,7 @@ fi'''
                                     print(f"Failed to generate optional {next_calc_type}, continuing...")
                                 else:
                                     print(f"CRITICAL: Failed to generate {next_calc_type}")
+                        return new_calc_id
                     except Exception as e:
                         print(f"Exception generating {next_calc_type}: {e}")
                         failed_generations.add(next_calc_type)
@@ -2113,17 +2151,16 @@ fi'''
                         else:
                             print(f"CRITICAL: Required calculation {next_calc_type} failed!")
                             print(f"This may block dependent calculations.")
-                        continue
+                        return None
+                
+                # Independent steps (e.g. BAND and DOSS) are generated and submitted concurrently
+                new_calc_ids.extend(self._run_ready_steps(material_id, ready_steps, generate_step))
             else:
                 # Default behavior: generate both DOSS and BAND
                 print("No planned sequence found. Using default: generating both DOSS and BAND...")
-                doss_calc_id = self.generate_doss_from_sp(completed_calc_id)
-                if doss_calc_id:
-                    new_calc_ids.append(doss_calc_id)
-                    
-                band_calc_id = self.generate_band_from_sp(completed_calc_id)
-                if band_calc_id:
-                    new_calc_ids.append(band_calc_id)
+                default_steps = {"DOSS": self.generate_doss_from_sp, "BAND": self.generate_band_from_sp}
+                new_calc_ids.extend(self._run_ready_steps(
+                    material_id, list(default_steps), lambda step: default_steps[step](completed_calc_id)))
                 
         elif base_type in ["FREQ", "BAND", "DOSS"]:
             # These calculations are often terminal, but sometimes workflow continues
@@ -2139,7 +2176,7 @@ fi'''
                         
                         if next_base_type == "OPT":
                             # OPT after FREQ/BAND/DOSS needs geometry from highest completed OPT
-                            all_calcs = self.db.get_calculations_by_status(material_id=material_id)
+                            all_calcs = self._material_calculations(material_id)
                             completed_by_type = {}
                             for calc in all_calcs:
                                 if calc['status'] == 'completed':
@@ -2158,7 +2195,7 @@ fi'''
                                 print(f"No completed OPT found to use as source for {next_calc_type}")
                         elif next_base_type == "FREQ":
                             # Another FREQ calculation - also needs OPT geometry
-                            all_calcs = self.db.get_calculations_by_status(material_id=material_id)
+                            all_calcs = self._material_calculations(material_id)
                             completed_by_type = {}
                             for calc in all_calcs:
                                 if calc['status'] == 'completed':
@@ -2192,6 +2229,47 @@ fi'''
             
         return new_calc_ids
         
+    def _run_ready_steps(self, material_id: str, calc_types: List[str],
+                         generate: Callable[[str], Optional[str]], reraise: bool = False) -> List[str]:
+        """
+        Generate and submit ready, independent steps of a material concurrently.
+        
+        Steps of the same base type keep their order (BAND before BAND2), and a
+        failed required step cancels the later ones.
+        
+        Args:
+            material_id: Material identifier
+            calc_types: Calculation types to generate, in workflow order
+            generate: Generates one calculation type, returns its calc_id or None
+            reraise: Raise the first exception of a step after all steps finished
+            
+        Returns:
+            New calculation IDs, in the order of calc_types
+        """
+        tasks = [StepTask((material_id, calc_type), functools.partial(generate, calc_type),
+                          chain=(material_id, self._parse_calc_type(calc_type)[0]),
+                          critical=not self._is_calculation_optional(calc_type))
+                 for calc_type in calc_types]
+        if not tasks:
+            return []
+            
+        start = time.perf_counter()
+        self.step_fanout.run(tasks)
+        wall = time.perf_counter() - start
+        self._invalidate_calc_index(material_id)
+        self.step_timings = summarize_timings(tasks)
+        if len(tasks) > 1:
+            print(f"Step timings for {material_id}: {format_timings(tasks, wall)}")
+        
+        for task in tasks:
+            if task.status == CANCELLED:
+                print(f"Skipping {task.key[1]} - cancelled after {task.cancelled_by[1]} failed")
+            elif task.error is not None:
+                if reraise:
+                    raise task.error
+                print(f"Exception generating {task.key[1]}: {task.error}")
+        return [task.result for task in tasks if task.result]
+    
     def _find_calc_position_in_sequence(self, calc_type: str, completed_calc: Dict, planned_sequence: List[str]) -> int:
         """
         Find the position of the current calculation in the planned sequence.
@@ -2203,7 +2281,7 @@ fi'''
         
         # Count how many calculations of this base type have been completed for this material
         material_id = completed_calc['material_id']
-        all_calcs = self.db.get_calculations_by_status(material_id=material_id)
+        all_calcs = self._material_calculations(material_id)
         
         # Count completed calculations of this base type
         completed_count = 0
@@ -2541,7 +2619,7 @@ fi'''
         Returns:
             True if calculation already exists
         """
-        all_calcs = self.db.get_calculations_by_status(material_id=material_id)
+        all_calcs = self._material_calculations(material_id)
         for calc in all_calcs:
             if calc['calc_type'] == calc_type:
                 # Check if it's not in a terminal failed state that needs retry
@@ -2814,6 +2892,32 @@ fi'''
             # Clean up working directory
             shutil.rmtree(work_dir, ignore_errors=True)
     
+    @timed_stage('generate')
+    def _generate_d12_with_service(self, out_file: Path, d12_file: Optional[Path],
+                                   config_file: Path, output_dir: Path) -> Optional[Dict[str, Any]]:
+        """
+        Generate a D12 file with the input service from a CRYSTALOptToD12.py config file.
+        
+        Returns:
+            The service result, or None if CRYSTALOptToD12.py should be run as a script
+        """
+        service = get_input_service(self.script_paths)
+        if service is None:
+            return None
+        try:
+            with open(config_file, 'r') as f:
+                config = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"  Could not read config file {config_file}: {e}")
+            return None
+        
+        generated = service.generate_d12(out_file, d12_file, config, output_dir)
+        if not generated['success']:
+            print(f"  Input service could not generate the D12 file ({generated['error']}), "
+                  f"running CRYSTALOptToD12.py")
+            return None
+        return generated
+    
     def generate_numbered_calculation(self, source_calc_id: str, target_calc_type: str) -> Optional[str]:
         """
         Generate a numbered calculation (OPT2, OPT3, SP2, etc.) from a source calculation.
@@ -2908,7 +3012,7 @@ fi'''
         original_input_file = None
         if target_base_type == "OPT" and target_num > 1:
             # Try to find the original OPT input file
-            all_calcs = self.db.get_calculations_by_status(material_id=material_id)
+            all_calcs = self._material_calculations(material_id)
             for calc in all_calcs:
                 if calc['calc_type'] == 'OPT' and calc['status'] in ['completed', 'running', 'submitted']:
                     original_opt_input = Path(calc['input_file'])
@@ -3159,13 +3263,23 @@ fi'''
                     # Default to SP for unknown types
                     input_responses = "y\n1\n1\n\n\n\n\n\n\n\n\n\n\n\n\n\n\n\n\n\n"
             
-            success, stdout, stderr = self.run_script_in_isolated_directory(
-                crystal_to_d12_script, work_dir, args, input_data=input_responses
-            )
+            # With a config file the input service generates the file without a new
+            # interpreter; the canned-response script run remains the fallback
+            config_files = [args[i + 1] for i, arg in enumerate(args) if arg == "--config-file"]
+            generated = None
+            if config_files:
+                generated = self._generate_d12_with_service(out_file, d12_file, Path(config_files[-1]), work_dir)
             
-            if not success:
-                print(f"CRYSTALOptToD12.py failed: {stderr}")
-                return None
+            if generated is None:
+                success, stdout, stderr = self.run_script_in_isolated_directory(
+                    crystal_to_d12_script, work_dir, args, input_data=input_responses
+                )
+                
+                if not success:
+                    print(f"CRYSTALOptToD12.py failed: {stderr}")
+                    return None
+            else:
+                stdout = generated['output']
             
             # Debug: show some output to verify config was applied
             if expert_config_file and expert_config_file.exists():
@@ -3386,7 +3500,7 @@ fi'''
         Returns:
             Calculation ID of the most recent wavefunction calculation, or None if not found
         """
-        all_calcs = self.db.get_calculations_by_status(material_id=material_id)
+        all_calcs = self._material_calculations(material_id)
         
         # Filter for completed calculations that produce wavefunctions
         wf_calcs = []
@@ -3416,7 +3530,7 @@ fi'''
             return {"error": f"Material {material_id} not found"}
             
         # Get all calculations for this material
-        calculations = self.db.get_calculations_by_status(material_id=material_id)
+        calculations = self._material_calculations(material_id)
         
         # Organize by calculation type and status
         workflow_status = {
@@ -3477,47 +3591,69 @@ fi'''
             
         return workflow_status
         
-    def process_completed_calculations(self) -> int:
+    def process_completed_calculations(self, batch_size: int = 100) -> int:
         """
-        Process all recently completed calculations and trigger workflow steps.
+        Process unconsumed calculation completion events and trigger workflow steps.
+        
+        Completions are recorded in the workflow_events outbox by the same
+        transaction that marks a calculation completed, so only new
+        completions are read, however many calculations the database holds.
+        Events of different materials are processed concurrently (see
+        mace.workflow.fanout); each material's events keep their order.
         
+        Args:
+            batch_size: Events claimed per database round trip
+            
         Returns:
             Number of new workflow steps initiated
         """
-        # Get recently completed calculations that haven't been processed
-        completed_calcs = self.db.get_calculations_by_status('completed')
+        consumer = f"{socket.gethostname()}:{os.getpid()}"
         
         new_steps = 0
-        for calc in completed_calcs:
-            # Check if this calculation has already triggered workflow steps
-            settings_json = calc.get('settings_json')
-            if settings_json:
-                try:
-                    settings = json.loads(settings_json)
-                except (json.JSONDecodeError, TypeError):
-                    settings = {}
-            else:
-                settings = {}
+        while True:
+            events = self.db.claim_workflow_events(consumer, limit=batch_size)
+            if not events:
+                break
                 
-            if settings.get('workflow_processed'):
-                continue
+            # Events of different materials run concurrently, a material's events in order
+            tasks = [StepTask(event['event_id'],
+                              functools.partial(self.execute_workflow_step, event['material_id'], event['calc_id']),
+                              chain=event['material_id'])
+                     for event in events]
+            start = time.perf_counter()
+            # One query loads the calculations of all materials of the batch
+            with self.calc_index_scope([event['material_id'] for event in events]):
+                self.step_fanout.run(tasks)
+            if len(tasks) > 1:
+                print(f"Workflow step timings: {format_timings(tasks, time.perf_counter() - start)}")
+            
+            error = None
+            for event, task in zip(events, tasks):
+                if task.error is not None or task.status == CANCELLED:
+                    # Leave the event (and the material's later events) for the next run
+                    self.db.release_workflow_event(event['event_id'])
+                    error = error or task.error
+                    continue
+                    
+                new_calc_ids = task.result
+                if new_calc_ids:
+                    new_steps += len(new_calc_ids)
+                
+                # Always consume the event, even if no new calculations were generated
+                # This prevents re-processing the same calculation multiple times
+                self.db.complete_workflow_event(event['event_id'], {
+                    'steps_generated': len(new_calc_ids) if new_calc_ids else 0,
+                    'new_calc_ids': new_calc_ids or []
+                })
                 
-            # Execute workflow step
-            new_calc_ids = self.execute_workflow_step(calc['material_id'], calc['calc_id'])
-            
-            if new_calc_ids:
-                new_steps += len(new_calc_ids)
-            
-            # Always mark this calculation as workflow processed, even if no new calculations were generated
-            # This prevents re-processing the same calculation multiple times
-            settings['workflow_processed'] = True
-            settings['workflow_process_timestamp'] = datetime.now().isoformat()
-            settings['workflow_steps_generated'] = len(new_calc_ids) if new_calc_ids else 0
-            self.db.update_calculation_settings(calc['calc_id'], settings)
+            if error is not None:
+                raise error
+                
+            if len(events) < batch_size:
+                break
                 
         return new_steps
 
-
 def main():
     """CLI interface for workflow engine."""
     import argparse
@@ -3549,12 +3685,17 @@ def main():
                 for failed in status['failed_calculations']:
                     print(f"  - {failed['calc_id']} ({failed['calc_type']}): {failed['error_type']}")
         else:
+            print(f"Completion events waiting for processing: {workflow_engine.db.count_pending_workflow_events()}")
             print("Please specify --material-id for status checking")
             
     elif args.action == 'process':
         print("Processing completed calculations...")
         new_steps = workflow_engine.process_completed_calculations()
         print(f"Initiated {new_steps} new workflow steps")
+        pending = workflow_engine.db.count_pending_workflow_events()
+        if pending:
+            # Released after a failed step, or claimed by another queue manager
+            print(f"{pending} completion events still pending")
         
     elif args.action == 'workflow':
         # Show workflow status for all materials
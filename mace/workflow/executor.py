@@ -33,7 +33,9 @@ import queue
 try:
     from mace.database.materials import MaterialDatabase
     from mace.queue.manager import EnhancedCrystalQueueManager
+    from mace.queue.submission import is_script_generator, submit_script
     from mace.workflow.context import WorkflowContext, workflow_context, get_current_context
+    from mace.workflow.input_service import get_input_service
     # Crystal_d12 modules no longer needed here - handled by subprocess calls
 except ImportError as e:
     print(f"Error importing required modules: {e}")
@@ -858,35 +860,6 @@ class WorkflowExecutor:
         
         return script_content
         
-    def submit_slurm_job(self, script_file: Path, calc_dir: Path) -> str:
-        """Submit SLURM job and return job ID"""
-        original_cwd = os.getcwd()
-        
-        try:
-            os.chdir(calc_dir)
-            
-            result = subprocess.run(
-                ['sbatch', script_file.name],
-                capture_output=True,
-                text=True
-            )
-            
-            if result.returncode == 0:
-                # Extract job ID from sbatch output
-                for line in result.stdout.strip().split('\n'):
-                    if 'Submitted batch job' in line:
-                        return line.split()[-1]
-            else:
-                print(f"SLURM submission failed: {result.stderr}")
-                
-        except Exception as e:
-            print(f"Error submitting job: {e}")
-            
-        finally:
-            os.chdir(original_cwd)
-            
-        return None
-        
     def extract_core_material_name(self, d12_file: Path) -> str:
         """Extract the core material name using smart suffix removal"""
         # Use the same logic as create_material_id_from_file for consistency
@@ -1164,83 +1137,27 @@ fi'''
         
     def submit_slurm_job(self, script_file: Path, calc_dir: Path) -> Optional[str]:
         """Submit SLURM job and return job ID"""
-        try:
-            # Change to calculation directory
-            original_cwd = os.getcwd()
-            os.chdir(calc_dir)
-            
-            # Check if this is a script generator (template) or actual SLURM script
-            job_name = script_file.stem
-            
-            # Check if the script contains script generation logic
-            with open(script_file, 'r') as f:
-                script_content = f.read()
-            
-            if 'echo \'#!/bin/bash --login\' >' in script_content or 'echo "#SBATCH' in script_content:
-                # This is a script generator template - run locally to generate actual script
-                print(f"  Running script generator locally: {script_file.name}")
-                result = subprocess.run(
-                    ['bash', script_file.name, job_name],
-                    capture_output=True,
-                    text=True
-                )
-                
-                if result.returncode == 0:
-                    # Extract job ID from sbatch output (the template runs sbatch at the end)
-                    output_lines = result.stdout.strip().split('\n')
-                    for line in output_lines:
-                        if 'Submitted batch job' in line:
-                            job_id = line.split()[-1]
-                            return job_id
-                    
-                    # Maybe the template just generated the script but didn't submit it
-                    # Look for generated script and submit it manually
-                    generated_script = calc_dir / f"{job_name}.sh"
-                    if generated_script.exists():
-                        print(f"  Found generated script: {generated_script.name}")
-                        result = subprocess.run(
-                            ['sbatch', generated_script.name],
-                            capture_output=True,
-                            text=True
-                        )
-                        if result.returncode == 0:
-                            output_lines = result.stdout.strip().split('\n')
-                            for line in output_lines:
-                                if 'Submitted batch job' in line:
-                                    job_id = line.split()[-1]
-                                    return job_id
-                else:
-                    print(f"Error running script generator: {result.stderr}")
-                    
-            else:
-                # This is a regular SLURM script - submit directly
-                print(f"  Submitting SLURM script directly: {script_file.name}")
-                result = subprocess.run(
-                    ['sbatch', script_file.name],
-                    capture_output=True,
-                    text=True
-                )
-                
-                if result.returncode == 0:
-                    # Extract job ID from sbatch output
-                    output_lines = result.stdout.strip().split('\n')
-                    for line in output_lines:
-                        if 'Submitted batch job' in line:
-                            job_id = line.split()[-1]
-                            return job_id
-                else:
-                    print(f"SLURM submission failed: {result.stderr}")
-                
-        except Exception as e:
-            print(f"Error submitting job: {e}")
-            
-        finally:
-            os.chdir(original_cwd)
-            
-        return None
+        # Templates are run locally to generate the real script; regular
+        # scripts go straight to sbatch. Both run with cwd=calc_dir.
+        if script_file.exists() and is_script_generator(script_file.read_text()):
+            print(f"  Running script generator locally: {script_file.name}")
+        else:
+            print(f"  Submitting SLURM script directly: {script_file.name}")
+
+        job_id, error = submit_script(script_file, calc_dir, job_name=script_file.stem)
+        if not job_id:
+            print(f"SLURM submission failed: {error}")
+        return job_id
+        
+    def convert_cifs_with_config(self, plan: Dict[str, Any], workflow_id: str, jobs: Optional[int] = None):
+        """
+        Convert CIF files using saved configuration
         
-    def convert_cifs_with_config(self, plan: Dict[str, Any], workflow_id: str):
-        """Convert CIF files using saved configuration"""
+        Args:
+            plan: Workflow plan
+            workflow_id: Workflow ID
+            jobs: Conversion worker processes (default: plan 'cif_conversion_jobs' or CPU count)
+        """
         cif_config = plan.get('cif_conversion_config')
         if not cif_config:
             raise ValueError("CIF conversion config not found in plan")
@@ -1265,12 +1182,16 @@ fi'''
         else:
             script_path = Path(__file__).parent.parent.parent / "Crystal_d12" / "NewCifToD12.py"
         
+        jobs = max(1, jobs or plan.get('cif_conversion_jobs') or os.cpu_count() or 1)
+        n_cifs = len(list(Path(plan['input_directory']).glob("*.cif")))
+        
         conversion_cmd = [
             sys.executable, str(script_path),
             "--batch",
             "--options_file", str(cif_config_file),
             "--cif_dir", plan['input_directory'],
-            "--output_dir", str(cif_output_dir)
+            "--output_dir", str(cif_output_dir),
+            "--jobs", str(jobs)
         ]
         
         print(f"    Running: {' '.join(conversion_cmd)}")
@@ -1279,11 +1200,13 @@ fi'''
         print(f"    Config file exists: {cif_config_file.exists()}")
         print(f"    Input directory exists: {Path(plan['input_directory']).exists()}")
         
-        # Add timeout to prevent hanging
+        # Add timeout to prevent hanging: 5 minutes plus 1 second per CIF and worker
+        timeout = 300 + n_cifs // jobs
         try:
-            result = subprocess.run(conversion_cmd, capture_output=True, text=True, timeout=300)  # 5 minute timeout
+            result = subprocess.run(conversion_cmd, capture_output=True, text=True, timeout=timeout,
+                                    stdin=subprocess.DEVNULL)
         except subprocess.TimeoutExpired:
-            print("    CIF conversion timed out after 5 minutes")
+            print(f"    CIF conversion timed out after {timeout} seconds")
             raise RuntimeError("CIF conversion timed out")
         
         print(f"    Return code: {result.returncode}")
@@ -1303,6 +1226,15 @@ fi'''
         plan['generated_d12s'] = [str(f) for f in generated_d12s]
         print(f"    Generated {len(generated_d12s)} D12 files")
         
+        # CIFs that failed or needed a decision are listed in the error manifest
+        manifest_file = cif_output_dir / "cif2d12_errors.jsonl"
+        if manifest_file.exists():
+            with open(manifest_file) as f:
+                statuses = [json.loads(line).get('status') for line in f if line.strip()]
+            plan['cif_conversion_manifest'] = str(manifest_file)
+            print(f"    {statuses.count('error')} CIF files failed, {statuses.count('warning')} warnings: "
+                  f"{manifest_file}")
+        
         # Save the updated plan back to disk so generated_d12s is persisted
         if 'workflow_id' in plan:
             updated_plan_file = self.configs_dir / f"workflow_plan_{plan['workflow_id']}_updated.json"
@@ -1799,37 +1731,14 @@ fi'''
             # Use the saved configuration from planning phase
             saved_config = config.get("crystal_opt_config", {})
             
-            # Create a temporary config file with the saved settings
-            temp_config = self.temp_dir / f"expert_{calc_type.lower()}_config_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
-            with open(temp_config, 'w') as f:
-                json.dump(saved_config, f, indent=2)
-            
-            # Run CRYSTALOptToD12.py with the saved configuration
-            cmd = [
-                sys.executable, str(script_path),
-                "--out-file", output_file,
-                "--d12-file", input_file,
-                "--output-dir", str(output_dir),
-                "--options-file", str(temp_config)
-            ]
-            
-            try:
-                print(f"      Running CRYSTALOptToD12.py with expert configuration...")
-                result = subprocess.run(cmd, capture_output=True, text=True)
-                if result.returncode == 0:
-                    print(f"      Successfully generated {calc_type} input with expert settings")
-                    
-                    # Fix naming for OPT2 files
-                    if calc_type == "OPT2":
-                        self._fix_opt2_naming(output_dir, Path(output_file).stem)
-                else:
-                    print(f"      Error generating {calc_type} input: {result.stderr}")
-            except Exception as e:
-                print(f"      Error running with expert config: {e}")
-            
-            # Clean up temp config
-            if temp_config.exists():
-                temp_config.unlink()
+            print(f"      Running CRYSTALOptToD12.py with expert configuration...")
+            if self._generate_d12_from_config(script_path, output_file, input_file, output_dir,
+                                              calc_type, saved_config, prefix="expert_"):
+                print(f"      Successfully generated {calc_type} input with expert settings")
+                
+                # Fix naming for OPT2 files
+                if calc_type == "OPT2":
+                    self._fix_opt2_naming(output_dir, Path(output_file).stem)
             return
             
         # Check if this should run interactively (fallback for old configs)
@@ -1863,9 +1772,6 @@ fi'''
             return
         
         # Non-interactive mode (batch with config file)
-        # Create temporary config for CRYSTALOptToD12.py
-        temp_config = self.temp_dir / f"temp_crystal_opt_config_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
-        
         # Ensure we pass the correct calculation type (OPT for OPT2, not SP)
         actual_calc_type = "OPT" if calc_type == "OPT2" else calc_type
         
@@ -1935,30 +1841,50 @@ fi'''
         if "basis_modifications" in config:
             crystal_opt_config["basis_modifications"] = config["basis_modifications"]
         
+        if self._generate_d12_from_config(script_path, output_file, input_file, output_dir,
+                                          calc_type, crystal_opt_config, timeout=300):
+            print(f"      Generated {calc_type} input from {Path(output_file).name}")
+            
+            # Fix naming for OPT2 files (CRYSTALOptToD12.py generates files with _opt suffix)
+            if calc_type == "OPT2":
+                self._fix_opt2_naming(output_dir, Path(output_file).stem)
+
+    def _generate_d12_from_config(self, script_path: Path, output_file: str, input_file: str,
+                                  output_dir: Path, calc_type: str, crystal_opt_config: Dict[str, Any],
+                                  timeout: int = 3600, prefix: str = "temp_") -> bool:
+        """
+        Generate a D12 input from a CRYSTALOptToD12.py config without prompts.
+        
+        Uses the warm input service; with the service disabled, runs the script
+        with the config as --config-file in non-interactive mode.
+        """
+        service = get_input_service({'crystal_to_d12': script_path})
+        if service is not None:
+            generated = service.generate_d12(output_file, input_file, crystal_opt_config, output_dir)
+            if not generated['success']:
+                print(f"      Failed to generate {calc_type} input: {generated['error']}")
+            return generated['success']
+        
+        temp_config = self.temp_dir / f"{prefix}crystal_opt_config_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
         with open(temp_config, 'w') as f:
             json.dump(crystal_opt_config, f)
-            
-        # Run CRYSTALOptToD12.py
         cmd = [
             sys.executable, str(script_path),
             "--out-file", output_file,
             "--d12-file", input_file,
             "--output-dir", str(output_dir),
-            "--options-file", str(temp_config)
+            "--config-file", str(temp_config),
+            "--non-interactive"
         ]
-        
         try:
-            result = subprocess.run(cmd, capture_output=True, text=True, timeout=300)
-            if result.returncode == 0:
-                print(f"      Generated {calc_type} input from {Path(output_file).name}")
-                
-                # Fix naming for OPT2 files (CRYSTALOptToD12.py generates files with _opt suffix)
-                if calc_type == "OPT2":
-                    self._fix_opt2_naming(output_dir, Path(output_file).stem)
-            else:
+            result = subprocess.run(cmd, capture_output=True, text=True, timeout=timeout,
+                                    stdin=subprocess.DEVNULL)
+            if result.returncode != 0:
                 print(f"      Failed to generate {calc_type} input: {result.stderr}")
+            return result.returncode == 0
         except subprocess.TimeoutExpired:
             print(f"      Timeout generating {calc_type} input")
+            return False
         finally:
             if temp_config.exists():
                 temp_config.unlink()
@@ -2202,13 +2128,25 @@ fi'''
             # Basic or Advanced mode - use configuration file
             d3_config = config.get("d3_config", {})
             
+            # Strip instance numbers for compatibility (BAND2 -> BAND)
+            base_calc_type = re.sub(r'\d+$', '', calc_type)
+            
+            service = get_input_service({'crystal_to_d3': script_path})
+            if service is not None:
+                generated = service.generate_d3(output_file, d3_config, base_calc_type, output_dir)
+                if generated['success']:
+                    print(f"      Generated {calc_type} D3 input from {Path(output_file).name}")
+                    
+                    # Fix D3 file naming for numbered instances (BAND2, DOSS2, etc.)
+                    self._fix_d3_numbered_naming(output_dir, Path(output_file).stem, calc_type)
+                else:
+                    print(f"      Failed to generate {calc_type} D3 input: {generated['error']}")
+                return
+            
             # Create temporary config file
             temp_config = self.temp_dir / f"temp_d3_{calc_type.lower()}_config_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
             
             # Prepare configuration for CRYSTALOptToD3.py
-            # Strip instance numbers for compatibility (BAND2 -> BAND)
-            base_calc_type = re.sub(r'\d+$', '', calc_type)
-            
             d3_json_config = {
                 "version": "1.0",
                 "type": "d3_configuration",
@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+"""
+Concurrent Fan-out of Workflow Steps
+====================================
+
+Runs the generation and submission of independent workflow steps (BAND,
+DOSS, TRANSPORT, CHARGE+POTENTIAL and FREQ after an SP, or the completion
+events of different materials) concurrently in a bounded thread pool.
+
+The steps form a small DAG:
+- a step waits for the steps it `requires` in the same run
+- steps with the same `chain` (e.g. one material, or one material's base
+  type) run one at a time, in the order given
+- a failed step cancels every step that requires it (transitively); a
+  critical step that fails or is cancelled also cancels the later steps of
+  its chain
+
+A step fails when its function raises or returns None. Steps run inline in
+the calling thread when there is only one, when MACE_STEP_WORKERS is 1 or
+when the run is nested in a step running in another fan-out's pool, so the
+number of threads stays bounded by MACE_STEP_WORKERS. A StepFanout keeps its
+worker threads between runs until shutdown().
+
+Each step records the wall time of the stages marked with stage() (or
+@timed_stage) while it runs: directory setup, input generation, SLURM
+script, submission, ...
+
+Environment:
+  MACE_STEP_WORKERS=N       Concurrent steps (default 4, 1 runs them one after another)
+
+Usage:
+  from mace.workflow.fanout import StepFanout, StepTask, stage
+  tasks = [StepTask(("mat", "BAND"), lambda: engine.generate_property_calculation(sp_id, "BAND")),
+           StepTask(("mat", "DOSS"), lambda: engine.generate_property_calculation(sp_id, "DOSS"))]
+  fanout = StepFanout()
+  fanout.run(tasks)
+  print(format_timings(tasks))
+  fanout.shutdown()
+"""
+
+import os
+import time
+import functools
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Optional
+
+
+DEFAULT_STEP_WORKERS = int(os.environ.get('MACE_STEP_WORKERS', '4'))
+
+# Step states
+PENDING = 'pending'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+
+_local = threading.local()
+
+
+@contextmanager
+def stage(name: str):
+    """
+    Record the wall time of a stage of the running step.
+
+    Only the outermost stage is recorded, so nested stages are not counted
+    twice. Outside a step this does nothing.
+    """
+    timings = getattr(_local, 'timings', None)
+    if timings is None or getattr(_local, 'stage', None) is not None:
+        yield
+        return
+    _local.stage = name
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[name] = timings.get(name, 0.0) + time.perf_counter() - start
+        _local.stage = None
+
+
+def timed_stage(name: str):
+    """Decorator form of stage()."""
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with stage(name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class StepTask:
+    """One workflow step of a fan-out."""
+
+    def __init__(self, key: Hashable, function: Callable[[], Any], chain: Hashable = None,
+                 requires: Iterable[Hashable] = (), critical: bool = True):
+        """
+        Args:
+            key: Unique key of the step, e.g. (material_id, calc_type)
+            function: Generates and submits the step; returns None on failure
+            chain: Steps with the same chain run one at a time, in order
+            requires: Keys of steps of the same run that must succeed first
+                      (keys not in the run are ignored)
+            critical: A failure also cancels the later steps of the chain
+        """
+        self.key = key
+        self.function = function
+        self.chain = chain
+        self.requires = tuple(requires)
+        self.critical = critical
+        self.status = PENDING
+        self.result = None
+        self.error: Optional[BaseException] = None
+        self.cancelled_by: Optional[Hashable] = None
+        self.wall = 0.0
+        self.timings: Dict[str, float] = {}
+
+    def __repr__(self):
+        return f"StepTask({self.key!r}, {self.status})"
+
+
+class StepFanout:
+    """Runs a DAG of StepTasks in a bounded thread pool."""
+
+    def __init__(self, max_workers: Optional[int] = None):
+        """
+        Args:
+            max_workers: Concurrent steps (default MACE_STEP_WORKERS)
+        """
+        self.max_workers = max(1, DEFAULT_STEP_WORKERS if max_workers is None else max_workers)
+        self._pool = None  # Created on the first concurrent run and kept for the later ones
+        self._pool_lock = threading.Lock()
+
+    def run(self, tasks: List[StepTask]) -> List[StepTask]:
+        """
+        Run the tasks and wait for all of them.
+
+        Exceptions of the task functions are kept in task.error, never raised.
+
+        Returns:
+            The tasks, in the order given
+        """
+        by_key = {task.key: task for task in tasks}
+        pending = list(tasks)
+        inline = self.max_workers == 1 or len(tasks) <= 1 or getattr(_local, 'in_pool', False)
+
+        if inline:
+            while pending:
+                task = self._next_runnable(pending, by_key, set())
+                if task is None:
+                    break
+                pending.remove(task)
+                self._execute(task)
+                self._finish(task, by_key)
+        else:
+            from concurrent.futures import wait, FIRST_COMPLETED
+            pool = self._executor()
+            running = {}
+            while pending or running:
+                busy_chains = {task.chain for task in running.values() if task.chain is not None}
+                while len(running) < self.max_workers:
+                    task = self._next_runnable(pending, by_key, busy_chains)
+                    if task is None:
+                        break
+                    pending.remove(task)
+                    task.status = RUNNING
+                    running[pool.submit(self._execute, task, True)] = task
+                    if task.chain is not None:
+                        busy_chains.add(task.chain)
+                if not running:
+                    break
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    self._finish(running.pop(future), by_key)
+
+        # Whatever is left waits in a cycle of requirements
+        for task in pending:
+            if task.status == PENDING:
+                task.status = CANCELLED
+        return tasks
+
+    def shutdown(self, wait: bool = True):
+        """Stop the worker threads; a later concurrent run starts new ones."""
+        with self._pool_lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=wait)
+
+    def _executor(self):
+        """The pool shared by the runs of this fan-out (runs from several threads queue in it)."""
+        with self._pool_lock:
+            if self._pool is None:
+                from concurrent.futures import ThreadPoolExecutor
+                self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='mace-step')
+            return self._pool
+
+    def _next_runnable(self, pending: List[StepTask], by_key: Dict, busy_chains: set) -> Optional[StepTask]:
+        """First pending task whose requirements are done and whose chain is free."""
+        blocked_chains = set(busy_chains)
+        for task in list(pending):
+            if task.status == CANCELLED:
+                pending.remove(task)
+                continue
+            if task.chain is not None:
+                if task.chain in blocked_chains:
+                    continue
+                blocked_chains.add(task.chain)  # Later tasks of the chain wait for this one
+            if all(by_key[key].status == DONE for key in task.requires if key in by_key):
+                return task
+        return None
+
+    def _execute(self, task: StepTask, in_pool: bool = False):
+        # A nested inline run restores the outer step's state and adds its stage times to it
+        outer_timings = getattr(_local, 'timings', None)
+        outer_stage = getattr(_local, 'stage', None)
+        _local.timings, _local.stage = task.timings, None
+        _local.in_pool = in_pool or getattr(_local, 'in_pool', False)
+        start = time.perf_counter()
+        try:
+            task.result = task.function()
+        except BaseException as e:
+            task.error = e
+        finally:
+            task.wall = time.perf_counter() - start
+            _local.timings, _local.stage = outer_timings, outer_stage
+            if in_pool:
+                _local.in_pool = False
+            if outer_timings is not None and outer_stage is None:
+                for name, seconds in task.timings.items():
+                    outer_timings[name] = outer_timings.get(name, 0.0) + seconds
+
+    def _finish(self, task: StepTask, by_key: Dict):
+        """Set the final status of a task and cancel what depends on a failure."""
+        task.status = DONE if task.error is None and task.result is not None else FAILED
+        if task.status == DONE:
+            return
+        failed = [task]
+        while failed:
+            cause = failed.pop()
+            for other in by_key.values():
+                if other.status != PENDING:
+                    continue
+                chained = cause.critical and cause.chain is not None and other.chain == cause.chain
+                if cause.key in other.requires or chained:
+                    other.status = CANCELLED
+                    other.cancelled_by = task.key
+                    failed.append(other)
+
+
+def summarize_timings(tasks: Iterable[StepTask]) -> Dict[str, float]:
+    """Total seconds per stage over the tasks that ran, with 'steps' (their wall time) and 'other'."""
+    totals: Dict[str, float] = {}
+    steps = 0.0
+    for task in tasks:
+        if task.status in (DONE, FAILED):
+            steps += task.wall
+            for name, seconds in task.timings.items():
+                totals[name] = totals.get(name, 0.0) + seconds
+    totals['other'] = max(0.0, steps - sum(totals.values()))
+    totals['steps'] = steps
+    return totals
+
+
+def format_timings(tasks: List[StepTask], wall: Optional[float] = None) -> str:
+    """One-line summary of the stage times of a fan-out."""
+    totals = summarize_timings(tasks)
+    ran = sum(1 for task in tasks if task.status in (DONE, FAILED))
+    stages = ', '.join(f"{name} {seconds:.2f}s" for name, seconds in
+                       sorted(totals.items(), key=lambda item: -item[1])
+                       if name != 'steps' and seconds >= 0.005)
+    line = f"{ran} step(s), {totals['steps']:.2f}s step time"
+    if wall is not None:
+        line += f" in {wall:.2f}s wall"
+    return f"{line}" + (f" ({stages})" if stages else "")
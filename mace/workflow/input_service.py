@@ -0,0 +1,317 @@
+#!/usr/bin/env python3
+"""
+Input Generation Service for MACE
+=================================
+
+Generates follow-up D12 and D3 inputs through the programmatic entry points
+of CRYSTALOptToD12.py (generate_d12) and CRYSTALOptToD3.py
+(generate_d3_from_config) instead of starting a Python interpreter per input.
+
+The scripts run in a small pool of worker processes that import them once
+and are reused for every workflow step, so each input costs only the
+parsing and writing. Workers keep the scripts' global state, working
+directory and output away from the engine; their stdin is empty, so a script
+that would prompt fails with needs_input set and the caller can fall back to
+running the script interactively. The workers are started with forkserver
+(spawn where it is unavailable), never forked from the engine's threads.
+
+In-process jobs capture the output and stdin of the calling thread only:
+sys.stdout and sys.stdin are replaced once by proxies that pass every other
+thread through to the real streams, so the step fan-out threads keep
+printing normally while an input is generated.
+
+Environment:
+  MACE_INPUT_SERVICE=0      Disable the service (callers run the scripts as before)
+  MACE_INPUT_WORKERS=N      Worker processes (default 2, 0 generates in-process)
+
+Usage:
+  from mace.workflow.input_service import get_input_service
+  service = get_input_service(engine.script_paths)
+  result = service.generate_d12("mat.out", "mat.d12", {"calculation_type": "SP"}, output_dir)
+  if result['success']:
+      print(result['d12_file'])
+"""
+
+import io
+import os
+import sys
+import atexit
+import importlib
+import threading
+from contextlib import contextmanager, redirect_stdout
+from pathlib import Path
+from typing import Any, Dict, Optional, Sequence
+
+
+REPO_ROOT = Path(__file__).resolve().parents[2]
+DEFAULT_WORKERS = int(os.environ.get('MACE_INPUT_WORKERS', '2'))
+DEFAULT_TIMEOUT = 3600  # Same limit as the script subprocesses
+
+# Input kind -> (script module, entry point)
+ENTRY_POINTS = {
+    'd12': ('CRYSTALOptToD12', 'generate_d12'),
+    'd3': ('CRYSTALOptToD3', 'generate_d3_from_config'),
+}
+
+
+def _add_script_dirs(script_dirs: Sequence[str]):
+    """Make the script modules importable (first directory wins)."""
+    for directory in reversed(script_dirs):
+        if directory not in sys.path:
+            sys.path.insert(0, directory)
+
+
+def _init_worker(script_dirs: Sequence[str]):
+    """Pool initializer: import the scripts once per worker."""
+    _add_script_dirs(script_dirs)
+    with redirect_stdout(io.StringIO()):
+        for module_name, _ in ENTRY_POINTS.values():
+            try:
+                importlib.import_module(module_name)
+            except Exception:
+                pass  # Reported by the first job that needs the module
+
+
+class _ThreadStream:
+    """Stand-in for sys.stdout/sys.stdin that threads can redirect for themselves."""
+
+    def __init__(self, stream):
+        self._stream = stream
+        self._local = threading.local()
+
+    def _target(self):
+        return getattr(self._local, 'stream', None) or self._stream
+
+    def __getattr__(self, name):
+        return getattr(self._target(), name)
+
+    def __iter__(self):
+        return iter(self._target())
+
+
+_stdio_lock = threading.Lock()
+
+
+def _thread_stream(name: str) -> _ThreadStream:
+    """The proxy installed as sys.<name>, installing it on first use."""
+    with _stdio_lock:
+        stream = getattr(sys, name)
+        if not isinstance(stream, _ThreadStream):
+            stream = _ThreadStream(stream)
+            setattr(sys, name, stream)
+        return stream
+
+
+@contextmanager
+def _captured_stdio(log: io.StringIO):
+    """Send this thread's output to log and give it an empty stdin."""
+    stdout, stdin = _thread_stream('stdout'), _thread_stream('stdin')
+    stdout._local.stream, stdin._local.stream = log, io.StringIO()
+    try:
+        yield
+    finally:
+        stdout._local.stream = stdin._local.stream = None
+
+
+def _run_job(kind: str, kwargs: Dict[str, Any], work_dir: Optional[str], isolated: bool) -> Dict[str, Any]:
+    """
+    Run one entry point with its output captured and an empty stdin.
+
+    Args:
+        kind: Key of ENTRY_POINTS
+        kwargs: Arguments of the entry point
+        work_dir: Working directory of the job (only entered when isolated)
+        isolated: True in a worker process, False when run in the caller
+
+    Returns:
+        {'success', 'result', 'needs_input', 'error', 'output'}
+    """
+    module_name, function_name = ENTRY_POINTS[kind]
+    outcome = {'success': False, 'result': None, 'needs_input': False, 'error': None}
+    log = io.StringIO()
+    cwd = os.getcwd()
+    try:
+        with _captured_stdio(log):
+            if isolated and work_dir:
+                os.makedirs(work_dir, exist_ok=True)
+                os.chdir(work_dir)
+            function = getattr(importlib.import_module(module_name), function_name)
+            outcome['result'] = function(**kwargs)
+        outcome['success'] = outcome['result'] is not None
+        if not outcome['success']:
+            lines = log.getvalue().strip().splitlines()
+            outcome['error'] = lines[-1].strip() if lines else f"{function_name} failed"
+    except EOFError:
+        outcome['needs_input'] = True
+        outcome['error'] = f"{module_name}.py asked for interactive input"
+    except SystemExit as e:
+        outcome['error'] = f"{module_name}.py exited with status {e.code}"
+    except Exception as e:
+        outcome['error'] = f"{type(e).__name__}: {e}"
+    finally:
+        if isolated:
+            os.chdir(cwd)
+    outcome['output'] = log.getvalue()
+    return outcome
+
+
+class InputGenerationService:
+    """Pool of warm worker processes generating D12 and D3 inputs."""
+
+    def __init__(self, script_dirs: Sequence[Path] = None, max_workers: Optional[int] = None,
+                 timeout: float = DEFAULT_TIMEOUT):
+        """
+        Args:
+            script_dirs: Directories of CRYSTALOptToD12.py and CRYSTALOptToD3.py
+                         (default: Crystal_d12 and Crystal_d3 of this repository)
+            max_workers: Worker processes (default MACE_INPUT_WORKERS; 0 runs in-process)
+            timeout: Seconds to wait for one input
+        """
+        if script_dirs is None:
+            script_dirs = [REPO_ROOT / "Crystal_d12", REPO_ROOT / "Crystal_d3"]
+        self.script_dirs = [str(Path(d).resolve()) for d in script_dirs]
+        self.max_workers = DEFAULT_WORKERS if max_workers is None else max_workers
+        self.timeout = timeout
+        self.generated = 0
+        self._executor = None
+        self._lock = threading.Lock()
+        self._inprocess_lock = threading.Lock()  # The scripts keep global state
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None and self.max_workers > 0:
+                try:
+                    # Imported here: multiprocessing is not needed to import the engine
+                    import multiprocessing
+                    from concurrent.futures import ProcessPoolExecutor
+                    # Forking the multithreaded engine could copy locks held by other threads
+                    method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+                    self._executor = ProcessPoolExecutor(max_workers=self.max_workers,
+                                                         mp_context=multiprocessing.get_context(method),
+                                                         initializer=_init_worker,
+                                                         initargs=(self.script_dirs,))
+                except (ImportError, OSError, ValueError) as e:
+                    print(f"Warning: Input generation workers unavailable ({e}), generating in-process")
+                    self.max_workers = 0
+            return self._executor
+
+    def _discard_executor(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+    def _run(self, kind: str, kwargs: Dict[str, Any], work_dir: Optional[Path]) -> Dict[str, Any]:
+        work_dir = str(work_dir) if work_dir else None
+        executor = self._get_executor()
+        if executor is not None:
+            from concurrent.futures import TimeoutError as FutureTimeoutError
+            from concurrent.futures.process import BrokenProcessPool
+            try:
+                future = executor.submit(_run_job, kind, kwargs, work_dir, True)
+                return future.result(timeout=self.timeout)
+            except FutureTimeoutError:
+                # The worker may be stuck: start a fresh pool for the next input
+                self._discard_executor()
+                return {'success': False, 'result': None, 'needs_input': False, 'output': '',
+                        'error': f"Input generation timed out after {self.timeout}s"}
+            except BrokenProcessPool as e:
+                print(f"Warning: Input generation workers stopped ({e}), generating in-process")
+                self._discard_executor()
+                self.max_workers = 0
+        with self._inprocess_lock:
+            _add_script_dirs(self.script_dirs)
+            return _run_job(kind, kwargs, work_dir, False)
+
+    def _result(self, outcome: Dict[str, Any]) -> Dict[str, Any]:
+        result = {key: outcome[key] for key in ('success', 'needs_input', 'error', 'output')}
+        if outcome['success']:
+            result.update(outcome['result'])
+            self.generated += 1
+        return result
+
+    def generate_d12(self, output_file: Path, input_file: Optional[Path] = None,
+                     config: Optional[Dict[str, Any]] = None,
+                     output_dir: Optional[Path] = None) -> Dict[str, Any]:
+        """
+        Generate a D12 input from a CRYSTAL output (CRYSTALOptToD12.generate_d12).
+
+        Args:
+            output_file: CRYSTAL output file (.out)
+            input_file: Its D12 input file
+            config: CRYSTALOptToD12 config settings (as in a --config-file)
+            output_dir: Directory for the new file (default: next to output_file)
+
+        Returns:
+            {'success', 'needs_input', 'error', 'output'} and, on success,
+            'd12_file', 'calc_type' and 'options'
+        """
+        # Absolute paths: a worker runs the script in output_dir
+        kwargs = {
+            'output_file': os.path.abspath(output_file),
+            'input_file': os.path.abspath(input_file) if input_file else None,
+            'config': config,
+            'output_dir': os.path.abspath(output_dir) if output_dir else None,
+        }
+        return self._result(self._run('d12', kwargs, output_dir or Path(output_file).parent))
+
+    def generate_d3(self, output_file: Path, config: Dict[str, Any], calc_type: Optional[str] = None,
+                    output_dir: Optional[Path] = None) -> Dict[str, Any]:
+        """
+        Generate a D3 input from a CRYSTAL output (CRYSTALOptToD3.generate_d3_from_config).
+
+        Args:
+            output_file: CRYSTAL output file (.out) next to its wavefunction
+            config: D3 configuration (as in the "configuration" of a D3 config file)
+            calc_type: Calculation type, if the config has no calculation_type
+            output_dir: Directory for the D3 and wavefunction files
+
+        Returns:
+            {'success', 'needs_input', 'error', 'output'} and, on success,
+            'd3_file', 'wavefunction_file', 'calc_type' and 'config'
+        """
+        # Absolute paths: a worker runs the script in output_dir
+        kwargs = {
+            'input_file': os.path.abspath(output_file),
+            'config': config,
+            'calc_type': calc_type,
+            'output_dir': os.path.abspath(output_dir) if output_dir else None,
+        }
+        return self._result(self._run('d3', kwargs, output_dir or Path(output_file).parent))
+
+    def close(self):
+        """Stop the worker processes."""
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
+                self._executor = None
+
+
+_services: Dict[tuple, InputGenerationService] = {}
+_services_lock = threading.Lock()
+
+
+def get_input_service(script_paths: Optional[Dict[str, Path]] = None) -> Optional[InputGenerationService]:
+    """
+    Shared service for the scripts in script_paths (WorkflowEngine.script_paths).
+
+    Returns:
+        The service, or None when disabled with MACE_INPUT_SERVICE=0
+    """
+    if os.environ.get('MACE_INPUT_SERVICE', '1') == '0':
+        return None
+    script_paths = script_paths or {}
+    script_dirs = tuple(
+        str(Path(script_paths[key]).parent) if script_paths.get(key) else str(REPO_ROOT / default)
+        for key, default in (('crystal_to_d12', 'Crystal_d12'), ('crystal_to_d3', 'Crystal_d3'))
+    )
+    with _services_lock:
+        if script_dirs not in _services:
+            _services[script_dirs] = InputGenerationService(script_dirs)
+        return _services[script_dirs]
+
+
+@atexit.register
+def _close_services():
+    for service in list(_services.values()):
+        service.close()
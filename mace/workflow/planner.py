@@ -97,9 +97,10 @@ class WorkflowPlanner:
     4. Queue management and execution
     """
 
-    def __init__(self, work_dir: str = ".", db_path: str = "materials.db"):
+    def __init__(self, work_dir: str = ".", db_path: str = "materials.db", cif_jobs: Optional[int] = None):
         self.work_dir = Path(work_dir).resolve()
         self.db_path = db_path
+        self.cif_jobs = cif_jobs  # Worker processes for CIF conversion (None: CPU count)
         # Database is not needed during planning phase - will be created by executor if needed
         # self.db = MaterialDatabase(db_path)  # Removed to prevent unnecessary database creation
 
@@ -4454,8 +4455,15 @@ class WorkflowPlanner:
             print("Falling back to basic execution...")
             self.execute_calculation_sequence(plan, queue_manager)
 
-    def convert_cifs_to_d12s(self, plan: Dict[str, Any]):
-        """Convert CIF files to D12 format using saved configuration"""
+    def convert_cifs_to_d12s(self, plan: Dict[str, Any], jobs: Optional[int] = None):
+        """
+        Convert CIF files to D12 format using saved configuration
+
+        Args:
+            plan: Workflow plan
+            jobs: Conversion worker processes (default: --jobs of the planner,
+                  plan 'cif_conversion_jobs' or CPU count)
+        """
         # Check if D12 files already exist (skip if already done)
         input_dir = Path(plan["input_directory"])
         existing_d12s = list(input_dir.glob("*.d12"))
@@ -4484,7 +4492,7 @@ class WorkflowPlanner:
             workflow_id = f"temp_conversion_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
 
             # Run the conversion using the proper executor
-            executor.convert_cifs_with_config(plan, workflow_id)
+            executor.convert_cifs_with_config(plan, workflow_id, jobs=jobs or self.cif_jobs)
             print("CIF conversion completed successfully!")
 
         except Exception as e:
@@ -4778,10 +4786,12 @@ def main():
     parser.add_argument("--work-dir", default=".", help="Working directory")
     parser.add_argument("--db-path", default="materials.db", help="Database path")
     parser.add_argument("--execute", help="Execute saved workflow plan")
+    parser.add_argument("--jobs", type=int, default=None,
+                        help="Worker processes for CIF to D12 conversion (default: number of CPUs)")
 
     args = parser.parse_args()
 
-    planner = WorkflowPlanner(args.work_dir, args.db_path)
+    planner = WorkflowPlanner(args.work_dir, args.db_path, cif_jobs=args.jobs)
 
     if args.execute:
         plan_file = Path(args.execute)
@@ -7,7 +7,6 @@ This shows how to add isolation support with minimal code changes.
 
 import sys
 import os
-from pathlib import Path
 
 # Minimal change: Import contextual versions with same names
 try:
@@ -94,8 +93,7 @@ def run_workflow_with_optional_isolation():
             print("Isolation support activated")
     
     # Import and run the original run_workflow
-    sys.path.insert(0, str(Path(__file__).parent.parent))
-    from run_workflow import main as original_main
+    from mace.run_workflow import main as original_main
     
     # Run with isolation support (if enabled)
     original_main()
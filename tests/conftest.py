@@ -0,0 +1,18 @@
+"""Shared fixtures for the MACE test suite."""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT))
+
+
+@pytest.fixture
+def db(tmp_path):
+    """An empty MaterialDatabase in a temporary directory."""
+    from mace.database.materials import MaterialDatabase
+    database = MaterialDatabase(str(tmp_path / "materials.db"), str(tmp_path / "structures.db"))
+    yield database
+    database.close()
@@ -0,0 +1,121 @@
+"""SQL aggregation (PropertyAggregator._aggregate_sql) against the Python path."""
+
+import math
+import statistics
+from datetime import datetime, timedelta
+
+import pytest
+
+from mace.database.analysis.aggregation import PropertyAggregator, percentile
+
+PROPERTIES = ["band_gap", "total_energy"]
+
+# material_id -> (formula, space group, band gap, total energy, [(calc_type, status), ...] oldest first)
+MATERIALS = {
+    "mat_1": ("ZnO", 186, 3.3, -1500.0, [("OPT", "completed"), ("SP", "failed")]),
+    "mat_2": ("ZnS", 216, 3.6, -2300.0, [("OPT", "completed")]),
+    "mat_3": ("Si", 227, 1.1, -580.0, [("OPT", "completed"), ("BAND", "completed")]),
+    "mat_4": ("C", 227, 5.5, -76.0, [("OPT", "running")]),
+    "mat_5": ("GaN", 186, 3.4, -4000.0, [("OPT", "failed")]),
+    "mat_6": ("MgO", 225, 7.8, -275.0, [("OPT", "completed"), ("SP", "completed")]),
+    "mat_7": ("TiO2", 136, 3.0, None, []),
+    "mat_8": ("Cu", 225, None, -3300.0, [("OPT", "completed")]),
+    "mat_9": ("X", None, "n/a", None, []),
+}
+
+CASES = [
+    ("crystal_system", "median", None),
+    ("crystal_system", "p25", None),
+    ("crystal_system", "stdev", None),
+    ("calculation_type", "mean", None),
+    ("convergence_status", "count", None),
+    ("crystal_system", "mean", ["band_gap > 3"]),
+    ("convergence_status", "median", ["band_gap > 3", "formula LIKE 'Zn%' OR formula LIKE 'Ga%'"]),
+]
+
+
+@pytest.fixture
+def aggregator(db):
+    start = datetime(2025, 1, 1)
+    materials, properties, calculations = [], [], []
+    for i, (material_id, (formula, space_group, band_gap, energy, calcs)) in enumerate(MATERIALS.items()):
+        created = (start + timedelta(minutes=i)).isoformat()
+        materials.append((material_id, formula, space_group, created, created))
+        if isinstance(band_gap, str):
+            properties.append((material_id, "electronic", "band_gap", None, band_gap, created))
+        elif band_gap is not None:
+            properties.append((material_id, "electronic", "band_gap", band_gap, None, created))
+        if energy is not None:
+            properties.append((material_id, "thermodynamic", "total_energy", energy, None, created))
+        for k, (calc_type, status) in enumerate(calcs):
+            calc_created = (start + timedelta(minutes=i, seconds=k)).isoformat()
+            calculations.append((f"{material_id}_calc{k}", material_id, calc_type, status, calc_created))
+
+    with db._get_connection() as conn:
+        conn.executemany("INSERT INTO materials (material_id, formula, space_group, created_at, updated_at) "
+                         "VALUES (?, ?, ?, ?, ?)", materials)
+        conn.executemany("INSERT INTO properties (material_id, property_category, property_name, "
+                         "property_value, property_value_text, extracted_at) VALUES (?, ?, ?, ?, ?, ?)",
+                         properties)
+        conn.executemany("INSERT INTO calculations (calc_id, material_id, calc_type, status, created_at) "
+                         "VALUES (?, ?, ?, ?, ?)", calculations)
+    return PropertyAggregator(db)
+
+
+def _close(a, b):
+    if isinstance(a, (int, float)) and isinstance(b, (int, float)):
+        return math.isclose(a, b, rel_tol=1e-9, abs_tol=1e-9)
+    return a == b
+
+
+@pytest.mark.parametrize("group_by, aggregation, filters", CASES)
+def test_sql_matches_python(aggregator, capsys, group_by, aggregation, filters):
+    sql = aggregator.aggregate_by_group(group_by, PROPERTIES, aggregation, filters)
+    assert "Warning" not in capsys.readouterr().out  # No fallback to the Python path
+    python = aggregator.aggregate_by_group(group_by, PROPERTIES, aggregation, filters, pushdown=False)
+
+    assert sql["total_materials"] == python["total_materials"]
+    assert list(sql["groups"]) == list(python["groups"])
+    for name, group in sql["groups"].items():
+        expected = python["groups"][name]
+        assert group["material_count"] == expected["material_count"]
+        assert group["material_ids"] == expected["material_ids"]
+        assert set(group["properties"]) == set(expected["properties"])
+        for prop, stats in group["properties"].items():
+            for key, value in stats.items():
+                assert _close(value, expected["properties"][prop].get(key)), (name, prop, key)
+
+
+def test_crystal_system_statistics(aggregator):
+    cubic_gaps = [3.6, 1.1, 5.5, 7.8]  # mat_8 has no band gap
+    median = aggregator.aggregate_by_group("crystal_system", ["band_gap"], "median")["groups"]
+    assert median["cubic"]["material_count"] == 5
+    assert median["cubic"]["properties"]["band_gap"]["value"] == pytest.approx(4.55)
+    assert median["cubic"]["properties"]["band_gap"]["count"] == 4
+    assert median["cubic"]["properties"]["band_gap"]["stdev"] == pytest.approx(statistics.stdev(cubic_gaps))
+    assert median["Unknown"]["properties"] == {}
+
+    p25 = aggregator.aggregate_by_group("crystal_system", ["band_gap"], "p25")["groups"]
+    assert p25["cubic"]["properties"]["band_gap"]["value"] == pytest.approx(percentile(cubic_gaps, 25))
+    stdev = aggregator.aggregate_by_group("crystal_system", ["band_gap"], "stdev")["groups"]
+    assert stdev["hexagonal"]["properties"]["band_gap"]["value"] == pytest.approx(statistics.stdev([3.3, 3.4]))
+
+
+def test_groups_by_latest_calculation(aggregator):
+    calc_types = aggregator.aggregate_by_group("calculation_type", PROPERTIES, "count")["groups"]
+    assert {name: group["material_count"] for name, group in calc_types.items()} == {
+        "No calculations": 2, "OPT": 4, "SP": 2, "BAND": 1}
+
+    statuses = aggregator.aggregate_by_group("convergence_status", PROPERTIES, "count")["groups"]
+    assert {name: sorted(group["material_ids"]) for name, group in statuses.items()} == {
+        "No calculations": ["mat_7", "mat_9"],
+        "completed": ["mat_2", "mat_3", "mat_6", "mat_8"],
+        "failed": ["mat_1", "mat_5"],
+        "running": ["mat_4"],
+    }
+
+
+def test_filter_expression(aggregator):
+    results = aggregator.aggregate_by_group("crystal_system", ["band_gap"], "mean", ["band_gap > 3.5"])
+    assert results["total_materials"] == 3  # mat_2, mat_4, mat_6
+    assert results["groups"]["cubic"]["properties"]["band_gap"]["value"] == pytest.approx((3.6 + 5.5 + 7.8) / 3)
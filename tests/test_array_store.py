@@ -0,0 +1,84 @@
+"""Array store writes are committed together with their property rows."""
+
+import sqlite3
+import sys
+from datetime import datetime
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from conftest import REPO_ROOT
+from mace.database.array_store import ArrayStore, load_property_array
+from mace.utils.property_extractor import CrystalPropertyExtractor
+
+
+def _extraction(calc_id, scale=1.0):
+    return {
+        "_metadata": {"material_id": "mat_1", "calc_id": calc_id, "extracted_at": datetime.now().isoformat()},
+        "energy_points": [scale * i for i in range(50)],
+        "total_dos": [scale * i * i for i in range(50)],
+        "band_gap": 1.5 * scale,
+    }
+
+
+@pytest.fixture
+def extractor(db):
+    ex = CrystalPropertyExtractor.__new__(CrystalPropertyExtractor)
+    ex.db = db
+    return ex
+
+
+def _array_files(db):
+    return sorted(path.name for path in ArrayStore(db).store_dir.rglob("*") if path.is_file())
+
+
+def test_arrays_and_properties_are_stored_together(db, extractor):
+    assert extractor.save_many_properties_to_database([_extraction("calc_1")], raise_errors=True) == 3
+    array, _ = load_property_array(db, "calc_1", "total_dos")
+    assert array.tolist() == [float(i * i) for i in range(50)]
+    assert _array_files(db) == ["energy_points.npy", "total_dos.npy"]
+
+
+def test_failed_upsert_leaves_no_index_rows_or_files(db, extractor, monkeypatch):
+    def fail(conn, rows, *args, **kwargs):
+        raise sqlite3.OperationalError("disk I/O error")
+    monkeypatch.setattr(db, "_upsert_properties", fail)
+
+    with pytest.raises(sqlite3.OperationalError):
+        extractor.save_many_properties_to_database([_extraction("calc_1")], raise_errors=True)
+    assert ArrayStore(db).list_arrays() == []
+    assert _array_files(db) == []
+
+
+def test_failed_update_keeps_the_previous_arrays(db, extractor, monkeypatch):
+    extractor.save_many_properties_to_database([_extraction("calc_1")], raise_errors=True)
+
+    def fail(conn, rows, *args, **kwargs):
+        raise sqlite3.OperationalError("database is locked")
+    monkeypatch.setattr(db, "_upsert_properties", fail)
+    assert extractor.save_many_properties_to_database([_extraction("calc_1", scale=2.0)]) == 0
+
+    array, _ = load_property_array(db, "calc_1", "energy_points")
+    assert array.tolist() == [float(i) for i in range(50)]
+    assert [record["shape"] for record in ArrayStore(db).list_arrays("calc_1")] == [[50], [50]]
+    assert _array_files(db) == ["energy_points.npy", "total_dos.npy"]
+
+
+def test_dos_plot_reports_a_missing_array_file(db, extractor):
+    # autoDOS imports matplotlib.pyplot at module level
+    pytest.importorskip("matplotlib")
+    sys.path.insert(0, str(REPO_ROOT / "code" / "NewPlotting_Scripts" / "AutoDOS"))
+    import autoDOS
+
+    db.create_material("mat_1", "C")
+    calc_id = db.create_calculation("mat_1", "DOSS")
+    with db._get_connection() as conn:
+        conn.execute("UPDATE calculations SET input_settings_json = '{}' WHERE calc_id = ?", (calc_id,))
+    extractor.save_many_properties_to_database([_extraction(calc_id)], raise_errors=True)
+    assert autoDOS.get_dos_data(db.db_path, "mat_1")[0].tolist() == [float(i) for i in range(50)]
+
+    for path in ArrayStore(db).store_dir.rglob("*.npy"):
+        path.unlink()
+    with pytest.raises(ValueError, match="Array file missing for energy_points"):
+        autoDOS.get_dos_data(db.db_path, "mat_1")
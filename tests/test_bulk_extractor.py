@@ -0,0 +1,89 @@
+"""Checkpointing of mace extract (BulkPropertyExtractor)."""
+
+import json
+import shutil
+import sqlite3
+from pathlib import Path
+
+import pytest
+
+from mace.utils.bulk_extractor import BulkPropertyExtractor
+from mace.utils.property_extractor import CrystalPropertyExtractor
+
+SAMPLES = sorted((Path(__file__).resolve().parent.parent / "cif" / "crystalouputs").glob("*.out"))[:3]
+
+
+@pytest.fixture
+def outputs(tmp_path):
+    directory = tmp_path / "outputs"
+    directory.mkdir()
+    for sample in SAMPLES:
+        shutil.copy(sample, directory / sample.name)
+    return BulkPropertyExtractor.find_output_files(directory)
+
+
+def _extractor(tmp_path):
+    return BulkPropertyExtractor(str(tmp_path / "materials.db"), jobs=1, batch_size=2,
+                                 checkpoint_file=str(tmp_path / "checkpoint.json"))
+
+
+def _stored_files(tmp_path):
+    conn = sqlite3.connect(str(tmp_path / "materials.db"))
+    count = conn.execute("SELECT COUNT(DISTINCT material_id) FROM properties").fetchone()[0]
+    conn.close()
+    return count
+
+
+def test_failed_write_is_not_checkpointed(tmp_path, outputs, monkeypatch):
+    bulk = _extractor(tmp_path)
+
+    def fail(conn, rows, *args, **kwargs):
+        raise sqlite3.OperationalError("database is locked")
+
+    monkeypatch.setattr(bulk.writer.db, "_upsert_properties", fail)
+    stats = bulk.run(outputs)
+    assert stats['unsaved'] == len(outputs)
+    assert stats['properties'] == 0
+    assert not bulk.checkpoint
+
+    # --resume extracts and stores every file again
+    monkeypatch.undo()
+    stats = _extractor(tmp_path).run(outputs, resume=True)
+    assert stats['skipped'] == 0
+    assert stats['unsaved'] == 0
+    assert _stored_files(tmp_path) == len(outputs)
+
+
+def test_resume_skips_stored_files(tmp_path, outputs):
+    first = _extractor(tmp_path).run(outputs)
+    assert first['properties'] > 0
+    assert first['unsaved'] == 0
+
+    second = _extractor(tmp_path).run(outputs, resume=True)
+    assert second['skipped'] == len(outputs)
+    assert second['files'] == 0
+
+
+def test_failed_extraction_is_retried_by_resume(tmp_path, outputs, monkeypatch):
+    extract = CrystalPropertyExtractor.extract_all_properties
+
+    def fail_first(self, output_file, *args, **kwargs):
+        if Path(output_file) == outputs[0]:
+            raise ValueError("truncated output")
+        return extract(self, output_file, *args, **kwargs)
+
+    monkeypatch.setattr(CrystalPropertyExtractor, "extract_all_properties", fail_first)
+    bulk = _extractor(tmp_path)
+    stats = bulk.run(outputs)
+    assert stats['failed'] == 1
+    assert bulk.failed == {str(outputs[0])}
+    assert str(outputs[0]) not in bulk.checkpoint
+    assert json.loads((tmp_path / "checkpoint.json").read_text())['failed'] == [str(outputs[0])]
+
+    # --resume extracts only the failed file, and forgets the failure once it succeeds
+    monkeypatch.undo()
+    bulk = _extractor(tmp_path)
+    stats = bulk.run(outputs, resume=True)
+    assert (stats['skipped'], stats['files'], stats['failed']) == (len(outputs) - 1, 1, 0)
+    assert not bulk.failed
+    assert _stored_files(tmp_path) == len(outputs)
@@ -0,0 +1,162 @@
+"""Query counts of the lookups answered by MaterialCalcIndex."""
+
+import contextlib
+import io
+import json
+from contextlib import redirect_stdout
+
+import pytest
+
+from mace.database.calc_index import MaterialCalcIndex
+from mace.database.materials import MaterialDatabase
+from mace.recovery.recovery import ErrorRecoveryEngine
+from mace.workflow.engine import WorkflowEngine
+from mace.workflow.fanout import StepFanout
+
+WORKFLOW_ID = "workflow_test"
+
+
+class CountingDatabase(MaterialDatabase):
+    """MaterialDatabase that counts the SELECT statements it runs."""
+
+    def __init__(self, *args, **kwargs):
+        self.selects = 0
+        super().__init__(*args, **kwargs)
+
+    def _open_connection(self, read_only: bool = False):
+        conn = super()._open_connection(read_only)
+        conn.set_trace_callback(self._trace)
+        return conn
+
+    def _trace(self, statement):
+        if statement.lstrip().upper().startswith("SELECT"):
+            self.selects += 1
+
+
+class RecordingEngine(WorkflowEngine):
+    """Workflow engine whose property calculations are only recorded."""
+
+    def generate_property_calculation(self, source_calc_id, target_calc_type):
+        material_id = source_calc_id.rsplit("_", 1)[0]  # Built as <material>_sp
+        return self.db.create_calculation(material_id, target_calc_type, prerequisite_calc_id=source_calc_id,
+                                          settings={"workflow_id": WORKFLOW_ID})
+
+
+def insert_calcs(db, rows):
+    """Insert (calc_id, material_id, calc_type, status, error_type, settings) rows."""
+    with db._get_connection() as conn:
+        conn.executemany("""
+            INSERT INTO calculations (calc_id, material_id, calc_type, status, error_type,
+                                      settings_json, created_at)
+            VALUES (?, ?, ?, ?, ?, ?, strftime('%Y-%m-%dT%H:%M:%f', 'now'))
+        """, [(calc_id, material_id, calc_type, status, error_type, json.dumps(settings))
+              for calc_id, material_id, calc_type, status, error_type, settings in rows])
+
+
+def build_failures(db_path, n_failures):
+    """Plain failures, recovery chains at and below the retry limit, unhandled errors; returns the recoverable ids."""
+    db = MaterialDatabase(str(db_path))
+    rows, expected = [], set()
+    n_failed, i = 0, 0
+    while n_failed < n_failures:
+        material_id = f"mat_{i // 4:05d}"
+        if i % 4 == 0:
+            db.create_material(material_id, "C")
+            rows.append((f"{material_id}_opt", material_id, "OPT", "completed", None, {}))
+        original = f"{material_id}_sp{i % 4}"
+        if i % 4 == 3:
+            # No handler for this error type
+            rows.append((original, material_id, "SP", "failed", "unknown_error", {}))
+            n_failed += 1
+        else:
+            # 0, 1 or 3 failed recovery attempts (shrink_error allows 3)
+            attempts = {0: 0, 1: 1, 2: 3}[i % 4]
+            chain = [original] + [f"{original}_r{n}" for n in range(1, attempts + 1)]
+            for n, calc_id in enumerate(chain):
+                settings = {"is_recovery_attempt": True, "parent_calc_id": chain[n - 1]} if n else {}
+                rows.append((calc_id, material_id, "SP", "failed", "shrink_error", settings))
+            n_failed += len(chain)
+            if attempts < 3:
+                expected.add(chain[-1])  # Only the newest attempt of a chain is recovered
+        i += 1
+    insert_calcs(db, rows)
+    db.close()
+    return expected
+
+
+def build_completions(work_dir, n_completions):
+    """Completed OPT -> SP chains with pending SP events; the first material also has its OPT event."""
+    (work_dir / "workflow_configs").mkdir(parents=True)
+    (work_dir / "workflow_configs" / "workflow_plan_test.json").write_text(
+        json.dumps({"workflow_sequence": ["OPT", "SP", "BAND", "DOSS"]}))
+    db = MaterialDatabase(str(work_dir / "materials.db"))
+    settings = {"workflow_id": WORKFLOW_ID}
+    rows = []
+    for i in range(n_completions):
+        material_id = f"mat_{i:05d}"
+        db.create_material(material_id, "C")
+        rows.append((f"{material_id}_opt", material_id, "OPT", "completed", None, settings))
+        rows.append((f"{material_id}_sp", material_id, "SP", "completed", None, settings))
+    insert_calcs(db, rows)
+    with db._get_connection() as conn:
+        conn.execute("UPDATE workflow_events SET consumed_at = CURRENT_TIMESTAMP "
+                     "WHERE calc_id LIKE '%_opt' AND calc_id != 'mat_00000_opt'")
+    db.close()
+
+
+def workflow_run(work_dir, use_index):
+    """SELECT statements of process_completed_calculations and the calculations it created."""
+    with redirect_stdout(io.StringIO()):
+        engine = RecordingEngine(str(work_dir / "materials.db"), str(work_dir))
+    engine.db = CountingDatabase(str(work_dir / "materials.db"))
+    engine.step_fanout = StepFanout(max_workers=1)
+    if not use_index:
+        engine.calc_index_scope = lambda material_ids: contextlib.nullcontext()
+
+    engine.db.selects = 0
+    with redirect_stdout(io.StringIO()):
+        engine.process_completed_calculations()
+    selects = engine.db.selects
+    created = sorted((calc["material_id"], calc["calc_type"])
+                     for calc in engine.db.get_calculations_by_status()
+                     if calc["calc_type"] not in ("OPT", "SP"))
+    engine.close()
+    return selects, created
+
+
+@pytest.mark.parametrize("n_failures", [40, 400])
+def test_recovery_sweep_query_count_does_not_grow_with_failures(tmp_path, n_failures):
+    db_path = tmp_path / "materials.db"
+    expected = build_failures(db_path, n_failures)
+    with redirect_stdout(io.StringIO()):
+        recovery = ErrorRecoveryEngine(str(db_path), str(tmp_path / "no_config.yaml"))
+    recovery.db = db = CountingDatabase(str(db_path))
+
+    db.selects = 0
+    recoverable = recovery.get_recoverable_calculations()
+    # The failed calculations and one index load
+    assert db.selects <= 2
+    assert {calc["calc_id"] for calc in recoverable} == expected
+
+    # Retry counts cover the whole recovery chain, with or without an index
+    chain_end = next(calc_id for calc_id in sorted(expected) if calc_id.endswith("_r1"))
+    index = MaterialCalcIndex(db, [chain_end.split("_sp")[0]])
+    assert recovery.get_retry_count(chain_end) == 1
+    assert recovery.get_retry_count(chain_end, index) == 1
+    assert recovery.get_retry_count(chain_end.rsplit("_r", 1)[0], index) == 1
+    db.close()
+
+
+@pytest.mark.parametrize("n_completions", [10, 60])
+def test_workflow_lookups_use_the_index(tmp_path, n_completions):
+    build_completions(tmp_path / "plain", n_completions)
+    build_completions(tmp_path / "indexed", n_completions)
+    plain_selects, plain = workflow_run(tmp_path / "plain", False)
+    indexed_selects, indexed = workflow_run(tmp_path / "indexed", True)
+    assert indexed == plain
+    assert len(indexed) == 2 * n_completions
+    # mat_00000's OPT event runs first; its SP event still creates BAND and DOSS once
+    assert indexed.count(("mat_00000", "BAND")) == 1
+    # About three SELECTs per completion, however many lookups its steps make
+    assert indexed_selects <= 3 * n_completions + 10
+    assert plain_selects > 2 * indexed_selects
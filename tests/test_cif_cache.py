@@ -0,0 +1,76 @@
+"""CIF analysis cache: identical D12 files on a hit, and parallel runs with a broken CIF."""
+
+import os
+import shutil
+import sys
+
+import pytest
+
+from conftest import REPO_ROOT
+
+pytest.importorskip("ase")
+pytest.importorskip("spglib")
+sys.path.insert(0, str(REPO_ROOT / "Crystal_d12"))
+
+import NewCifToD12
+from NewCifToD12 import process_cifs
+
+CIF_FILES = sorted((REPO_ROOT / "cif").glob("*.cif"))[:3]
+
+OPTIONS_A = {
+    "dimensionality": "CRYSTAL", "calculation_type": "SP", "method": "DFT",
+    "dft_functional": "PBE", "use_dispersion": False, "basis_set_type": "INTERNAL",
+    "basis_set": "POB-TZVP-REV2", "symmetry_handling": "CIF", "write_only_unique": True,
+    "symmetry_tolerance": 1e-5, "is_spin_polarized": False,
+    "tolerances": {"TOLINTEG": "7 7 7 7 14", "TOLDEE": 7}, "scf_method": "DIIS",
+    "scf_maxcycle": 800, "fmixing": 30, "dft_grid": "XLGRID",
+}
+OPTIONS_B = dict(OPTIONS_A, method="HF", hf_method="UHF", basis_set="STO-3G",
+                 is_spin_polarized=True, use_dispersion=True, dft_functional="B3LYP",
+                 symmetry_handling="SPGLIB", validate_symmetry=True)
+
+
+@pytest.fixture
+def cif_dir(tmp_path):
+    directory = tmp_path / "cifs"
+    directory.mkdir()
+    for cif_file in CIF_FILES:
+        shutil.copy(cif_file, directory / cif_file.name)
+    return directory
+
+
+def _convert(cif_dir, out_dir, options, cache_dir=None, jobs=1):
+    summary = process_cifs(str(cif_dir), options, str(out_dir), jobs=jobs,
+                           cache_dir=str(cache_dir) if cache_dir else None, strict=True)
+    return summary, {path.name: path.read_bytes() for path in out_dir.glob("*.d12")}
+
+
+@pytest.mark.parametrize("options", [OPTIONS_A, OPTIONS_B], ids=["dft_cif_symmetry", "uhf_spglib"])
+def test_cache_hit_gives_identical_d12_files(cif_dir, tmp_path, monkeypatch, options):
+    cache_dir = tmp_path / "cache"
+    _, uncached = _convert(cif_dir, tmp_path / "uncached", options)
+    assert len(uncached) == len(CIF_FILES)
+
+    # Fill the cache with the other option set, then parse nothing on the warm run
+    other = OPTIONS_B if options is OPTIONS_A else OPTIONS_A
+    _convert(cif_dir, tmp_path / "cold", other, cache_dir)
+
+    def parse_again(*args, **kwargs):
+        raise AssertionError("CIF parsed again on a cache hit")
+    monkeypatch.setattr(NewCifToD12, "parse_cif", parse_again)
+    monkeypatch.setattr(NewCifToD12.spglib, "get_symmetry_dataset", parse_again)
+    summary, warm = _convert(cif_dir, tmp_path / "warm", options, cache_dir)
+    assert summary["cache_misses"] == 0 and summary["cache_hits"] >= 2 * len(CIF_FILES)
+    assert warm == uncached
+
+
+def test_broken_cif_in_a_parallel_run_is_reported(cif_dir, tmp_path):
+    (cif_dir / "broken.cif").write_text("data_broken\n_cell_length_a 3.0\n")
+    summary, outputs = _convert(cif_dir, tmp_path / "out", OPTIONS_A, tmp_path / "cache", jobs=2)
+    assert [os.path.basename(cif_file) for cif_file, _ in summary["errors"]] == ["broken.cif"]
+    assert "Space group not found" in summary["errors"][0][1]
+    assert len(summary["converted"]) == len(outputs) == len(CIF_FILES)
+
+    # The same files as a serial run without the cache
+    _, serial = _convert(cif_dir, tmp_path / "serial", OPTIONS_A)
+    assert outputs == serial
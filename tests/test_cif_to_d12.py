@@ -0,0 +1,104 @@
+"""CIF to D12 conversion in strict batch mode: no prompts, inferred space groups, failure stages."""
+
+import builtins
+import json
+import re
+import sys
+
+import pytest
+
+from conftest import REPO_ROOT
+
+pytest.importorskip("ase")
+pytest.importorskip("spglib")
+sys.path.insert(0, str(REPO_ROOT / "Crystal_d12"))
+
+import NewCifToD12
+from NewCifToD12 import CifConversionError, load_cif, process_cifs
+
+TEMPLATE = (REPO_ROOT / "cif" / "1_dia_opt_BULK_OPTGEOM_symm.cif").read_text()
+NO_SPACEGROUP = re.sub(r"_symmetry_(space_group_name_H-M|Int_Tables_number|cell_setting).*\n", "", TEMPLATE)
+NO_CELL_LENGTHS = re.sub(r"_cell_length_.*\n", "", TEMPLATE)
+NO_ATOMS = TEMPLATE[:TEMPLATE.index("loop_\n_atom_site_label")]
+BROKEN = "data_broken\n_cell_length_a 3.0\n"
+
+OPTIONS = {
+    "dimensionality": "CRYSTAL", "calculation_type": "SP", "method": "DFT",
+    "dft_functional": "PBE", "use_dispersion": False, "basis_set_type": "INTERNAL",
+    "basis_set": "POB-TZVP-REV2", "symmetry_handling": "CIF", "write_only_unique": True,
+    "symmetry_tolerance": 1e-5, "is_spin_polarized": False,
+    "tolerances": {"TOLINTEG": "7 7 7 7 14", "TOLDEE": 7}, "scf_method": "DIIS",
+    "scf_maxcycle": 800, "fmixing": 30, "dft_grid": "XLGRID",
+}
+
+
+@pytest.fixture
+def no_input(monkeypatch):
+    def prompt(*args):
+        raise AssertionError(f"prompted in strict mode: {args}")
+    monkeypatch.setattr(builtins, "input", prompt)
+
+
+def _cif(tmp_path, name, text):
+    path = tmp_path / name
+    path.write_text(text)
+    return str(path)
+
+
+def test_missing_space_group_is_inferred_without_prompting(tmp_path, no_input):
+    cif_data = load_cif(_cif(tmp_path, "no_spacegroup.cif", NO_SPACEGROUP), strict=True)
+    assert cif_data["spacegroup"] == 227
+    assert [warning["stage"] for warning in cif_data["conversion_warnings"]] == ["spacegroup"]
+    assert "inferred by spglib" in cif_data["conversion_warnings"][0]["message"]
+
+
+def test_interactive_mode_offers_the_inferred_space_group(tmp_path, monkeypatch):
+    questions = []
+    monkeypatch.setattr(builtins, "input", lambda question: questions.append(question) or "")
+    cif_data = load_cif(_cif(tmp_path, "no_spacegroup.cif", NO_SPACEGROUP))
+    assert cif_data["spacegroup"] == 227
+    assert questions == ["Please enter the space group number [227]: "]
+    assert "conversion_warnings" not in cif_data
+
+
+@pytest.mark.parametrize("text, stage, message", [
+    (BROKEN, "spacegroup", "atom sites could not be read"),
+    (NO_CELL_LENGTHS, "parse", "Missing cell parameters in the CIF: a, b, c"),
+    (NO_ATOMS, "parse", "No atom sites found"),
+], ids=["broken", "no_cell_lengths", "no_atoms"])
+def test_unconvertible_cif_raises_with_its_stage(tmp_path, no_input, text, stage, message):
+    with pytest.raises(CifConversionError, match=message) as error:
+        load_cif(_cif(tmp_path, "bad.cif", text), strict=True)
+    assert error.value.stage == stage
+
+
+def test_space_group_cannot_be_inferred_without_spglib(tmp_path, no_input, monkeypatch):
+    monkeypatch.setattr(NewCifToD12, "SPGLIB_AVAILABLE", False)
+    with pytest.raises(CifConversionError, match="spglib is not installed") as error:
+        load_cif(_cif(tmp_path, "no_spacegroup.cif", NO_SPACEGROUP), strict=True)
+    assert error.value.stage == "spacegroup"
+
+
+def test_manifest_lists_inferred_groups_and_failures(tmp_path, no_input):
+    cif_dir = tmp_path / "cifs"
+    cif_dir.mkdir()
+    for name, text in [("diamond.cif", TEMPLATE), ("no_spacegroup.cif", NO_SPACEGROUP),
+                       ("broken.cif", BROKEN), ("no_cell.cif", NO_CELL_LENGTHS)]:
+        _cif(cif_dir, name, text)
+    manifest_file = tmp_path / "errors.jsonl"
+
+    summary = process_cifs(str(cif_dir), OPTIONS, str(tmp_path / "out"), strict=True,
+                           manifest_file=str(manifest_file))
+    assert len(summary["converted"]) == 2
+    entries = [json.loads(line) for line in manifest_file.read_text().splitlines()]
+    assert [(entry["cif_file"].rsplit("/", 1)[1], entry["status"], entry["stage"]) for entry in entries] == [
+        ("broken.cif", "error", "spacegroup"),
+        ("no_cell.cif", "error", "parse"),
+        ("no_spacegroup.cif", "warning", "spacegroup"),
+    ]
+    assert entries[2]["output_file"] in summary["converted"]
+
+    # The inferred group gives the same D12 file as the CIF that states it
+    d12 = {path.name.split("_CRYSTAL_")[0]: path.read_text().split("\n", 1)[1]
+           for path in (tmp_path / "out").glob("*.d12")}
+    assert d12["no_spacegroup"] == d12["diamond"]
@@ -0,0 +1,97 @@
+"""Persistent per-thread connections of MaterialDatabase."""
+
+import gc
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pytest
+
+from mace.database.materials import MaterialDatabase
+
+
+def test_thread_connections_are_reused(db):
+    with db._get_read_connection() as first:
+        pass
+    with db._get_read_connection() as second:
+        pass
+    assert first is second
+
+
+def test_connections_close_when_thread_exits(db):
+    holders = len(db._thread_holders)
+    opened = []
+
+    def work():
+        with db._get_connection() as conn:
+            conn.execute("SELECT 1")
+        with db._get_read_connection() as conn:
+            conn.execute("SELECT 1")
+        opened.extend(db._local.holder.connections)
+
+    thread = threading.Thread(target=work)
+    thread.start()
+    thread.join()
+    gc.collect()
+
+    assert len(opened) == 2
+    assert len(db._thread_holders) == holders
+    for conn in opened:
+        # Closed connections refuse statements
+        try:
+            conn.execute("SELECT 1")
+        except Exception as e:
+            assert "closed" in str(e)
+        else:
+            raise AssertionError("connection of a finished thread is still open")
+
+
+def test_short_lived_pools_do_not_accumulate_connections(db):
+    db.create_material("mat_1", "Si2")
+    holders = len(db._thread_holders)
+    for _ in range(20):
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            list(pool.map(lambda _: db.get_material("mat_1"), range(16)))
+    gc.collect()
+    assert len(db._thread_holders) == holders
+
+
+def test_close_closes_connections_of_live_threads(db):
+    started, release = threading.Event(), threading.Event()
+    opened = []
+
+    def work():
+        with db._get_read_connection() as conn:
+            opened.append(conn)
+        started.set()
+        release.wait()
+
+    thread = threading.Thread(target=work)
+    thread.start()
+    started.wait()
+    db.close()
+    release.set()
+    thread.join()
+
+    try:
+        opened[0].execute("SELECT 1")
+    except Exception as e:
+        assert "closed" in str(e)
+    else:
+        raise AssertionError("close() left a thread's connection open")
+
+
+@pytest.mark.parametrize("directory", ["runs?v=2", "mat#1", "50%25"])
+def test_read_connection_opens_paths_with_uri_characters(tmp_path, directory):
+    db_path = tmp_path / directory / "materials.db"
+    db_path.parent.mkdir()
+    db = MaterialDatabase(str(db_path))
+    db.create_material("mat_1", "Si2")
+    with db._get_read_connection() as conn:
+        assert conn is db._local.holder.read_conn
+        assert Path(conn.execute("PRAGMA database_list").fetchone()[2]) == db_path
+        with pytest.raises(sqlite3.OperationalError, match="readonly"):
+            conn.execute("DELETE FROM materials")
+    assert db.get_material("mat_1")["formula"] == "Si2"
+    db.close()
@@ -0,0 +1,128 @@
+"""Both correlation engines against scipy on data with missing values."""
+
+import math
+import random
+from datetime import datetime
+
+import pytest
+
+from mace.database.analysis import correlation as correlation_module
+from mace.database.analysis.correlation import PropertyCorrelation
+from mace.database.materials import MaterialDatabase
+
+stats = pytest.importorskip("scipy.stats")
+
+STATISTICS = ("correlation", "spearman", "r_squared", "slope", "intercept")
+
+
+def build_database(db_path, n_materials, n_properties, missing, seed=7):
+    """Create a synthetic database of n_materials x n_properties numeric values."""
+    rng = random.Random(seed)
+    db = MaterialDatabase(str(db_path))
+    now = datetime.now().isoformat()
+    materials, properties = [], []
+
+    for m in range(n_materials):
+        material_id = f"mat_{m:06d}"
+        materials.append((material_id, 'C', 227, now, now))
+        base = rng.gauss(0, 1)
+        for p in range(n_properties):
+            if rng.random() < missing:
+                continue
+            kind = p % 5
+            if kind == 0:
+                value = 2.0 * base + rng.gauss(0, 0.3)        # correlated with base
+            elif kind == 1:
+                value = -7500.0 + 1e-3 * base + rng.gauss(0, 1e-4)  # total-energy like
+            elif kind == 2:
+                value = float(rng.randint(0, 4))               # many ties
+            elif kind == 3:
+                value = 1.5 if p % 10 == 3 else rng.gauss(0, 1)  # some constant columns
+            else:
+                value = rng.expovariate(1.0)
+            properties.append((material_id, f"{material_id}_c0", 'electronic',
+                               f"prop_{p:03d}", value, None, now))
+
+    with db._get_connection() as conn:
+        conn.executemany("""
+            INSERT INTO materials (material_id, formula, space_group, created_at, updated_at)
+            VALUES (?, ?, ?, ?, ?)
+        """, materials)
+        conn.executemany("""
+            INSERT INTO properties (material_id, calc_id, property_category, property_name,
+                                    property_value, property_value_text, extracted_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        """, properties)
+    return db
+
+
+@pytest.fixture(scope="module")
+def corr_db(tmp_path_factory):
+    # 30% missing values, so almost every pair has fewer materials than its columns
+    db = build_database(tmp_path_factory.mktemp("correlation") / "materials.db", 120, 10, 0.3)
+    yield db
+    db.close()
+
+
+def reference(db):
+    """scipy Spearman and Pearson r of every pair over its common materials."""
+    values = {}
+    for prop in db.get_all_properties():
+        values.setdefault(prop["material_id"], {})[prop["property_name"]] = prop["property_value"]
+    result = {}
+    names = sorted({name for props in values.values() for name in props})
+    for a in range(len(names)):
+        for b in range(a + 1, len(names)):
+            p1, p2 = names[a], names[b]
+            common = [props for props in values.values() if p1 in props and p2 in props]
+            x = [props[p1] for props in common]
+            y = [props[p2] for props in common]
+            if len(set(x)) < 2 or len(set(y)) < 2:
+                result[(p1, p2)] = (0.0, 0.0)
+                continue
+            result[(p1, p2)] = (stats.pearsonr(x, y)[0], stats.spearmanr(x, y)[0])
+    return result
+
+
+def check_against_scipy(results, expected):
+    pairs = {(c["property_1"], c["property_2"]): c for c in results["correlations"]}
+    assert set(pairs) == set(expected)
+    for pair, (pearson, spearman) in expected.items():
+        assert math.isclose(pairs[pair]["correlation"], pearson, abs_tol=1e-9), pair
+        assert math.isclose(pairs[pair]["spearman"], spearman, abs_tol=1e-9), pair
+
+
+def test_numpy_engine_matches_scipy(corr_db):
+    results = PropertyCorrelation(corr_db).calculate_correlations(vectorized=True)
+    check_against_scipy(results, reference(corr_db))
+
+
+def test_python_engine_matches_scipy(corr_db):
+    results = PropertyCorrelation(corr_db).calculate_correlations(vectorized=False)
+    check_against_scipy(results, reference(corr_db))
+
+
+def test_fallback_without_numpy_matches_scipy(corr_db, monkeypatch):
+    monkeypatch.setattr(correlation_module, "HAS_NUMPY", False)
+    results = PropertyCorrelation(corr_db).calculate_correlations()
+    check_against_scipy(results, reference(corr_db))
+
+
+def test_engines_agree_without_missing_values(tmp_path):
+    # No missing values: every pair reuses the column ranks
+    db = build_database(tmp_path / "materials.db", 80, 10, 0.0)
+    analyzer = PropertyCorrelation(db)
+    fast = analyzer.calculate_correlations(vectorized=True)
+    slow = analyzer.calculate_correlations(vectorized=False)
+    fast_pairs = {(c["property_1"], c["property_2"]): c for c in fast["correlations"]}
+    slow_pairs = {(c["property_1"], c["property_2"]): c for c in slow["correlations"]}
+    assert set(fast_pairs) == set(slow_pairs)
+    for pair, a in fast_pairs.items():
+        b = slow_pairs[pair]
+        for key in ("sample_count", "materials", "x_range", "y_range"):
+            assert a[key] == b[key], (pair, key)
+        for key in STATISTICS:
+            assert math.isclose(a[key], b[key], rel_tol=1e-6, abs_tol=1e-6), (pair, key)
+    assert fast["summary"]["total_materials"] == slow["summary"]["total_materials"]
+    check_against_scipy(fast, reference(db))
+    db.close()
@@ -0,0 +1,106 @@
+"""Section tokenizer for CRYSTAL outputs and the extractor and d12 parser built on it."""
+
+import re
+import sys
+from pathlib import Path
+
+import pytest
+
+from mace.utils.crystal_output_stream import CrystalOutputStream, read_tail_lines
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+OPT_OUTPUT = REPO_ROOT / "cif" / "crystalouputs" / "1_dia_opt_BULK_OPTGEOM.out"
+FREQ_OUTPUT = REPO_ROOT / "cif" / "2D example" / "3LG_BF4_2x2_Sol_Raman.out"
+SAMPLE_OUTPUTS = sorted((REPO_ROOT / "cif").rglob("*.out"))
+
+
+def test_sections_cover_the_file_in_order():
+    sections = list(CrystalOutputStream(OPT_OUTPUT).iter_sections())
+    assert sections[0].kind == "header"
+    assert "".join(section.text for section in sections) == OPT_OUTPUT.read_text(errors="ignore")
+    steps = [section for section in sections if section.kind == "opt_point"]
+    assert [section.index for section in steps] == list(range(len(steps)))
+    assert sections[-1].kind == "termination"
+
+
+def test_freq_output_is_split_into_bounded_sections():
+    sections = list(CrystalOutputStream(FREQ_OUTPUT).iter_sections())
+    kinds = {section.kind for section in sections}
+    assert {"header", "frequency", "force_constants", "harmonic_frequencies", "raman_intensities",
+            "normal_modes", "thermodynamics", "termination"} <= kinds
+    assert "".join(section.text for section in sections) == FREQ_OUTPUT.read_text(errors="ignore")
+    # No section comes close to the whole file; the normal modes are one section per block
+    total_lines = sum(len(section.lines) for section in sections)
+    assert max(len(section.lines) for section in sections) < total_lines / 5
+    assert len([section for section in sections if section.kind == "normal_modes"]) > 10
+
+
+def test_scf_end_continues_the_optimization_step():
+    sections = list(CrystalOutputStream(OPT_OUTPUT).iter_sections())
+    kinds = [section.kind for section in sections]
+    assert kinds.index("opt_point") < kinds.index("scf_end") < kinds.index("opt_end")
+    scf_end = sections[kinds.index("scf_end")]
+    assert "== SCF ENDED" in scf_end.lines[0]
+
+
+@pytest.mark.parametrize("output_file", SAMPLE_OUTPUTS, ids=lambda path: path.name)
+def test_extractor_matches_the_whole_file_extraction(output_file, monkeypatch):
+    from mace.utils import crystal_output_stream
+    from mace.utils.property_extractor import CrystalPropertyExtractor
+
+    def extract():
+        properties = CrystalPropertyExtractor(None).extract_all_properties(output_file, "material", "calc")
+        properties.pop("_metadata")
+        return properties
+
+    streamed = extract()
+    if "OPTIMIZATION - POINT" in output_file.read_text(errors="ignore"):
+        # The optimization steps are what the extractor tells apart
+        classify = crystal_output_stream.classify_banner
+        steps = ("opt_point", "opt_end", "final_geometry", "termination")
+        monkeypatch.setattr(crystal_output_stream, "classify_banner",
+                            lambda line: kind if (kind := classify(line)) in steps else None)
+    else:
+        monkeypatch.setattr(crystal_output_stream, "classify_banner", lambda line: None)
+    assert streamed == extract()
+
+
+def test_extractor_reports_the_final_optimization_values():
+    from mace.utils.property_extractor import CrystalPropertyExtractor
+
+    properties = CrystalPropertyExtractor(None).extract_all_properties(OPT_OUTPUT, "1_dia", "calc")
+    text = OPT_OUTPUT.read_text(errors="ignore")
+    energies = re.findall(r"TOTAL ENERGY\(DFT\)\(AU\)\(\s*\d+\)\s*(\S+)", text)
+    points = re.search(r"OPT END - CONVERGED .* POINTS\s+(\d+)", text).group(1)
+    final_gap = re.findall(r"BAND GAP:\s*([\d.]+)", text)[-1]
+    assert properties["total_energy_au"] == float(energies[-1])
+    assert properties["optimization_converged"] is True
+    assert properties["optimization_cycles"] == int(points)
+    assert properties["band_gap"] == float(final_gap)
+    # Initial geometry from the header, final geometry from its closing section
+    assert properties["initial_primitive_a"] != properties["final_primitive_a"]
+    assert properties["primitive_a"] == properties["final_primitive_a"]
+
+
+def test_tail_lines_stop_at_marker():
+    lines, covers_file = read_tail_lines(OPT_OUTPUT, stop_re=re.compile("TERMINATION"))
+    assert not covers_file
+    assert any("TERMINATION" in line for line in lines)
+
+
+@pytest.mark.parametrize("output_file", SAMPLE_OUTPUTS, ids=lambda path: path.name)
+def test_d12_parser_matches_a_full_read(output_file, monkeypatch):
+    sys.path.insert(0, str(REPO_ROOT / "Crystal_d12"))
+    import d12_parsers
+
+    def parse():
+        try:
+            data = d12_parsers.CrystalOutputParser(str(output_file)).parse()
+        except ValueError as e:
+            return repr(e)
+        data.pop("optimization_content")
+        return data
+
+    streamed = parse()
+    monkeypatch.setattr(d12_parsers, "CrystalOutputStream", None)
+    assert streamed == parse()
@@ -0,0 +1,64 @@
+"""Error detector: the head-and-tail scan mode and its full-scan fallback."""
+
+import pytest
+
+from mace.recovery.detector import CrystalErrorDetector
+from mace.utils.crystal_output_stream import TAIL_WINDOW_BYTES
+
+HEADER = "     CRYSTAL23 OPTIMIZATION CALCULATION\n"
+# Enough filler that the middle of the file is outside both 64 KB windows
+FILLER = "".join(f" CYC {i:6d} ETOT(AU) -1.000000000000E+02\n" for i in range(TAIL_WINDOW_BYTES // 20))
+
+
+@pytest.fixture
+def detector(tmp_path):
+    return CrystalErrorDetector(str(tmp_path), str(tmp_path / "materials.db"), enable_tracking=False,
+                                scan_mode='tail')
+
+
+def _write_output(tmp_path, middle="", tail=""):
+    output_file = tmp_path / "material.out"
+    output_file.write_text(HEADER + FILLER + middle + FILLER + tail)
+    return output_file
+
+
+def test_completion_in_the_tail(detector, tmp_path):
+    output_file = _write_output(tmp_path, tail=" * OPT END - CONVERGED * E(AU): -1.0E+02\n")
+    result = detector.analyze_output_file(output_file)
+    assert (result['scan_mode'], result['status'], result['completion_type']) == \
+        ('tail', 'completed', 'optimization_complete')
+    assert detector.analyze_output_file(output_file, scan_mode='full')['status'] == 'completed'
+
+
+def test_error_in_the_tail(detector, tmp_path):
+    output_file = _write_output(tmp_path, tail=" SCF ENDED - TOO MANY CYCLES\n")
+    result = detector.analyze_output_file(output_file)
+    assert (result['scan_mode'], result['status'], result['error_type']) == ('tail', 'error', 'scf_convergence')
+
+
+def test_full_scan_when_neither_window_matches(detector, tmp_path):
+    output_file = _write_output(tmp_path, middle=" SCF ENDED - TOO MANY CYCLES\n")
+    result = detector.analyze_output_file(output_file)
+    assert (result['scan_mode'], result['status'], result['error_type']) == ('full', 'error', 'scf_convergence')
+
+    result = detector.analyze_output_file(_write_output(tmp_path))
+    assert (result['scan_mode'], result['status']) == ('full', 'ongoing')
+
+
+def test_error_mid_file_with_completion_in_the_tail(detector, tmp_path):
+    # Tail mode trusts a completion marker at the end of the file: an error
+    # message that the run recovered from is only seen by a full scan
+    output_file = _write_output(tmp_path, middle=" SCF ENDED - TOO MANY CYCLES\n",
+                                tail=" * OPT END - CONVERGED * E(AU): -1.0E+02\n")
+    result = detector.analyze_output_file(output_file)
+    assert (result['scan_mode'], result['status']) == ('tail', 'completed')
+
+    result = detector.analyze_output_file(output_file, scan_mode='full')
+    assert (result['scan_mode'], result['status'], result['error_type']) == ('full', 'error', 'scf_convergence')
+
+
+def test_small_file_is_scanned_whole(detector, tmp_path):
+    output_file = tmp_path / "small.out"
+    output_file.write_text(HEADER + " SCF ENDED - TOO MANY CYCLES\n" + " * OPT END - CONVERGED *\n")
+    result = detector.analyze_output_file(output_file)
+    assert (result['scan_mode'], result['status']) == ('tail', 'error')
@@ -0,0 +1,105 @@
+"""Streaming exports: chunking, JSON layout, filters and dropped CSV columns."""
+
+import csv
+import json
+from datetime import datetime, timedelta
+
+import pytest
+
+from mace.database.export.formats import ExportFormatter, export_materials
+
+N_MATERIALS = 25
+
+
+@pytest.fixture
+def export_db(db):
+    start = datetime(2025, 1, 1)
+    materials, properties = [], []
+    for i in range(N_MATERIALS):
+        material_id = f"mat_{i:03d}"
+        created = (start + timedelta(minutes=i)).isoformat()
+        materials.append((material_id, ["ZnO", "TiO2", "Si"][i % 3], 225 if i % 2 else 186,
+                          json.dumps({"source": "test", "index": i}), created, created))
+        properties.append((material_id, "electronic", "band_gap", i * 0.25, None, created))
+        properties.append((material_id, "thermodynamic", "total_energy", -100.0 - i, None, created))
+        if i % 4 == 0:
+            properties.append((material_id, "electronic", "conductivity_type", None, "insulator", created))
+    with db._get_connection() as conn:
+        conn.executemany("INSERT INTO materials (material_id, formula, space_group, metadata_json, "
+                         "created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?)", materials)
+        conn.executemany("INSERT INTO properties (material_id, property_category, property_name, "
+                         "property_value, property_value_text, extracted_at) VALUES (?, ?, ?, ?, ?, ?)",
+                         properties)
+    return db
+
+
+def _read(path, format):
+    """Records of an exported file, in file order."""
+    if format == "csv":
+        with open(path, newline="", encoding="utf-8") as f:
+            return list(csv.DictReader(f))
+    if format == "json":
+        return json.loads(path.read_text())["data"]
+    if format == "jsonl":
+        return [json.loads(line) for line in path.read_text().splitlines()]
+    pq = pytest.importorskip("pyarrow.parquet")
+    return pq.read_table(str(path)).to_pylist()
+
+
+@pytest.mark.parametrize("format", ["csv", "json", "jsonl", "parquet"])
+@pytest.mark.parametrize("properties_only", [False, True])
+def test_chunked_export_equals_single_chunk(export_db, tmp_path, format, properties_only):
+    if format == "parquet":
+        pytest.importorskip("pyarrow")
+    single = export_materials(export_db, format, str(tmp_path / f"single.{format}"),
+                              properties_only=properties_only, chunk_size=10000)
+    chunked = export_materials(export_db, format, str(tmp_path / f"chunked.{format}"),
+                               properties_only=properties_only, chunk_size=4)
+    records = _read(tmp_path / f"single.{format}", format)
+    assert len(records) == (N_MATERIALS * 2 + 7 if properties_only else N_MATERIALS)
+    assert _read(tmp_path / f"chunked.{format}", format) == records
+    assert single and chunked
+
+
+@pytest.mark.parametrize("count", [0, 3])
+def test_json_is_valid_with_metadata_after_the_data(tmp_path, count):
+    records = [{"material_id": f"mat_{i}", "band_gap": i / 2, "nested": {"a": [i]}} for i in range(count)]
+    output_file = tmp_path / "out.json"
+    assert ExportFormatter(chunk_size=2).export(iter(records), str(output_file), "json",
+                                                metadata={"export_type": "test"})
+    exported = json.loads(output_file.read_text())
+    assert list(exported) == ["data", "metadata"]
+    assert exported["data"] == records
+    assert exported["metadata"]["record_count"] == count
+    assert exported["metadata"]["export_type"] == "test"
+
+
+def test_include_properties_and_filters(export_db, tmp_path):
+    output_file = tmp_path / "filtered.jsonl"
+    export_materials(export_db, "jsonl", str(output_file), filters=["band_gap > 4.0"],
+                     include_properties=["band_gap", "conductivity_type"], chunk_size=3)
+    records = _read(output_file, "jsonl")
+    assert [record["material_id"] for record in records] == [f"mat_{i:03d}" for i in range(24, 16, -1)]
+    assert {key for record in records for key in record} == {"material_id", "band_gap", "conductivity_type"}
+    assert [record["conductivity_type"] for record in records if "conductivity_type" in record] == \
+        ["insulator", "insulator"]
+
+    # An advanced filter expression is applied as well
+    export_materials(export_db, "jsonl", str(output_file),
+                     filters=["band_gap > 4.0 AND formula LIKE 'Zn%'"], chunk_size=3)
+    records = _read(output_file, "jsonl")
+    assert sorted(record["material_id"] for record in records) == ["mat_018", "mat_021", "mat_024"]
+    assert all(record["metadata"]["source"] == "test" for record in records)
+
+
+def test_dropped_csv_columns_warn(tmp_path, capsys):
+    # The header comes from the first chunk; a key first seen later cannot be written
+    records = [{"material_id": "mat_1", "band_gap": 1.0}, {"material_id": "mat_2", "band_gap": 2.0},
+               {"material_id": "mat_3", "band_gap": 3.0, "total_energy": -10.0}]
+    output_file = tmp_path / "out.csv"
+    assert ExportFormatter(chunk_size=2).export(iter(records), str(output_file), "csv")
+    assert "Columns not in the CSV header were skipped: total_energy" in capsys.readouterr().out
+    assert [row["material_id"] for row in _read(output_file, "csv")] == ["mat_1", "mat_2", "mat_3"]
+
+    ExportFormatter(chunk_size=2).export(records, str(output_file), "csv")
+    assert "Warning" not in capsys.readouterr().out
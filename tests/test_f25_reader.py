@@ -0,0 +1,103 @@
+"""fort.25 reader: fixed-width and free-format blocks, several maps per file and the .npy cache."""
+
+import os
+import sys
+
+import pytest
+
+from conftest import REPO_ROOT
+
+np = pytest.importorskip("numpy")
+sys.path.insert(0, str(REPO_ROOT / "code" / "NewPlotting_Scripts" / "AutoChargeDens"))
+
+import f25_reader
+from f25_reader import read_f25
+
+
+def block(values, nx, ny, dx=0.05, tag="-%-0MAPN", fixed=True):
+    """Text of one block: header, two coordinate lines and the values 6 per line."""
+    lines = [f"{tag}{nx:5d}{ny:5d}{dx:12.5E}{0.05:12.5E}{0.0:12.5E}",
+             f"{0.0:12.5E}{0.0:12.5E}{0.0:12.5E}{1.0:12.5E}{1.0:12.5E}{0.0:12.5E}",
+             f"{0.0:12.5E}{1.0:12.5E}{0.0:12.5E}{1:4d}{1:4d}{0:4d}"]
+    for start in range(0, len(values), 6):
+        row = values[start:start + 6]
+        lines.append("".join(f"{v:12.5E}" for v in row) if fixed else " ".join(f"{v:g}" for v in row))
+    return "\n".join(lines) + "\n"
+
+
+def write(path, *blocks):
+    path.write_text("".join(blocks))
+    return path
+
+
+def test_negative_fields_that_run_into_each_other(tmp_path):
+    values = [-4.41239e-10, -6.33884e-10, -1.0e3, -2.5e-5, 3.25e2, -7.0e-1]
+    fort25 = write(tmp_path / "neg.f25", block(values, 3, 2))
+    assert "-4.41239E-10-6.33884E-10" in fort25.read_text()
+    [fmap] = read_f25(fort25, cache=False)
+    assert (fmap.tag, fmap.nx, fmap.ny, fmap.dx) == ("-%-0MAPN", 3, 2, 0.05)
+    assert fmap.values.tolist() == values
+    assert fmap.grid.shape == (2, 3)
+
+
+def test_partial_last_line_and_several_blocks(tmp_path):
+    first = [float(i) - 3.5 for i in range(8)]   # 4x2: one full line and 2 values
+    second = [-float(i) for i in range(15)]      # 5x3: two full lines and 3 values
+    third = [1.5e-3] * 12                        # 3x4: full lines only
+    fourth = [2.0, -3.0]                         # 2x1: less than one line
+    fort25 = write(tmp_path / "maps.f25", block(first, 4, 2), block(second, 5, 3, dx=0.1),
+                   block(third, 3, 4, tag="-%-1MAPN"), block(fourth, 2, 1))
+    maps = read_f25(fort25, cache=False)
+    assert [(fmap.tag, fmap.nx, fmap.ny) for fmap in maps] == \
+        [("-%-0MAPN", 4, 2), ("-%-0MAPN", 5, 3), ("-%-1MAPN", 3, 4), ("-%-0MAPN", 2, 1)]
+    assert [fmap.values.tolist() for fmap in maps] == [first, second, third, fourth]
+    assert maps[1].dx == 0.1
+
+
+def test_free_format_block_falls_back_to_the_tokenizer(tmp_path, monkeypatch):
+    values = [0.5, -1.25, 3.0, 1e-05, -2.0, 7.75, 0.125]
+    fort25 = write(tmp_path / "free.f25", block(values, 7, 1, fixed=False), block(values, 7, 1))
+    tokenized = []
+    decode_tokens = f25_reader._decode_tokens
+    monkeypatch.setattr(f25_reader, "_decode_tokens",
+                        lambda *args: tokenized.append(args[2]) or decode_tokens(*args))
+    maps = read_f25(fort25, cache=False)
+    # Only the free-format block needs the tokenizer; the fixed-width one after it is unaffected
+    assert tokenized == [7]
+    assert [fmap.values.tolist() for fmap in maps] == [values, values]
+
+
+def test_cache_is_reused_until_size_or_mtime_change(tmp_path, monkeypatch):
+    fort25 = write(tmp_path / "map.f25", block([1.0, -2.0, 3.0, -4.0], 2, 2))
+    assert read_f25(fort25)[0].values.tolist() == [1.0, -2.0, 3.0, -4.0]
+    assert (tmp_path / "map.f25.npy").exists() and (tmp_path / "map.f25.npy.json").exists()
+
+    parsed = []
+    parse_f25 = f25_reader.parse_f25
+    monkeypatch.setattr(f25_reader, "parse_f25", lambda buf: parsed.append(1) or parse_f25(buf))
+    assert read_f25(fort25)[0].values.tolist() == [1.0, -2.0, 3.0, -4.0]
+    assert parsed == []
+
+    # Same size, new values and modification time
+    stat = fort25.stat()
+    write(fort25, block([5.0, -6.0, 7.0, -8.0], 2, 2))
+    os.utime(fort25, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    assert fort25.stat().st_size == stat.st_size
+    assert read_f25(fort25)[0].values.tolist() == [5.0, -6.0, 7.0, -8.0]
+    assert len(parsed) == 1
+
+    # Same modification time, different size
+    stat = fort25.stat()
+    write(fort25, block([5.0, -6.0, 7.0, -8.0, 9.0, -10.0], 3, 2))
+    os.utime(fort25, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    assert read_f25(fort25)[0].values.tolist() == [5.0, -6.0, 7.0, -8.0, 9.0, -10.0]
+    assert len(parsed) == 2
+
+
+@pytest.mark.parametrize("text", ["", "no data blocks here\n"], ids=["empty", "no_blocks"])
+def test_plot_script_rejects_a_file_without_blocks(tmp_path, text):
+    pytest.importorskip("matplotlib")
+    from format_and_plot_f25_new import getdataf25
+    fort25 = write(tmp_path / "empty.f25", text)
+    with pytest.raises(ValueError, match="no data block"):
+        getdataf25(str(fort25))
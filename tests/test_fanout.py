@@ -0,0 +1,113 @@
+"""Step fan-out scheduling, cancellation and its long-lived worker pool."""
+
+import threading
+import time
+
+import pytest
+
+from mace.workflow.fanout import CANCELLED, DONE, FAILED, StepFanout, StepTask, stage
+
+
+@pytest.fixture
+def fanout():
+    fanout = StepFanout(max_workers=3)
+    yield fanout
+    fanout.shutdown()
+
+
+def step(result="ok", seconds=0.01, threads=None, order=None, name=None):
+    def function():
+        with stage("work"):
+            time.sleep(seconds)
+        if threads is not None:
+            threads.add(threading.current_thread())
+        if order is not None:
+            order.append(name)
+        if isinstance(result, Exception):
+            raise result
+        return result
+    return function
+
+
+def test_failures_cancel_dependents_and_keep_chain_order(fanout):
+    order = []
+    tasks = [
+        StepTask("opt2", step(None), chain="opt"),                    # Required step fails
+        StepTask("opt3", step(), chain="opt"),                        # Later in its chain
+        StepTask("freq", step(), requires=["opt2"]),                  # Needs the failed step
+        StepTask("freq_band", step(), requires=["freq"]),             # Transitively
+        StepTask("band", step(RuntimeError("boom"), order=order, name="band"), chain="band", critical=False),
+        StepTask("band2", step(order=order, name="band2"), chain="band"),  # Optional failure: runs
+        StepTask("doss", step(seconds=0.05)),
+    ]
+    fanout.run(tasks)
+    assert {task.key: task.status for task in tasks} == {
+        "opt2": FAILED, "opt3": CANCELLED, "freq": CANCELLED, "freq_band": CANCELLED,
+        "band": FAILED, "band2": DONE, "doss": DONE}
+    assert order == ["band", "band2"]
+    assert isinstance(tasks[4].error, RuntimeError)
+    assert tasks[2].cancelled_by == "opt2"
+    assert all(task.timings.get("work", 0) >= 0.009 for task in tasks if task.status == DONE)
+
+
+def test_nested_fanout_runs_inline(fanout):
+    # A fan-out nested in a pooled step runs in the step's thread and adds its stage times to the step
+    def nested():
+        StepFanout(max_workers=4).run([StepTask(i, step()) for i in range(3)])
+        return threading.current_thread().name
+
+    outer = fanout.run([StepTask(i, nested) for i in range(2)])
+    assert all(task.status == DONE and task.timings.get("work", 0) >= 0.029 for task in outer)
+    assert all(task.result.startswith("mace-step") for task in outer)
+
+
+def test_runs_reuse_the_worker_threads(fanout):
+    threads = set()
+    for _ in range(5):
+        tasks = fanout.run([StepTask(i, step(threads=threads)) for i in range(6)])
+        assert all(task.status == DONE for task in tasks)
+    assert len(threads) <= 3
+    assert all(thread.name.startswith("mace-step") for thread in threads)
+
+    # After shutdown the next run starts new threads
+    pool = fanout._pool
+    fanout.shutdown()
+    assert fanout._pool is None and not any(thread.is_alive() for thread in threads)
+    assert all(task.status == DONE for task in fanout.run([StepTask(i, step()) for i in range(3)]))
+    assert fanout._pool is not pool
+
+
+def test_concurrent_runs_share_the_pool(fanout):
+    results = {}
+
+    def run(name):
+        results[name] = fanout.run([StepTask(i, step(seconds=0.02)) for i in range(6)])
+
+    runners = [threading.Thread(target=run, args=(n,)) for n in range(4)]
+    for runner in runners:
+        runner.start()
+    for runner in runners:
+        runner.join(timeout=10)
+    assert len(results) == 4
+    assert all(task.status == DONE for tasks in results.values() for task in tasks)
+
+
+def test_cancelled_critical_step_cancels_its_chain(fanout):
+    # An optional step fails; the critical step needing it is cancelled, and so is the rest of its chain
+    tasks = fanout.run([
+        StepTask("band", step(None), critical=False),
+        StepTask("doss", step(), chain="mat", requires=["band"]),
+        StepTask("freq", step(), chain="mat"),
+    ])
+    assert [task.status for task in tasks] == [FAILED, CANCELLED, CANCELLED]
+    assert tasks[2].cancelled_by == "band"
+
+
+def test_cancelled_optional_step_keeps_its_chain(fanout):
+    # A critical step fails; the optional step needing it is cancelled, the rest of its chain still runs
+    tasks = fanout.run([
+        StepTask("opt", step(None)),
+        StepTask("band", step(), chain="mat", requires=["opt"], critical=False),
+        StepTask("doss", step(), chain="mat"),
+    ])
+    assert [task.status for task in tasks] == [FAILED, CANCELLED, DONE]
@@ -0,0 +1,86 @@
+"""Checksums of the file manager's scans are cached in the fingerprint table."""
+
+import os
+
+import pytest
+
+from mace.utils import output_fingerprints
+from mace.utils.file_manager import CrystalFileManager
+
+
+@pytest.fixture
+def hashed(monkeypatch):
+    """One entry per checksum computed by the fingerprint cache."""
+    calls = []
+    md5 = output_fingerprints.hashlib.md5
+
+    class CountingHashlib:
+        @staticmethod
+        def md5():
+            calls.append("md5")
+            return md5()
+
+    monkeypatch.setattr(output_fingerprints, "hashlib", CountingHashlib)
+    return calls
+
+
+@pytest.fixture
+def tree(tmp_path):
+    calc_dir = tmp_path / "materials" / "mat_1" / "opt"
+    calc_dir.mkdir(parents=True)
+    for name in ("mat_1.d12", "mat_1.out"):
+        (calc_dir / name).write_text(f"{name}\n" * 100)
+    return tmp_path
+
+
+def manager(tree):
+    return CrystalFileManager(str(tree / "materials"), str(tree / "materials.db"))
+
+
+def test_unchanged_files_are_not_hashed_again(tree, hashed):
+    first = manager(tree).generate_file_report()
+    assert len(hashed) == 2
+
+    # A new manager reads the checksums stored by the first one
+    del hashed[:]
+    assert manager(tree).generate_file_report()["summary"] == first["summary"]
+    assert hashed == []
+
+
+def test_changed_files_are_hashed_again(tree, hashed):
+    output = tree / "materials" / "mat_1" / "opt" / "mat_1.out"
+    before = manager(tree).check_file_integrity(output)["checksum"]
+
+    with open(output, "a") as f:
+        f.write("EEEEEEEEEE TERMINATION\n")
+    del hashed[:]
+    after = manager(tree).check_file_integrity(output)["checksum"]
+    assert len(hashed) == 1 and after != before
+
+    # Same size and contents rewritten in place: the new mtime invalidates the checksum too
+    stat = output.stat()
+    output.write_text(output.read_text().replace("mat_1.out", "mat_2.out"))
+    os.utime(output, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    del hashed[:]
+    assert manager(tree).check_file_integrity(output)["checksum"] != after
+    assert len(hashed) == 1
+
+
+def test_checksums_are_kept_when_a_scan_fails(tree, hashed):
+    scanned = []
+    check = CrystalFileManager._check_file_integrity
+
+    def fail_on_second_file(self, file_path):
+        if scanned:
+            raise OSError("stale file handle")
+        scanned.append(file_path)
+        return check(self, file_path)
+
+    with pytest.MonkeyPatch.context() as patch:
+        patch.setattr(CrystalFileManager, "_check_file_integrity", fail_on_second_file)
+        with pytest.raises(OSError):
+            manager(tree).generate_file_report()
+
+    del hashed[:]
+    manager(tree).check_file_integrity(scanned[0])
+    assert hashed == []
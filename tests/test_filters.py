@@ -0,0 +1,160 @@
+"""SQL filter pushdown selects the same materials as the Python evaluator."""
+
+import random
+from datetime import datetime, timedelta
+
+import pytest
+
+from mace.database.materials import MaterialDatabase
+from mace.database.query.advanced_filters import parse_advanced_filter
+from mace.database.query.sql_filters import compile_advanced_filter
+
+ADVANCED_CORPUS = [
+    "band_gap > 3",
+    "band_gap >= 3.0 AND band_gap < 5",
+    "band_gap = 2.5",
+    "band_gap != 2.5",
+    "band_gap <> 2.5",
+    "band_gap == 2",
+    "total_energy < -1000 OR band_gap > 4",
+    "(band_gap > 3 AND space_group = 227) OR total_energy < -1000",
+    "space_group IN (225, 227, 229)",
+    "space_group NOT IN (225, 227)",
+    "space_group > 200",
+    "space_group = '227'",
+    "formula LIKE 'Zn%'",
+    "formula LIKE '%o'",
+    "formula NOT LIKE 'C%'",
+    "formula LIKE 'Z_O'",
+    "formula LIKE 'Ti.%'",
+    "formula = 'ZnO'",
+    "formula != 'ZnO'",
+    "formula > 'M'",
+    "formula IN ('ZnO', 'TiO2', 'SiC')",
+    "formula > 100",
+    "formula = 123",
+    "transport_seebeck IS NOT NULL",
+    "transport_seebeck IS NULL",
+    "magnetic_state = 'ferromagnetic'",
+    "magnetic_state != 'ferromagnetic'",
+    "magnetic_state IN ('ferromagnetic', 'antiferromagnetic')",
+    "magnetic_state NOT IN ('ferromagnetic')",
+    "magnetic_state LIKE 'ferro%'",
+    "magnetic_state < 'm'",
+    "magnetic_state > 1",
+    "fermi_energy > 0",
+    "fermi_energy LIKE '1%'",
+    "fermi_energy = 'n/a'",
+    "band_gap LIKE '2.%'",
+    "band_gap IN (2.5, 3, 'n/a')",
+    "band_gap IS 2.5",
+    "band_gap IS NOT 2.5",
+    "dimensionality = 'SLAB' AND band_gap > 1",
+    "status = 'active' AND (formula LIKE 'Si%' OR formula LIKE 'Ti%')",
+    "notes IS NULL",
+    "source_type = 'cif' OR source_type = 'd12'",
+    "metal_flag = True",
+    "metal_flag = 0",
+    "missing_property > 0",
+    "missing_property IS NULL",
+]
+
+PROPERTY_FILTER_CORPUS = [
+    (["band_gap > 3.0"], 'AND'),
+    (["band_gap > 3.0", "total_energy < -1000"], 'AND'),
+    (["band_gap > 3.0", "total_energy < -1000"], 'OR'),
+    (["fermi_energy >= 0"], 'AND'),
+    (["magnetic_state = ferromagnetic"], 'AND'),
+    (["magnetic_state != ferromagnetic"], 'AND'),
+    (["transport_seebeck = None"], 'AND'),
+    (["band_gap != 2.5", "space_group > 0"], 'OR'),
+]
+
+FORMULAS = ['ZnO', 'TiO2', 'SiC', 'Si', 'C', 'GaN', 'MgO', 'ZnS', 'Ti.O', 'zno',
+            '123', '12.5', '1-2', 'CaTiO3', 'Al2O3', 'BN', 'Zn\nO', 'Zño']
+
+
+def build_database(db_path, n_materials, seed=42):
+    """Synthetic database: numeric and text values, numeric strings, duplicated properties, NULLs."""
+    rng = random.Random(seed)
+    db = MaterialDatabase(str(db_path))
+    start = datetime(2025, 1, 1)
+    materials, properties = [], []
+
+    for i in range(n_materials):
+        material_id = f"mat_{i:06d}"
+        created = (start + timedelta(minutes=i)).isoformat()
+        materials.append((
+            material_id, rng.choice(FORMULAS), rng.choice([None, 1, 194, 225, 227, 229]),
+            rng.choice(['CRYSTAL', 'SLAB']), created, created,
+            rng.choice(['cif', 'd12', 'manual', None]), None, rng.choice(['active', 'archived']),
+            None, rng.choice([None, 'checked'])
+        ))
+
+        def add(name, value=None, text=None, category='electronic', calc=0):
+            properties.append((material_id, f"{material_id}_c{calc}", category, name,
+                               value, text, None, created))
+
+        if rng.random() < 0.9:
+            add('band_gap', rng.choice([0.0, 1.2, 2, 2.5, 3.0, 3.7, 5.1]))
+            if rng.random() < 0.2:
+                # Second extraction of the same property from another calculation
+                add('band_gap', rng.choice([2.5, 4.2]), category=rng.choice(['electronic', 'band']), calc=1)
+        if rng.random() < 0.1:
+            add('band_gap', None, 'n/a', calc=2)
+        if rng.random() < 0.8:
+            add('total_energy', rng.uniform(-3000, -10), category='thermodynamic')
+        if rng.random() < 0.5:
+            add('transport_seebeck', rng.choice([None, 120.5, -35.0]), category='transport')
+        if rng.random() < 0.6:
+            add('magnetic_state', None, rng.choice(['ferromagnetic', 'antiferromagnetic', 'Ferro', '']),
+                category='magnetic')
+        if rng.random() < 0.6:
+            # Numeric values stored as text
+            add('fermi_energy', None, rng.choice(['1.5', '-0.25', '10', '1e-05', 'n/a', ' 3 ']))
+        if rng.random() < 0.5:
+            add('metal_flag', rng.choice([0.0, 1.0]))
+
+    with db._get_connection() as conn:
+        conn.executemany("""
+            INSERT INTO materials (material_id, formula, space_group, dimensionality, created_at,
+                                   updated_at, source_type, source_file, status, metadata_json, notes)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, materials)
+        conn.executemany("""
+            INSERT INTO properties (material_id, calc_id, property_category, property_name,
+                                    property_value, property_value_text, property_unit, extracted_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        """, properties)
+    return db
+
+
+@pytest.fixture(scope="module")
+def corpus_db(tmp_path_factory):
+    db = build_database(tmp_path_factory.mktemp("filters") / "materials.db", 400)
+    yield db
+    db.close()
+
+
+def material_ids(rows):
+    return sorted(row["material_id"] for row in rows)
+
+
+@pytest.mark.parametrize("expression", ADVANCED_CORPUS)
+def test_advanced_filter_matches_python_evaluator(corpus_db, expression):
+    expected = material_ids(corpus_db.filter_materials_advanced(expression, pushdown=False))
+    assert material_ids(corpus_db.filter_materials_advanced(expression)) == expected
+
+
+@pytest.mark.parametrize("filters, logic", PROPERTY_FILTER_CORPUS)
+def test_property_filter_matches_python_evaluator(corpus_db, filters, logic):
+    expected = material_ids(corpus_db.filter_materials_by_properties(filters, logic, pushdown=False))
+    assert material_ids(corpus_db.filter_materials_by_properties(filters, logic)) == expected
+
+
+def test_corpus_is_pushed_down_and_selective(corpus_db):
+    # Most expressions compile to SQL, and the corpus is not trivially all or nothing
+    pushed = [expr for expr in ADVANCED_CORPUS if compile_advanced_filter(parse_advanced_filter(expr)) is not None]
+    assert len(pushed) >= len(ADVANCED_CORPUS) - 5
+    counts = {len(corpus_db.filter_materials_advanced(expr)) for expr in ADVANCED_CORPUS}
+    assert 0 in counts and 400 in counts and len(counts) > 10
@@ -0,0 +1,102 @@
+"""Batched property history: versions, unchanged values, snapshots and the schema migration."""
+
+import sqlite3
+
+from mace.database.utils.history import PropertyHistory, ensure_history_tables, write_history
+
+
+def _row(material_id, name, value, calc_id="calc_1"):
+    return (material_id, calc_id, "electronic", name, value, str(value), "eV",
+            "2024-01-01T00:00:00", "crystal_property_extractor.py")
+
+
+def _history(db):
+    with db._get_read_connection() as conn:
+        return [tuple(row) for row in conn.execute(
+            "SELECT material_id, property_name, calc_id, property_value, old_value, version, material_version "
+            "FROM property_history ORDER BY history_id")]
+
+
+def test_one_batch_is_one_material_version(db):
+    db.upsert_properties([_row("mat_1", "band_gap", 1.0), _row("mat_1", "total_energy", -10.0),
+                          _row("mat_2", "band_gap", 4.0)])
+    # The same property of two calculations in one batch: two property versions, one material version
+    db.upsert_properties([_row("mat_1", "band_gap", 2.0), _row("mat_1", "band_gap", 3.0, calc_id="calc_2")])
+
+    assert _history(db) == [
+        ("mat_1", "band_gap", "calc_1", "1.0", None, 1, 1),
+        ("mat_1", "total_energy", "calc_1", "-10.0", None, 1, 1),
+        ("mat_2", "band_gap", "calc_1", "4.0", None, 1, 1),
+        ("mat_1", "band_gap", "calc_1", "2.0", "1.0", 2, 2),
+        ("mat_1", "band_gap", "calc_2", "3.0", None, 3, 2),
+    ]
+    assert PropertyHistory(str(db.db_path)).get_material_version("mat_2") == 1
+
+
+def test_unchanged_values_are_not_recorded(db):
+    rows = [_row("mat_1", "band_gap", 1.0), _row("mat_1", "total_energy", -10.0)]
+    db.upsert_properties(rows)
+    db.upsert_properties(rows)
+    assert len(_history(db)) == 2
+
+    db.upsert_properties([_row("mat_1", "band_gap", 1.0), _row("mat_1", "total_energy", -11.0)])
+    assert _history(db)[2:] == [("mat_1", "total_energy", "calc_1", "-11.0", "-10.0", 2, 2)]
+
+
+def test_state_at_a_version_across_snapshots(db):
+    history = PropertyHistory(str(db.db_path), snapshot_interval=3)
+    expected = {}
+    state = {}
+    for version in range(1, 9):
+        changes = [{"material_id": "mat_1", "property_name": f"p{(version + i) % 4}", "value": version * 10 + i,
+                    "unit": "eV"} for i in range(2)]
+        history.record_property_changes(changes)
+        for change in changes:
+            state[change["property_name"]] = str(change["value"])
+        expected[version] = dict(state)
+
+    with db._get_read_connection() as conn:
+        snapshots = [row[0] for row in conn.execute(
+            "SELECT material_version FROM history_snapshots WHERE material_id = 'mat_1' ORDER BY 1")]
+    assert snapshots and snapshots[0] > 1  # Versions before, at and after snapshots are rebuilt below
+    for version, properties in expected.items():
+        rebuilt = history.get_material_state("mat_1", version)
+        assert rebuilt["material_version"] == version
+        assert {name: entry["value"] for name, entry in rebuilt["properties"].items()} == properties
+
+
+def test_compact_snapshots_the_latest_version(db):
+    history = PropertyHistory(str(db.db_path), snapshot_interval=0)
+    for version in range(3):
+        history.record_property_change("mat_1", "band_gap", version)
+    assert history.compact() == 1
+    assert history.compact() == 0
+    assert history.get_material_state("mat_1")["properties"]["band_gap"]["value"] == "2"
+
+
+def test_material_version_is_backfilled(tmp_path):
+    conn = sqlite3.connect(str(tmp_path / "old.db"))
+    conn.execute("""
+        CREATE TABLE property_history (
+            history_id INTEGER PRIMARY KEY AUTOINCREMENT, material_id TEXT NOT NULL,
+            property_name TEXT NOT NULL, property_value TEXT, property_unit TEXT,
+            property_category TEXT, calc_id TEXT, changed_at TIMESTAMP, changed_by TEXT,
+            change_reason TEXT, old_value TEXT, version INTEGER DEFAULT 1)
+    """)
+    conn.executemany("INSERT INTO property_history (material_id, property_name, property_value, version) "
+                     "VALUES (?, ?, ?, ?)",
+                     [("mat_1", "band_gap", "1.0", 1), ("mat_2", "band_gap", "2.0", 1),
+                      ("mat_1", "band_gap", "1.5", 2), ("mat_1", "total_energy", "-3", 1)])
+    ensure_history_tables(conn)
+    assert [tuple(row) for row in conn.execute(
+        "SELECT material_id, material_version FROM property_history ORDER BY history_id")] == [
+        ("mat_1", 1), ("mat_2", 1), ("mat_1", 2), ("mat_1", 3)]
+
+    # New changes continue after the backfilled versions
+    conn.execute("CREATE TABLE properties (property_id INTEGER PRIMARY KEY, material_id TEXT, calc_id TEXT, "
+                 "property_name TEXT, property_value REAL, property_value_text TEXT, property_unit TEXT)")
+    write_history(conn, [{"material_id": "mat_1", "property_name": "band_gap", "value": "1.7"}])
+    conn.commit()
+    assert conn.execute("SELECT version, material_version FROM property_history "
+                        "ORDER BY history_id DESC LIMIT 1").fetchone() == (3, 4)
+    conn.close()
@@ -0,0 +1,83 @@
+"""Light MACE entry points do not import the heavy scientific packages.
+
+The import time of the job-end callback, as reported by `python -X importtime`,
+must stay within MACE_IMPORT_BUDGET_MS (default 300 ms: twice the 150 ms
+target that benchmarks/benchmark_imports.py checks against wall time, so a
+single new heavy import fails it; raise it on slow machines).
+"""
+
+import json
+import os
+import re
+import subprocess
+import sys
+
+import pytest
+
+from conftest import REPO_ROOT
+
+HEAVY_PACKAGES = ("numpy", "pandas", "ase", "matplotlib", "scipy")
+
+# Entry points that must stay light -> modules they import
+LIGHT_ENTRY_POINTS = {
+    "job-end callback": ["mace.queue.manager", "mace.queue.daemon", "mace.recovery.recovery",
+                         "mace.workflow.engine"],
+    "daemon notification": ["mace.queue.daemon"],
+    "mace monitor": ["mace.queue.monitor"],
+}
+
+DEFAULT_IMPORT_BUDGET_MS = 300
+
+# The marker separates the interpreter's own start-up imports from the entry point's
+IMPORT_SCRIPT = """
+import importlib, json, sys
+sys.stderr.write("--- entry point\\n")
+for module in {modules!r}:
+    importlib.import_module(module)
+print(json.dumps(sorted(sys.modules)))
+"""
+
+# import time: self [us] | cumulative | imported package (nested imports are indented)
+IMPORTTIME_LINE = re.compile(r"^import time:\s+\d+ \|\s+(\d+) \|( +)\S+")
+
+
+def run_entry_point(modules):
+    """Import modules in a fresh interpreter; return their import time in ms and the loaded module names."""
+    env = dict(os.environ, PYTHONPATH=str(REPO_ROOT), MACE_NO_BANNER="1")
+    # Time imports from bytecode, as installed: recompiling sources is not import cost
+    env.pop("PYTHONDONTWRITEBYTECODE", None)
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", IMPORT_SCRIPT.format(modules=modules)],
+                            cwd=str(REPO_ROOT), env=env, capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+    report = result.stderr.split("--- entry point\n", 1)[1]
+    # Top-level imports only: their cumulative time includes everything nested below them
+    import_us = sum(int(match.group(1)) for match in map(IMPORTTIME_LINE.match, report.splitlines())
+                    if match and len(match.group(2)) == 1)
+    return import_us / 1000, set(json.loads(result.stdout.strip().splitlines()[-1]))
+
+
+@pytest.mark.parametrize("name", sorted(LIGHT_ENTRY_POINTS))
+def test_light_entry_points_do_not_import_heavy_packages(name):
+    _, loaded = run_entry_point(LIGHT_ENTRY_POINTS[name])
+    assert set(LIGHT_ENTRY_POINTS[name]) <= loaded
+    assert sorted(package for package in HEAVY_PACKAGES if package in loaded) == []
+
+
+def test_version_does_not_import_heavy_packages():
+    # mace_cli exits after printing the version; its interpreter's modules are listed at exit
+    script = ("import atexit, json, runpy, sys\n"
+              "atexit.register(lambda: print(json.dumps(sorted(sys.modules))))\n"
+              "sys.argv = [{cli!r}, '--version']\n"
+              "runpy.run_path(sys.argv[0], run_name='__main__')\n").format(cli=str(REPO_ROOT / "mace_cli"))
+    env = dict(os.environ, MACE_NO_BANNER="1")
+    result = subprocess.run([sys.executable, "-c", script], cwd=str(REPO_ROOT), env=env,
+                            capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+    loaded = set(json.loads(result.stdout.strip().splitlines()[-1]))
+    assert sorted(package for package in HEAVY_PACKAGES if package in loaded) == []
+
+
+def test_job_end_callback_stays_within_import_budget():
+    budget_ms = float(os.environ.get("MACE_IMPORT_BUDGET_MS", DEFAULT_IMPORT_BUDGET_MS))
+    import_ms = min(run_entry_point(LIGHT_ENTRY_POINTS["job-end callback"])[0] for _ in range(3))
+    assert 0 < import_ms <= budget_ms
@@ -0,0 +1,34 @@
+"""Index advisor: the recorded queries use indexes on a fresh database."""
+
+import pytest
+
+from mace.database.utils.index_advisor import (RECORDED_QUERIES, analyze_indexes, classify_plan,
+                                               explain_query, format_index_report)
+
+
+@pytest.mark.parametrize("update_stats", [False, True])
+def test_recorded_queries_are_not_flagged(db, update_stats):
+    results = analyze_indexes(db, update_stats=update_stats)
+    assert len(results) == len(RECORDED_QUERIES)
+    assert [(r["name"], r["error"], r["problems"]) for r in results if r["error"] or r["problems"]] == []
+    assert "✅ All recorded queries use indexes" in format_index_report(results)
+
+
+def test_query_on_an_unindexed_column_is_flagged(db):
+    with db._get_read_connection() as conn:
+        problems, _ = classify_plan(explain_query(conn, "SELECT * FROM materials WHERE source_file = ?"))
+        assert len(problems) == 1 and problems[0].startswith("full scan of materials")
+
+        # A join on unindexed columns makes SQLite build a temporary index
+        problems, _ = classify_plan(explain_query(
+            conn, "SELECT * FROM materials a JOIN materials b ON a.source_file = b.notes"))
+        assert any(problem.startswith("temporary index") for problem in problems)
+
+
+def test_sorts_are_notes():
+    problems, notes = classify_plan(["SEARCH materials USING INDEX idx_materials_status (status=?)",
+                                     "USE TEMP B-TREE FOR ORDER BY"])
+    assert problems == []
+    assert notes == ["temporary sort: USE TEMP B-TREE FOR ORDER BY"]
+    assert classify_plan(["SCAN CONSTANT ROW"]) == ([], [])
+    assert classify_plan(["SCAN TABLE properties"])[0] == ["full scan of properties: SCAN TABLE properties"]
@@ -0,0 +1,154 @@
+"""Input generation service: prompts, exits and timeouts of the scripts, and the in-process fallback."""
+
+import shutil
+import sys
+import textwrap
+import threading
+
+import pytest
+
+from conftest import REPO_ROOT
+from mace.workflow.input_service import ENTRY_POINTS, InputGenerationService
+
+SCRIPT_MODULES = [module_name for module_name, _ in ENTRY_POINTS.values()]
+
+# Stands in for CRYSTALOptToD12.py; config["mode"] selects the misbehaviour
+FAKE_D12_SCRIPT = textwrap.dedent("""
+    import os
+    import sys
+    import time
+
+    def generate_d12(output_file, input_file=None, config=None, output_dir=None):
+        mode = (config or {}).get("mode")
+        if mode == "prompt":
+            return {"answer": input("Select functional: ")}
+        if mode == "exit":
+            sys.exit(2)
+        if mode == "sleep":
+            time.sleep(config["seconds"])
+        if mode == "wait":
+            print("script output")
+            config["started"].set()
+            config["release"].wait(10)
+        if mode == "fail":
+            print("Error: no final geometry in the output")
+            return None
+        return {"d12_file": output_file, "calc_type": "SP", "options": {}, "pid": os.getpid()}
+""")
+
+
+@pytest.fixture
+def clean_imports(monkeypatch):
+    """Import the script modules afresh and drop them again afterwards."""
+    monkeypatch.setattr(sys, "path", list(sys.path))
+    saved = {name: sys.modules.pop(name) for name in SCRIPT_MODULES if name in sys.modules}
+    yield
+    for name in SCRIPT_MODULES:
+        sys.modules.pop(name, None)
+    sys.modules.update(saved)
+
+
+@pytest.fixture
+def fake_service(tmp_path, clean_imports):
+    script_dir = tmp_path / "scripts"
+    script_dir.mkdir()
+    (script_dir / "CRYSTALOptToD12.py").write_text(FAKE_D12_SCRIPT)
+    services = []
+
+    def make(max_workers, timeout=60):
+        service = InputGenerationService([script_dir], max_workers=max_workers, timeout=timeout)
+        services.append(service)
+        return service
+    yield make
+    for service in services:
+        service.close()
+
+
+@pytest.mark.parametrize("max_workers", [0, 1], ids=["in_process", "worker"])
+def test_script_reading_stdin_needs_input(fake_service, tmp_path, max_workers):
+    result = fake_service(max_workers).generate_d12(tmp_path / "mat.out", config={"mode": "prompt"})
+    assert (result["success"], result["needs_input"]) == (False, True)
+    assert result["error"] == "CRYSTALOptToD12.py asked for interactive input"
+    assert "Select functional" in result["output"]
+
+
+@pytest.mark.parametrize("max_workers", [0, 1], ids=["in_process", "worker"])
+def test_system_exit_in_the_script_is_an_error(fake_service, tmp_path, max_workers):
+    service = fake_service(max_workers)
+    result = service.generate_d12(tmp_path / "mat.out", config={"mode": "exit"})
+    assert (result["success"], result["needs_input"]) == (False, False)
+    assert result["error"] == "CRYSTALOptToD12.py exited with status 2"
+
+    # The service keeps working after the exit
+    assert service.generate_d12(tmp_path / "mat.out")["success"]
+    assert service.generated == 1
+
+
+def test_failed_script_reports_its_last_output_line(fake_service, tmp_path):
+    result = fake_service(0).generate_d12(tmp_path / "mat.out", config={"mode": "fail"})
+    assert result["success"] is False
+    assert result["error"] == "Error: no final geometry in the output"
+
+
+def test_in_process_job_captures_only_its_own_thread(fake_service, tmp_path, capsys):
+    service = fake_service(0)
+    config = {"mode": "wait", "started": threading.Event(), "release": threading.Event()}
+    results = []
+    job = threading.Thread(target=lambda: results.append(service.generate_d12(tmp_path / "mat.out", config=config)))
+    job.start()
+    assert config["started"].wait(10)
+    # Another step thread prints while the script runs
+    print("engine output")
+    config["release"].set()
+    job.join()
+
+    assert results[0]["success"]
+    assert results[0]["output"] == "script output\n"
+    assert capsys.readouterr().out == "engine output\n"
+
+
+def test_workers_are_not_forked(fake_service, tmp_path):
+    service = fake_service(1)
+    assert service.generate_d12(tmp_path / "mat.out")["success"]
+    assert service._executor._mp_context.get_start_method() in ("forkserver", "spawn")
+
+
+def test_timeout_discards_the_pool(fake_service, tmp_path):
+    service = fake_service(1, timeout=0.5)
+    first = service.generate_d12(tmp_path / "mat.out")
+    assert first["success"]
+
+    result = service.generate_d12(tmp_path / "mat.out", config={"mode": "sleep", "seconds": 3})
+    assert result["success"] is False
+    assert result["error"] == "Input generation timed out after 0.5s"
+    assert service._executor is None
+
+    # The next input gets a fresh worker instead of waiting behind the stuck one
+    again = service.generate_d12(tmp_path / "mat.out")
+    assert again["success"]
+    assert again["pid"] != first["pid"]
+
+
+def test_in_process_fallback_writes_the_same_files(tmp_path, monkeypatch, clean_imports):
+    sample = REPO_ROOT / "cif" / "crystalouputs" / "1_dia_opt_BULK_OPTGEOM.out"
+    shutil.copy(sample, tmp_path)
+    shutil.copy(sample.with_suffix(".d12"), tmp_path)
+    # Relative paths: a worker runs the script in the output directory
+    monkeypatch.chdir(tmp_path)
+    config = {"calculation_type": "SP", "functional": "PBE0"}
+
+    generated = {}
+    for max_workers in (1, 0):
+        service = InputGenerationService(max_workers=max_workers)
+        try:
+            result = service.generate_d12("1_dia_opt_BULK_OPTGEOM.out", "1_dia_opt_BULK_OPTGEOM.d12",
+                                          config, "sp")
+        finally:
+            service.close()
+        assert result["success"], result["error"]
+        with open(result["d12_file"]) as f:
+            generated[max_workers] = (result["d12_file"], f.read(), result["options"])
+        (tmp_path / "sp" / "1_dia_opt_BULK_OPTGEOM_sp_PBE0-D3_optimized.d12").unlink()
+
+    assert generated[1][0] == str(tmp_path / "sp" / "1_dia_opt_BULK_OPTGEOM_sp_PBE0-D3_optimized.d12")
+    assert generated[0] == generated[1]
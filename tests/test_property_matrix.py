@@ -0,0 +1,107 @@
+"""Property cache changelog bounds and the analysis modules without NumPy."""
+
+import json
+import subprocess
+import sys
+
+import pytest
+
+from mace.database import materials as materials_module
+from mace.database.materials import MaterialDatabase
+
+from conftest import REPO_ROOT
+
+np = pytest.importorskip("numpy")
+
+
+def _rows(n, scale=1.0):
+    return [(f"mat_{i % 40:03d}", "calc_1", "electronic", f"prop_{i // 40}", (i + 1) * scale, None, "eV",
+             "2024-01-01T00:00:00", "test") for i in range(n)]
+
+
+def _changes(db):
+    with db._get_read_connection() as conn:
+        return conn.execute("SELECT COUNT(*), MAX(change_id) FROM property_changes").fetchone()
+
+
+def test_changelog_is_pruned_on_write(tmp_path, monkeypatch):
+    from mace.database.analysis.property_matrix import PropertyMatrixCache
+    monkeypatch.setattr(materials_module, "PROPERTY_CHANGES_KEEP", 50)
+    monkeypatch.setattr(materials_module, "PROPERTY_CHANGES_PRUNE_EVERY", 10)
+    db = MaterialDatabase(str(tmp_path / "materials.db"), str(tmp_path / "structures.db"))
+    cache = PropertyMatrixCache(db, str(tmp_path / "cache"))
+    cache.load()
+
+    for start in range(0, 400, 20):
+        db.upsert_properties(_rows(400)[start:start + 20], record_history=False)
+    count, last = _changes(db)
+    assert last == 400
+    assert 50 <= count <= 60
+
+    # The cache fell behind the pruned changelog and rebuilds
+    assert cache.refresh()["mode"] == "rebuild"
+    matrix = cache.load()
+    assert matrix.value("mat_007", "prop_9") == 368.0
+    db.close()
+
+
+def test_reading_the_cache_does_not_delete_changes(tmp_path):
+    from mace.database.analysis.property_matrix import PropertyMatrixCache
+    db = MaterialDatabase(str(tmp_path / "materials.db"), str(tmp_path / "structures.db"))
+    cache = PropertyMatrixCache(db, str(tmp_path / "cache"))
+    db.upsert_properties(_rows(80), record_history=False)
+    cache.load()
+    db.upsert_properties(_rows(10, scale=2.0), record_history=False)
+    before = _changes(db)
+    assert cache.refresh() == {"mode": "incremental", "changes": 10, "change_id": 90}
+    assert _changes(db) == before
+    assert cache.load().value("mat_003", "prop_0") == 8.0
+    db.close()
+
+
+ANALYSIS_SCRIPT = """
+import json, sys
+sys.path.insert(0, {root!r})
+if {block}:
+    class BlockNumpy:
+        def find_spec(self, name, path=None, target=None):
+            if name == "numpy" or name.startswith("numpy."):
+                raise ImportError("numpy blocked")
+    sys.meta_path.insert(0, BlockNumpy())
+from mace.database.materials import MaterialDatabase
+from mace.database import analysis
+from mace.database.analysis import correlation, distribution
+db = MaterialDatabase({db!r}, {ase!r})
+corr = analysis.PropertyCorrelation(db).calculate_correlations(min_samples=3)
+dist = analysis.PropertyDistribution(db).analyze_distributions()
+print(json.dumps({{"has_numpy": [correlation.HAS_NUMPY, distribution.HAS_NUMPY],
+                  "correlations": corr["correlations"], "distributions": dist["distributions"]}},
+                 sort_keys=True, default=str))
+"""
+
+
+def _run_analysis(tmp_path, block_numpy):
+    script = ANALYSIS_SCRIPT.format(root=str(REPO_ROOT), block=block_numpy, db=str(tmp_path / "materials.db"),
+                                    ase=str(tmp_path / "structures.db"))
+    result = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, cwd=str(tmp_path))
+    assert result.returncode == 0, result.stderr
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def test_analysis_works_without_numpy(db, tmp_path):
+    rows = _rows(200)
+    rows += [(f"mat_{i:03d}", "calc_1", "magnetic", "magnetic_state", None, "FM" if i % 3 else "AFM", None,
+              "2024-01-01T00:00:00", "test") for i in range(40)]
+    db.upsert_properties(rows, record_history=False)
+
+    without = _run_analysis(tmp_path, block_numpy=True)
+    with_numpy = _run_analysis(tmp_path, block_numpy=False)
+    assert without["has_numpy"] == [False, False]
+    assert with_numpy["has_numpy"] == [True, True]
+    assert without["distributions"] == with_numpy["distributions"]
+    assert "magnetic_state" in without["distributions"]
+    pairs = lambda result: {(c["property_1"], c["property_2"]): c for c in result["correlations"]}
+    assert pairs(without).keys() == pairs(with_numpy).keys()
+    for pair, corr in pairs(without).items():
+        assert corr["spearman"] == pytest.approx(pairs(with_numpy)[pair]["spearman"], abs=1e-9)
+        assert corr["correlation"] == pytest.approx(pairs(with_numpy)[pair]["correlation"], abs=1e-9)
@@ -0,0 +1,44 @@
+"""Batched property upserts and the unique-index migration."""
+
+from mace.database.materials import MaterialDatabase
+
+
+def _row(name, value, calc_id="calc_1"):
+    return ("mat_1", calc_id, "electronic", name, value, str(value), "eV",
+            "2024-01-01T00:00:00", "crystal_property_extractor.py")
+
+
+def _values(db):
+    with db._get_read_connection() as conn:
+        return conn.execute("SELECT property_name, calc_id, property_value FROM properties "
+                            "ORDER BY property_name, calc_id").fetchall()
+
+
+def test_upsert_inserts_then_updates(db):
+    assert db.upsert_properties([_row("band_gap", 1.0), _row("total_energy", -10.0)]) == 2
+    assert db.upsert_properties([_row("band_gap", 2.0)]) == 1
+    assert [tuple(row) for row in _values(db)] == [("band_gap", "calc_1", 2.0),
+                                                   ("total_energy", "calc_1", -10.0)]
+
+
+def test_upsert_treats_missing_calc_id_as_one_key(db):
+    db.upsert_properties([_row("band_gap", 1.0, calc_id=None)])
+    db.upsert_properties([_row("band_gap", 3.0, calc_id=None)])
+    assert [tuple(row) for row in _values(db)] == [("band_gap", None, 3.0)]
+
+
+def test_migration_reports_removed_duplicates(tmp_path, capsys):
+    db_path, ase_path = str(tmp_path / "materials.db"), str(tmp_path / "structures.db")
+    db = MaterialDatabase(db_path, ase_path)
+    with db._get_connection() as conn:
+        conn.execute("DROP INDEX idx_properties_unique")
+        conn.executemany("INSERT INTO properties (material_id, calc_id, property_category, property_name, "
+                         "property_value, extracted_at) VALUES (?, ?, ?, ?, ?, ?)",
+                         [("mat_1", "calc_1", "test", f"p{i % 3}", i, "2024-01-01") for i in range(9)])
+    db.close()
+    capsys.readouterr()
+
+    db = MaterialDatabase(db_path, ase_path)
+    assert "Removed 6 duplicate property rows" in capsys.readouterr().out
+    assert [row[2] for row in _values(db)] == [6.0, 7.0, 8.0]
+    db.close()
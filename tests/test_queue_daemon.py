@@ -0,0 +1,137 @@
+"""Queue daemon: read cache, spool, liveness and batching of notifications."""
+
+import json
+import os
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime
+
+import pytest
+
+from mace.queue.daemon import (HEARTBEAT_FILE, PID_FILE, SPOOL_DIR, QueueDaemon, StateCache,
+                               drain_spool, is_daemon_running, notify)
+
+
+@pytest.fixture
+def cache(db):
+    now = datetime.now().isoformat()
+    with db._get_connection() as conn:
+        conn.execute("INSERT INTO materials (material_id, formula, created_at, updated_at) "
+                     "VALUES ('mat_1', 'C', ?, ?)", (now, now))
+        conn.execute("INSERT INTO calculations (calc_id, material_id, calc_type, status, created_at) "
+                     "VALUES ('calc_1', 'mat_1', 'OPT', 'running', ?)", (now,))
+    return StateCache(db)
+
+
+def test_repeated_read_is_a_hit_and_a_copy(cache):
+    first = cache.get_calculation("calc_1")
+    again = cache.get_calculation("calc_1")
+    assert (cache.misses, cache.hits) == (1, 1)
+    assert again == first
+    again["status"] = "modified by caller"
+    assert cache.get_calculation("calc_1")["status"] == "running"
+
+
+def test_commit_from_another_connection_invalidates(cache, db):
+    cache.get_calculation("calc_1")
+    conn = sqlite3.connect(str(db.db_path))
+    conn.execute("UPDATE calculations SET status = 'failed' WHERE calc_id = 'calc_1'")
+    conn.commit()
+    conn.close()
+    assert cache.get_calculation("calc_1")["status"] == "failed"
+    assert cache.misses == 2
+
+    # The database's own write connection commits as well
+    db.update_calculation_status("calc_1", "completed")
+    assert cache.get_calculation("calc_1")["status"] == "completed"
+
+
+def test_reads_inside_a_write_block_bypass_the_cache(cache, db):
+    cache.get_calculation("calc_1")
+    with db._get_connection() as conn:
+        conn.execute("UPDATE calculations SET status = 'queued' WHERE calc_id = 'calc_1'")
+        assert cache.get_calculation("calc_1")["status"] == "queued"
+        conn.rollback()
+    assert cache.get_calculation("calc_1")["status"] == "running"
+    assert cache.hits == 1
+
+
+def test_reads_from_another_thread_bypass_the_cache(cache):
+    cache.get_calculation("calc_1")
+    results = []
+    thread = threading.Thread(target=lambda: results.append(cache.get_calculation("calc_1")))
+    thread.start()
+    thread.join()
+    assert results[0]["status"] == "running"
+    assert (cache.misses, cache.hits) == (1, 0)
+
+
+def _write_daemon_info(directory, pid):
+    directory.mkdir(parents=True, exist_ok=True)
+    info = {"pid": pid, "host": os.uname().nodename, "tick": 5, "started_at": time.time()}
+    (directory / PID_FILE).write_text(json.dumps(info))
+    (directory / HEARTBEAT_FILE).touch()
+
+
+def test_live_daemon_is_running(tmp_path):
+    _write_daemon_info(tmp_path, os.getpid())
+    assert is_daemon_running(tmp_path)
+
+
+def test_dead_pid_is_not_running(tmp_path):
+    dead = subprocess.Popen([sys.executable, "-c", "pass"])
+    dead.wait()
+    _write_daemon_info(tmp_path, dead.pid)
+    assert not is_daemon_running(tmp_path)
+
+
+def test_stale_heartbeat_is_not_running(tmp_path):
+    _write_daemon_info(tmp_path, os.getpid())
+    old = time.time() - 3600
+    os.utime(tmp_path / HEARTBEAT_FILE, (old, old))
+    assert not is_daemon_running(tmp_path)
+
+
+class RecordingManager:
+    """Stands in for the queue manager: records the callback batches it is asked to run."""
+
+    def __init__(self, d12_dir):
+        self.d12_dir = d12_dir
+        self.db = None
+        self.batches = []
+
+    def run_callback_batch(self, modes):
+        self.batches.append(list(modes))
+
+
+def test_notifications_are_coalesced_into_one_batch(tmp_path):
+    manager = RecordingManager(tmp_path)
+    daemon = QueueDaemon(manager, tmp_path / "daemon")
+    for job_id in range(5):
+        notify(daemon.directory, "completion", job_id=str(job_id))
+    notify(daemon.directory, "status_check")
+
+    assert daemon.run_once() == ["completion", "status_check"]
+    assert manager.batches == [["completion", "status_check"]]
+    assert daemon.notifications == 6
+    assert drain_spool(daemon.directory) == []
+    # Nothing pending: no batch unless a completion check is due
+    assert daemon.run_once() == []
+    assert daemon.run_once(idle_due=True) == ["completion"]
+
+
+def test_unreadable_notes_and_unknown_modes_are_skipped(tmp_path, capsys):
+    manager = RecordingManager(tmp_path)
+    daemon = QueueDaemon(manager, tmp_path / "daemon")
+    notify(daemon.directory, "no_such_mode")
+    (daemon.directory / SPOOL_DIR / "0_corrupt.json").write_text("{not json")
+    notify(daemon.directory, "early_failure")
+
+    assert daemon.run_once() == ["early_failure"]
+    assert manager.batches == [["early_failure"]]
+    output = capsys.readouterr().out
+    assert "0_corrupt.json" in output and "no_such_mode" in output
+    assert list((daemon.directory / SPOOL_DIR).glob("*.json")) == []
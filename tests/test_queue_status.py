@@ -0,0 +1,119 @@
+"""Queue snapshot and check_queue_status against fake squeue/sacct executables."""
+
+import stat
+
+import pytest
+
+from mace.queue import snapshot as snapshot_module
+from mace.queue.snapshot import QueueSnapshot
+
+NORMAL_END = "SCF ENDED - CONVERGENCE ON ENERGY\nEEEEEEEEEE TERMINATION  DATE 01 01 2024\n * CRYSTAL ENDS\n"
+SCF_FAILURE = "SCF ENDED - TOO MANY CYCLES\nERROR **** SCF **** TOO MANY CYCLES\n"
+
+
+def fake_slurm(tmp_path, squeue_lines, sacct_lines):
+    """Write fake squeue/sacct scripts that log their calls and print fixed output."""
+    log = tmp_path / "slurm_calls.log"
+    for name, lines in (("squeue", squeue_lines), ("sacct", sacct_lines)):
+        script = tmp_path / f"fake_{name}"
+        output = "\n".join(lines)
+        script.write_text(f"#!/bin/sh\necho \"{name} $*\" >> \"{log}\"\ncat <<'OUT'\n{output}\nOUT\n")
+        script.chmod(script.stat().st_mode | stat.S_IEXEC)
+    return tmp_path / "fake_squeue", tmp_path / "fake_sacct", log
+
+
+def calls(log):
+    return log.read_text().splitlines() if log.exists() else []
+
+
+def test_snapshot_shares_one_squeue_per_ttl(tmp_path):
+    squeue, sacct, log = fake_slurm(tmp_path, ["101|RUNNING|now|2026-01-01T10:00:00|a",
+                                               "102|PENDING|N/A|2026-01-01T10:00:00|b"], [])
+    snapshot = QueueSnapshot(ttl=60, squeue_cmd=str(squeue), sacct_cmd=str(sacct))
+    assert snapshot.counts() == (1, 1)
+    assert snapshot.state_counts() == {"RUNNING": 1, "PENDING": 1}
+    assert snapshot.resolve(["101", "102"]) == {"101": "RUNNING", "102": "PENDING"}
+    assert calls(log) == [f"squeue -u {snapshot.user} --noheader -o %i|%T|%S|%V|%j"]
+
+
+def test_snapshot_resolves_finished_jobs_with_one_sacct_call(tmp_path):
+    squeue, sacct, log = fake_slurm(tmp_path, ["101|RUNNING|now|2026-01-01T10:00:00|a"],
+                                    ["201|COMPLETED", "202|CANCELLED by 1234", "203|TIMEOUT"])
+    snapshot = QueueSnapshot(ttl=60, squeue_cmd=str(squeue), sacct_cmd=str(sacct))
+    states = snapshot.resolve(["101", "201", "202", "203", "204"])
+    assert states == {"101": "RUNNING", "201": "COMPLETED", "202": "CANCELLED", "203": "TIMEOUT"}
+    assert sum(line.startswith("sacct") for line in calls(log)) == 1
+
+    # Final states are cached; only the unknown job is looked up again
+    snapshot.resolve(["201", "202", "203", "204"])
+    sacct_calls = [line for line in calls(log) if line.startswith("sacct")]
+    assert len(sacct_calls) == 2
+    assert "--jobs=204 " in sacct_calls[-1] + " "
+
+
+@pytest.mark.parametrize("value, ttl", [(None, 30.0), ("5", 5.0), ("soon", 30.0), ("-1", 30.0)])
+def test_snapshot_ttl_is_read_when_the_snapshot_is_created(monkeypatch, capsys, value, ttl):
+    monkeypatch.setattr(snapshot_module, "_shared_snapshot", None)
+    if value is None:
+        monkeypatch.delenv("MACE_QUEUE_SNAPSHOT_TTL", raising=False)
+    else:
+        monkeypatch.setenv("MACE_QUEUE_SNAPSHOT_TTL", value)
+    assert snapshot_module.get_queue_snapshot().ttl == ttl
+    warned = "Invalid MACE_QUEUE_SNAPSHOT_TTL" in capsys.readouterr().out
+    assert warned == (value is not None and ttl == 30.0)
+
+
+@pytest.fixture
+def manager(tmp_path, monkeypatch):
+    from mace.queue.manager import EnhancedCrystalQueueManager
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(snapshot_module, "_shared_snapshot", None)
+    mgr = EnhancedCrystalQueueManager(str(tmp_path), db_path=str(tmp_path / "materials.db"),
+                                      enable_error_recovery=False)
+    mgr.handled = {"completed": [], "failed": []}
+    monkeypatch.setattr(mgr, "handle_completed_calculation", lambda calc_id: mgr.handled["completed"].append(calc_id))
+    monkeypatch.setattr(mgr, "handle_failed_calculation",
+                        lambda calc_id, state: mgr.handled["failed"].append((calc_id, state)))
+    yield mgr
+    mgr.db.close()
+
+
+def add_job(mgr, tmp_path, name, job_id, output=None):
+    work_dir = tmp_path / name
+    work_dir.mkdir()
+    if output is not None:
+        (work_dir / f"{name}.out").write_text(output)
+    mgr.db.create_material(name, "Si2")
+    calc_id = mgr.db.create_calculation(name, "SP", input_file=str(work_dir / f"{name}.d12"),
+                                        work_dir=str(work_dir))
+    mgr.db.update_calculation_status(calc_id, "running", slurm_job_id=job_id)
+    return calc_id
+
+
+def test_sacct_completed_is_checked_against_the_output(tmp_path, monkeypatch, manager):
+    squeue, sacct, log = fake_slurm(tmp_path, ["301|RUNNING|now|2026-01-01T10:00:00|queued"],
+                                    ["302|COMPLETED", "303|COMPLETED", "304|FAILED"])
+    monkeypatch.setenv("MACE_SQUEUE", str(squeue))
+    monkeypatch.setenv("MACE_SACCT", str(sacct))
+
+    queued = add_job(manager, tmp_path, "queued", "301")
+    finished = add_job(manager, tmp_path, "finished", "302", NORMAL_END)
+    scf_failed = add_job(manager, tmp_path, "scf_failed", "303", SCF_FAILURE)
+    slurm_failed = add_job(manager, tmp_path, "slurm_failed", "304", SCF_FAILURE)
+
+    manager.check_queue_status()
+
+    status = {calc_id: manager.db.get_calculation(calc_id) for calc_id in
+              (queued, finished, scf_failed, slurm_failed)}
+    assert status[queued]["status"] == "running"
+    assert status[finished]["status"] == "completed"
+    assert status[finished]["output_file"].endswith("finished.out")
+    # sacct says COMPLETED, but CRYSTAL did not terminate normally
+    assert status[scf_failed]["status"] == "failed"
+    assert status[scf_failed]["output_file"].endswith("scf_failed.out")
+    assert status[slurm_failed]["status"] == "failed"
+
+    assert manager.handled["completed"] == [finished]
+    assert manager.handled["failed"] == [(slurm_failed, "FAILED")]
+    # One squeue and one sacct call for the whole cycle
+    assert [line.split()[0] for line in calls(log)] == ["squeue", "sacct"]
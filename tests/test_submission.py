@@ -0,0 +1,275 @@
+"""Submission queue and bulk manager submission against a stub sbatch."""
+
+import shutil
+import stat
+import time
+from pathlib import Path
+
+import pytest
+
+from mace.queue import snapshot as snapshot_module
+from mace.queue import submission as submission_module
+from mace.queue.snapshot import QueueSnapshot
+from mace.queue.submission import SubmissionJob, SubmissionQueue
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+SAMPLE_D12 = REPO_ROOT / "cif" / "2D example" / "3LG_BF4_2x2_Sol_ad.d12"
+
+
+def stub_sbatch(tmp_path, delay=0.0, failures=0, error="sbatch: error: Socket timed out on send/recv operation"):
+    """Write a stub sbatch that logs "<cwd> <script>" and prints sequential job ids.
+
+    The first `failures` calls fail with `error` on stderr.
+    """
+    bin_dir = tmp_path / "bin"
+    bin_dir.mkdir()
+    log = tmp_path / "sbatch_calls.log"
+    counter = tmp_path / "sbatch_counter"
+    counter.write_text("0")
+    script = bin_dir / "sbatch"
+    script.write_text(f"""#!/bin/sh
+sleep {delay}
+exec 9>>"{counter}.lock"
+flock 9
+n=$(($(cat "{counter}") + 1))
+echo $n > "{counter}"
+flock -u 9
+if [ $n -le {failures} ]; then
+  echo "{error}" >&2
+  exit 1
+fi
+echo "$(pwd) $1" >> "{log}"
+echo "Submitted batch job $((1000 + n))"
+""")
+    script.chmod(script.stat().st_mode | stat.S_IEXEC)
+    return script, log
+
+
+def calls(log):
+    return log.read_text().splitlines() if log.exists() else []
+
+
+def job_scripts(tmp_path, n):
+    jobs = []
+    for i in range(n):
+        work_dir = tmp_path / f"job_{i}"
+        work_dir.mkdir()
+        script = work_dir / f"job_{i}.sh"
+        script.write_text("#!/bin/bash\n#SBATCH --ntasks=4\nsrun true\n")
+        jobs.append(SubmissionJob(script, work_dir))
+    return jobs
+
+
+def test_submit_many_runs_sbatch_concurrently_in_each_work_dir(tmp_path):
+    sbatch, log = stub_sbatch(tmp_path, delay=0.5)
+    queue = SubmissionQueue(max_workers=8, rate=0, sbatch_cmd=str(sbatch))
+    jobs = job_scripts(tmp_path, 8)
+    start = time.perf_counter()
+    try:
+        result = queue.submit_many(jobs)
+    finally:
+        queue.shutdown()
+    elapsed = time.perf_counter() - start
+
+    assert result == jobs
+    assert sorted(job.job_id for job in jobs) == [str(1001 + i) for i in range(8)]
+    assert all(job.error is None and job.attempts == 1 for job in jobs)
+    # Every sbatch ran in its job's directory, without changing ours
+    assert sorted(calls(log)) == sorted(f"{job.work_dir} {job.script_path}" for job in jobs)
+    assert Path.cwd() != tmp_path
+    # 8 calls of 0.5 s each take 4 s serially
+    assert elapsed < 2.0
+
+
+def stub_squeue(tmp_path, lines, queued_by_sbatch=()):
+    """Write a stub squeue that logs its calls and lists "<id>|<state>|<start>|<submit>|<name>" lines.
+
+    The queued_by_sbatch lines, "<id>|<state>|<name>", are only listed once the
+    stub sbatch has been called, with the current time as their submit time.
+    """
+    log = tmp_path / "squeue_calls.log"
+    counter = tmp_path / "sbatch_counter"
+    script = tmp_path / "bin" / "squeue"
+    output = "\n".join(lines)
+    later = "\n".join("{}|{}|N/A|$now|{}".format(*line.split("|")) for line in queued_by_sbatch)
+    script.write_text(f"""#!/bin/sh
+echo "$*" >> "{log}"
+cat <<'OUT'
+{output}
+OUT
+if [ "$(cat "{counter}")" -gt 0 ]; then
+now=$(date +%Y-%m-%dT%H:%M:%S)
+cat <<OUT
+{later}
+OUT
+fi
+""")
+    script.chmod(script.stat().st_mode | stat.S_IEXEC)
+    return QueueSnapshot(squeue_cmd=str(script)), log
+
+
+def test_transient_errors_are_retried(tmp_path):
+    sbatch, log = stub_sbatch(tmp_path, failures=2,
+                              error="sbatch: error: Batch job submission failed: Unable to contact slurm controller")
+    queue = SubmissionQueue(max_workers=1, rate=0, backoff=0.01, sbatch_cmd=str(sbatch))
+    job = queue.submit_job(job_scripts(tmp_path, 1)[0])
+    assert job.job_id == "1003"
+    assert job.attempts == 3
+    assert len(calls(log)) == 1
+
+
+def test_socket_timeouts_are_retried_when_squeue_has_no_such_job(tmp_path):
+    sbatch, log = stub_sbatch(tmp_path, failures=2)
+    snapshot, squeue_log = stub_squeue(tmp_path, ["900|RUNNING|now|2026-01-01T10:00:00|other_job"])
+    queue = SubmissionQueue(max_workers=1, rate=0, backoff=0.01, sbatch_cmd=str(sbatch),
+                            queue_snapshot=snapshot)
+    job = queue.submit_job(job_scripts(tmp_path, 1)[0])
+    assert job.job_id == "1003"
+    assert job.attempts == 3
+    assert len(calls(log)) == 1
+    # squeue only runs after each of the 2 timeouts, not before every sbatch
+    assert len(calls(squeue_log)) == 2
+
+
+def test_successful_submissions_do_not_run_squeue(tmp_path):
+    sbatch, log = stub_sbatch(tmp_path)
+    snapshot, squeue_log = stub_squeue(tmp_path, [])
+    queue = SubmissionQueue(max_workers=4, rate=0, sbatch_cmd=str(sbatch), queue_snapshot=snapshot)
+    try:
+        jobs = queue.submit_many(job_scripts(tmp_path, 20))
+    finally:
+        queue.shutdown()
+    assert all(job.job_id for job in jobs)
+    assert calls(squeue_log) == []
+
+
+def test_socket_timeout_of_a_queued_job_is_not_resubmitted(tmp_path):
+    sbatch, log = stub_sbatch(tmp_path, failures=1)
+    # The controller queued the job before the reply timed out
+    snapshot, _ = stub_squeue(tmp_path, ["800|RUNNING|now|2026-01-01T10:00:00|other_job"],
+                              queued_by_sbatch=["900|PENDING|job_0.sh"])
+    queue = SubmissionQueue(max_workers=1, rate=0, backoff=0.01, sbatch_cmd=str(sbatch),
+                            queue_snapshot=snapshot)
+    job = queue.submit_job(job_scripts(tmp_path, 1)[0])
+    assert job.job_id == "900" and job.error is None
+    assert job.attempts == 1
+    assert calls(log) == []
+
+
+def test_socket_timeout_does_not_take_an_older_job_with_the_same_name(tmp_path):
+    sbatch, log = stub_sbatch(tmp_path, failures=1)
+    # Earlier submissions of the same script are still queued; this one was not
+    snapshot, _ = stub_squeue(tmp_path, ["700|RUNNING|now|2026-01-01T10:00:00|job_0.sh",
+                                         "701|PENDING|N/A|2026-01-01T10:05:00|job_0"])
+    queue = SubmissionQueue(max_workers=1, rate=0, backoff=0.01, sbatch_cmd=str(sbatch),
+                            queue_snapshot=snapshot)
+    job = queue.submit_job(job_scripts(tmp_path, 1)[0])
+    assert job.job_id == "1002" and job.error is None
+    assert job.attempts == 2
+    assert len(calls(log)) == 1
+
+
+def test_socket_timeout_with_several_new_jobs_of_the_name_is_not_retried(tmp_path):
+    sbatch, log = stub_sbatch(tmp_path, failures=1)
+    # Another process queued a job of the same name while this sbatch timed out
+    snapshot, _ = stub_squeue(tmp_path, [], queued_by_sbatch=["900|PENDING|job_0.sh", "901|PENDING|job_0"])
+    queue = SubmissionQueue(max_workers=1, rate=0, backoff=0.01, sbatch_cmd=str(sbatch),
+                            queue_snapshot=snapshot)
+    job = queue.submit_job(job_scripts(tmp_path, 1)[0])
+    assert job.job_id is None
+    assert job.attempts == 1
+    assert "several new jobs" in job.error
+    assert calls(log) == []
+
+
+def test_socket_timeouts_are_not_retried_without_squeue(tmp_path):
+    sbatch, log = stub_sbatch(tmp_path, failures=1)
+    snapshot = QueueSnapshot(squeue_cmd=str(tmp_path / "bin" / "no_squeue"))
+    queue = SubmissionQueue(max_workers=1, rate=0, backoff=0.01, sbatch_cmd=str(sbatch),
+                            queue_snapshot=snapshot)
+    job = queue.submit_job(job_scripts(tmp_path, 1)[0])
+    assert job.job_id is None
+    assert job.attempts == 1
+    assert "Socket timed out" in job.error
+    assert calls(log) == []
+
+
+def test_permanent_errors_are_not_retried(tmp_path):
+    sbatch, _ = stub_sbatch(tmp_path, failures=5, error="sbatch: error: Invalid account")
+    queue = SubmissionQueue(max_workers=1, rate=0, backoff=0.01, sbatch_cmd=str(sbatch))
+    job = queue.submit_job(job_scripts(tmp_path, 1)[0])
+    assert job.job_id is None
+    assert job.attempts == 1
+    assert "Invalid account" in job.error
+
+
+def test_template_generated_script_is_submitted_with_the_configured_sbatch(tmp_path):
+    sbatch, log = stub_sbatch(tmp_path)
+    template = tmp_path / "submit_template.sh"
+    template.write_text('#!/bin/bash\necho "#SBATCH --ntasks=4" > $1.sh\n')
+    work_dir = tmp_path / "calc"
+    work_dir.mkdir()
+    queue = SubmissionQueue(max_workers=1, rate=0, sbatch_cmd=str(sbatch))
+    job = queue.submit_job(SubmissionJob(template, work_dir, job_name="mat_sp"))
+    assert job.job_id == "1001"
+    assert calls(log) == [f"{work_dir} mat_sp.sh"]
+
+
+@pytest.fixture
+def manager(tmp_path, monkeypatch):
+    from mace.queue.manager import EnhancedCrystalQueueManager
+    sbatch, log = stub_sbatch(tmp_path, delay=0.3)
+    monkeypatch.setenv("MACE_SBATCH", str(sbatch))
+    monkeypatch.setenv("MACE_SUBMIT_RATE", "0")
+    monkeypatch.setattr(submission_module, "_shared_queue", None)
+    monkeypatch.setattr(snapshot_module, "_shared_snapshot", None)
+    # A script generator template: writes <job name>.sh and leaves the sbatch to the queue
+    template = tmp_path / "submitcrystal23.sh"
+    template.write_text('#!/bin/bash\necho "#SBATCH --ntasks=4" > $1.sh\n')
+    d12_dir = tmp_path / "inputs"
+    d12_dir.mkdir()
+    monkeypatch.chdir(d12_dir)
+    mgr = EnhancedCrystalQueueManager(str(d12_dir), db_path=str(tmp_path / "materials.db"),
+                                      enable_error_recovery=False)
+    monkeypatch.setattr(mgr, "_get_submit_script_for_calc_type", lambda calc_type: str(template))
+    mgr.sbatch_log = log
+    yield mgr
+    mgr.db.close()
+    submission_module.get_submission_queue().shutdown()
+
+
+def test_new_d12_files_are_submitted_together(manager, tmp_path):
+    for i in range(6):
+        shutil.copy(SAMPLE_D12, manager.d12_dir / f"mat{i}_SP.d12")
+    manager.max_submit_per_callback = 4
+
+    start = time.perf_counter()
+    manager.process_new_d12_files()
+    elapsed = time.perf_counter() - start
+
+    submitted = manager.db.get_calculations_by_status("submitted")
+    assert len(submitted) == 4
+    assert len(calls(manager.sbatch_log)) == 4
+    assert {calc["slurm_job_id"] for calc in submitted} == {"1001", "1002", "1003", "1004"}
+    assert set(manager.legacy_job_status["submitted"]) == {"1001", "1002", "1003", "1004"}
+    for line in calls(manager.sbatch_log):
+        cwd, script = line.split()
+        calc = next(calc for calc in submitted if calc["work_dir"] == cwd)
+        assert script == f"{Path(calc['input_file']).stem}.sh"
+    # 4 sbatch calls of 0.3 s each take 1.2 s serially
+    assert elapsed < 1.0
+
+    # The next callback only submits the remaining files
+    manager.process_new_d12_files()
+    assert len(manager.db.get_calculations_by_status("submitted")) == 6
+
+
+def test_failed_submission_leaves_the_calculation_unsubmitted(manager, tmp_path, monkeypatch):
+    broken = tmp_path / "broken.sh"
+    broken.write_text("#!/bin/bash\n#SBATCH --ntasks=4\nsrun true\n")
+    monkeypatch.setattr(manager, "_get_submit_script_for_calc_type", lambda calc_type: str(broken))
+    shutil.copy(SAMPLE_D12, manager.d12_dir / "mat0_SP.d12")
+    # Direct scripts are run as commands; this one is not executable
+    assert manager.submit_calculations([manager.d12_dir / "mat0_SP.d12"]) == [None]
+    assert manager.db.get_calculations_by_status("submitted") == []
+    assert manager.legacy_job_status["submitted"] == {}
@@ -0,0 +1,55 @@
+"""The job-end callback script generates a completed SP's follow-up steps concurrently."""
+
+import json
+import os
+import subprocess
+import sys
+
+from conftest import REPO_ROOT
+from mace.database.materials import MaterialDatabase
+
+# Loads callback.py as the job-end script does, records property calculations
+# instead of generating their inputs, and runs the script's main()
+CALLBACK_SCRIPT = """
+import runpy, sys, threading
+callback = runpy.run_path({script!r}, run_name="mace_callback")
+threads = set()
+
+def generate_property_calculation(self, source_calc_id, target_calc_type):
+    threads.add(threading.current_thread().name)
+    material_id = self.db.get_calculation(source_calc_id)["material_id"]
+    return self.db.create_calculation(material_id, target_calc_type, prerequisite_calc_id=source_calc_id,
+                                      settings={{"workflow_id": "workflow_test"}})
+
+callback["WorkflowEngine"].generate_property_calculation = generate_property_calculation
+sys.argv = ["callback.py", "--calc-id", {calc_id!r}]
+callback["main"]()
+print("threads:", ",".join(sorted(threads)))
+"""
+
+
+def test_callback_generates_band_and_doss_after_sp(tmp_path):
+    (tmp_path / "workflow_configs").mkdir()
+    (tmp_path / "workflow_configs" / "workflow_plan_test.json").write_text(
+        json.dumps({"workflow_sequence": ["OPT", "SP", "BAND", "DOSS"]}))
+    db = MaterialDatabase(str(tmp_path / "materials.db"))
+    db.create_material("mat_0001", "C")
+    for calc_type in ("OPT", "SP"):
+        calc_id = db.create_calculation("mat_0001", calc_type, settings={"workflow_id": "workflow_test"})
+        db.update_calculation_status(calc_id, "completed", output_file=str(tmp_path / f"{calc_type}.out"))
+    db.close()
+
+    script = CALLBACK_SCRIPT.format(script=str(REPO_ROOT / "mace" / "workflow" / "callback.py"), calc_id=calc_id)
+    env = dict(os.environ, PYTHONPATH=str(REPO_ROOT), MACE_STEP_WORKERS="4")
+    result = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, cwd=str(tmp_path),
+                            env=env)
+    assert result.returncode == 0, result.stderr
+    assert "Generated 2 new calculations" in result.stdout
+    # Both steps ran in the fan-out's worker threads
+    threads = result.stdout.strip().splitlines()[-1].split(": ", 1)[1].split(",")
+    assert threads and all(name.startswith("mace-step") for name in threads)
+
+    db = MaterialDatabase(str(tmp_path / "materials.db"))
+    created = sorted(calc["calc_type"] for calc in db.get_calculations_by_status(material_id="mat_0001"))
+    db.close()
+    assert created == ["BAND", "DOSS", "OPT", "SP"]
@@ -0,0 +1,99 @@
+"""Workflow events: part of the base schema, backfilled for older databases, pruned by the workflow cleanup."""
+
+import threading
+from datetime import datetime, timedelta
+
+import pytest
+
+from mace.database.materials import MaterialDatabase
+from mace.workflow import engine as engine_module
+from mace.workflow.engine import WorkflowEngine
+
+
+def _complete(db, name):
+    db.create_material(name, "Si2")
+    calc_id = db.create_calculation(name, "OPT", input_file=f"{name}.d12", work_dir=".")
+    db.update_calculation_status(calc_id, "completed")
+    return calc_id
+
+
+def _wait_for_cleanup():
+    for thread in threading.enumerate():
+        if thread.name == "workflow-dir-cleanup":
+            thread.join(timeout=10)
+
+
+def test_new_database_needs_no_migration(tmp_path, capsys):
+    db = MaterialDatabase(str(tmp_path / "materials.db"), str(tmp_path / "structures.db"))
+    calc_id = _complete(db, "mat_new")
+    assert [event["calc_id"] for event in db.claim_workflow_events("test", limit=10)] == [calc_id]
+    db.close()
+    assert capsys.readouterr().out == ""
+
+
+def test_database_without_events_is_backfilled(tmp_path, capsys):
+    db_path = tmp_path / "materials.db"
+    db = MaterialDatabase(str(db_path), str(tmp_path / "structures.db"))
+    calc_id = _complete(db, "mat_done")
+    with db._get_connection() as conn:
+        conn.executescript("""
+            DROP TRIGGER trg_calculations_completed_event;
+            DROP TRIGGER trg_calculations_insert_completed_event;
+            DROP TABLE workflow_events;
+        """)
+    db.close()
+
+    db = MaterialDatabase(str(db_path), str(tmp_path / "structures.db"))
+    assert [event["calc_id"] for event in db.claim_workflow_events("test", limit=10)] == [calc_id]
+    later = _complete(db, "mat_later")
+    assert [event["calc_id"] for event in db.claim_workflow_events("test", limit=10)] == [later]
+    db.close()
+    assert "Adding workflow_events table" in capsys.readouterr().out
+
+
+@pytest.fixture
+def events_db(tmp_path):
+    db_path = tmp_path / "materials.db"
+    db = MaterialDatabase(str(db_path), str(tmp_path / "structures.db"))
+    old, recent, pending = (_complete(db, name) for name in ("mat_old", "mat_recent", "mat_pending"))
+    for event in db.claim_workflow_events("test", limit=10):
+        if event["calc_id"] != pending:
+            db.complete_workflow_event(event["event_id"], {})
+        else:
+            db.release_workflow_event(event["event_id"])
+    long_ago = (datetime.now() - timedelta(days=engine_module.WORKFLOW_EVENT_RETENTION_DAYS + 5)).isoformat()
+    with db._get_connection() as conn:
+        conn.execute("UPDATE workflow_events SET consumed_at = ? WHERE calc_id = ?", (long_ago, old))
+    db.close()
+    return db_path, {"old": old, "recent": recent, "pending": pending}
+
+
+def _remaining(db):
+    with db._get_read_connection() as conn:
+        return sorted(row[0] for row in conn.execute("SELECT calc_id FROM workflow_events"))
+
+
+def test_cleanup_prunes_old_consumed_events(events_db, tmp_path):
+    db_path, calcs = events_db
+    (tmp_path / "work").mkdir()
+    engine = WorkflowEngine(str(db_path), str(tmp_path / "work"))
+    _wait_for_cleanup()
+    assert _remaining(engine.db) == sorted([calcs["recent"], calcs["pending"]])
+    assert engine.db.count_pending_workflow_events() == 1
+    engine.db.close()
+
+
+def test_prune_is_throttled_with_the_directory_cleanup(events_db, tmp_path, monkeypatch):
+    db_path, calcs = events_db
+    (tmp_path / "work" / "workflow_staging").mkdir(parents=True)
+    (tmp_path / "work" / "workflow_staging" / engine_module.CLEANUP_STAMP_FILE).touch()
+    engine = WorkflowEngine(str(db_path), str(tmp_path / "work"))
+    _wait_for_cleanup()
+    # The cleanup ran recently, so the old event is still there
+    assert calcs["old"] in _remaining(engine.db)
+    assert engine._schedule_workflow_dir_cleanup() is False
+
+    assert engine._schedule_workflow_dir_cleanup(force=True) is True
+    _wait_for_cleanup()
+    assert calcs["old"] not in _remaining(engine.db)
+    engine.db.close()